@@ -0,0 +1,436 @@
+"""
+构建产物仓库：记录每次构建的产物、命令行、输入哈希、Python/PyInstaller 版本和耗时
+
+仓库按"对象"读写 (类似 S3 的键值存储)：
+
+    records/<key>.json      构建记录
+    artifacts/<key>.tar.gz  产物归档
+
+ArtifactStore 在这些对象操作之上实现发布与取回，后端只需要实现 _exists/_read/_write/
+_upload/_download/_list 几个方法。本地目录后端 LocalArtifactStore 额外维护一个 index.json
+汇总所有记录，多台构建机可以共享同一个目录 (如网络盘)；HttpArtifactStore 通过 HTTP 按对象
+读写 (S3 风格的 HEAD/GET/PUT，协议见 store_server.py，它也是可以直接使用的简单对象服务器)。
+
+键只由可移植的信息计算 (文件内容哈希、第三方包版本、Python/PyInstaller 版本和平台)，
+不含本机路径或修改时间，环境一致的构建机会得到相同的键。
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import tarfile
+import hashlib
+import tempfile
+import importlib.util
+from contextlib import contextmanager
+from build_cache import _hash_file, _hash_path, _pyinstaller_version, _source_name, _strip_paths
+from build_cache import file_lock, STALE_LOCK_SECONDS
+from import_analyzer import import_closure
+
+# 记录格式版本，修改键的计算方式时需要递增
+STORE_FORMAT_VERSION = 1
+
+# 默认仓库目录，可通过环境变量 PY_TO_EXE_STORE_DIR 覆盖
+DEFAULT_STORE_DIR = os.environ.get(
+    'PY_TO_EXE_STORE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'py_to_exe', 'artifacts')
+)
+
+# HTTP 后端的令牌，设置后请求带 Authorization: Bearer <令牌>
+STORE_TOKEN_ENV = 'PY_TO_EXE_STORE_TOKEN'
+
+
+def input_hashes(input_file, additional_data=None, icon_path=None, source_tree=None, source_root=None):
+    """
+    返回构建输入的内容哈希
+
+    键为 src:<相对源码目录的路径>、data:<目标路径> 和 icon，值为 sha256；
+    项目模式下另有 tree (整个源码树的摘要)，src 只有启动脚本
+    """
+    hashes = {}
+    root_dir = os.path.abspath(source_root) if source_root else os.path.dirname(os.path.abspath(input_file))
+    if source_tree:
+        hashes['tree'] = source_tree
+        local_files = [os.path.abspath(input_file)]
+    else:
+        local_files, _ = import_closure(input_file, source_root=source_root)
+    for path in local_files:
+        hasher = hashlib.sha256()
+        _hash_file(path, hasher)
+        hashes[f"src:{_source_name(path, root_dir)}"] = hasher.hexdigest()
+    for src, dest in additional_data or []:
+        hasher = hashlib.sha256()
+        _hash_path(src, hasher)
+        hashes[f"data:{dest}"] = hasher.hexdigest()
+    if icon_path:
+        hasher = hashlib.sha256()
+        _hash_file(icon_path, hasher)
+        hashes['icon'] = hasher.hexdigest()
+    return hashes
+
+
+def external_versions(modules):
+    """返回第三方模块所属发行包的版本，标准库模块记为 stdlib，找不到的记为 missing"""
+    from importlib.metadata import packages_distributions, version, PackageNotFoundError
+    distributions = packages_distributions()
+    versions = {}
+    for name in sorted(modules):
+        top = name.split('.')[0]
+        if top in sys.stdlib_module_names:
+            versions[top] = 'stdlib'
+            continue
+        dists = distributions.get(top)
+        if not dists:
+            try:
+                found = importlib.util.find_spec(top) is not None
+            except (ImportError, ValueError):
+                found = False
+            versions[top] = 'unknown' if found else 'missing'
+            continue
+        try:
+            versions[top] = f"{dists[0]}=={version(dists[0])}"
+        except PackageNotFoundError:
+            versions[top] = 'unknown'
+    return versions
+
+
+def _portable_cmd(cmd):
+    """
+    去掉命令中的本机路径：--icon 和 --add-data 只保留目标部分，--paths 记为 <src>，
+    --upx-dir 记为 <upx>，脚本只保留文件名
+    """
+    portable = []
+    args = _strip_paths(cmd)
+    skip = None
+    for arg in args[:-1]:
+        if skip == '--icon':
+            portable.append('<icon>')
+        elif skip == '--paths':
+            portable.append('<src>')
+        elif skip == '--upx-dir':
+            portable.append('<upx>')
+        elif skip == '--add-data':
+            portable.append(arg.rsplit(os.pathsep, 1)[-1])
+        else:
+            portable.append(arg)
+        skip = arg if arg in ('--icon', '--add-data', '--paths', '--upx-dir') else None
+    portable.append(os.path.basename(args[-1]))
+    return portable
+
+
+def build_record(input_file, cmd, additional_data=None, icon_path=None, source_tree=None, source_root=None):
+    """
+    计算构建记录和仓库键
+
+    参数与 BuildCache.compute_key 相同
+
+    返回:
+        tuple: (键, 记录字典)
+    """
+    _, external = import_closure(input_file, source_root=source_root)
+    record = {
+        'format': STORE_FORMAT_VERSION,
+        'python': sys.version,
+        'pyinstaller': _pyinstaller_version(),
+        'platform': sys.platform,
+        'cmd': _portable_cmd(cmd),
+        'inputs': input_hashes(input_file, additional_data, icon_path, source_tree, source_root),
+        'external': external_versions(external),
+    }
+    key = hashlib.sha256(json.dumps(record, sort_keys=True).encode('utf-8')).hexdigest()
+    return key, record
+
+
+class ArtifactStore:
+    """
+    产物仓库接口
+
+    子类实现以下对象操作 (name 为 records/<key>.json 这样的相对名称):
+        _exists(name)             对象是否存在
+        _read(name)               读取小对象，返回 bytes，不存在时返回 None
+        _write(name, data)        写入小对象
+        _upload(name, path)       上传本地文件为对象
+        _download(name, path)     下载对象到本地文件，不存在时返回 False
+        _list(prefix)             列出以 prefix 开头的对象名称
+    """
+
+    def _exists(self, name):
+        raise NotImplementedError
+
+    def _read(self, name):
+        raise NotImplementedError
+
+    def _write(self, name, data):
+        raise NotImplementedError
+
+    def _upload(self, name, path):
+        raise NotImplementedError
+
+    def _download(self, name, path):
+        raise NotImplementedError
+
+    def _list(self, prefix):
+        raise NotImplementedError
+
+    def _on_published(self, key, record):
+        """发布完成后调用，本地后端用来更新索引"""
+
+    def has(self, key):
+        return self._exists(f"artifacts/{key}.tar.gz") and self._exists(f"records/{key}.json")
+
+    def record(self, key):
+        """返回构建记录，不存在时返回 None"""
+        data = self._read(f"records/{key}.json")
+        return json.loads(data.decode('utf-8')) if data is not None else None
+
+    def records(self):
+        """返回所有构建记录，按创建时间排序"""
+        records = []
+        for name in self._list('records/'):
+            if name.endswith('.json'):
+                record = self.record(name[len('records/'):-len('.json')])
+                if record:
+                    records.append(record)
+        return sorted(records, key=lambda r: r.get('created', 0))
+
+    def publish(self, key, dist_path, artifacts, record):
+        """
+        发布产物
+
+        参数:
+            key (str): build_record 计算的键
+            dist_path (str): 产物所在目录
+            artifacts (list): dist_path 中属于本次构建的文件或目录名称
+            record (dict): 构建记录，会补充 key、artifacts、created 和 agent
+        """
+        record = dict(record, key=key, artifacts=list(artifacts), created=time.time(), agent=socket.gethostname())
+        with tempfile.TemporaryDirectory(prefix='py_to_exe_store_') as tmp:
+            archive = os.path.join(tmp, 'artifacts.tar.gz')
+            with tarfile.open(archive, 'w:gz') as tar:
+                for name in artifacts:
+                    tar.add(os.path.join(dist_path, name), arcname=name)
+            record['bytes'] = os.path.getsize(archive)
+            # 先上传产物再写记录，读取方以记录存在作为产物完整的标志
+            self._upload(f"artifacts/{key}.tar.gz", archive)
+        self._write(f"records/{key}.json", json.dumps(record, ensure_ascii=False, indent=2).encode('utf-8'))
+        self._on_published(key, record)
+        return record
+
+    def fetch(self, key, dest_dir):
+        """
+        取回产物到 dest_dir
+
+        返回还原的产物名称列表，仓库中没有该键时返回 None
+        """
+        record = self.record(key)
+        if record is None:
+            return None
+        os.makedirs(dest_dir, exist_ok=True)
+        with tempfile.TemporaryDirectory(prefix='py_to_exe_store_') as tmp:
+            archive = os.path.join(tmp, 'artifacts.tar.gz')
+            if not self._download(f"artifacts/{key}.tar.gz", archive):
+                return None
+            stage = os.path.join(tmp, 'stage')
+            with tarfile.open(archive, 'r:gz') as tar:
+                try:
+                    tar.extractall(stage, filter='tar')
+                except TypeError:
+                    # 旧版本 Python 的 extractall 没有 filter 参数
+                    tar.extractall(stage)
+            for name in record['artifacts']:
+                target = os.path.join(dest_dir, name)
+                if os.path.isdir(target) and not os.path.islink(target):
+                    shutil.rmtree(target)
+                elif os.path.lexists(target):
+                    os.remove(target)
+                shutil.move(os.path.join(stage, name), target)
+        return list(record['artifacts'])
+
+
+class LocalArtifactStore(ArtifactStore):
+    """
+    本地目录后端
+
+    参数:
+        root (str, optional): 仓库目录，默认为 DEFAULT_STORE_DIR
+    """
+
+    INDEX_NAME = 'index.json'
+    LOCK_NAME = 'index.lock'
+
+    def __init__(self, root=None):
+        self.root = os.path.abspath(root or DEFAULT_STORE_DIR)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.root, *name.split('/'))
+
+    def _exists(self, name):
+        return os.path.isfile(self._path(name))
+
+    def _read(self, name):
+        try:
+            with open(self._path(name), 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, name, data):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def _upload(self, name, path):
+        target = self._path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        shutil.copyfile(path, tmp)
+        os.replace(tmp, target)
+
+    def _download(self, name, path):
+        try:
+            shutil.copyfile(self._path(name), path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def _list(self, prefix):
+        directory = self._path(prefix.rstrip('/'))
+        if not os.path.isdir(directory):
+            return []
+        return [f"{prefix}{entry}" for entry in sorted(os.listdir(directory)) if not entry.endswith('.tmp')]
+
+    @contextmanager
+    def _locked(self, timeout=30):
+        """索引锁，多台构建机共享目录时也适用 (见 build_cache.file_lock)"""
+        with file_lock(os.path.join(self.root, self.LOCK_NAME), timeout, "产物仓库索引锁"):
+            yield
+
+    def _on_published(self, key, record):
+        with self._locked():
+            data = self._read(self.INDEX_NAME)
+            index = json.loads(data.decode('utf-8')) if data else {'entries': {}}
+            index['entries'][key] = {
+                'artifacts': record['artifacts'],
+                'created': record['created'],
+                'agent': record['agent'],
+                'bytes': record['bytes'],
+                'pyinstaller': record['pyinstaller'],
+                'duration': (record.get('metrics') or {}).get('total'),
+            }
+            self._write(self.INDEX_NAME, json.dumps(index, ensure_ascii=False, indent=2).encode('utf-8'))
+
+
+class HttpArtifactStore(ArtifactStore):
+    """
+    HTTP 对象存储后端 (S3 风格)：对象 name 对应 <url>/<name>，HEAD 判断是否存在、GET 读取、PUT 写入，
+    GET <url>/?prefix=<前缀> 返回对象名称的 JSON 列表。store_server.py 是一个实现了该协议的简单服务器
+
+    参数:
+        url (str): 仓库地址，如 http://store.example.com:8766
+        token (str, optional): 令牌，默认取环境变量 PY_TO_EXE_STORE_TOKEN
+        timeout (float, optional): 单个请求的超时秒数，默认为 60
+    """
+
+    def __init__(self, url, token=None, timeout=60):
+        self.url = url.rstrip('/')
+        self.token = token or os.environ.get(STORE_TOKEN_ENV)
+        self.timeout = timeout
+
+    def _request(self, method, name='', data=None, headers=None, query=None):
+        """发送请求，返回响应对象；对象不存在时返回 None，其他错误抛出 OSError"""
+        # 只在使用 HTTP 后端时才导入 urllib
+        import urllib.request
+        import urllib.error
+        import urllib.parse
+        url = f"{self.url}/{urllib.parse.quote(name)}"
+        if query:
+            url += '?' + urllib.parse.urlencode(query)
+        headers = dict(headers or {})
+        if self.token:
+            headers['Authorization'] = f"Bearer {self.token}"
+        request = urllib.request.Request(url, data=data, method=method, headers=headers)
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise OSError(f"产物仓库返回 {e.code}: {method} {url}") from None
+        except urllib.error.URLError as e:
+            raise OSError(f"无法连接产物仓库 {self.url}: {e.reason}") from None
+
+    def _exists(self, name):
+        response = self._request('HEAD', name)
+        if response is None:
+            return False
+        response.close()
+        return True
+
+    def _read(self, name):
+        response = self._request('GET', name)
+        if response is None:
+            return None
+        with response:
+            return response.read()
+
+    def _write(self, name, data):
+        self._request('PUT', name, data, {'Content-Type': 'application/octet-stream'}).close()
+
+    def _upload(self, name, path):
+        # 按文件流式上传，不把整个产物归档读入内存
+        with open(path, 'rb') as f:
+            self._request('PUT', name, f, {'Content-Type': 'application/octet-stream',
+                                           'Content-Length': str(os.path.getsize(path))}).close()
+
+    def _download(self, name, path):
+        response = self._request('GET', name)
+        if response is None:
+            return False
+        with response, open(path, 'wb') as f:
+            shutil.copyfileobj(response, f)
+        return True
+
+    def _list(self, prefix):
+        response = self._request('GET', query={'prefix': prefix})
+        if response is None:
+            return []
+        with response:
+            return json.loads(response.read().decode('utf-8'))
+
+
+def open_store(location=None):
+    """
+    根据地址打开产物仓库
+
+    参数:
+        location (str, optional): 本地目录、file:// 地址或 http(s):// 地址，默认为 DEFAULT_STORE_DIR
+    """
+    if location and '://' in location:
+        scheme, _, path = location.partition('://')
+        if scheme == 'file':
+            return LocalArtifactStore(path)
+        if scheme in ('http', 'https'):
+            return HttpArtifactStore(location)
+        raise ValueError(f"不支持的产物仓库地址: {location} (支持本地目录、file:// 和 http(s)://)")
+    return LocalArtifactStore(location)
+
+
+def format_record(record):
+    """把构建记录格式化为一行文本"""
+    created = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(record.get('created', 0)))
+    duration = (record.get('metrics') or {}).get('total')
+    duration = f"{duration:.1f}s" if duration is not None else "-"
+    return (f"{record['key'][:12]}  {created}  {', '.join(record['artifacts'])}  "
+            f"{record.get('bytes', 0) / 1024 / 1024:.1f} MB  {duration}  "
+            f"PyInstaller {record['pyinstaller']}  {record.get('agent', '')}")
+
+
+if __name__ == "__main__":
+    store = open_store(sys.argv[1] if len(sys.argv) > 1 else None)
+    for item in store.records():
+        print(format_record(item))
@@ -0,0 +1,382 @@
+"""
+异步打包接口，供 asyncio 程序 (如构建服务) 在进程内调用
+
+package_py_to_exe 出错时会调用 sys.exit(1)，不适合嵌入其他程序。本模块在线程池中运行 build_exe:
+    - 返回结果字典，打包错误不会抛出，也不会退出解释器
+    - async for line in build.lines() 逐行读取该次打包的输出，多个打包同时进行时互不混杂
+    - build.cancel()、取消等待它的任务或超时都会结束 PyInstaller 进程树，并在清理完未完成的产物后返回
+    - AsyncPackager 用信号量限制同时进行的打包数
+
+用法:
+    packager = AsyncPackager(max_concurrent=4)
+    build = packager.start('app.py', onefile=False, timeout=600)
+    async for line in build.lines():
+        print(line)
+    result = await build
+
+    python async_packager.py a.py b.py c.py -j 2
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+import threading
+import subprocess
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from packager_core import build_exe
+from process_runner import ProcessCancelled
+from job_queue import SUCCEEDED, FAILED, CANCELLED
+
+# 超时的打包状态
+TIMED_OUT = '超时'
+
+# 未读取的日志最多保留的行数，更早的行被丢弃 (仍会写入日志文件)
+DEFAULT_MAX_LINES = 5000
+
+# 结果中保留的最后几行输出
+TAIL_LINES = 20
+
+# 当前线程正在进行的打包，print 和子进程输出由 _ThreadRouter 写到它的日志中
+_local = threading.local()
+_router_lock = threading.Lock()
+_active = 0
+
+
+class _ThreadRouter:
+    """替换 sys.stdout/sys.stderr：打包线程的输出写到各自的日志，其他线程的输出原样写出"""
+
+    def __init__(self, target):
+        self.target = target
+
+    def write(self, text):
+        build = getattr(_local, 'build', None)
+        if build is None:
+            return self.target.write(text)
+        build._write(text)
+        return len(text)
+
+    def flush(self):
+        if getattr(_local, 'build', None) is None:
+            self.target.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.target, name)
+
+
+@contextmanager
+def _capture_output(build):
+    """在当前线程中把 stdout/stderr 重定向到 build 的日志，第一个打包开始时安装路由，最后一个结束时恢复"""
+    global _active
+    with _router_lock:
+        if _active == 0:
+            sys.stdout = _ThreadRouter(sys.stdout)
+            sys.stderr = _ThreadRouter(sys.stderr)
+        _active += 1
+    _local.build = build
+    try:
+        yield
+    finally:
+        _local.build = None
+        with _router_lock:
+            _active -= 1
+            if _active == 0:
+                if isinstance(sys.stdout, _ThreadRouter):
+                    sys.stdout = sys.stdout.target
+                if isinstance(sys.stderr, _ThreadRouter):
+                    sys.stderr = sys.stderr.target
+
+
+def _describe_error(error):
+    """返回 (错误说明, 退出码)，退出码与 packager_cli 一致"""
+    from packager_cli import EXIT_BUILD_FAILED, exit_code_for
+    if isinstance(error, subprocess.CalledProcessError):
+        return f"PyInstaller 返回码 {error.returncode}", EXIT_BUILD_FAILED
+    if isinstance(error, subprocess.TimeoutExpired):
+        return f"超过 {error.timeout:g} 秒仍未完成，已结束 PyInstaller", EXIT_BUILD_FAILED
+    if isinstance(error, SystemExit):
+        return f"打包过程中调用了 sys.exit({error.code})", EXIT_BUILD_FAILED
+    return str(error), exit_code_for(error)
+
+
+class AsyncBuild:
+    """
+    一次异步打包，由 AsyncPackager.start 或 start_build 创建
+
+    await build (或 await build.result()) 得到结果字典；build.phase 为当前阶段名。
+    lines() 只应有一个读取者，未读取的行最多保留 max_lines 行。
+
+    参数:
+        input_file (str): 要打包的 Python 文件路径
+        options (dict): 其他打包参数，原样传给 build_exe
+        max_lines (int, optional): 未读取的日志最多保留的行数
+        log_path (str, optional): 完整日志文件路径
+    """
+
+    def __init__(self, input_file, options, max_lines=DEFAULT_MAX_LINES, log_path=None):
+        self.input_file = input_file
+        self.options = options
+        self.log_path = log_path
+        self.phase = None
+        self.total_lines = 0
+        self.dropped_lines = 0
+        self.cancel_event = threading.Event()
+        self._lines = deque(maxlen=max_lines)
+        self._tail = deque(maxlen=TAIL_LINES)
+        self._partial = ''
+        self._done = False
+        self._lock = threading.Lock()
+        self._log_file = None
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = None
+
+    def _write(self, text):
+        """在打包线程中写入一段输出，凑成整行后交给读取者"""
+        with self._lock:
+            if self._log_file:
+                self._log_file.write(text)
+            lines = (self._partial + text).split('\n')
+            self._partial = lines.pop()
+            was_empty = not self._lines
+            for line in lines:
+                if len(self._lines) == self._lines.maxlen:
+                    self.dropped_lines += 1
+                self._lines.append(line.rstrip('\r'))
+                self._tail.append(line.rstrip('\r'))
+            self.total_lines += len(lines)
+        if lines and was_empty:
+            self._notify()
+
+    def _notify(self):
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # 事件循环已关闭，没有读取者了
+            pass
+
+    def _on_phase(self, phase, index, total):
+        self.phase = phase
+
+    def _run(self):
+        """在工作线程中运行 build_exe，返回 (输出目录, 异常)"""
+        if self.log_path:
+            self._log_file = open(self.log_path, 'w', encoding='utf-8', errors='replace')
+        try:
+            with _capture_output(self):
+                try:
+                    return build_exe(self.input_file, cancel_event=self.cancel_event, on_phase=self._on_phase,
+                                     **self.options), None
+                except (Exception, SystemExit) as e:
+                    # SystemExit 也在这里截住，不能传到宿主的事件循环
+                    print(f"打包过程中出错: {_describe_error(e)[0]}")
+                    return None, e
+        finally:
+            with self._lock:
+                if self._partial:
+                    self._lines.append(self._partial)
+                    self._tail.append(self._partial)
+                    self.total_lines += 1
+                    self._partial = ''
+                if self._log_file:
+                    self._log_file.close()
+                    self._log_file = None
+
+    def _finish(self):
+        with self._lock:
+            self._done = True
+        self._notify()
+
+    async def _execute(self, semaphore=None, executor=None, timeout=None):
+        queued_at = time.perf_counter()
+        try:
+            if semaphore is not None:
+                await semaphore.acquire()
+            try:
+                started = time.perf_counter()
+                timed_out = False
+                if self.cancel_event.is_set():
+                    output_dir, error = None, ProcessCancelled()
+                else:
+                    future = self._loop.run_in_executor(executor, self._run)
+                    try:
+                        output_dir, error = await asyncio.wait_for(asyncio.shield(future), timeout)
+                    except asyncio.TimeoutError:
+                        timed_out = True
+                        self.cancel_event.set()
+                        output_dir, error = await future
+                    except asyncio.CancelledError:
+                        # 等 build_exe 清理完工作目录和未完成的产物再传出取消
+                        self.cancel_event.set()
+                        await future
+                        raise
+            finally:
+                if semaphore is not None:
+                    semaphore.release()
+        finally:
+            self._finish()
+
+        from packager_cli import EXIT_OK, EXIT_BUILD_FAILED
+        if timed_out:
+            status, message, exit_code = TIMED_OUT, f"超过 {timeout:g} 秒仍未完成，已结束打包", EXIT_BUILD_FAILED
+        elif isinstance(error, ProcessCancelled) or (error is not None and self.cancel_event.is_set()):
+            status, message, exit_code = CANCELLED, "已取消", EXIT_BUILD_FAILED
+        elif error is not None:
+            message, exit_code = _describe_error(error)
+            status = FAILED
+        else:
+            status, message, exit_code = SUCCEEDED, None, EXIT_OK
+        return {
+            'input_file': self.input_file,
+            'status': status,
+            'error': message,
+            'error_type': type(error).__name__ if error is not None and status == FAILED else None,
+            'exit_code': exit_code,
+            'output_dir': output_dir,
+            'log': self.log_path,
+            'tail': list(self._tail),
+            'queued': round(started - queued_at, 3),
+            'duration': time.perf_counter() - started,
+        }
+
+    async def lines(self):
+        """逐行读取打包输出，打包结束且所有行都已读取后结束"""
+        while True:
+            self._wakeup.clear()
+            with self._lock:
+                batch = list(self._lines)
+                self._lines.clear()
+                done = self._done
+            for line in batch:
+                yield line
+            if not batch:
+                if done:
+                    return
+                await self._wakeup.wait()
+
+    def cancel(self):
+        """取消打包：结束 PyInstaller 进程树，结果状态为已取消；尚未开始的打包不再运行"""
+        self.cancel_event.set()
+
+    def done(self):
+        return self._task is not None and self._task.done()
+
+    async def result(self):
+        """等待打包结束，返回结果字典"""
+        return await self._task
+
+    def __await__(self):
+        return self._task.__await__()
+
+
+def start_build(input_file, timeout=None, log_path=None, semaphore=None, executor=None, **options):
+    """
+    在当前事件循环中开始一次打包 (需要在协程中调用)
+
+    参数:
+        input_file (str): 要打包的 Python 文件路径
+        timeout (float, optional): 整个打包 (包括创建打包环境和分析产物) 的超时秒数，
+            超时后结束打包，结果状态为超时
+        log_path (str, optional): 完整日志文件路径
+        semaphore (asyncio.Semaphore, optional): 开始打包前需要获取的信号量
+        executor (concurrent.futures.Executor, optional): 运行 build_exe 的线程池，默认为事件循环的默认线程池
+        **options: 其他打包参数，原样传给 build_exe
+
+    返回:
+        AsyncBuild: await 得到结果字典 (input_file、status、error、error_type、exit_code、output_dir、
+            log、tail、queued、duration)
+    """
+    build = AsyncBuild(input_file, options, log_path=log_path)
+    build._task = asyncio.ensure_future(build._execute(semaphore, executor, timeout))
+    return build
+
+
+async def build_async(input_file, timeout=None, log_path=None, **options):
+    """打包一个脚本并返回结果字典，参数与 start_build 相同"""
+    return await start_build(input_file, timeout=timeout, log_path=log_path, **options)
+
+
+class AsyncPackager:
+    """
+    限制并发数的异步打包器
+
+    参数:
+        max_concurrent (int, optional): 同时进行的打包数，默认为 CPU 核数；超出的打包排队等待
+    """
+
+    def __init__(self, max_concurrent=None):
+        self.max_concurrent = max(1, max_concurrent or os.cpu_count() or 1)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrent, thread_name_prefix='py_to_exe_build')
+        self._semaphore = None
+
+    def start(self, input_file, timeout=None, log_path=None, **options):
+        """开始一次打包 (排队等待并发名额)，返回 AsyncBuild，参数与 start_build 相同"""
+        if self._semaphore is None:
+            # asyncio 的同步原语在旧版本中绑定创建时的事件循环，在第一次使用时创建
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        return start_build(input_file, timeout=timeout, log_path=log_path, semaphore=self._semaphore,
+                           executor=self._executor, **options)
+
+    async def build(self, input_file, timeout=None, log_path=None, **options):
+        """打包一个脚本并返回结果字典"""
+        return await self.start(input_file, timeout=timeout, log_path=log_path, **options)
+
+    async def build_many(self, jobs, timeout=None):
+        """
+        并发打包多个任务
+
+        参数:
+            jobs (list): 任务列表，每个任务是包含 input_file 的打包参数字典 (与批量打包清单相同)
+            timeout (float, optional): 每个任务的超时秒数
+
+        返回:
+            list: 与 jobs 顺序相同的结果字典列表
+        """
+        builds = [self.start(timeout=timeout, **job) for job in jobs]
+        return await asyncio.gather(*builds)
+
+    def close(self):
+        """关闭线程池，不等待仍在进行的打包"""
+        self._executor.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+async def _run_files(files, max_concurrent, timeout, build_options):
+    with AsyncPackager(max_concurrent) as packager:
+        builds = [packager.start(path, timeout=timeout, **build_options) for path in files]
+
+        async def echo(build):
+            name = os.path.basename(build.input_file)
+            async for line in build.lines():
+                print(f"[{name}] {line}")
+
+        await asyncio.gather(*(echo(build) for build in builds))
+        return [await build for build in builds]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="在一个进程中并发打包多个 Python 文件，输出按文件标注")
+    parser.add_argument('input_files', nargs='+', help="要打包的 Python 文件")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="同时进行的打包数，默认为 CPU 核数")
+    parser.add_argument('-o', '--output-dir', help="输出目录，默认为各脚本所在目录下的 dist")
+    parser.add_argument('--onedir', dest='onefile', action='store_false', help="打包为文件夹形式")
+    parser.add_argument('--timeout', type=float, metavar='SECONDS', help="每个打包的超时秒数")
+    args = parser.parse_args(argv)
+
+    results = asyncio.run(_run_files(args.input_files, args.jobs, args.timeout,
+                                     {'output_dir': args.output_dir, 'onefile': args.onefile}))
+    from batch_packager import format_result
+    for result in results:
+        print(format_result(result))
+    return 0 if all(result['status'] == SUCCEEDED for result in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
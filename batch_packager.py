@@ -0,0 +1,306 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+from packager_core import build_exe
+from project import program_name, is_project, expand_project
+
+# 清单中每个任务可以使用的打包参数 (与 package_py_to_exe 的参数一致)
+JOB_OPTIONS = (
+    'input_file', 'output_dir', 'onefile', 'console', 'icon_path',
+    'additional_data', 'hidden_imports', 'use_cache', 'cache_dir',
+    'incremental', 'work_root', 'auto_hidden_imports', 'exclude_modules',
+    'size_report', 'auto_exclude', 'timeout', 'metrics_file',
+    'artifact_store', 'optimize', 'strip_tests', 'optimize_report',
+    'compression', 'upx_dir', 'upx_exclude', 'compression_objective', 'reproducible',
+    'delta_dir', 'preflight', 'requirements_lock', 'wheelhouse', 'venv_dir',
+    'entry', 'source_root',
+)
+
+
+def _read_manifest_file(manifest_path):
+    """按扩展名读取 JSON 或 TOML 文件"""
+    if manifest_path.lower().endswith('.toml'):
+        try:
+            import tomllib
+        except ImportError:
+            try:
+                import tomli as tomllib
+            except ImportError:
+                raise ImportError("读取 TOML 需要 Python 3.11+ 或 tomli，请先运行: pip install tomli")
+        with open(manifest_path, 'rb') as f:
+            return tomllib.load(f)
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def load_manifest(manifest_path, names=None):
+    """
+    读取批量打包清单 (JSON 或 TOML)
+
+    清单格式:
+        {
+            "defaults": {"onefile": true, "output_dir": "dist"},
+            "jobs": [
+                {"input_file": "tools/a.py"},
+                {"input_file": "tools/b.py", "onefile": false, "hidden_imports": ["x"]}
+            ]
+        }
+
+    也可以直接是任务列表，"jobs" 也可以写作 "targets"。任务可以带 "name"
+    (默认为脚本文件名)，names 不为空时只返回这些名称的任务。
+    input_file 也可以是项目目录或 pyproject.toml，用 "entry" 选择入口点，
+    这时 name 默认为入口点 (未指定时为项目目录名)。
+    清单中的相对路径以清单所在目录为基准。返回合并了默认参数后的任务列表。
+    """
+    manifest = _read_manifest_file(manifest_path)
+
+    if isinstance(manifest, list):
+        manifest = {'jobs': manifest}
+    defaults = manifest.get('defaults', {})
+    entries = manifest.get('jobs', manifest.get('targets', []))
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+
+    jobs = []
+    found = set()
+    for i, entry in enumerate(entries):
+        if isinstance(entry, str):
+            entry = {'input_file': entry}
+        job = dict(defaults)
+        job.update(entry)
+        name = job.pop('name', None) or _default_name(job)
+        if names and name not in names:
+            continue
+        found.add(name)
+        unknown = set(job) - set(JOB_OPTIONS)
+        if unknown:
+            raise ValueError(f"第 {i + 1} 个任务包含未知参数: {', '.join(sorted(unknown))}")
+        if 'input_file' not in job:
+            raise ValueError(f"第 {i + 1} 个任务缺少 input_file")
+        jobs.append(expand_project(resolve_job_paths(job, base_dir)))
+
+    missing = set(names or ()) - found
+    if missing:
+        raise ValueError(f"清单中没有这些目标: {', '.join(sorted(missing))}")
+    return jobs
+
+
+def _default_name(job):
+    """任务的默认名称：脚本文件名，项目为入口点或项目目录名"""
+    if 'input_file' not in job:
+        return None
+    input_file = job['input_file']
+    if not is_project(input_file):
+        return Path(input_file).stem
+    if job.get('entry'):
+        return job['entry'].partition('=')[0].strip()
+    if os.path.basename(input_file) == 'pyproject.toml':
+        input_file = os.path.dirname(os.path.abspath(input_file))
+    return os.path.basename(os.path.abspath(input_file))
+
+
+def resolve_job_paths(job, base_dir):
+    """把任务中的相对路径转换为以 base_dir 为基准的绝对路径"""
+    job = dict(job)
+    for key in ('input_file', 'output_dir', 'icon_path', 'cache_dir', 'work_root', 'metrics_file', 'upx_dir',
+                'delta_dir', 'requirements_lock', 'wheelhouse', 'venv_dir', 'source_root'):
+        if job.get(key):
+            job[key] = os.path.join(base_dir, job[key])
+    if job.get('artifact_store') and '://' not in job['artifact_store']:
+        job['artifact_store'] = os.path.join(base_dir, job['artifact_store'])
+    if job.get('additional_data'):
+        job['additional_data'] = [(os.path.join(base_dir, src), dest) for src, dest in job['additional_data']]
+    return job
+
+
+@contextmanager
+def _redirect_output(log_path):
+    """把当前进程的 stdout/stderr (包括 PyInstaller 子进程) 重定向到日志文件"""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved_stdout = os.dup(1)
+    saved_stderr = os.dup(2)
+    with open(log_path, 'w', encoding='utf-8') as log:
+        os.dup2(log.fileno(), 1)
+        os.dup2(log.fileno(), 2)
+        try:
+            yield
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os.dup2(saved_stdout, 1)
+            os.dup2(saved_stderr, 2)
+            os.close(saved_stdout)
+            os.close(saved_stderr)
+
+
+def run_job(job, log_dir):
+    """
+    在工作进程中执行一个打包任务
+
+    每个任务使用独占的临时工作目录 (--workpath/--specpath)，
+    输出写入 log_dir 下的独立日志文件。返回任务结果字典。
+    """
+    name = program_name(job['input_file'])
+    log_path = os.path.join(log_dir, f"{name}-{os.getpid()}-{int(time.time() * 1000)}.log")
+    work_dir = tempfile.mkdtemp(prefix=f"py_to_exe_{name}_")
+    result = {
+        'input_file': job['input_file'],
+        'status': '成功',
+        'error': None,
+        'output_dir': None,
+        'log': log_path,
+    }
+
+    start = time.perf_counter()
+    with _redirect_output(log_path):
+        try:
+            result['output_dir'] = build_exe(work_dir=work_dir, **job)
+        except Exception as e:
+            result['status'] = '失败'
+            result['error'] = str(e)
+            print(f"打包过程中出错: {str(e)}")
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    result['duration'] = time.perf_counter() - start
+    return result
+
+
+def preflight_jobs(jobs, max_workers=None):
+    """
+    在主进程中并行预检所有任务，未通过的任务不会占用工作进程。
+    使用隔离打包环境的任务需要先创建环境，留到工作进程中检查
+
+    返回:
+        tuple: (通过预检的任务列表, 未通过的任务结果列表)
+    """
+    from preflight import run_preflight, format_preflight
+    checked = [job for job in jobs if job.get('preflight', True) and not job.get('requirements_lock')]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        reports = list(executor.map(lambda job: run_preflight(
+            job['input_file'], additional_data=job.get('additional_data'), hidden_imports=job.get('hidden_imports'),
+            icon_path=job.get('icon_path'), exclude_modules=job.get('exclude_modules'),
+            source_root=job.get('source_root')), checked))
+
+    passed = [job for job in jobs if not job.get('preflight', True) or job.get('requirements_lock')]
+    rejected = []
+    for job, report in zip(checked, reports):
+        if report['ok']:
+            # 工作进程中不再重复检查
+            passed.append(dict(job, preflight=False))
+        else:
+            rejected.append({
+                'input_file': job['input_file'],
+                'status': '失败',
+                'error': format_preflight(report),
+                'output_dir': None,
+                'log': None,
+                'duration': report['seconds'],
+            })
+    return passed, rejected
+
+
+def run_batch(jobs, max_workers=None, log_dir=None, on_result=None):
+    """
+    在进程池中并行打包多个脚本
+
+    参数:
+        jobs (list): 任务列表，每个任务是 package_py_to_exe 的参数字典
+        max_workers (int, optional): 并行进程数，默认为 CPU 核数 (不超过任务数)
+        log_dir (str, optional): 每个任务的日志目录，默认为新建的临时目录
+        on_result (callable, optional): 每个任务完成时以结果字典调用
+
+    返回:
+        dict: {'results': [...], 'succeeded': int, 'failed': int, 'wall_time': float, 'log_dir': str}
+    """
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    if log_dir is None:
+        log_dir = tempfile.mkdtemp(prefix='py_to_exe_batch_')
+    log_dir = os.path.abspath(log_dir)
+    os.makedirs(log_dir, exist_ok=True)
+
+    results = []
+    start = time.perf_counter()
+    jobs, rejected = preflight_jobs(jobs)
+    for result in rejected:
+        results.append(result)
+        if on_result:
+            on_result(result)
+    max_workers = max(1, min(max_workers, len(jobs) or 1))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_job, job, log_dir): job for job in jobs}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception as e:
+                # 工作进程异常退出等情况
+                result = {
+                    'input_file': futures[future]['input_file'],
+                    'status': '失败',
+                    'error': str(e),
+                    'output_dir': None,
+                    'log': None,
+                    'duration': 0.0,
+                }
+            results.append(result)
+            if on_result:
+                on_result(result)
+
+    succeeded = sum(1 for r in results if r['status'] == '成功')
+    return {
+        'results': results,
+        'succeeded': succeeded,
+        'failed': len(results) - succeeded,
+        'wall_time': time.perf_counter() - start,
+        'workers': max_workers,
+        'log_dir': log_dir,
+    }
+
+
+def format_result(result):
+    """把单个任务结果格式化为一行文本"""
+    line = f"[{result['status']}] {result['input_file']} ({result['duration']:.1f} 秒)"
+    if result['error']:
+        line += f" - {result['error']}"
+        if result['log']:
+            line += f" (日志: {result['log']})"
+    return line
+
+
+def format_summary(summary):
+    """把批量打包汇总格式化为一行文本"""
+    return (f"批量打包完成: 成功 {summary['succeeded']} 个，失败 {summary['failed']} 个，"
+            f"{summary['workers']} 个进程，总耗时 {summary['wall_time']:.1f} 秒")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按清单并行批量打包 Python 脚本")
+    parser.add_argument('manifest', help="批量打包清单 (JSON)")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="并行进程数，默认为 CPU 核数")
+    parser.add_argument('--log-dir', default=None, help="任务日志目录")
+    args = parser.parse_args()
+
+    try:
+        jobs = load_manifest(args.manifest)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"读取清单出错: {str(e)}")
+        sys.exit(2)
+
+    print(f"共 {len(jobs)} 个打包任务")
+    summary = run_batch(jobs, max_workers=args.jobs, log_dir=args.log_dir,
+                        on_result=lambda r: print(format_result(r), flush=True))
+    print(format_summary(summary))
+    print(f"日志目录: {summary['log_dir']}")
+    sys.exit(1 if summary['failed'] else 0)
+
+
+if __name__ == "__main__":
+    main()
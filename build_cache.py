@@ -0,0 +1,466 @@
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import hashlib
+import threading
+import importlib.util
+from contextlib import contextmanager
+from import_analyzer import import_closure
+
+# 缓存格式版本，修改缓存键的计算方式时需要递增
+CACHE_FORMAT_VERSION = 1
+
+# 默认缓存目录，可通过环境变量 PY_TO_EXE_CACHE_DIR 覆盖
+DEFAULT_CACHE_DIR = os.environ.get(
+    'PY_TO_EXE_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'py_to_exe', 'builds')
+)
+
+# 默认缓存容量上限 (2 GB)
+DEFAULT_MAX_SIZE = 2 * 1024 * 1024 * 1024
+
+# 锁持有超过这么多秒视为持有者已异常退出 (更新索引只需要几毫秒)
+STALE_LOCK_SECONDS = 600
+
+
+def _hash_file(path, hasher):
+    """将文件内容写入哈希对象"""
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            hasher.update(chunk)
+
+
+def _hash_path(path, hasher):
+    """将文件或目录 (递归、按名称排序) 的内容写入哈希对象"""
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                hasher.update(os.path.relpath(full, path).replace(os.sep, '/').encode('utf-8'))
+                _hash_file(full, hasher)
+    else:
+        _hash_file(path, hasher)
+
+
+def _external_fingerprint(module_name):
+    """第三方模块的轻量指纹：安装位置及其大小、修改时间 (不导入模块本身)"""
+    try:
+        spec = importlib.util.find_spec(module_name)
+    except (ImportError, ValueError):
+        spec = None
+    if spec is None or not spec.origin or not os.path.exists(spec.origin):
+        return f"{module_name}:missing"
+    if spec.origin in ('built-in', 'frozen'):
+        return f"{module_name}:{spec.origin}"
+    st = os.stat(spec.origin)
+    return f"{module_name}:{spec.origin}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _pyinstaller_version():
+    try:
+        from importlib.metadata import version
+        return version('pyinstaller')
+    except Exception:
+        return 'unknown'
+
+
+def _strip_paths(cmd):
+    """
+    去掉命令中与产物内容无关的参数 (--distpath、--workpath、--specpath、--clean)：
+    命中后会还原到新的输出目录，工作目录的位置也不影响产物
+    """
+    stripped = []
+    skip = False
+    for arg in cmd:
+        if skip:
+            skip = False
+            continue
+        if arg in ('--distpath', '--workpath', '--specpath'):
+            skip = True
+            continue
+        if arg == '--clean' or arg.split('=')[0] in ('--distpath', '--workpath', '--specpath'):
+            continue
+        stripped.append(arg)
+    return stripped
+
+
+def _relative_paths(cmd, root_dir, script_dir=None):
+    """
+    把命令中位于源码目录下的路径改写为相对路径：同一份源码放在不同位置
+    (例如打包服务器为每个任务解压的目录) 时得到相同的缓存键。
+    项目模式的启动脚本不在源码目录中，所在目录另外改写为 <script>
+    """
+    prefix = os.path.join(root_dir, '')
+    relative = []
+    for arg in cmd:
+        if script_dir and script_dir != root_dir:
+            arg = arg.replace(os.path.join(script_dir, ''), '<script>' + os.sep)
+        # --paths 等参数可能是源码目录本身
+        relative.append('<src>' if arg == root_dir else arg.replace(prefix, '<src>' + os.sep))
+    return relative
+
+
+def _source_name(path, root_dir):
+    """本地文件在缓存键中的名称：源码目录中的相对路径，源码目录之外的启动脚本只取文件名"""
+    rel = os.path.relpath(path, root_dir)
+    if rel.startswith(os.pardir) or os.path.isabs(rel):
+        return os.path.basename(path)
+    return rel.replace(os.sep, '/')
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def _pid_alive(pid):
+    """本机进程是否仍在运行 (不发送任何信号)"""
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+    if sys.platform == 'win32':
+        import ctypes
+        kernel32 = ctypes.windll.kernel32
+        # PROCESS_QUERY_LIMITED_INFORMATION；没有权限打开的进程也在运行
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return kernel32.GetLastError() == 5
+        code = ctypes.c_ulong()
+        kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        kernel32.CloseHandle(handle)
+        # STILL_ACTIVE
+        return code.value == 259
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _lock_owner(path):
+    """读取锁文件中的持有者 (host、pid、created、token)，读不到或内容不完整时返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _is_stale(path, owner):
+    """锁是否已失效：持有者在本机且进程已退出，或者持有时间超过 STALE_LOCK_SECONDS"""
+    if owner is None:
+        # 持有者可能刚创建文件还没写入内容，按文件的修改时间判断
+        try:
+            return time.time() - os.path.getmtime(path) > STALE_LOCK_SECONDS
+        except OSError:
+            return False
+    if owner.get('host') == socket.gethostname() and not _pid_alive(owner.get('pid')):
+        return True
+    return time.time() - owner.get('created', 0) > STALE_LOCK_SECONDS
+
+
+def _break_lock(path, owner):
+    """
+    删除失效的锁。先改名再确认改名的正是判断为失效的那个锁：
+    其他等待者可能已经删除它并创建了新锁，这时把新锁放回原处
+    """
+    broken = f"{path}.{os.getpid()}.{threading.get_ident()}.stale"
+    try:
+        os.rename(path, broken)
+    except OSError:
+        return
+    if _lock_owner(broken) != owner:
+        try:
+            os.link(broken, path)
+        except OSError:
+            pass
+    os.remove(broken)
+
+
+@contextmanager
+def file_lock(lock_path, timeout=30, label="锁"):
+    """
+    用独占创建的锁文件实现跨进程 (也适用于多台机器共享的目录) 的互斥
+
+    锁文件记录持有者的主机名、进程号、创建时间和随机令牌。等待超过 timeout 秒时抛出 TimeoutError；
+    只有失效的锁 (见 _is_stale) 才会被删除，不会因为等待得久就抢走正常持有的锁。
+    释放时只删除自己持有的锁
+    """
+    owner = {'host': socket.gethostname(), 'pid': os.getpid(), 'created': time.time(),
+             'token': os.urandom(8).hex()}
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            holder = _lock_owner(lock_path)
+            if _is_stale(lock_path, holder):
+                _break_lock(lock_path, holder)
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"等待{label}超时: {lock_path} (持有者: {holder})") from None
+            time.sleep(0.05)
+            continue
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(owner))
+        break
+    try:
+        yield
+    finally:
+        # 持有超时被当作失效锁删除后，锁可能已经属于其他进程
+        if _lock_owner(lock_path) == owner:
+            os.remove(lock_path)
+
+
+class BuildCache:
+    """
+    基于内容哈希的本地构建缓存
+
+    缓存键由输入脚本、其本地导入闭包、--add-data 数据内容、图标文件以及
+    完整的 PyInstaller 命令行共同决定。命中时直接把之前的产物还原到
+    --distpath，不再运行 PyInstaller。缓存总大小超过上限时按 LRU 淘汰。
+    """
+
+    INDEX_NAME = 'index.json'
+    LOCK_NAME = 'index.lock'
+
+    def __init__(self, cache_dir=None, max_size=DEFAULT_MAX_SIZE):
+        self.cache_dir = os.path.abspath(cache_dir or DEFAULT_CACHE_DIR)
+        self.max_size = max_size
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    # ---------- 索引读写 ----------
+
+    @contextmanager
+    def _locked(self, timeout=30):
+        """跨进程的索引锁，批量打包时多个进程会共用同一个缓存 (见 file_lock)"""
+        with file_lock(os.path.join(self.cache_dir, self.LOCK_NAME), timeout, "缓存锁"):
+            yield
+
+    def _load_index(self):
+        index_path = os.path.join(self.cache_dir, self.INDEX_NAME)
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        index.setdefault('entries', {})
+        index.setdefault('stats', {'hits': 0, 'misses': 0, 'evictions': 0})
+        return index
+
+    def _save_index(self, index):
+        index_path = os.path.join(self.cache_dir, self.INDEX_NAME)
+        tmp_path = index_path + f".{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, index_path)
+
+    # ---------- 缓存键 ----------
+
+    def compute_key(self, input_file, cmd, additional_data=None, icon_path=None, source_tree=None, source_root=None):
+        """
+        计算构建缓存键
+
+        参数:
+            input_file (str): 要打包的 Python 文件路径
+            cmd (list): package_py_to_exe 构建的 PyInstaller 命令
+            additional_data (list, optional): [(源路径, 目标路径), ...]
+            icon_path (str, optional): 图标文件路径
+            source_tree (str, optional): 项目模式下整个源码树的摘要 (source_tree.hash_tree)，
+                指定时代替导入闭包中各个文件的内容
+            source_root (str, optional): 本地模块所在的源码目录，默认为脚本所在目录
+        """
+        hasher = hashlib.sha256()
+        hasher.update(f"format:{CACHE_FORMAT_VERSION}\n".encode('utf-8'))
+        hasher.update(f"python:{sys.version}\n".encode('utf-8'))
+        hasher.update(f"pyinstaller:{_pyinstaller_version()}\n".encode('utf-8'))
+        hasher.update(f"platform:{sys.platform}\n".encode('utf-8'))
+        script_dir = os.path.dirname(os.path.abspath(input_file))
+        root_dir = os.path.abspath(source_root) if source_root else script_dir
+        hasher.update(json.dumps(_relative_paths(_strip_paths(cmd), root_dir, script_dir)).encode('utf-8'))
+
+        # 脚本及其本地导入闭包
+        local_files, external = import_closure(input_file, source_root=source_root)
+        if source_tree:
+            # 启动脚本不在源码树摘要中
+            hasher.update(f"\ntree:{source_tree}\n".encode('utf-8'))
+            local_files = [os.path.abspath(input_file)]
+        for path in local_files:
+            hasher.update(f"\nsrc:{_source_name(path, root_dir)}\n".encode('utf-8'))
+            _hash_file(path, hasher)
+        for name in external:
+            hasher.update(f"\next:{_external_fingerprint(name)}".encode('utf-8'))
+
+        # --add-data 数据内容
+        for src, dest in additional_data or []:
+            hasher.update(f"\ndata:{dest}\n".encode('utf-8'))
+            _hash_path(src, hasher)
+
+        if icon_path:
+            hasher.update(b"\nicon\n")
+            _hash_file(icon_path, hasher)
+
+        return hasher.hexdigest()
+
+    # ---------- 查询与还原 ----------
+
+    def lookup(self, key, dist_path):
+        """
+        查询缓存，命中时把产物还原到 dist_path
+
+        返回被还原的产物路径列表，未命中返回 None
+        """
+        entry_dir = os.path.join(self.cache_dir, key)
+        with self._locked():
+            index = self._load_index()
+            entry = index['entries'].get(key)
+            if entry is None or not os.path.isdir(entry_dir):
+                index['entries'].pop(key, None)
+                index['stats']['misses'] += 1
+                self._save_index(index)
+                return None
+            entry['last_access'] = time.time()
+            entry['hits'] = entry.get('hits', 0) + 1
+            index['stats']['hits'] += 1
+            self._save_index(index)
+            artifacts = list(entry['artifacts'])
+
+        os.makedirs(dist_path, exist_ok=True)
+        restored = []
+        for name in artifacts:
+            src = os.path.join(entry_dir, name)
+            dst = os.path.join(dist_path, name)
+            if os.path.isdir(dst) and not os.path.islink(dst):
+                shutil.rmtree(dst)
+            elif os.path.lexists(dst):
+                os.remove(dst)
+            # 不使用硬链接：PyInstaller 下次构建会原地覆盖产物文件，从而破坏缓存
+            if os.path.isdir(src):
+                shutil.copytree(src, dst, symlinks=True)
+            else:
+                shutil.copy2(src, dst)
+            restored.append(dst)
+        return restored
+
+    def store(self, key, dist_path, name, onefile=True):
+        """
+        把本次构建产物存入缓存
+
+        参数:
+            key (str): compute_key 返回的缓存键
+            dist_path (str): PyInstaller 的 --distpath
+            name (str): 产物名称 (通常为脚本文件名去掉扩展名)
+            onefile (bool): 是否为单文件模式
+        """
+        candidates = [name, name + '.exe', name + '.app']
+        artifacts = []
+        for candidate in candidates:
+            path = os.path.join(dist_path, candidate)
+            if candidate.endswith('.app') and os.path.isdir(path):
+                artifacts.append(candidate)
+            elif onefile and os.path.isfile(path):
+                artifacts.append(candidate)
+            elif not onefile and os.path.isdir(path) and not candidate.endswith('.app'):
+                artifacts.append(candidate)
+        if not artifacts:
+            return False
+
+        # 先写入临时目录，再原子地改名，避免并发读到不完整的条目
+        entry_dir = os.path.join(self.cache_dir, key)
+        tmp_dir = entry_dir + f".{os.getpid()}.tmp"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        for artifact in artifacts:
+            src = os.path.join(dist_path, artifact)
+            if os.path.isdir(src):
+                shutil.copytree(src, os.path.join(tmp_dir, artifact), symlinks=True)
+            else:
+                shutil.copy2(src, os.path.join(tmp_dir, artifact))
+        size = _dir_size(tmp_dir)
+
+        with self._locked():
+            if os.path.exists(entry_dir):
+                shutil.rmtree(entry_dir)
+            os.replace(tmp_dir, entry_dir)
+            index = self._load_index()
+            now = time.time()
+            index['entries'][key] = {
+                'name': name,
+                'artifacts': artifacts,
+                'size': size,
+                'created': now,
+                'last_access': now,
+                'hits': 0,
+            }
+            self._evict(index, keep=key)
+            self._save_index(index)
+        return True
+
+    def _evict(self, index, keep=None):
+        """按最近访问时间淘汰条目，直到总大小不超过上限"""
+        entries = index['entries']
+        total = sum(e['size'] for e in entries.values())
+        for key in sorted(entries, key=lambda k: entries[k]['last_access']):
+            if total <= self.max_size:
+                break
+            if key == keep:
+                continue
+            total -= entries[key]['size']
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            del entries[key]
+            index['stats']['evictions'] += 1
+
+    # ---------- 统计与维护 ----------
+
+    def stats(self):
+        """返回缓存命中/未命中统计"""
+        index = self._load_index()
+        stats = dict(index['stats'])
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['entries'] = len(index['entries'])
+        stats['total_size'] = sum(e['size'] for e in index['entries'].values())
+        stats['max_size'] = self.max_size
+        return stats
+
+    def clear(self):
+        """清空缓存"""
+        with self._locked():
+            for name in os.listdir(self.cache_dir):
+                if name == self.LOCK_NAME:
+                    continue
+                path = os.path.join(self.cache_dir, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+
+
+def format_stats(stats):
+    """把统计信息格式化为一行可读文本"""
+    return (f"缓存命中 {stats['hits']} 次，未命中 {stats['misses']} 次 "
+            f"(命中率 {stats['hit_rate']:.0%})，{stats['entries']} 个条目，"
+            f"占用 {stats['total_size'] / 1024 / 1024:.1f} MB / "
+            f"{stats['max_size'] / 1024 / 1024:.0f} MB，已淘汰 {stats['evictions']} 个")
+
+
+if __name__ == "__main__":
+    cache = BuildCache()
+    if len(sys.argv) > 1 and sys.argv[1] == 'clear':
+        cache.clear()
+        print(f"已清空缓存: {cache.cache_dir}")
+    else:
+        print(f"缓存目录: {cache.cache_dir}")
+        print(format_stats(cache.stats()))
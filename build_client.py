@@ -0,0 +1,393 @@
+"""
+打包服务器 (build_server.py) 的客户端
+
+把脚本及其本地模块 (与构建缓存相同的导入闭包)、附加数据、图标和依赖锁文件压缩上传，
+实时输出服务器上的打包日志，成功后把产物下载到本地输出目录。
+
+设置环境变量 PY_TO_EXE_SERVER (如 http://buildbox:8765) 后，命令行和各个图形界面都提交到服务器打包；
+服务器要求令牌时在 PY_TO_EXE_SERVER_TOKEN 中设置。
+
+用法:
+    python build_client.py list [--server URL]
+    python build_client.py cancel ID [--server URL]
+"""
+import os
+import io
+import sys
+import json
+import stat
+import time
+import shutil
+import base64
+import zipfile
+import argparse
+import tempfile
+import threading
+from process_runner import ProcessCancelled
+from project import is_project, expand_project
+
+# 打包服务器地址和令牌的环境变量
+SERVER_ENV = 'PY_TO_EXE_SERVER'
+TOKEN_ENV = 'PY_TO_EXE_SERVER_TOKEN'
+
+# 服务器的默认端口
+DEFAULT_PORT = 8765
+
+# 可以提交到服务器的打包参数；缓存、工作目录、产物仓库等由服务器决定
+REMOTE_OPTIONS = (
+    'onefile', 'console', 'icon_path', 'additional_data', 'hidden_imports', 'auto_hidden_imports',
+    'exclude_modules', 'size_report', 'auto_exclude', 'timeout', 'optimize', 'strip_tests',
+    'compression', 'upx_exclude', 'compression_objective', 'reproducible', 'preflight', 'requirements_lock',
+    'source_root',
+)
+
+# 只在本机有意义的参数，提交到服务器时忽略
+LOCAL_OPTIONS = (
+    'use_cache', 'cache_dir', 'incremental', 'work_root', 'metrics_file', 'artifact_store', 'optimize_report',
+    'upx_dir', 'delta_dir', 'wheelhouse', 'venv_dir', 'work_dir', 'on_phase',
+)
+
+
+class RemoteBuildError(RuntimeError):
+    """服务器上的打包失败，exit_code 与 packager_cli 的退出码一致"""
+
+    def __init__(self, message, exit_code=1, build_id=None):
+        super().__init__(message)
+        self.exit_code = exit_code
+        self.build_id = build_id
+
+
+def server_url(url=None):
+    """返回打包服务器地址 (参数优先，其次是环境变量 PY_TO_EXE_SERVER)，没有配置时返回 None"""
+    url = (url or os.environ.get(SERVER_ENV) or '').strip().rstrip('/')
+    if url and '://' not in url:
+        url = f"http://{url}"
+    return url or None
+
+
+def member_parts(name):
+    """检查归档中的相对路径 (以 / 分隔)，返回路径各段；绝对路径或包含 .. 时抛出 ValueError"""
+    parts = name.replace('\\', '/').split('/')
+    if not name or name.startswith('/') or ':' in parts[0] or any(part in ('', '.', '..') for part in parts):
+        raise ValueError(f"路径不合法: {name}")
+    return parts
+
+
+def zip_tree(entries):
+    """
+    把文件和目录压缩为 zip，保留可执行权限和符号链接
+
+    参数:
+        entries (list): [(归档中的路径, 本地路径), ...]，本地路径为目录时包含其中所有文件
+
+    返回:
+        bytes: zip 数据
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, path in entries:
+            if os.path.isdir(path) and not os.path.islink(path):
+                files = []
+                for root, dirs, names in os.walk(path):
+                    for entry in dirs + names:
+                        full = os.path.join(root, entry)
+                        if entry in names or os.path.islink(full):
+                            files.append(full)
+                members = [(f"{name}/{os.path.relpath(full, path).replace(os.sep, '/')}", full)
+                           for full in sorted(files)]
+            else:
+                members = [(name, path)]
+            for member, full in members:
+                if os.path.islink(full):
+                    # 链接本身 (而不是目标文件) 写入归档，权限位中记录类型
+                    info = zipfile.ZipInfo(member, time.localtime(os.lstat(full).st_mtime)[:6])
+                    info.external_attr = (os.lstat(full).st_mode & 0xFFFF) << 16
+                    archive.writestr(info, os.readlink(full))
+                else:
+                    archive.write(full, member)
+    return buffer.getvalue()
+
+
+def extract_zip(data, target_dir):
+    """
+    解压 zip_tree 生成的数据，拒绝指向目标目录之外的路径和符号链接
+
+    符号链接只检查链接文本，所以不允许其他成员经过已解压的符号链接 (多个 .. 链接
+    串起来就能逃出目标目录)，也不允许覆盖已解压的符号链接；写入前再确认上级目录的
+    真实路径仍在目标目录中
+
+    返回:
+        list: 解压出的顶层名称
+    """
+    top = []
+    target_dir = os.path.abspath(target_dir)
+    real_root = os.path.realpath(target_dir)
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for info in archive.infolist():
+            parts = member_parts(info.filename.rstrip('/'))
+            target = os.path.join(target_dir, *parts)
+            path = target_dir
+            for part in parts:
+                path = os.path.join(path, part)
+                if os.path.islink(path):
+                    raise ValueError(f"路径经过符号链接: {info.filename}")
+            if parts[0] not in top:
+                top.append(parts[0])
+            if info.is_dir():
+                os.makedirs(target, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            parent = os.path.realpath(os.path.dirname(target))
+            if parent != real_root and not parent.startswith(real_root + os.sep):
+                raise ValueError(f"路径指向目标目录之外: {info.filename}")
+            mode = info.external_attr >> 16
+            if stat.S_ISLNK(mode):
+                link = archive.read(info).decode('utf-8')
+                resolved = os.path.normpath(os.path.join(os.path.dirname(target), link))
+                if os.path.isabs(link) or not resolved.startswith(target_dir + os.sep):
+                    raise ValueError(f"符号链接指向目标目录之外: {info.filename}")
+                os.symlink(link, target)
+                continue
+            with archive.open(info) as src, open(target, 'wb') as out:
+                shutil.copyfileobj(src, out, 1024 * 1024)
+            if mode:
+                os.chmod(target, stat.S_IMODE(mode))
+    return top
+
+
+def pack_sources(input_file, icon_path=None, additional_data=None, requirements_lock=None, source_root=None):
+    """
+    收集打包需要的本地文件：脚本所在目录 (项目模式下为 source_root) 中的整个源码树
+    (按 source_tree.list_files 的规则跳过隐藏文件、__pycache__、dist 等)，以及导入闭包、
+    附加数据、图标和依赖锁文件。静态分析找不到的导入 (动态导入、读取同目录的文件等)
+    在服务器上同样可用。
+
+    源码目录作为归档根目录，不在其中的启动脚本 (项目模式) 也放在归档根目录；
+    其他源码目录之外的文件放在归档的 _external/<序号>/ 下。
+
+    返回:
+        tuple: (zip 数据, 归档中的脚本路径,
+            改写为归档内相对路径的 {icon_path, additional_data, requirements_lock, source_root})
+    """
+    from import_analyzer import import_closure
+    base_dir = os.path.abspath(source_root) if source_root else os.path.dirname(os.path.abspath(input_file))
+    entries = {}
+
+    def add(path, outside=None):
+        path = os.path.abspath(path)
+        rel = os.path.relpath(path, base_dir)
+        if rel.startswith(os.pardir) or os.path.isabs(rel):
+            rel = outside or f"_external/{len(entries)}/{os.path.basename(path)}"
+        name = rel.replace(os.sep, '/')
+        entries.setdefault(name, path)
+        return name
+
+    from source_tree import list_files
+    entry = add(input_file, os.path.basename(input_file))
+    paths = {}
+    if source_root:
+        paths['source_root'] = '.'
+    for path in list_files(base_dir):
+        add(os.path.join(base_dir, *path.split('/')))
+    for path in import_closure(os.path.abspath(input_file), source_root=source_root)[0]:
+        add(path)
+    if icon_path:
+        paths['icon_path'] = add(icon_path)
+    if additional_data:
+        paths['additional_data'] = [[add(src), dest] for src, dest in additional_data]
+    if requirements_lock:
+        paths['requirements_lock'] = add(requirements_lock)
+    return zip_tree(sorted(entries.items())), entry, paths
+
+
+def _request(url, method='GET', body=None, timeout=30):
+    """发送请求，返回响应对象；服务器返回错误时抛出 RemoteBuildError"""
+    # 只在提交到服务器时才导入，图形界面启动时不需要加载 urllib
+    import urllib.request
+    import urllib.error
+    headers = {}
+    if body is not None:
+        body = json.dumps(body).encode('utf-8')
+        headers['Content-Type'] = 'application/json'
+    token = os.environ.get(TOKEN_ENV)
+    if token:
+        headers['Authorization'] = f"Bearer {token}"
+    request = urllib.request.Request(url, data=body, method=method, headers=headers)
+    try:
+        return urllib.request.urlopen(request, timeout=timeout)
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read().decode('utf-8'))['error']
+        except (ValueError, KeyError):
+            message = e.reason
+        raise RemoteBuildError(f"打包服务器返回 {e.code}: {message}", exit_code=4 if e.code == 400 else 1) from None
+    except urllib.error.URLError as e:
+        raise RemoteBuildError(f"无法连接打包服务器 {url}: {e.reason}") from None
+
+
+def _request_json(url, method='GET', body=None):
+    with _request(url, method, body) as response:
+        return json.loads(response.read().decode('utf-8'))
+
+
+def submit_build(input_file, server=None, priority=0, **options):
+    """
+    上传脚本并提交打包任务
+
+    参数:
+        input_file (str): 要打包的 Python 文件路径
+        server (str, optional): 服务器地址，默认取环境变量 PY_TO_EXE_SERVER
+        priority (int, optional): 优先级，数值越大越先运行
+        **options: REMOTE_OPTIONS 中的打包参数
+
+    返回:
+        dict: 服务器上的任务信息 (id、name、status 等)
+    """
+    server = server_url(server)
+    if not server:
+        raise ValueError(f"没有指定打包服务器，请设置环境变量 {SERVER_ENV}")
+    if not os.path.isfile(input_file):
+        raise FileNotFoundError(f"输入文件不存在: {input_file}")
+    unknown = set(options) - set(REMOTE_OPTIONS)
+    if unknown:
+        raise ValueError(f"打包服务器不支持这些参数: {', '.join(sorted(unknown))}")
+    for path in [options.get('icon_path'), options.get('requirements_lock')] + \
+            [src for src, _ in options.get('additional_data') or []]:
+        if path and not os.path.exists(path):
+            raise FileNotFoundError(f"文件不存在: {path}")
+    archive, entry, paths = pack_sources(input_file, options.get('icon_path'), options.get('additional_data'),
+                                         options.get('requirements_lock'), options.get('source_root'))
+    options = {key: value for key, value in dict(options, **paths).items() if value is not None}
+    return _request_json(f"{server}/builds", 'POST', {
+        'entry': entry,
+        'options': options,
+        'priority': priority,
+        'archive': base64.b64encode(archive).decode('ascii'),
+    })
+
+
+def get_build(build_id, server=None):
+    return _request_json(f"{server_url(server)}/builds/{build_id}")
+
+
+def list_builds(server=None):
+    return _request_json(f"{server_url(server)}/builds")
+
+
+def cancel_build(build_id, server=None):
+    return _request_json(f"{server_url(server)}/builds/{build_id}", 'DELETE')
+
+
+def follow_log(build_id, on_line, server=None, offset=0):
+    """逐行读取服务器上的打包日志，打包结束后返回；on_line 的参数与 run_process 的回调相同"""
+    start = time.monotonic()
+    with _request(f"{server_url(server)}/builds/{build_id}/log?offset={offset}", timeout=None) as response:
+        for raw in response:
+            on_line(time.monotonic() - start, 'stdout', raw.decode('utf-8', errors='replace'))
+
+
+def download_artifacts(build_id, output_dir, server=None):
+    """下载产物并解压到输出目录，返回产物名称列表"""
+    from packager_core import publish_artifacts
+    with _request(f"{server_url(server)}/builds/{build_id}/artifacts", timeout=None) as response:
+        data = response.read()
+    os.makedirs(output_dir, exist_ok=True)
+    # 先解压到输出目录下的暂存目录，完整后再替换已有产物
+    stage_dir = tempfile.mkdtemp(prefix='.remote-partial-', dir=output_dir)
+    try:
+        names = extract_zip(data, stage_dir)
+        publish_artifacts(stage_dir, output_dir)
+    finally:
+        shutil.rmtree(stage_dir, ignore_errors=True)
+    return names
+
+
+def remote_build(input_file, output_dir=None, server=None, on_line=None, cancel_event=None, priority=0, **options):
+    """
+    在打包服务器上打包，产物下载到本地输出目录，出错时抛出异常
+
+    参数:
+        input_file, output_dir: 与 build_exe 相同
+        server (str, optional): 服务器地址，默认取环境变量 PY_TO_EXE_SERVER
+        on_line (callable, optional): 每收到一行日志调用 on_line(秒数, 'stdout', 行文本)，可直接使用 echo_line
+        cancel_event (threading.Event, optional): 被设置后取消服务器上的任务并抛出 ProcessCancelled
+        priority (int, optional): 优先级
+        **options: 其他打包参数 (包括项目模式的 entry)，LOCAL_OPTIONS 中只在本机有意义的参数被忽略
+
+    返回:
+        dict: 服务器上的任务信息，output_dir 为本地输出目录，artifacts 为下载的产物名称
+    """
+    server = server_url(server)
+    # 项目在本机生成启动脚本，连同整个源码树一起上传
+    if options.get('entry') or is_project(input_file):
+        job = expand_project(dict(options, input_file=input_file, output_dir=output_dir))
+        input_file, output_dir = job.pop('input_file'), job.pop('output_dir')
+        options = job
+    ignored = sorted(key for key in options if key in LOCAL_OPTIONS and options[key])
+    if ignored and on_line:
+        on_line(0, 'stdout', f"提交到打包服务器时忽略本机参数: {', '.join(ignored)}\n")
+    options = {key: value for key, value in options.items() if key not in LOCAL_OPTIONS}
+    output_dir = output_dir or os.path.join(os.path.dirname(os.path.abspath(input_file)), 'dist')
+
+    build = submit_build(input_file, server, priority, **options)
+    if on_line:
+        on_line(0, 'stdout', f"已提交到打包服务器 {server}，任务编号 {build['id']}\n")
+
+    # 取消时通知服务器，服务器结束任务后日志流随之结束
+    finished = threading.Event()
+    if cancel_event is not None:
+        def watch_cancel():
+            while not finished.wait(0.2):
+                if cancel_event.is_set():
+                    cancel_build(build['id'], server)
+                    return
+        threading.Thread(target=watch_cancel, daemon=True).start()
+    try:
+        follow_log(build['id'], on_line or (lambda *args: None), server)
+        build = get_build(build['id'], server)
+    except KeyboardInterrupt:
+        # 本地按下 Ctrl+C 时同时取消服务器上的任务
+        try:
+            cancel_build(build['id'], server)
+        except (RemoteBuildError, OSError):
+            pass
+        raise
+    finally:
+        finished.set()
+
+    if build['status'] == '已取消' or (cancel_event is not None and cancel_event.is_set()):
+        raise ProcessCancelled("打包已取消")
+    if build['status'] != '成功':
+        raise RemoteBuildError(build.get('message') or "打包失败", build.get('exit_code') or 1, build['id'])
+    build['artifacts'] = download_artifacts(build['id'], output_dir, server)
+    build['output_dir'] = output_dir
+    return build
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="查看或取消打包服务器上的任务")
+    parser.add_argument('--server', help=f"服务器地址，默认取环境变量 {SERVER_ENV}")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="列出任务")
+    cancel = commands.add_parser('cancel', help="取消任务")
+    cancel.add_argument('id', type=int, help="任务编号")
+    args = parser.parse_args(argv)
+
+    if not server_url(args.server):
+        parser.error(f"请用 --server 或环境变量 {SERVER_ENV} 指定打包服务器")
+    try:
+        if args.command == 'list':
+            for build in list_builds(args.server):
+                duration = f"{build['duration']:.1f}s" if build['duration'] is not None else '-'
+                print(f"{build['id']:>4}  {build['status']:<4}  {duration:>8}  {build['name']}  {build['message'] or ''}")
+        else:
+            build = cancel_build(args.id, args.server)
+            print(f"任务 {build['id']} 状态: {build['status']}")
+    except RemoteBuildError as e:
+        print(f"出错: {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
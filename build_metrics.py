@@ -0,0 +1,130 @@
+import os
+import time
+
+# 打包过程的各个阶段，按执行顺序排列
+PHASES = (
+    ('validate', '输入检查'),
+    ('check_pyinstaller', '检查 PyInstaller'),
+    ('analysis', '模块分析'),
+    ('pyz', '生成 PYZ'),
+    ('assemble', '组装 PKG/EXE'),
+    ('collect', 'COLLECT'),
+    ('cleanup', '收尾清理'),
+)
+PHASE_LABELS = dict(PHASES)
+PHASE_NAMES = [name for name, _ in PHASES]
+
+# PyInstaller 日志中标志阶段开始的文本
+LOG_MARKERS = (
+    ('INFO: checking Analysis', 'analysis'),
+    ('INFO: checking PYZ', 'pyz'),
+    ('INFO: checking PKG', 'assemble'),
+    ('INFO: checking COLLECT', 'collect'),
+)
+
+
+class PhaseTimer:
+    """
+    记录一次打包中各阶段的耗时
+
+    调用方在输入检查、运行 PyInstaller 前后等位置调用 start() 切换阶段，
+    PyInstaller 内部的阶段通过 feed() 从日志标记中识别。
+
+    参数:
+        name (str, optional): 产物名称，写入指标
+        on_phase (callable, optional): 进入新阶段时调用 on_phase(阶段名, 序号, 阶段总数)，在调用 start/feed 的线程中执行
+    """
+
+    def __init__(self, name=None, on_phase=None):
+        self.name = name
+        self.on_phase = on_phase
+        self.started_at = time.time()
+        self.phases = []
+        self.current = None
+        self._origin = time.monotonic()
+        self._phase_start = None
+
+    def start(self, phase):
+        """结束当前阶段并开始 phase"""
+        now = time.monotonic()
+        self._close(now)
+        self.current = phase
+        self._phase_start = now
+        if self.on_phase:
+            self.on_phase(phase, PHASE_NAMES.index(phase), len(PHASES))
+
+    def feed(self, line):
+        """根据 PyInstaller 的一行日志切换阶段 (只会向后切换)"""
+        for marker, phase in LOG_MARKERS:
+            if marker in line:
+                if self.current is None or PHASE_NAMES.index(phase) > PHASE_NAMES.index(self.current):
+                    self.start(phase)
+                return
+
+    def _close(self, now):
+        if self.current is None:
+            return
+        self.phases.append({
+            'phase': self.current,
+            'label': PHASE_LABELS[self.current],
+            'start': round(self._phase_start - self._origin, 3),
+            'duration': round(now - self._phase_start, 3),
+        })
+        self.current = None
+
+    def finish(self, status):
+        """
+        结束计时
+
+        返回:
+            dict: name、status、started_at、total (秒) 和 phases (各阶段的开始时间与耗时)
+        """
+        now = time.monotonic()
+        self._close(now)
+        return {
+            'name': self.name,
+            'status': status,
+            'started_at': self.started_at,
+            'total': round(now - self._origin, 3),
+            'phases': list(self.phases),
+        }
+
+
+def write_metrics(metrics, path):
+    """
+    写出阶段耗时
+
+    .csv 文件每次追加一行 (文件不存在时先写表头)，便于比较多次构建；其他扩展名写为 JSON
+    """
+    import csv
+    import json
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    if not path.lower().endswith('.csv'):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(metrics, f, ensure_ascii=False, indent=2)
+        return
+
+    durations = {}
+    for item in metrics['phases']:
+        durations[item['phase']] = durations.get(item['phase'], 0) + item['duration']
+    row = {
+        'started_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(metrics['started_at'])),
+        'name': metrics['name'],
+        'status': metrics['status'],
+        'total': metrics['total'],
+    }
+    row.update({name: round(durations[name], 3) if name in durations else '' for name in PHASE_NAMES})
+    is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+    with open(path, 'a', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=list(row))
+        if is_new:
+            writer.writeheader()
+        writer.writerow(row)
+
+
+def format_metrics(metrics):
+    """把阶段耗时格式化为一行文本"""
+    parts = [f"{item['label']} {item['duration']:.1f}s" for item in metrics['phases']]
+    return f"阶段耗时 (共 {metrics['total']:.1f}s): " + "，".join(parts)
@@ -0,0 +1,414 @@
+"""
+打包服务器：在一台机器上集中打包，团队成员通过 HTTP 提交任务
+
+任务由 JobScheduler 按优先级调度到有限数量的工作线程，每个任务在独立的子进程中运行
+packager_cli.py，所有任务共享服务器上的构建缓存；服务器不保存任务，重启后清空。
+
+接口 (请求和响应均为 JSON，日志和产物除外):
+    POST   /builds                   提交任务 {entry, options, priority, archive (base64 编码的 zip)}
+    GET    /builds                   列出任务
+    GET    /builds/<id>              任务状态
+    GET    /builds/<id>/log?offset=N 日志 (纯文本)，任务结束前持续输出新的行
+    GET    /builds/<id>/artifacts    产物 (zip)，任务成功后可用
+    DELETE /builds/<id>              取消任务
+
+客户端见 build_client.py；设置环境变量 PY_TO_EXE_SERVER 后命令行和各个图形界面都会提交到服务器。
+
+用法:
+    python build_server.py [--host 127.0.0.1] [--port 8765] [-j 2] [--token TOKEN]
+"""
+import os
+import re
+import sys
+import json
+import time
+import base64
+import shutil
+import argparse
+import binascii
+import threading
+from urllib.parse import urlsplit, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from process_runner import run_process, tail_text, ProcessCancelled
+from job_queue import JobScheduler, SUCCEEDED, CANCELLED, FINISHED
+from build_client import REMOTE_OPTIONS, DEFAULT_PORT, member_parts, zip_tree, extract_zip
+from project import program_name
+
+# 默认数据目录 (任务的源码、日志和产物)
+DEFAULT_DATA_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'py_to_exe', 'server')
+
+# 保留的已结束任务数，更早的任务连同文件一起删除
+DEFAULT_KEEP = 50
+
+# 上传的源码归档大小上限 (字节)
+MAX_UPLOAD = 200 * 1024 * 1024
+
+# 等待新日志时，检查一次客户端是否断开的间隔秒数
+_LOG_POLL = 1.0
+
+# 在子进程中运行打包的命令行工具
+CLI_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'packager_cli.py')
+
+
+class BuildLog:
+    """一个任务的日志：保存所有行并写入文件，多个客户端可以从任意位置读取并等待新的行"""
+
+    def __init__(self, path):
+        self.lines = []
+        self.closed = False
+        self._file = open(path, 'w', encoding='utf-8', errors='replace')
+        self._condition = threading.Condition()
+
+    def write(self, text):
+        with self._condition:
+            if self.closed:
+                return
+            self.lines.append(text)
+            self._file.write(text)
+            self._condition.notify_all()
+
+    def close(self):
+        with self._condition:
+            if not self.closed:
+                self.closed = True
+                self._file.close()
+            self._condition.notify_all()
+
+    def read(self, offset, timeout):
+        """返回 (offset 之后的行, 日志是否已结束)，没有新的行时最多等待 timeout 秒"""
+        with self._condition:
+            self._condition.wait_for(lambda: len(self.lines) > offset or self.closed, timeout)
+            return self.lines[offset:], self.closed
+
+
+class BuildServer:
+    """
+    打包服务器
+
+    参数:
+        data_dir (str, optional): 数据目录，默认为 ~/.cache/py_to_exe/server
+        workers (int, optional): 同时运行的任务数，默认为 1
+        cache_dir (str, optional): 共享的构建缓存目录，默认为 build_cache 的默认目录
+        timeout (float, optional): 单个任务的超时秒数上限
+        keep (int, optional): 保留的已结束任务数
+        wheelhouse (str, optional): 任务使用依赖锁文件时，创建打包环境用的 wheel 目录
+        token (str, optional): 设置后请求需要带 Authorization: Bearer <token>
+    """
+
+    def __init__(self, data_dir=None, workers=1, cache_dir=None, timeout=None, keep=DEFAULT_KEEP,
+                 wheelhouse=None, token=None):
+        self.data_dir = os.path.abspath(data_dir or DEFAULT_DATA_DIR)
+        self.jobs_dir = os.path.join(self.data_dir, 'jobs')
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.keep = keep
+        self.wheelhouse = wheelhouse
+        self.token = token
+        # 任务不跨重启保存，编号从 1 重新开始
+        shutil.rmtree(self.jobs_dir, ignore_errors=True)
+        os.makedirs(self.jobs_dir)
+        self.scheduler = JobScheduler(self._run_job, workers, on_change=self._on_change)
+
+    def job_dir(self, job):
+        return os.path.join(self.jobs_dir, str(job.id))
+
+    def submit(self, payload):
+        """检查并解压提交的任务，加入队列，返回 BuildJob；请求不合法时抛出 ValueError"""
+        if not isinstance(payload, dict):
+            raise ValueError("请求体必须是 JSON 对象")
+        entry = payload.get('entry')
+        options = payload.get('options') or {}
+        if not isinstance(entry, str) or not entry.lower().endswith('.py'):
+            raise ValueError("entry 必须是归档中的 .py 文件")
+        member_parts(entry)
+        if not isinstance(options, dict):
+            raise ValueError("options 必须是 JSON 对象")
+        unknown = set(options) - set(REMOTE_OPTIONS)
+        if unknown:
+            raise ValueError(f"不支持的打包参数: {', '.join(sorted(unknown))}")
+        # 路径参数只能指向归档中的文件
+        for key in ('icon_path', 'requirements_lock'):
+            if options.get(key) is not None:
+                member_parts(str(options[key]))
+        # 项目模式的源码目录为归档根目录或其中的子目录
+        if options.get('source_root') not in (None, '.'):
+            member_parts(str(options['source_root']))
+        additional_data = options.get('additional_data') or []
+        if not isinstance(additional_data, list) or \
+                not all(isinstance(item, list) and len(item) == 2 for item in additional_data):
+            raise ValueError("additional_data 必须是 [源路径, 目标路径] 的列表")
+        for src, _ in additional_data:
+            member_parts(str(src))
+        try:
+            archive = base64.b64decode(payload.get('archive') or '', validate=True)
+        except (binascii.Error, TypeError):
+            raise ValueError("archive 必须是 base64 编码的 zip") from None
+        priority = payload.get('priority', 0)
+        if not isinstance(priority, int):
+            raise ValueError("priority 必须是整数")
+
+        name = program_name(entry)
+        job = self.scheduler.add(name, {'entry': entry, 'options': options, 'archive': archive}, priority)
+        return job
+
+    def _prepare(self, job):
+        """在工作线程中解压源码并写出配置文件，返回配置文件路径"""
+        job_dir = self.job_dir(job)
+        src_dir = os.path.join(job_dir, 'src')
+        os.makedirs(src_dir, exist_ok=True)
+        extract_zip(job.options.pop('archive'), src_dir)
+        if not os.path.isfile(os.path.join(src_dir, *member_parts(job.options['entry']))):
+            raise ValueError(f"归档中没有脚本: {job.options['entry']}")
+        target = dict(job.options['options'], input_file=os.path.join('src', job.options['entry']),
+                      output_dir='dist', use_cache=True)
+        for key in ('icon_path', 'requirements_lock', 'source_root'):
+            if target.get(key):
+                target[key] = os.path.join('src', target[key])
+        if target.get('additional_data'):
+            target['additional_data'] = [[os.path.join('src', src), dest] for src, dest in target['additional_data']]
+        if self.cache_dir:
+            target['cache_dir'] = self.cache_dir
+        if self.wheelhouse and target.get('requirements_lock'):
+            target['wheelhouse'] = self.wheelhouse
+        if self.timeout:
+            target['timeout'] = min(target.get('timeout') or self.timeout, self.timeout)
+        config_path = os.path.join(job_dir, 'build.json')
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump({'targets': [target]}, f, ensure_ascii=False, indent=2)
+        return config_path
+
+    def _run_job(self, job):
+        """JobScheduler 的 runner：在子进程中运行 packager_cli，成功后把产物压缩为 artifacts.zip"""
+        job_dir = self.job_dir(job)
+        try:
+            config_path = self._prepare(job)
+            job.log.write(f"任务 {job.id}: 开始打包 {job.options['entry']}\n")
+            # 服务器本机设置了 PY_TO_EXE_SERVER 时，子进程不能再提交回服务器
+            env = {key: value for key, value in os.environ.items() if key != 'PY_TO_EXE_SERVER'}
+            result = run_process([sys.executable, '-u', CLI_PATH, '--config', config_path],
+                                 on_line=lambda elapsed, stream, line: job.log.write(line),
+                                 cancel_event=job.cancel_event, cwd=job_dir, env=env)
+            job.exit_code = result['returncode']
+            if result['cancelled']:
+                job.log.write("打包已取消，已结束打包进程\n")
+                raise ProcessCancelled("打包已取消")
+            if result['returncode'] != 0:
+                raise RuntimeError(tail_text(result, 'stderr', 1) or f"打包失败，退出码 {result['returncode']}")
+            dist = os.path.join(job_dir, 'dist')
+            artifacts = sorted(os.listdir(dist))
+            with open(os.path.join(job_dir, 'artifacts.zip.partial'), 'wb') as f:
+                f.write(zip_tree([(name, os.path.join(dist, name)) for name in artifacts]))
+            os.replace(os.path.join(job_dir, 'artifacts.zip.partial'), os.path.join(job_dir, 'artifacts.zip'))
+            job.artifacts = artifacts
+            return f"产物: {', '.join(artifacts)}"
+        except (ValueError, OSError) as e:
+            job.log.write(f"打包过程中出错: {str(e)}\n")
+            job.exit_code = 4 if isinstance(e, ValueError) else 1
+            raise
+        finally:
+            # 只保留日志和产物归档
+            shutil.rmtree(os.path.join(job_dir, 'src'), ignore_errors=True)
+            shutil.rmtree(os.path.join(job_dir, 'dist'), ignore_errors=True)
+            job.log.close()
+
+    def _on_change(self, job):
+        if job.log is None:
+            os.makedirs(self.job_dir(job), exist_ok=True)
+            job.log = BuildLog(os.path.join(self.job_dir(job), 'build.log'))
+            job.exit_code = None
+            job.artifacts = []
+            job.submitted = time.time()
+        if job.status in FINISHED:
+            if job.status == CANCELLED and job.started == job.finished:
+                # 还没开始运行就被取消 (调度器把开始和结束时间设为同一时刻)，runner 不会执行
+                job.options.pop('archive', None)
+                job.log.close()
+            self._prune()
+
+    def _prune(self):
+        """删除超出保留数量的已结束任务"""
+        finished = [job for job in self.scheduler.jobs() if job.status in FINISHED and job.log.closed]
+        for job in sorted(finished, key=lambda job: job.finished)[:max(0, len(finished) - self.keep)]:
+            self.scheduler.remove(job.id)
+            shutil.rmtree(self.job_dir(job), ignore_errors=True)
+
+    def job_info(self, job):
+        """任务的 JSON 表示"""
+        return {
+            'id': job.id,
+            'name': job.name,
+            'entry': job.options['entry'],
+            'status': job.status,
+            'message': job.message,
+            'priority': job.priority,
+            'exit_code': job.exit_code,
+            'submitted': job.submitted,
+            'duration': round(job.duration, 3) if job.duration is not None else None,
+            'log_lines': len(job.log.lines),
+            'artifacts': job.artifacts if job.status == SUCCEEDED else [],
+        }
+
+    def cancel(self, job):
+        self.scheduler.cancel(job.id)
+
+    def serve(self, host='127.0.0.1', port=DEFAULT_PORT):
+        """创建 HTTP 服务器 (尚未开始处理请求)，调用其 serve_forever() 开始服务"""
+        httpd = ThreadingHTTPServer((host, port), BuildRequestHandler)
+        httpd.daemon_threads = True
+        httpd.build_server = self
+        return httpd
+
+
+class BuildRequestHandler(BaseHTTPRequestHandler):
+    """打包服务器的请求处理"""
+
+    server_version = 'py_to_exe_server/1'
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[{self.log_date_time_string()}] {self.address_string()} {format % args}\n")
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send_json({'error': message}, status)
+
+    def _route(self):
+        """检查令牌并解析路径，返回 (任务或 None, 子资源)；出错时已发送响应并返回 None"""
+        builds = self.server.build_server
+        if builds.token and self.headers.get('Authorization') != f"Bearer {builds.token}":
+            self._send_error(401, "需要有效的令牌")
+            return None
+        path = urlsplit(self.path).path.rstrip('/')
+        match = re.fullmatch(r'/builds(?:/(\d+)(?:/(log|artifacts))?)?', path)
+        if not match:
+            self._send_error(404, f"没有这个接口: {path}")
+            return None
+        if match.group(1) is None:
+            return None, None
+        job = builds.scheduler.get(int(match.group(1)))
+        if job is None:
+            self._send_error(404, f"没有这个任务: {match.group(1)}")
+            return None
+        return job, match.group(2)
+
+    def do_GET(self):
+        routed = self._route()
+        if routed is None:
+            return
+        job, resource = routed
+        builds = self.server.build_server
+        if job is None:
+            self._send_json([builds.job_info(job) for job in builds.scheduler.jobs()])
+        elif resource is None:
+            self._send_json(builds.job_info(job))
+        elif resource == 'log':
+            self._stream_log(job)
+        else:
+            path = os.path.join(builds.job_dir(job), 'artifacts.zip')
+            if job.status != SUCCEEDED or not os.path.isfile(path):
+                self._send_error(409, f"任务 {job.id} 没有可下载的产物 (状态: {job.status})")
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/zip')
+            self.send_header('Content-Length', str(os.path.getsize(path)))
+            self.end_headers()
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, self.wfile)
+
+    def _stream_log(self, job):
+        """输出日志，任务结束前持续等待新的行；没有 Content-Length，以关闭连接表示结束"""
+        try:
+            offset = int(parse_qs(urlsplit(self.path).query).get('offset', ['0'])[0])
+        except ValueError:
+            self._send_error(400, "offset 必须是整数")
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.end_headers()
+        self.close_connection = True
+        try:
+            while True:
+                lines, closed = job.log.read(offset, _LOG_POLL)
+                if lines:
+                    self.wfile.write(''.join(lines).encode('utf-8'))
+                    self.wfile.flush()
+                    offset += len(lines)
+                elif closed:
+                    return
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端断开，任务继续运行
+            return
+
+    def do_POST(self):
+        routed = self._route()
+        if routed is None:
+            return
+        if routed != (None, None):
+            self._send_error(405, "只能向 /builds 提交任务")
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_UPLOAD * 4 // 3 + 4096:
+            self._send_error(413, f"上传的归档超过 {MAX_UPLOAD // 1024 // 1024} MB")
+            return
+        try:
+            payload = json.loads(self.rfile.read(length).decode('utf-8'))
+            job = self.server.build_server.submit(payload)
+        except ValueError as e:
+            self._send_error(400, str(e))
+            return
+        self._send_json(self.server.build_server.job_info(job), 201)
+
+    def do_DELETE(self):
+        routed = self._route()
+        if routed is None:
+            return
+        job, resource = routed
+        if job is None or resource is not None:
+            self._send_error(405, "只能取消单个任务: DELETE /builds/<id>")
+            return
+        self.server.build_server.cancel(job)
+        self._send_json(self.server.build_server.job_info(job))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="打包服务器：通过 HTTP 接收打包任务，在本机的工作线程中打包")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址，默认只接受本机连接")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"监听端口，默认为 {DEFAULT_PORT}")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="同时运行的任务数，默认为 1")
+    parser.add_argument('--data-dir', help="数据目录，默认为 ~/.cache/py_to_exe/server")
+    parser.add_argument('--cache-dir', help="共享的构建缓存目录")
+    parser.add_argument('--timeout', type=float, metavar='SECONDS', help="单个任务的超时秒数上限")
+    parser.add_argument('--keep', type=int, default=DEFAULT_KEEP, help=f"保留的已结束任务数，默认为 {DEFAULT_KEEP}")
+    parser.add_argument('--wheelhouse', help="任务使用依赖锁文件时，创建打包环境用的 wheel 目录")
+    parser.add_argument('--token', default=os.environ.get('PY_TO_EXE_SERVER_TOKEN'),
+                        help="要求客户端提供的令牌，默认取环境变量 PY_TO_EXE_SERVER_TOKEN")
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs 必须大于 0")
+
+    server = BuildServer(args.data_dir, args.jobs, args.cache_dir, args.timeout, args.keep,
+                         args.wheelhouse, args.token)
+    httpd = server.serve(args.host, args.port)
+    if args.host not in ('127.0.0.1', 'localhost', '::1') and not args.token:
+        print("警告: 服务器接受其他机器的连接且没有设置令牌，提交的脚本会在本机执行", file=sys.stderr)
+    print(f"打包服务器已启动: http://{args.host}:{httpd.server_address[1]} ({args.jobs} 个工作线程)")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("正在停止打包服务器...")
+    finally:
+        httpd.server_close()
+        for job in server.scheduler.jobs():
+            if job.status not in FINISHED:
+                server.cancel(job)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
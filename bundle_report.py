@@ -0,0 +1,287 @@
+import os
+import sys
+import ast
+import json
+import zipfile
+import sysconfig
+from import_analyzer import ScanCache, analyze
+
+# 这些类型的条目计入共享库/数据文件，Python 模块通过 PYZ 归档单独统计
+_BINARY_TYPES = ('BINARY', 'EXTENSION', 'EXECUTABLE')
+_DATA_TYPES = ('DATA', 'ZIPFILE')
+
+# 小于该大小的包不作为排除建议 (排除它们节省不了多少空间)
+MIN_EXCLUDE_BYTES = 20 * 1024
+
+
+def _read_toc(path):
+    """读取 PyInstaller 写出的 TOC 文件 (Python 字面量)，不存在时返回 None"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return ast.literal_eval(f.read())
+    except (OSError, ValueError, SyntaxError):
+        return None
+
+
+def _toc_entries(toc):
+    """从 TOC 结构中取出所有 (名称, 源路径, 类型) 条目"""
+    entries = []
+    if isinstance(toc, (list, tuple)):
+        for item in toc:
+            if isinstance(item, tuple) and len(item) == 3 and all(isinstance(x, str) for x in item):
+                entries.append(item)
+            elif isinstance(item, (list, tuple)):
+                entries.extend(_toc_entries(item))
+    return entries
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _pyz_sizes(pyz_path):
+    """返回 PYZ 归档中每个模块压缩后的字节数；无法读取时返回空字典"""
+    try:
+        from PyInstaller.archive.readers import ZlibArchiveReader
+        reader = ZlibArchiveReader(pyz_path)
+        return {name: entry[-1] for name, entry in reader.toc.items()}
+    except Exception:
+        return {}
+
+
+def _carchive_sizes(exe_path):
+    """返回单文件 EXE 内嵌归档中每个条目压缩后的字节数；无法读取时返回空字典"""
+    try:
+        from PyInstaller.archive.readers import CArchiveReader
+        reader = CArchiveReader(exe_path)
+        return {name: entry[1] for name, entry in reader.toc.items()}
+    except Exception:
+        return {}
+
+
+def _base_library_modules(zip_path):
+    """
+    返回 base_library.zip 中的模块及其标准库源文件
+
+    这些模块在程序启动时就会加载，它们的顶层导入也视为可达
+    """
+    stdlib = sysconfig.get_paths()['stdlib']
+    modules = {}
+    try:
+        with zipfile.ZipFile(zip_path) as zf:
+            names = zf.namelist()
+    except (OSError, zipfile.BadZipFile):
+        return modules
+    for entry in names:
+        if not entry.endswith('.pyc'):
+            continue
+        parts = entry[:-len('.pyc')].split('/')
+        if parts[-1] == '__init__':
+            parts = parts[:-1]
+            src = os.path.join(stdlib, *parts, '__init__.py')
+        else:
+            src = os.path.join(stdlib, *parts) + '.py'
+        modules['.'.join(parts)] = src
+    return modules
+
+
+def _missing_modules(warn_path):
+    """从 warn-<name>.txt 中取出顶层导入却缺失的模块"""
+    missing = []
+    try:
+        with open(warn_path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if line.startswith('missing module named') and '(top-level)' in line:
+                    missing.append(line.split(' - ')[0][len('missing module named '):].strip().strip("'"))
+    except OSError:
+        pass
+    return missing
+
+
+def _reachable_modules(modules, roots, cache):
+    """
+    从 roots 出发，沿着各模块中的全部导入 (包括写在函数中、运行到时才执行的导入，
+    以及字符串常量形式的动态导入) 遍历，返回可达的模块集合
+
+    modules: {模块名: 源文件路径}，只在这些模块之间遍历
+    """
+    reached = set()
+    pending = list(roots)
+    while pending:
+        name = pending.pop()
+        # 导入 a.b.c 时 a 和 a.b 也会被执行
+        parts = name.split('.')
+        for i in range(1, len(parts) + 1):
+            prefix = '.'.join(parts[:i])
+            if prefix in reached or prefix not in modules:
+                continue
+            reached.add(prefix)
+            src = modules[prefix]
+            if not src or not src.endswith('.py') or not os.path.isfile(src):
+                continue
+            try:
+                scanned = cache.scan(src)
+            except (SyntaxError, ValueError, OSError):
+                continue
+            is_package = os.path.basename(src) == '__init__.py'
+            package = prefix if is_package else prefix.rpartition('.')[0]
+            for imported in scanned['imports'] + scanned['dynamic']:
+                if imported.startswith('.'):
+                    level = len(imported) - len(imported.lstrip('.'))
+                    base = package.split('.')
+                    if level - 1 > len(base):
+                        continue
+                    base = base[:len(base) - (level - 1)]
+                    rest = imported.lstrip('.')
+                    imported = '.'.join(base + ([rest] if rest else []))
+                pending.append(imported)
+    return reached
+
+
+def analyze_bundle(work_path, name, input_file=None, dist_path=None, onefile=True, hidden_imports=None, top=15,
+                   source_root=None):
+    """
+    分析一次构建的产物组成
+
+    参数:
+        work_path (str): 本次构建的 PyInstaller 工作目录 (--workpath 下的 <name> 目录)
+        name (str): 产物名称 (脚本文件名去掉扩展名)
+        input_file (str, optional): 打包的脚本，用于计算静态导入图并给出 --exclude-module 建议
+        dist_path (str, optional): 输出目录，用于读取单文件 EXE 中的压缩大小
+        onefile (bool, optional): 是否为单文件模式
+        hidden_imports (list, optional): 手动指定的隐藏导入，视为可达
+        top (int, optional): 每一类最多列出的条目数
+        source_root (str, optional): 本地模块所在的源码目录，默认为脚本所在目录
+
+    返回报告字典，字节数均为打包后 (压缩后，如可读取) 的大小
+    """
+    pyz_toc = _read_toc(os.path.join(work_path, 'PYZ-00.toc'))
+    pkg_toc = _read_toc(os.path.join(work_path, 'PKG-00.toc'))
+    collect_toc = _read_toc(os.path.join(work_path, 'COLLECT-00.toc'))
+    if pyz_toc is None and pkg_toc is None:
+        raise FileNotFoundError(f"找不到 PyInstaller 的 TOC 文件: {work_path}")
+
+    # Python 模块
+    module_sources = {}
+    for mod_name, src, typecode in _toc_entries(pyz_toc):
+        if typecode == 'PYMODULE':
+            module_sources[mod_name] = src
+    pyz_sizes = _pyz_sizes(os.path.join(work_path, 'PYZ-00.pyz'))
+    module_sizes = {mod: pyz_sizes.get(mod, _file_size(src)) for mod, src in module_sources.items()}
+
+    packages = {}
+    for mod_name, size in module_sizes.items():
+        pkg = packages.setdefault(mod_name.split('.')[0], {'name': mod_name.split('.')[0], 'bytes': 0, 'modules': 0})
+        pkg['bytes'] += size
+        pkg['modules'] += 1
+
+    # 共享库与数据文件
+    archive_sizes = {}
+    if onefile and dist_path:
+        for candidate in (name, name + '.exe'):
+            exe_path = os.path.join(dist_path, candidate)
+            if os.path.isfile(exe_path):
+                archive_sizes = _carchive_sizes(exe_path)
+                break
+
+    binaries = {}
+    datas = {}
+    scripts = []
+    for dest, src, typecode in _toc_entries(pkg_toc) + _toc_entries(collect_toc):
+        if typecode == 'PYSOURCE':
+            scripts.append((dest, src))
+            continue
+        if typecode in _BINARY_TYPES:
+            target = binaries
+        elif typecode in _DATA_TYPES:
+            target = datas
+        else:
+            continue
+        target[dest] = {'name': dest, 'bytes': archive_sizes.get(dest, _file_size(src)), 'source': src}
+
+    def ranked(items):
+        return sorted(items, key=lambda item: item['bytes'], reverse=True)
+
+    report = {
+        'name': name,
+        'modules_bytes': sum(module_sizes.values()),
+        'binaries_bytes': sum(b['bytes'] for b in binaries.values()),
+        'data_bytes': sum(d['bytes'] for d in datas.values()),
+        'packages': ranked(packages.values())[:top],
+        'binaries': ranked(binaries.values())[:top],
+        'data': ranked(datas.values())[:top],
+        'missing_modules': _missing_modules(os.path.join(work_path, f"warn-{name}.txt")),
+        'exclude_candidates': [],
+    }
+    report['total_bytes'] = report['modules_bytes'] + report['binaries_bytes'] + report['data_bytes']
+
+    # 静态导入图无法到达的包，作为 --exclude-module 建议
+    if input_file:
+        cache = ScanCache()
+        analysis = analyze(input_file, cache, source_root)
+        roots = set(hidden_imports or []) | set(analysis['hidden_imports'])
+        for path in analysis['local_files']:
+            roots.update(cache.scan(path)['imports'])
+        # 用户脚本和运行时钩子中的全部导入都视为会执行
+        for dest, src in scripts:
+            if os.path.isfile(src):
+                try:
+                    roots.update(cache.scan(src)['imports'])
+                except (SyntaxError, ValueError, OSError):
+                    pass
+        base_modules = _base_library_modules(os.path.join(work_path, 'base_library.zip'))
+        roots.update(base_modules)
+        roots = {r for r in roots if not r.startswith('.')}
+        reached = _reachable_modules(dict(base_modules, **module_sources), roots, cache)
+        cache.save()
+
+        reached_packages = {mod.split('.')[0] for mod in reached}
+        candidates = [dict(pkg) for pkg in packages.values()
+                      if pkg['name'] not in reached_packages and pkg['bytes'] >= MIN_EXCLUDE_BYTES]
+        report['exclude_candidates'] = ranked(candidates)
+
+    return report
+
+
+def _format_bytes(size):
+    if size >= 1024 * 1024:
+        return f"{size / 1024 / 1024:.1f} MB"
+    return f"{size / 1024:.1f} KB"
+
+
+def format_report(report):
+    """把分析报告格式化为多行文本"""
+    lines = [
+        f"产物组成 ({report['name']}): 共 {_format_bytes(report['total_bytes'])}",
+        f"  Python 模块 {_format_bytes(report['modules_bytes'])}，"
+        f"共享库 {_format_bytes(report['binaries_bytes'])}，数据文件 {_format_bytes(report['data_bytes'])}",
+    ]
+    for title, key in (("最大的包", 'packages'), ("最大的共享库", 'binaries'), ("最大的数据文件", 'data')):
+        if report[key]:
+            lines.append(f"{title}:")
+            for item in report[key]:
+                lines.append(f"  {_format_bytes(item['bytes']):>10}  {item['name']}")
+    if report['exclude_candidates']:
+        lines.append("静态导入图无法到达、可以尝试排除的包 (--exclude-module):")
+        for item in report['exclude_candidates']:
+            lines.append(f"  {_format_bytes(item['bytes']):>10}  {item['name']}")
+    if report['missing_modules']:
+        lines.append(f"顶层导入但缺失的模块: {', '.join(report['missing_modules'])}")
+    return "\n".join(lines)
+
+
+def write_report(report, path):
+    """把分析报告写入 JSON 文件"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print("用法: python bundle_report.py <workpath>/<name> <name> [script.py]")
+        sys.exit(2)
+    result = analyze_bundle(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None)
+    print(format_report(result))
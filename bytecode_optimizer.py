@@ -0,0 +1,163 @@
+"""
+字节码优化：选择优化级别、排除用不到的测试包，并比较优化前后的产物
+
+优化级别与 python -O/-OO 相同，通过 PyInstaller 的 --optimize 应用到打包的所有模块：
+    0  不优化
+    1  去掉 assert 语句和 if __debug__ 代码块
+    2  在 1 的基础上去掉文档字符串 (依赖 __doc__ 的程序，如 argparse 的描述取自 __doc__ 时，请确认仍能正常运行)
+"""
+import os
+import sys
+import importlib.util
+import importlib.machinery
+from import_analyzer import ScanCache, analyze, _package_dir
+
+OPTIMIZE_LEVELS = (0, 1, 2)
+
+# 视为测试包的包名
+TEST_PACKAGE_NAMES = ('test', 'tests', 'testing')
+
+
+class _ModuleSources:
+    """
+    按需定位模块源文件的映射 (供 bundle_report._reachable_modules 使用)，不导入任何模块
+
+    模块名不存在时 in 为 False；存在但没有 .py 源文件 (扩展模块、命名空间包) 时值为空字符串
+    """
+
+    def __init__(self, search_dir):
+        self.search_dir = search_dir
+        self._sources = {}
+
+    def _locate(self, name):
+        if name in self._sources:
+            return self._sources[name]
+        parent, _, last = name.rpartition('.')
+        source = None
+        directory = _package_dir(parent, self.search_dir) if parent else self.search_dir
+        if directory:
+            source = self._find_in(directory, last)
+        if source is None and not parent:
+            # 顶层模块只查找 spec，不会执行其中的代码
+            try:
+                spec = importlib.util.find_spec(name)
+            except (ImportError, ValueError):
+                spec = None
+            if spec is not None:
+                source = spec.origin if spec.has_location else ''
+        self._sources[name] = source
+        return source
+
+    @staticmethod
+    def _find_in(directory, last):
+        base = os.path.join(directory, last)
+        if os.path.isfile(os.path.join(base, '__init__.py')):
+            return os.path.join(base, '__init__.py')
+        for suffix in ['.py'] + list(importlib.machinery.EXTENSION_SUFFIXES):
+            if os.path.isfile(base + suffix):
+                return base + suffix
+        return '' if os.path.isdir(base) else None
+
+    def __contains__(self, name):
+        return self._locate(name) is not None
+
+    def __getitem__(self, name):
+        return self._locate(name)
+
+
+def _find_test_packages(package, package_dir, depth=3):
+    """在已安装的包中查找测试子包 (只查找 depth 层以内的目录，不导入)"""
+    found = []
+    try:
+        entries = sorted(os.scandir(package_dir), key=lambda entry: entry.name)
+    except OSError:
+        return found
+    for entry in entries:
+        if not entry.is_dir() or not os.path.isfile(os.path.join(entry.path, '__init__.py')):
+            continue
+        name = f"{package}.{entry.name}"
+        if entry.name in TEST_PACKAGE_NAMES:
+            found.append(name)
+        elif depth > 1:
+            found.extend(_find_test_packages(name, entry.path, depth - 1))
+    return found
+
+
+def find_test_packages(input_file, source_root=None):
+    """
+    返回可以排除的测试包模块名 (用于 --exclude-module)
+
+    候选为标准库的 test 包、脚本所在目录中的测试包，以及脚本导入的第三方包和标准库包中的测试子包
+    (如 numpy.tests、tkinter.test)。从脚本及其本地模块的导入出发，沿着各包中的全部导入
+    (包括函数中的导入和动态导入) 遍历，能到达的测试包 (如 pandas 的 __init__ 导入的
+    pandas.testing) 不会排除。项目模式下 source_root 为源码目录。
+    """
+    from bundle_report import _reachable_modules
+    search_dir = os.path.abspath(source_root) if source_root else os.path.dirname(os.path.abspath(input_file))
+    cache = ScanCache()
+    result = analyze(input_file, cache, source_root)
+    candidates = [name for name in TEST_PACKAGE_NAMES
+                  if name == 'test' or os.path.isfile(os.path.join(search_dir, name, '__init__.py'))]
+    for top in result['external']:
+        if top in TEST_PACKAGE_NAMES:
+            continue
+        package_dir = _package_dir(top, search_dir)
+        if package_dir:
+            candidates.extend(_find_test_packages(top, package_dir))
+
+    roots = set(result['hidden_imports'])
+    for path in result['local_files']:
+        scanned = cache.scan(path)
+        roots.update(name for name in scanned['imports'] + scanned['dynamic'] if not name.startswith('.'))
+    # 本地模块自身 (如本地的 test.py) 也是可达的
+    roots.update(os.path.relpath(path, search_dir).split(os.sep)[0].split('.')[0] for path in result['local_files'])
+    reached = _reachable_modules(_ModuleSources(search_dir), roots, cache)
+    cache.save()
+    return [name for name in candidates
+            if not any(mod == name or mod.startswith(name + '.') for mod in reached)]
+
+
+def compare_builds(baseline_exe, optimized_exe, runs=5, on_line=None):
+    """
+    比较优化前后产物的大小和启动耗时
+
+    冻结后的程序不读取 -X importtime，以热启动耗时的 p50 衡量导入耗时的变化
+    (短时间运行的程序启动耗时主要花在导入模块上)。
+
+    参数:
+        on_line (callable, optional): 进度消息的输出，与 build_exe 的 on_line 相同，默认打印
+
+    返回:
+        dict: baseline 和 optimized 各自的 size_bytes 与 start_ms
+    """
+    from startup_benchmark import benchmark_executable
+
+    def say(message):
+        if on_line:
+            on_line(0, 'stdout', message + '\n')
+        else:
+            print(message)
+
+    result = {}
+    for key, exe_path in (('baseline', baseline_exe), ('optimized', optimized_exe)):
+        say(f"正在测量{'优化前' if key == 'baseline' else '优化后'}的启动耗时...")
+        bench = benchmark_executable(exe_path, runs=runs)
+        result[key] = {'size_bytes': bench['size_bytes'], 'start_ms': bench['warm']['p50_ms']}
+    return result
+
+
+def format_comparison(result):
+    """把优化前后的比较格式化为一行文本"""
+    before, after = result['baseline'], result['optimized']
+    size_delta = after['size_bytes'] - before['size_bytes']
+    start_delta = after['start_ms'] - before['start_ms']
+    return (f"字节码优化: 产物大小 {before['size_bytes'] / 1024 / 1024:.2f} MB -> "
+            f"{after['size_bytes'] / 1024 / 1024:.2f} MB ({size_delta / 1024:+.0f} KB)，"
+            f"启动耗时 p50 {before['start_ms']:.1f}ms -> {after['start_ms']:.1f}ms ({start_delta:+.1f}ms)")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("用法: python bytecode_optimizer.py <script.py>")
+        sys.exit(2)
+    print(f"可以排除的测试包: {', '.join(find_test_packages(sys.argv[1]))}")
@@ -0,0 +1,197 @@
+"""
+UPX 压缩策略：选择压缩级别和排除列表，或自动比较各策略的产物大小与冷启动耗时
+
+PyInstaller 调用 UPX 时固定使用 --lzma，压缩级别通过 UPX 读取的环境变量 UPX 传入。
+非 Windows 平台上 PyInstaller 默认不使用 UPX (部分共享库压缩后 dlopen 会崩溃)，
+选择 UPX 策略时会设置 PYINSTALLER_FORCE_UPX=1 强制启用，并默认排除已知会出问题的库。
+只需要本机的 upx 可执行文件 (PATH 中或 --upx-dir 指定的目录)，不需要联网。
+"""
+import os
+import sys
+import shutil
+import tempfile
+import subprocess
+from project import program_name
+
+# 压缩策略及对应的 UPX 参数 (None 表示使用 UPX 的默认级别)
+UPX_MODES = (
+    ('upx-fast', '-1'),
+    ('upx', None),
+    ('upx-best', '--best'),
+)
+UPX_LEVELS = dict(UPX_MODES)
+COMPRESSION_MODES = ('none',) + tuple(UPX_LEVELS) + ('auto',)
+
+# PyInstaller 按是否使用 UPX 缓存处理过的二进制文件，缓存键不含压缩级别，
+# 每种 UPX 策略使用单独的 PyInstaller 缓存目录 (PYINSTALLER_CONFIG_DIR)
+UPX_CACHE_ROOT = os.path.join(os.path.expanduser('~'), '.cache', 'py_to_exe', 'upx')
+
+# 自动模式的优化目标
+OBJECTIVES = ('size', 'startup', 'balanced')
+
+# 压缩后无法正常加载的二进制文件 (按文件名匹配，支持通配符)
+DEFAULT_UPX_EXCLUDE = (
+    'vcruntime140.dll',
+    'vcruntime140_1.dll',
+    'msvcp140.dll',
+    'ucrtbase.dll',
+    'api-ms-win-*.dll',
+    'python3*.dll',
+    'libpython3*.so*',
+    'libcrypto*.so*',
+    'libssl*.so*',
+)
+
+
+def find_upx(upx_dir=None):
+    """返回 upx 可执行文件路径，找不到时返回 None"""
+    return shutil.which('upx', path=upx_dir) if upx_dir else shutil.which('upx')
+
+
+def compression_args(mode, upx_dir=None, upx_exclude=None):
+    """
+    返回压缩策略对应的 PyInstaller 参数和环境变量
+
+    参数:
+        mode (str): none、upx-fast、upx 或 upx-best
+        upx_dir (str, optional): upx 所在目录，默认在 PATH 中查找
+        upx_exclude (list, optional): 额外的不压缩文件名，与 DEFAULT_UPX_EXCLUDE 合并
+
+    返回:
+        tuple: (参数列表, 环境变量字典)
+    """
+    if mode == 'none':
+        return ['--noupx'], {}
+    if mode not in UPX_LEVELS:
+        raise ValueError(f"未知的压缩策略: {mode} (可选: {', '.join(COMPRESSION_MODES)})")
+    upx_path = find_upx(upx_dir)
+    if upx_path is None:
+        raise FileNotFoundError(f"找不到 UPX{f' (目录: {upx_dir})' if upx_dir else ''}，请安装 upx 或使用 --upx-dir 指定")
+
+    args = ['--upx-dir', os.path.dirname(upx_path)]
+    for name in dict.fromkeys(list(DEFAULT_UPX_EXCLUDE) + list(upx_exclude or [])):
+        args.extend(['--upx-exclude', name])
+    env = {'PYINSTALLER_CONFIG_DIR': os.path.join(UPX_CACHE_ROOT, mode)}
+    if UPX_LEVELS[mode]:
+        env['UPX'] = UPX_LEVELS[mode]
+    if sys.platform != 'win32':
+        env['PYINSTALLER_FORCE_UPX'] = '1'
+    return args, env
+
+
+def cache_key_cmd(cmd, env):
+    """
+    返回计算构建缓存键用的命令
+
+    去掉本机的 upx 目录；压缩级别通过环境变量传入，不在命令行中，需要补到命令里
+    """
+    key_cmd = list(cmd)
+    if '--upx-dir' in key_cmd:
+        key_cmd[key_cmd.index('--upx-dir') + 1] = 'upx'
+        key_cmd[-1:-1] = [f"UPX={env.get('UPX', '')}"]
+    return key_cmd
+
+
+def pick_best(results, objective='balanced'):
+    """
+    按优化目标选择策略
+
+    size 选产物最小的，startup 选冷启动最快的，balanced 选两者相对最优值之比的和最小的
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"未知的优化目标: {objective} (可选: {', '.join(OBJECTIVES)})")
+    if objective == 'size':
+        return min(results, key=lambda r: (r['size_bytes'], r['cold_ms']))
+    if objective == 'startup':
+        return min(results, key=lambda r: (r['cold_ms'], r['size_bytes']))
+    min_size = min(r['size_bytes'] for r in results) or 1
+    min_cold = min(r['cold_ms'] for r in results) or 1
+    return min(results, key=lambda r: r['size_bytes'] / min_size + r['cold_ms'] / min_cold)
+
+
+def auto_select(input_file, output_dir=None, objective='balanced', upx_dir=None, upx_exclude=None, runs=3,
+                **build_options):
+    """
+    分别以每种压缩策略打包，测量产物大小和冷启动耗时，按优化目标选出最佳策略，
+    并把该策略的产物移动到输出目录
+
+    packager_core.build_exe 的 compression='auto' 只用本函数选出策略 (output_dir 为 None)，
+    再按选中的策略走正常的打包流程，构建缓存、产物仓库、耗时记录和产物分析等选项照常生效
+
+    参数:
+        input_file (str): 要打包的 Python 文件路径
+        output_dir (str, optional): 输出目录，为 None 时只比较，不保留产物
+        objective (str, optional): size、startup 或 balanced，默认为 balanced
+        upx_dir (str, optional): upx 所在目录
+        upx_exclude (list, optional): 额外的不压缩文件名
+        runs (int, optional): 每种策略的启动测量次数，默认为 3
+        **build_options: 其他打包参数，原样传给 build_exe；其中的 on_line 同时接收本函数的消息
+
+    返回:
+        dict: objective、best (选中的策略) 和 results (各策略的 mode、size_bytes、cold_ms、warm_ms)
+    """
+    from packager_core import build_exe, publish_artifacts
+    from startup_benchmark import benchmark_executable, _find_executable
+
+    on_line = build_options.get('on_line')
+
+    def say(message):
+        if on_line:
+            on_line(0, 'stdout', message + '\n')
+        else:
+            print(message)
+
+    modes = ['none']
+    if find_upx(upx_dir):
+        modes.extend(UPX_LEVELS)
+    else:
+        say("找不到 UPX，只比较不压缩的产物")
+    name = program_name(input_file)
+    onefile = build_options.get('onefile', True)
+    trial_root = tempfile.mkdtemp(prefix='py_to_exe_compress_')
+    try:
+        results = []
+        for mode in modes:
+            say(f"正在以压缩策略 {mode} 打包...")
+            dist = os.path.join(trial_root, mode)
+            try:
+                build_exe(input_file, dist, compression=mode, upx_dir=upx_dir, upx_exclude=upx_exclude,
+                          work_dir=os.path.join(trial_root, f"work-{mode}"), preflight=False, **build_options)
+            except (subprocess.CalledProcessError, OSError) as e:
+                say(f"压缩策略 {mode} 打包失败，跳过: {str(e)}")
+                continue
+            bench = benchmark_executable(_find_executable(dist, name, onefile), runs=runs)
+            results.append({
+                'mode': mode,
+                'size_bytes': bench['size_bytes'],
+                'cold_ms': bench['cold']['p50_ms'],
+                'warm_ms': bench['warm']['p50_ms'],
+                'failed_runs': bench['failed_runs'],
+            })
+        if not results:
+            raise RuntimeError("所有压缩策略都打包失败")
+
+        # 压缩后启动失败 (比不压缩时失败次数多) 的策略不参与选择
+        baseline_failures = results[0]['failed_runs'] if results[0]['mode'] == 'none' else 0
+        candidates = [r for r in results if r['failed_runs'] <= baseline_failures] or results
+        best = pick_best(candidates, objective)
+        if output_dir:
+            publish_artifacts(os.path.join(trial_root, best['mode']), output_dir)
+    finally:
+        shutil.rmtree(trial_root, ignore_errors=True)
+
+    report = {'objective': objective, 'best': best['mode'], 'results': results}
+    say(format_selection(report))
+    return report
+
+
+def format_selection(report):
+    """把自动选择的结果格式化为多行文本"""
+    lines = [f"压缩策略比较 (优化目标: {report['objective']}):"]
+    for r in report['results']:
+        mark = '*' if r['mode'] == report['best'] else ' '
+        failed = f"，{r['failed_runs']} 次启动失败" if r['failed_runs'] else ''
+        lines.append(f" {mark} {r['mode']:<9} {r['size_bytes'] / 1024 / 1024:8.2f} MB  "
+                     f"冷启动 {r['cold_ms']:8.1f}ms  热启动 {r['warm_ms']:8.1f}ms{failed}")
+    lines.append(f"已选择: {report['best']}")
+    return '\n'.join(lines)
@@ -0,0 +1,219 @@
+"""
+差量更新的应用和校验，只依赖标准库，可以随程序一起分发 (如 --add-data delta_apply.py:.)
+
+差量文件由 delta_update.py 生成，格式为:
+    PYDELTA1 | 头部长度 (8 字节，大端) | 头部 JSON | LZMA 压缩的新增数据
+
+头部记录旧版本中被引用的文件 (sources) 及其 sha256，和新版本每个文件的组成 (ops)：
+[来源序号, 偏移, 长度]，来源序号为 -1 时表示新增数据中的一段。应用前先校验旧版本，
+生成的新版本逐个文件校验 sha256，全部通过后才替换，中途失败不会留下半个新版本。
+
+用法:
+    python delta_apply.py verify dist/app app-1a2b-3c4d.delta
+    python delta_apply.py apply dist/app app-1a2b-3c4d.delta [新版本路径，默认原地更新]
+"""
+import os
+import sys
+import json
+import lzma
+import shutil
+import hashlib
+import tempfile
+
+MAGIC = b'PYDELTA1'
+FORMAT_VERSION = 1
+
+
+def read_delta(delta_path):
+    """读取差量文件，返回 (头部, 未压缩的新增数据)"""
+    with open(delta_path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"不是差量文件: {delta_path}")
+        try:
+            header_size = int.from_bytes(f.read(8), 'big')
+            header = json.loads(f.read(header_size).decode('utf-8'))
+            payload = lzma.decompress(f.read())
+        except (ValueError, lzma.LZMAError, EOFError) as e:
+            raise ValueError(f"差量文件已损坏: {delta_path} ({str(e)})") from None
+    if header.get('format') != FORMAT_VERSION:
+        raise ValueError(f"不支持的差量文件格式: {header.get('format')}")
+    if len(payload) != header['payload_size']:
+        raise ValueError("差量文件已损坏: 新增数据长度不符")
+    return header, payload
+
+
+def _sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _member_path(root, rel):
+    """差量文件中的相对路径 (以 / 分隔，单文件时为空) 对应的本地路径"""
+    if not rel:
+        return root
+    parts = rel.split('/')
+    if any(part in ('', '.', '..') for part in parts):
+        raise ValueError(f"差量文件中的路径不合法: {rel}")
+    return os.path.join(root, *parts)
+
+
+def _check_files(root, entries):
+    """返回与记录不符的文件说明列表"""
+    problems = []
+    for entry in entries:
+        path = _member_path(root, entry['path'])
+        label = entry['path'] or os.path.basename(root)
+        if 'link' in entry:
+            if not os.path.islink(path) or os.readlink(path) != entry['link']:
+                problems.append(f"{label}: 符号链接不符")
+        elif not os.path.isfile(path):
+            problems.append(f"{label}: 文件不存在")
+        elif os.path.getsize(path) != entry['size'] or _sha256_file(path) != entry['sha256']:
+            problems.append(f"{label}: 内容不符")
+    return problems
+
+
+def check_base(old_path, delta_path):
+    """
+    检查旧版本能否应用差量
+
+    返回:
+        list: 问题说明，为空时可以应用
+    """
+    header, _ = read_delta(delta_path)
+    if header['kind'] == 'dir' and not os.path.isdir(old_path):
+        return [f"旧版本应为文件夹: {old_path}"]
+    if header['kind'] == 'file' and not os.path.isfile(old_path):
+        return [f"旧版本应为文件: {old_path}"]
+    return _check_files(old_path, header['sources'])
+
+
+def verify_result(new_path, delta_path):
+    """
+    检查 new_path 是否与差量描述的新版本完全一致 (文件夹中不能有多余的文件)
+
+    返回:
+        list: 问题说明，为空时一致
+    """
+    header, _ = read_delta(delta_path)
+    problems = _check_files(new_path, header['files'])
+    if header['kind'] == 'dir' and os.path.isdir(new_path):
+        expected = {entry['path'] for entry in header['files']}
+        for root, dirs, files in os.walk(new_path):
+            for name in files + [d for d in dirs if os.path.islink(os.path.join(root, d))]:
+                rel = os.path.relpath(os.path.join(root, name), new_path).replace(os.sep, '/')
+                if rel not in expected:
+                    problems.append(f"{rel}: 多余的文件")
+    return problems
+
+
+def _write_file(target, entry, payload, sources):
+    with open(target, 'wb') as out:
+        for source, offset, length in entry['ops']:
+            if source < 0:
+                out.write(payload[offset:offset + length])
+            else:
+                f = sources[source]
+                f.seek(offset)
+                out.write(f.read(length))
+    if _sha256_file(target) != entry['sha256']:
+        raise ValueError(f"{entry['path'] or os.path.basename(target)}: 生成的文件校验失败")
+    os.chmod(target, entry['mode'])
+
+
+def apply_delta(old_path, delta_path, new_path=None):
+    """
+    把差量应用到旧版本，生成新版本
+
+    参数:
+        old_path (str): 旧版本 (单文件 EXE 或文件夹)
+        delta_path (str): 差量文件
+        new_path (str, optional): 新版本的输出路径，默认为 old_path (原地更新)
+
+    返回:
+        str: 新版本路径
+    """
+    new_path = new_path or old_path
+    problems = check_base(old_path, delta_path)
+    if problems:
+        raise ValueError("旧版本与差量文件不匹配:\n" + "\n".join(problems))
+    header, payload = read_delta(delta_path)
+
+    parent = os.path.dirname(os.path.abspath(new_path))
+    os.makedirs(parent, exist_ok=True)
+    sources = [open(_member_path(old_path, entry['path']), 'rb') for entry in header['sources']]
+    staged = None
+    try:
+        if header['kind'] == 'file':
+            fd, staged = tempfile.mkstemp(prefix=f".{os.path.basename(new_path)}-partial-", dir=parent)
+            os.close(fd)
+            _write_file(staged, header['files'][0], payload, sources)
+        else:
+            staged = tempfile.mkdtemp(prefix=f".{os.path.basename(new_path)}-partial-", dir=parent)
+            for entry in header['files']:
+                target = _member_path(staged, entry['path'])
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if 'link' in entry:
+                    os.symlink(entry['link'], target)
+                else:
+                    _write_file(target, entry, payload, sources)
+    except BaseException:
+        if staged:
+            if os.path.isdir(staged):
+                shutil.rmtree(staged, ignore_errors=True)
+            elif os.path.exists(staged):
+                os.remove(staged)
+        raise
+    finally:
+        for f in sources:
+            f.close()
+
+    # 全部生成并校验后再替换
+    if os.path.isdir(staged):
+        old = None
+        if os.path.isdir(new_path) and not os.path.islink(new_path):
+            old = tempfile.mkdtemp(prefix=f".{os.path.basename(new_path)}-old-", dir=parent)
+            os.replace(new_path, os.path.join(old, 'previous'))
+        os.replace(staged, new_path)
+        if old:
+            shutil.rmtree(old, ignore_errors=True)
+    else:
+        os.replace(staged, new_path)
+    return new_path
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) not in (3, 4) or args[0] not in ('apply', 'verify') or (args[0] == 'verify' and len(args) != 3):
+        print("用法: python delta_apply.py verify <旧版本或新版本> <差量文件>\n"
+              "      python delta_apply.py apply <旧版本> <差量文件> [新版本路径]", file=sys.stderr)
+        return 2
+    command, path, delta_path = args[:3]
+    try:
+        if command == 'apply':
+            new_path = apply_delta(path, delta_path, args[3] if len(args) == 4 else None)
+            print(f"已更新: {new_path}")
+            return 0
+        new_problems = verify_result(path, delta_path)
+        if not new_problems:
+            print(f"{path} 已是差量文件对应的新版本")
+            return 0
+        base_problems = check_base(path, delta_path)
+        if not base_problems:
+            print(f"{path} 可以应用该差量文件")
+            return 0
+        print(f"{path} 既不是差量文件对应的新版本，也不能应用该差量文件:", file=sys.stderr)
+        for label, problems in (('旧版本', base_problems), ('新版本', new_problems)):
+            for problem in problems:
+                print(f"  与{label}相比 {problem}", file=sys.stderr)
+        return 1
+    except (OSError, ValueError, lzma.LZMAError) as e:
+        print(f"差量更新出错: {str(e)}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
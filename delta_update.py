@@ -0,0 +1,278 @@
+"""
+差量更新：保留上一次构建的产物，为新产物生成二进制差量文件，客户端用 delta_apply.py 应用
+
+按内容切块 (content-defined chunking)：在数据中查找固定的锚点字节模式作为块边界，边界只取决于附近的内容，
+插入或删除数据只影响附近的一两个块，后面的块即使整体移位也能在旧版本中找到。新版本的每个块先在旧版本
+(单文件 EXE 或文件夹中的所有文件) 的块索引中查找，找到的记为复制，找不到的作为新增数据，
+所有新增数据合并后用 LZMA 压缩。PyInstaller 产物中每个模块单独压缩，修改少量代码时只有对应的模块和
+目录表变化，差量通常只有完整产物的百分之几。配合可复现构建 (--reproducible) 效果更好。
+
+用法:
+    python delta_update.py old/app new/app -o app.delta
+"""
+import os
+import re
+import sys
+import json
+import lzma
+import time
+import shutil
+import hashlib
+import argparse
+from delta_apply import MAGIC, FORMAT_VERSION
+
+# 块大小的上下限 (字节)
+MIN_CHUNK = 2 * 1024
+MAX_CHUNK = 64 * 1024
+
+# 块边界的锚点: 压缩数据中平均每 8 KB 出现一次
+_BOUNDARY = re.compile(rb'[\x10-\x17]\x9d')
+
+# 上一次构建的产物保存在差量目录的该子目录中
+PREVIOUS_DIR = 'previous'
+
+
+def chunk_boundaries(data):
+    """返回按内容切分的块 [(偏移, 长度)]"""
+    chunks = []
+    start = 0
+    size = len(data)
+    while start < size:
+        match = _BOUNDARY.search(data, start + MIN_CHUNK, min(size, start + MAX_CHUNK))
+        end = match.end() if match else min(size, start + MAX_CHUNK)
+        chunks.append((start, end - start))
+        start = end
+    return chunks
+
+
+def _chunk_key(chunk):
+    return hashlib.blake2b(chunk, digest_size=16).digest()
+
+
+def _list_files(path):
+    """
+    返回产物中的文件 [(相对路径, 本地路径)]，单文件产物的相对路径为空，
+    以及符号链接 {相对路径: 链接目标}
+    """
+    if os.path.isfile(path):
+        return [('', path)], {}
+    files, links = [], {}
+    for root, dirs, names in os.walk(path):
+        for name in sorted(dirs + names):
+            full = os.path.join(root, name)
+            rel = os.path.relpath(full, path).replace(os.sep, '/')
+            if os.path.islink(full):
+                links[rel] = os.readlink(full)
+            elif name in names:
+                files.append((rel, full))
+    return sorted(files), links
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _merge_op(ops, source, offset, length):
+    """与上一个操作首尾相接时合并"""
+    if ops:
+        last = ops[-1]
+        if last[0] == source and last[1] + last[2] == offset:
+            last[2] += length
+            return
+    ops.append([source, offset, length])
+
+
+def create_delta(old_path, new_path, delta_path, preset=6):
+    """
+    生成从旧产物到新产物的差量文件
+
+    参数:
+        old_path (str): 旧产物 (单文件 EXE 或文件夹)
+        new_path (str): 新产物，类型需与旧产物相同
+        delta_path (str): 差量文件的输出路径
+        preset (int, optional): LZMA 压缩级别 (0-9)，默认为 6
+
+    返回:
+        dict: old_bytes、new_bytes、delta_bytes、copied_bytes、literal_bytes、files、changed_files、seconds
+    """
+    start_time = time.perf_counter()
+    if os.path.isdir(old_path) != os.path.isdir(new_path):
+        raise ValueError("旧产物和新产物必须都是文件或都是文件夹")
+    kind = 'dir' if os.path.isdir(new_path) else 'file'
+    old_files, _ = _list_files(old_path)
+    new_files, new_links = _list_files(new_path)
+
+    # 旧版本的整文件和块索引
+    old_entries = []
+    whole_index = {}
+    chunk_index = {}
+    for rel, full in old_files:
+        data = _read(full)
+        sha256 = hashlib.sha256(data).hexdigest()
+        old_entries.append({'path': rel, 'size': len(data), 'sha256': sha256})
+        whole_index.setdefault(sha256, len(old_entries) - 1)
+        for offset, length in chunk_boundaries(data):
+            chunk_index.setdefault(_chunk_key(data[offset:offset + length]), (len(old_entries) - 1, offset))
+    old_bytes = sum(entry['size'] for entry in old_entries)
+
+    payload = bytearray()
+    entries = []
+    used = {}
+    copied = changed = 0
+    for rel, full in new_files:
+        data = _read(full)
+        sha256 = hashlib.sha256(data).hexdigest()
+        ops = []
+        if sha256 in whole_index:
+            source = whole_index[sha256]
+            if data:
+                ops.append([source, 0, len(data)])
+            copied += len(data)
+            if old_entries[source]['path'] != rel:
+                changed += 1
+        else:
+            changed += 1
+            for offset, length in chunk_boundaries(data):
+                chunk = data[offset:offset + length]
+                found = chunk_index.get(_chunk_key(chunk))
+                if found:
+                    _merge_op(ops, found[0], found[1], length)
+                    copied += length
+                else:
+                    _merge_op(ops, -1, len(payload), length)
+                    payload += chunk
+        # 只记录被引用的旧文件，按引用顺序重新编号
+        for op in ops:
+            if op[0] >= 0:
+                op[0] = used.setdefault(op[0], len(used))
+        entries.append({'path': rel, 'size': len(data), 'sha256': sha256,
+                        'mode': os.stat(full).st_mode & 0o777, 'ops': ops})
+    entries.extend({'path': rel, 'link': target} for rel, target in sorted(new_links.items()))
+
+    header = {
+        'format': FORMAT_VERSION,
+        'kind': kind,
+        'sources': [old_entries[index] for index in sorted(used, key=used.get)],
+        'files': entries,
+        'payload_size': len(payload),
+    }
+    header_data = json.dumps(header, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    os.makedirs(os.path.dirname(os.path.abspath(delta_path)), exist_ok=True)
+    partial = delta_path + '.partial'
+    with open(partial, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header_data).to_bytes(8, 'big'))
+        f.write(header_data)
+        f.write(lzma.compress(bytes(payload), preset=preset))
+    os.replace(partial, delta_path)
+
+    return {
+        'delta_path': delta_path,
+        'old_bytes': old_bytes,
+        'new_bytes': sum(entry.get('size', 0) for entry in entries),
+        'delta_bytes': os.path.getsize(delta_path),
+        'copied_bytes': copied,
+        'literal_bytes': len(payload),
+        'files': len(entries),
+        'changed_files': changed + len(new_links),
+        'seconds': round(time.perf_counter() - start_time, 3),
+    }
+
+
+def artifact_digest(path):
+    """返回产物 (文件或文件夹) 的摘要，用于命名差量文件"""
+    from reproducible import tree_digests, combined_digest
+    return combined_digest(tree_digests([path]))
+
+
+def update_deltas(output_dir, name, delta_dir, on_line=None):
+    """
+    为输出目录中的新产物生成相对于上一次构建的差量文件，并保存新产物供下次使用
+
+    差量文件命名为 <产物>-<旧摘要前 12 位>-<新摘要前 12 位>.delta，保存在 delta_dir 中；
+    上一次构建的产物保存在 delta_dir/previous 中。产物没有变化时不生成差量文件。
+    生成的差量文件通过 on_line (与 build_exe 的 on_line 相同) 报告，默认打印
+
+    返回:
+        list: 每个产物的 create_delta 结果 (第一次构建或没有变化时为空列表)
+    """
+    from reproducible import artifact_paths
+
+    def say(message):
+        if on_line:
+            on_line(0, 'stdout', message + '\n')
+        else:
+            print(message)
+
+    previous_dir = os.path.join(delta_dir, PREVIOUS_DIR)
+    os.makedirs(previous_dir, exist_ok=True)
+    results = []
+    for path in artifact_paths(output_dir, name):
+        artifact = os.path.basename(path)
+        previous = os.path.join(previous_dir, artifact)
+        new_digest = artifact_digest(path)
+        if os.path.exists(previous) and os.path.isdir(previous) == os.path.isdir(path):
+            old_digest = artifact_digest(previous)
+            if old_digest == new_digest:
+                continue
+            delta_path = os.path.join(delta_dir, f"{artifact}-{old_digest[:12]}-{new_digest[:12]}.delta")
+            results.append(create_delta(previous, path, delta_path))
+            say(format_delta(results[-1]))
+        # 保存新产物，替换上一次的
+        staged = os.path.join(previous_dir, f".{artifact}-partial")
+        if os.path.isdir(path):
+            shutil.rmtree(staged, ignore_errors=True)
+            shutil.copytree(path, staged, symlinks=True)
+        else:
+            shutil.copy2(path, staged)
+        if os.path.isdir(previous) and not os.path.islink(previous):
+            shutil.rmtree(previous)
+        elif os.path.isdir(staged) and os.path.lexists(previous):
+            os.remove(previous)
+        os.replace(staged, previous)
+    return results
+
+
+def format_delta(result):
+    """把差量生成结果格式化为一行文本"""
+    ratio = result['delta_bytes'] / result['new_bytes'] * 100 if result['new_bytes'] else 0
+    return (f"差量文件: {result['delta_path']} ({result['delta_bytes'] / 1024:.0f} KB，"
+            f"新产物的 {ratio:.1f}%)，复用 {result['copied_bytes'] / 1024 / 1024:.1f} MB，"
+            f"新增 {result['literal_bytes'] / 1024:.0f} KB，{result['changed_files']}/{result['files']} 个文件变化，"
+            f"用时 {result['seconds']:.2f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="生成两次构建产物之间的差量文件")
+    parser.add_argument('old', help="旧产物 (EXE 文件或文件夹)")
+    parser.add_argument('new', help="新产物")
+    parser.add_argument('-o', '--output', required=True, help="差量文件的输出路径")
+    parser.add_argument('--preset', type=int, default=6, choices=range(10), metavar='0-9',
+                        help="LZMA 压缩级别，默认为 6")
+    parser.add_argument('--verify', action='store_true', help="生成后在临时目录中应用一次，确认得到新产物")
+    args = parser.parse_args(argv)
+
+    try:
+        for path in (args.old, args.new):
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"产物不存在: {path}")
+        result = create_delta(args.old, args.new, args.output, args.preset)
+        print(format_delta(result))
+        if args.verify:
+            import tempfile
+            from delta_apply import apply_delta, verify_result
+            with tempfile.TemporaryDirectory(prefix='py_to_exe_delta_') as tmp:
+                applied = apply_delta(args.old, args.output, os.path.join(tmp, os.path.basename(args.new)))
+                problems = verify_result(applied, args.output)
+            if problems:
+                raise ValueError("应用差量后与新产物不一致:\n" + "\n".join(problems))
+            print("校验通过: 应用差量后与新产物一致")
+    except Exception as e:
+        print(f"生成差量出错: {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
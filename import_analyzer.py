@@ -0,0 +1,480 @@
+import os
+import sys
+import ast
+import json
+import hashlib
+import importlib.util
+import importlib.machinery
+
+# 扫描结果缓存格式版本，修改扫描逻辑时需要递增
+SCAN_FORMAT_VERSION = 2
+
+# 默认扫描结果缓存文件，可通过环境变量 PY_TO_EXE_SCAN_CACHE 覆盖
+DEFAULT_SCAN_CACHE = os.environ.get(
+    'PY_TO_EXE_SCAN_CACHE',
+    os.path.join(os.path.expanduser('~'), '.cache', 'py_to_exe', 'imports.json')
+)
+
+# 常见第三方库在运行时动态加载、PyInstaller 无法自动发现的模块
+KNOWN_HIDDEN_IMPORTS = {
+    'uvicorn': [
+        'uvicorn.logging',
+        'uvicorn.loops.auto',
+        'uvicorn.protocols.http.auto',
+        'uvicorn.protocols.websockets.auto',
+        'uvicorn.lifespan.on',
+    ],
+    'sqlalchemy': ['sqlalchemy.sql.default_comparator'],
+    'passlib': ['passlib.handlers.bcrypt'],
+    'babel': ['babel.numbers'],
+    'engineio': ['engineio.async_drivers.threading'],
+    'pyttsx3': ['pyttsx3.drivers', 'pyttsx3.drivers.sapi5'],
+}
+
+# 动态导入函数 (按调用名的最后一段匹配)
+_IMPORT_FUNCTIONS = ('import_module', '__import__')
+# 遍历包内子模块的插件加载方式
+_ITER_FUNCTIONS = ('iter_modules', 'walk_packages')
+# 通过入口点加载插件的方式
+_ENTRY_POINT_FUNCTIONS = ('entry_points', 'iter_entry_points')
+
+# 进程内缓存: {绝对路径: 缓存条目}
+_memory_cache = {}
+
+
+def _dotted_name(node):
+    """把 a.b.c 形式的表达式转换为字符串，无法转换时返回 None"""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if isinstance(node, ast.Name):
+        parts.append(node.id)
+        return '.'.join(reversed(parts))
+    return None
+
+
+def _literal_prefix(node):
+    """
+    取出动态模块名中的常量前缀
+
+    支持 f"plugins.{name}" 和 "plugins." + name 两种写法，返回 "plugins"
+    """
+    prefix = None
+    if isinstance(node, ast.JoinedStr) and node.values:
+        first = node.values[0]
+        if isinstance(first, ast.Constant) and isinstance(first.value, str):
+            prefix = first.value
+    elif isinstance(node, ast.BinOp) and isinstance(node.op, ast.Add):
+        left = node.left
+        if isinstance(left, ast.Constant) and isinstance(left.value, str):
+            prefix = left.value
+    if prefix and prefix.endswith('.') and not prefix.startswith('.'):
+        return prefix.rstrip('.')
+    return None
+
+
+def _call_argument(node, position, keyword):
+    """按位置或关键字取出调用参数"""
+    if len(node.args) > position:
+        return node.args[position]
+    return _keyword_argument(node, keyword)
+
+
+def _keyword_argument(node, keyword):
+    for kw in node.keywords:
+        if kw.arg == keyword:
+            return kw.value
+    return None
+
+
+def _string_value(node):
+    if isinstance(node, ast.Constant) and isinstance(node.value, str):
+        return node.value
+    return None
+
+
+def scan_source(source, filename='<unknown>'):
+    """
+    扫描一段源码中的导入
+
+    返回字典:
+        imports: 静态导入的模块名 (相对导入保留前导的点)
+        toplevel_imports: 其中直接写在模块顶层、无条件执行的导入
+        dynamic: import_module/__import__ 中以字符串常量给出的模块名
+        prefixes: 动态模块名中的常量包前缀 (如 f"plugins.{name}" 中的 plugins)
+        plugin_packages: 通过 pkgutil.iter_modules(pkg.__path__) 遍历的包
+        entry_point_groups: 通过入口点加载插件时使用的组名
+    """
+    tree = ast.parse(source, filename=filename)
+
+    toplevel_imports = set()
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            toplevel_imports.update(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and (node.module or node.level):
+            base = ('.' * node.level) + (node.module or '')
+            if node.module:
+                toplevel_imports.add(base)
+            for alias in node.names:
+                if alias.name != '*':
+                    toplevel_imports.add(base + alias.name if base.endswith('.') else f"{base}.{alias.name}")
+
+    imports = set()
+    aliases = {}
+    calls = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.add(alias.name)
+                if alias.asname:
+                    aliases[alias.asname] = alias.name
+                else:
+                    top = alias.name.split('.')[0]
+                    aliases[top] = top
+        elif isinstance(node, ast.ImportFrom):
+            base = ('.' * node.level) + (node.module or '')
+            if node.module or node.level:
+                if node.module:
+                    imports.add(base)
+                for alias in node.names:
+                    if alias.name == '*':
+                        continue
+                    full = base + alias.name if base.endswith('.') else f"{base}.{alias.name}"
+                    imports.add(full)
+                    aliases[alias.asname or alias.name] = full
+        elif isinstance(node, ast.Call):
+            calls.append(node)
+
+    dynamic = set()
+    prefixes = set()
+    plugin_packages = set()
+    entry_point_groups = set()
+    for node in calls:
+        func_name = _dotted_name(node.func)
+        if not func_name:
+            continue
+        last = func_name.split('.')[-1]
+
+        if last in _IMPORT_FUNCTIONS:
+            target = _call_argument(node, 0, 'name')
+            name = _string_value(target)
+            if name:
+                if name.startswith('.'):
+                    # import_module('.sub', package='pkg')
+                    package = _string_value(_call_argument(node, 1, 'package'))
+                    if last == 'import_module' and package:
+                        name = importlib.util.resolve_name(name, package)
+                    else:
+                        continue
+                dynamic.add(name)
+            elif target is not None:
+                prefix = _literal_prefix(target)
+                if prefix:
+                    prefixes.add(prefix)
+
+        elif last in _ITER_FUNCTIONS:
+            target = _call_argument(node, 0, 'path')
+            if isinstance(target, ast.Attribute) and target.attr == '__path__':
+                package = _dotted_name(target.value)
+                if package:
+                    head, _, rest = package.partition('.')
+                    package = aliases.get(head, head) + ('.' + rest if rest else '')
+                    plugin_packages.add(package)
+
+        elif last in _ENTRY_POINT_FUNCTIONS:
+            if last == 'iter_entry_points':
+                group = _string_value(_call_argument(node, 0, 'group'))
+            else:
+                # importlib.metadata.entry_points() 的 group 只能用关键字传入
+                group = _string_value(_keyword_argument(node, 'group'))
+            if group:
+                entry_point_groups.add(group)
+
+    return {
+        'imports': sorted(imports),
+        'toplevel_imports': sorted(toplevel_imports),
+        'dynamic': sorted(dynamic),
+        'prefixes': sorted(prefixes),
+        'plugin_packages': sorted(plugin_packages),
+        'entry_point_groups': sorted(entry_point_groups),
+    }
+
+
+class ScanCache:
+    """
+    按文件修改时间和内容哈希缓存扫描结果
+
+    修改时间和大小都没变时不读取文件；修改时间变了但内容哈希相同时
+    (例如 git checkout) 也直接复用结果，只更新记录的修改时间。
+    """
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path or DEFAULT_SCAN_CACHE
+        self.entries = None
+        self.dirty = False
+
+    def _load(self):
+        if self.entries is not None:
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == SCAN_FORMAT_VERSION:
+                self.entries = data.get('entries', {})
+        except (OSError, ValueError):
+            pass
+        if self.entries is None:
+            self.entries = {}
+
+    def scan(self, path):
+        """返回文件的扫描结果，尽量从缓存中取"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+
+        entry = _memory_cache.get(path)
+        if entry is None:
+            self._load()
+            entry = self.entries.get(path)
+        if entry and entry['mtime_ns'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            _memory_cache[path] = entry
+            return entry['result']
+
+        with open(path, 'rb') as f:
+            source = f.read()
+        digest = hashlib.sha256(source).hexdigest()
+        if entry and entry['sha256'] == digest:
+            result = entry['result']
+        else:
+            result = scan_source(source, filename=path)
+
+        entry = {'mtime_ns': st.st_mtime_ns, 'size': st.st_size, 'sha256': digest, 'result': result}
+        self._load()
+        self.entries[path] = entry
+        _memory_cache[path] = entry
+        self.dirty = True
+        return result
+
+    def save(self):
+        """把新的扫描结果写回缓存文件"""
+        if not self.dirty:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = self.cache_path + f".{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': SCAN_FORMAT_VERSION, 'entries': self.entries}, f)
+            os.replace(tmp_path, self.cache_path)
+            self.dirty = False
+        except OSError:
+            # 缓存写入失败不影响扫描结果
+            pass
+
+
+def _resolve_local_module(name, search_dir):
+    """在 search_dir 中查找本地模块 (绝对导入)，返回源文件路径，找不到返回 None"""
+    parts = name.split('.')
+    if name.startswith('.') or not all(parts):
+        return None
+    base = os.path.join(search_dir, *parts)
+    for candidate in (base + '.py', os.path.join(base, '__init__.py')):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def _resolve_relative_module(name, importer, search_dir):
+    """
+    按导入者所在的包解析相对导入，返回源文件路径，找不到返回 None
+
+    与 Python 相同，n 个点表示从导入者所在的包向上 n - 1 级；超出源码目录时视为找不到，
+    不会退回到源码目录中的同名模块
+    """
+    level = len(name) - len(name.lstrip('.'))
+    package_dir = os.path.dirname(importer)
+    for _ in range(level - 1):
+        if package_dir == search_dir:
+            return None
+        package_dir = os.path.dirname(package_dir)
+    rest = name[level:]
+    if not rest:
+        init_file = os.path.join(package_dir, '__init__.py')
+        return init_file if os.path.isfile(init_file) else None
+    return _resolve_local_module(rest, package_dir)
+
+
+def _package_dir(package, search_dir):
+    """返回包所在的目录 (本地包或已安装的包)，只对顶层包调用 find_spec，不导入任何模块"""
+    parts = package.split('.')
+    local = os.path.join(search_dir, *parts)
+    if os.path.isfile(os.path.join(local, '__init__.py')) or os.path.isdir(local):
+        return local
+    try:
+        spec = importlib.util.find_spec(parts[0])
+    except (ImportError, ValueError):
+        return None
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    for location in spec.submodule_search_locations:
+        candidate = os.path.join(location, *parts[1:])
+        if os.path.isdir(candidate):
+            return candidate
+    return None
+
+
+def list_submodules(package, search_dir):
+    """列出包中的全部子模块 (递归，不导入)"""
+    package_dir = _package_dir(package, search_dir)
+    if not package_dir:
+        return []
+    suffixes = ['.py'] + list(importlib.machinery.EXTENSION_SUFFIXES)
+    modules = []
+    for root, dirs, files in os.walk(package_dir):
+        dirs[:] = sorted(d for d in dirs if d != '__pycache__' and os.path.isfile(os.path.join(root, d, '__init__.py')))
+        rel = os.path.relpath(root, package_dir)
+        prefix = package if rel == '.' else package + '.' + rel.replace(os.sep, '.')
+        if rel != '.':
+            modules.append(prefix)
+        for name in sorted(files):
+            for suffix in suffixes:
+                if name.endswith(suffix):
+                    stem = name[:-len(suffix)]
+                    if stem != '__init__':
+                        modules.append(f"{prefix}.{stem}")
+                    break
+    return modules
+
+
+def _entry_point_modules(group):
+    """返回已安装的发行包在指定入口点组中注册的模块"""
+    try:
+        from importlib.metadata import entry_points
+        eps = entry_points()
+        if hasattr(eps, 'select'):
+            selected = eps.select(group=group)
+        else:
+            selected = eps.get(group, [])
+    except Exception:
+        return []
+    return sorted({ep.value.split(':')[0].strip() for ep in selected})
+
+
+def analyze(input_file, cache=None, source_root=None):
+    """
+    分析脚本及其本地模块的导入
+
+    参数:
+        input_file (str): 要打包的 Python 文件路径
+        cache (ScanCache, optional): 扫描结果缓存，默认使用 ~/.cache/py_to_exe/imports.json
+        source_root (str, optional): 本地模块所在的源码目录，默认为脚本所在目录
+            (项目模式的启动脚本不在源码目录中)
+
+    返回字典:
+        local_files: 被直接或间接导入的本地 .py 文件 (包括脚本本身)
+        external: 其余顶层模块名 (第三方库和标准库)
+        dynamic: 字符串常量形式的动态导入
+        plugins: 插件模式 (包前缀、pkgutil 遍历、入口点、已知库) 推断出的模块
+        hidden_imports: 建议传给 --hidden-import 的模块 (dynamic + plugins)
+    """
+    own_cache = cache is None
+    if own_cache:
+        cache = ScanCache()
+
+    input_file = os.path.abspath(input_file)
+    search_dir = os.path.abspath(source_root) if source_root else os.path.dirname(input_file)
+
+    local_files = set()
+    external = set()
+    dynamic = set()
+    packages = set()
+    groups = set()
+    pending = [input_file]
+
+    while pending:
+        current = pending.pop()
+        if current in local_files:
+            continue
+        local_files.add(current)
+        try:
+            scanned = cache.scan(current)
+        except (SyntaxError, ValueError, OSError):
+            continue
+
+        dynamic.update(scanned['dynamic'])
+        packages.update(scanned['prefixes'])
+        packages.update(scanned['plugin_packages'])
+        groups.update(scanned['entry_point_groups'])
+
+        for name in scanned['imports'] + scanned['dynamic']:
+            if name.startswith('.'):
+                path = _resolve_relative_module(name, current, search_dir)
+            else:
+                path = _resolve_local_module(name, search_dir)
+            if path:
+                pending.append(os.path.abspath(path))
+                # 包的各级 __init__.py 也会被执行
+                pkg_dir = os.path.dirname(path)
+                while pkg_dir.startswith(search_dir) and pkg_dir != search_dir:
+                    init_file = os.path.join(pkg_dir, '__init__.py')
+                    if os.path.isfile(init_file):
+                        pending.append(init_file)
+                    pkg_dir = os.path.dirname(pkg_dir)
+            elif not name.startswith('.'):
+                top = name.split('.')[0]
+                if not _resolve_local_module(top, search_dir):
+                    external.add(top)
+
+    plugins = set()
+    for package in packages:
+        plugins.update(list_submodules(package, search_dir))
+    for group in groups:
+        plugins.update(_entry_point_modules(group))
+    for top in external:
+        plugins.update(KNOWN_HIDDEN_IMPORTS.get(top, []))
+
+    if own_cache:
+        cache.save()
+
+    return {
+        'local_files': sorted(local_files),
+        'external': sorted(external),
+        'dynamic': sorted(dynamic),
+        'plugins': sorted(plugins),
+        'hidden_imports': sorted(dynamic | plugins),
+    }
+
+
+def import_closure(input_file, cache=None, source_root=None):
+    """
+    计算脚本的导入闭包
+
+    返回 (local_files, external_modules)：
+        local_files: 脚本本身和源码目录中被直接或间接导入的 .py 文件 (已排序)
+        external_modules: 其余顶层模块名 (第三方库和标准库，已排序)
+    """
+    result = analyze(input_file, cache, source_root)
+    return result['local_files'], result['external']
+
+
+def detect_hidden_imports(input_file, hidden_imports=None, source_root=None):
+    """
+    合并手动指定和自动检测到的隐藏导入 (保持手动指定的顺序并去重)
+
+    返回 (合并后的列表, 新检测到的模块列表)
+    """
+    merged = list(hidden_imports or [])
+    detected = [name for name in analyze(input_file, source_root=source_root)['hidden_imports'] if name not in merged]
+    return merged + detected, detected
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("用法: python import_analyzer.py <script.py>")
+        sys.exit(2)
+    result = analyze(sys.argv[1])
+    print(f"本地模块: {len(result['local_files'])} 个")
+    for path in result['local_files']:
+        print(f"  {path}")
+    print(f"外部模块: {', '.join(result['external']) or '无'}")
+    print(f"动态导入: {', '.join(result['dynamic']) or '无'}")
+    print(f"插件模块: {', '.join(result['plugins']) or '无'}")
@@ -0,0 +1,134 @@
+"""
+导入耗时预算：用 python -X importtime 测量核心模块的导入耗时
+
+命令行打包工具被自动化脚本频繁调用，每次启动都要导入打包核心。本工具在新的解释器中多次导入
+指定模块，取中位数与预算比较，并检查没有导入图形界面库或 PyInstaller；超出预算时以退出码 1 报告，
+可以放在持续集成中运行。
+
+用法:
+    python import_budget.py
+    python import_budget.py packager_cli --budget 60 -n 9 --top 15
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+# 各模块的导入耗时预算 (毫秒)。改为按需导入后两者在开发机上的中位数为 30-40ms，
+# 之前 packager_cli 为 75-110ms (启动时导入了批量打包、产物仓库、导入分析等模块)
+DEFAULT_BUDGETS = {
+    'packager_core': 50,
+    'packager_cli': 60,
+}
+
+# 打包核心不应导入的模块
+FORBIDDEN_MODULES = ('tkinter', 'questionary', 'PySimpleGUI', 'PyInstaller')
+
+
+def _parse_importtime(stderr):
+    """解析 -X importtime 的输出，返回 [(模块名, 自身微秒, 累计微秒, 缩进层级)]"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # 表头行
+            continue
+        name = fields[2].rstrip()
+        level = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(fields[0]), int(fields[1]), level))
+    return entries
+
+
+def measure_import_time(module, runs=5):
+    """
+    在新的解释器中导入模块 runs 次，测量导入耗时
+
+    参数:
+        module (str): 模块名
+        runs (int, optional): 测量次数，另有一次预热 (生成 .pyc) 不计入
+
+    返回:
+        dict: module、runs、median_ms、min_ms、max_ms、modules (因导入该模块而加载的模块) 和
+            heaviest (按自身耗时排序的 (模块名, 毫秒) 列表，取自耗时中位的一次)
+    """
+    cmd = [sys.executable, '-X', 'importtime', '-c', f"import {module}"]
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    for index in range(runs + 1):
+        result = subprocess.run(cmd, cwd=cwd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"导入 {module} 失败:\n{result.stderr.strip()}")
+        entries = _parse_importtime(result.stderr)
+        end = next((i for i, (name, _, _, level) in enumerate(entries) if name == module and level == 0), None)
+        if end is None:
+            raise RuntimeError(f"-X importtime 的输出中没有 {module}")
+        # 子模块的记录排在模块自身之前，解释器启动时导入的 site 等模块不计入
+        start = end
+        while start > 0 and entries[start - 1][3] > 0:
+            start -= 1
+        if index:
+            samples.append((entries[end][2], entries[start:end + 1]))
+
+    samples.sort(key=lambda sample: sample[0])
+    median_entries = samples[len(samples) // 2][1]
+    totals = [total for total, _ in samples]
+    return {
+        'module': module,
+        'runs': runs,
+        'median_ms': round(statistics.median(totals) / 1000, 2),
+        'min_ms': round(totals[0] / 1000, 2),
+        'max_ms': round(totals[-1] / 1000, 2),
+        'modules': sorted({name for name, _, _, _ in median_entries}),
+        'heaviest': [(name, round(own / 1000, 2))
+                     for name, own, _, _ in sorted(median_entries, key=lambda e: e[1], reverse=True)],
+    }
+
+
+def check_budget(result, budget_ms, forbidden=FORBIDDEN_MODULES):
+    """返回违反预算的说明列表，没有问题时为空列表"""
+    problems = []
+    if result['median_ms'] > budget_ms:
+        problems.append(f"{result['module']} 导入耗时 {result['median_ms']:.1f}ms，超出预算 {budget_ms}ms")
+    loaded = [name for name in result['modules'] if name.split('.')[0] in forbidden]
+    if loaded:
+        problems.append(f"{result['module']} 导入了不应导入的模块: {', '.join(loaded)}")
+    return problems
+
+
+def format_result(result, top=10):
+    """把测量结果格式化为多行文本"""
+    lines = [f"{result['module']}: 中位数 {result['median_ms']:.1f}ms "
+             f"(最小 {result['min_ms']:.1f}ms，最大 {result['max_ms']:.1f}ms，{result['runs']} 次)，"
+             f"导入 {len(result['modules'])} 个模块"]
+    for name, ms in result['heaviest'][:top]:
+        lines.append(f"    {ms:7.2f}ms  {name}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="检查模块的导入耗时是否在预算之内")
+    parser.add_argument('modules', nargs='*', help="要检查的模块，默认为打包核心和命令行工具")
+    parser.add_argument('--budget', type=float, metavar='MS', help="导入耗时预算 (毫秒)，覆盖默认预算")
+    parser.add_argument('-n', '--runs', type=int, default=5, help="测量次数，默认为 5")
+    parser.add_argument('--top', type=int, default=10, help="列出自身耗时最多的模块数，默认为 10")
+    args = parser.parse_args(argv)
+
+    problems = []
+    for module in args.modules or list(DEFAULT_BUDGETS):
+        budget = args.budget or DEFAULT_BUDGETS.get(module)
+        if budget is None:
+            parser.error(f"{module} 没有默认预算，请使用 --budget 指定")
+        result = measure_import_time(module, args.runs)
+        print(format_result(result, args.top))
+        problems.extend(check_budget(result, budget))
+
+    for problem in problems:
+        print(f"超出预算: {problem}", file=sys.stderr)
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
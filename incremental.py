@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import shutil
+import hashlib
+from pathlib import Path
+
+# 默认工作目录根，可通过环境变量 PY_TO_EXE_WORK_DIR 覆盖
+DEFAULT_WORK_ROOT = os.environ.get(
+    'PY_TO_EXE_WORK_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'py_to_exe', 'work')
+)
+
+# 成功构建后写入的标记文件，记录上次构建的环境和参数
+STAMP_NAME = 'build-stamp.json'
+
+
+def work_dir_for(input_file, work_root=None):
+    """
+    返回脚本对应的持久工作目录 (位于源码树之外)
+
+    目录名由脚本名和其绝对路径的哈希组成，不同位置的同名脚本互不干扰。
+    """
+    input_file = os.path.abspath(input_file)
+    digest = hashlib.sha256(input_file.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(os.path.abspath(work_root or DEFAULT_WORK_ROOT), f"{Path(input_file).stem}-{digest}")
+
+
+def _pyinstaller_version():
+    try:
+        from importlib.metadata import version
+        return version('pyinstaller')
+    except Exception:
+        return 'unknown'
+
+
+def _options(cmd):
+    """命令中影响分析结果的部分 (去掉 --distpath、--workpath、--specpath、--clean)"""
+    options = []
+    skip = False
+    for arg in cmd:
+        if skip:
+            skip = False
+            continue
+        if arg in ('--distpath', '--workpath', '--specpath'):
+            skip = True
+            continue
+        if arg == '--clean':
+            continue
+        options.append(arg)
+    return options
+
+
+def _fingerprint(cmd):
+    return {
+        'python': sys.version,
+        'executable': sys.executable,
+        'pyinstaller': _pyinstaller_version(),
+        'options': _options(cmd),
+    }
+
+
+def stale_reason(work_dir, cmd):
+    """
+    判断工作目录中缓存的分析结果是否失效
+
+    返回失效原因 (str)，仍然可用时返回 None。源码本身的修改不算失效，
+    PyInstaller 会根据各个 TOC 自行做增量分析。
+    """
+    stamp_path = os.path.join(work_dir, STAMP_NAME)
+    if not os.path.isdir(work_dir):
+        return "首次构建"
+    try:
+        with open(stamp_path, 'r', encoding='utf-8') as f:
+            stamp = json.load(f)
+    except (OSError, ValueError):
+        return "上次构建未成功完成"
+
+    current = _fingerprint(cmd)
+    if stamp.get('python') != current['python'] or stamp.get('executable') != current['executable']:
+        return "Python 解释器已变化"
+    if stamp.get('pyinstaller') != current['pyinstaller']:
+        return "PyInstaller 版本已变化"
+    if stamp.get('options') != current['options']:
+        return "打包参数已变化"
+    return None
+
+
+def prepare_work_dir(input_file, cmd, work_root=None):
+    """
+    准备增量构建的工作目录，并把 --workpath/--specpath 加入命令
+
+    参数:
+        input_file (str): 要打包的 Python 文件路径
+        cmd (list): PyInstaller 命令，会被原地修改
+        work_root (str, optional): 工作目录根，默认为 ~/.cache/py_to_exe/work
+
+    返回 (work_dir, reason)：reason 为分析结果失效的原因，可以复用时为 None。
+    失效时会清空工作目录并添加 --clean。
+    """
+    work_dir = work_dir_for(input_file, work_root)
+    reason = stale_reason(work_dir, cmd)
+
+    if reason and os.path.isdir(work_dir):
+        shutil.rmtree(work_dir)
+    os.makedirs(work_dir, exist_ok=True)
+
+    # 构建开始前删除标记，构建中断时下次会被判定为失效
+    stamp_path = os.path.join(work_dir, STAMP_NAME)
+    if os.path.exists(stamp_path):
+        os.remove(stamp_path)
+
+    # 输入文件必须放在最后
+    target = cmd.pop()
+    cmd.extend(['--workpath', os.path.join(work_dir, 'build'), '--specpath', work_dir])
+    if reason:
+        cmd.append('--clean')
+    cmd.append(target)
+    return work_dir, reason
+
+
+def mark_built(work_dir, cmd):
+    """构建成功后写入标记文件"""
+    stamp = _fingerprint(cmd)
+    stamp_path = os.path.join(work_dir, STAMP_NAME)
+    with open(stamp_path, 'w', encoding='utf-8') as f:
+        json.dump(stamp, f, ensure_ascii=False, indent=2)
+
+
+def clean_work_dirs(work_root=None):
+    """删除所有增量构建工作目录"""
+    work_root = os.path.abspath(work_root or DEFAULT_WORK_ROOT)
+    if os.path.isdir(work_root):
+        shutil.rmtree(work_root)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == 'clean':
+        clean_work_dirs()
+        print(f"已清理增量构建工作目录: {DEFAULT_WORK_ROOT}")
+    else:
+        print(f"增量构建工作目录: {DEFAULT_WORK_ROOT}")
+        if os.path.isdir(DEFAULT_WORK_ROOT):
+            for name in sorted(os.listdir(DEFAULT_WORK_ROOT)):
+                print(f"  {name}")
@@ -0,0 +1,203 @@
+import time
+import itertools
+import threading
+from process_runner import ProcessCancelled
+
+# 任务状态
+PENDING = '等待中'
+RUNNING = '运行中'
+SUCCEEDED = '成功'
+FAILED = '失败'
+CANCELLED = '已取消'
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+
+class BuildJob:
+    """
+    队列中的一个打包任务
+
+    参数:
+        job_id (int): 任务编号
+        name (str): 显示名称
+        options (dict): 打包参数，由 runner 解释
+        priority (int, optional): 优先级，数值越大越先运行，默认为 0
+    """
+
+    def __init__(self, job_id, name, options, priority=0):
+        self.id = job_id
+        self.name = name
+        self.options = options
+        self.priority = priority
+        self.status = PENDING
+        self.message = None
+        self.started = None
+        self.finished = None
+        self.cancel_event = threading.Event()
+        # 任务自己的日志缓冲 (LogStream)，由调用方设置
+        self.log = None
+
+    @property
+    def duration(self):
+        """已运行的秒数，尚未开始时为 None"""
+        if self.started is None:
+            return None
+        return (self.finished or time.monotonic()) - self.started
+
+
+class JobScheduler:
+    """
+    打包任务队列：按优先级 (相同时按队列顺序) 调度，最多同时运行 max_workers 个任务
+
+    参数:
+        runner (callable): runner(job) 在工作线程中执行打包，返回结果消息；
+            抛出 ProcessCancelled 表示已取消，抛出其他异常表示失败
+        max_workers (int, optional): 最大并发数，默认为 1
+        on_change (callable, optional): 任务状态变化时调用 on_change(job)，可能在工作线程中调用
+    """
+
+    def __init__(self, runner, max_workers=1, on_change=None):
+        self.runner = runner
+        self.max_workers = max(1, max_workers)
+        self.on_change = on_change
+        self._jobs = []
+        self._running = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.RLock()
+
+    def jobs(self):
+        """按队列顺序返回所有任务"""
+        with self._lock:
+            return list(self._jobs)
+
+    def get(self, job_id):
+        with self._lock:
+            for job in self._jobs:
+                if job.id == job_id:
+                    return job
+        return None
+
+    def add(self, name, options, priority=0, log=None):
+        """
+        加入一个任务并尝试立即调度，返回 BuildJob
+
+        log 为任务的日志缓冲，也可以是根据任务编号创建日志缓冲的函数 log(job_id)
+        (日志文件名需要包含任务编号时使用)，在任务开始运行之前调用
+        """
+        with self._lock:
+            job = BuildJob(next(self._ids), name, options, priority)
+            job.log = log(job.id) if callable(log) else log
+            self._jobs.append(job)
+        self._notify(job)
+        self._dispatch()
+        return job
+
+    def move(self, job_id, offset):
+        """在队列中上移 (offset < 0) 或下移任务"""
+        with self._lock:
+            job = self.get(job_id)
+            if job is None:
+                return
+            index = self._jobs.index(job)
+            new_index = min(max(index + offset, 0), len(self._jobs) - 1)
+            self._jobs.insert(new_index, self._jobs.pop(index))
+        self._notify(job)
+
+    def set_priority(self, job_id, priority):
+        with self._lock:
+            job = self.get(job_id)
+            if job is None:
+                return
+            job.priority = priority
+        self._notify(job)
+
+    def set_max_workers(self, max_workers):
+        """修改并发数；调小时已在运行的任务不受影响"""
+        with self._lock:
+            self.max_workers = max(1, max_workers)
+        self._dispatch()
+
+    def cancel(self, job_id):
+        """
+        取消任务
+
+        等待中的任务直接标记为已取消；运行中的任务通知 runner 结束，并立即标记为已取消，
+        runner 清理完成后才释放并发名额
+        """
+        with self._lock:
+            job = self.get(job_id)
+            if job is None or job.status in FINISHED:
+                return
+            job.cancel_event.set()
+            if job.status == PENDING:
+                job.started = job.finished = time.monotonic()
+            else:
+                job.finished = time.monotonic()
+            job.status = CANCELLED
+        self._notify(job)
+
+    def remove(self, job_id):
+        """从队列中移除一个已结束的任务，返回是否移除"""
+        with self._lock:
+            job = self.get(job_id)
+            if job is None or job.status not in FINISHED:
+                return False
+            self._jobs.remove(job)
+        return True
+
+    def remove_finished(self):
+        """从队列中移除已结束的任务，返回被移除的任务"""
+        with self._lock:
+            removed = [job for job in self._jobs if job.status in FINISHED]
+            self._jobs = [job for job in self._jobs if job.status not in FINISHED]
+        return removed
+
+    def counts(self):
+        """返回各状态的任务数"""
+        with self._lock:
+            counts = dict.fromkeys((PENDING, RUNNING) + FINISHED, 0)
+            for job in self._jobs:
+                counts[job.status] += 1
+        return counts
+
+    def _next_job(self):
+        pending = [(-job.priority, index, job) for index, job in enumerate(self._jobs) if job.status == PENDING]
+        return min(pending)[2] if pending else None
+
+    def _dispatch(self):
+        started = []
+        with self._lock:
+            while self._running < self.max_workers:
+                job = self._next_job()
+                if job is None:
+                    break
+                job.status = RUNNING
+                job.started = time.monotonic()
+                self._running += 1
+                started.append(job)
+        for job in started:
+            self._notify(job)
+            threading.Thread(target=self._run, args=(job,), daemon=True).start()
+
+    def _run(self, job):
+        try:
+            message = self.runner(job)
+            status = SUCCEEDED
+        except ProcessCancelled:
+            message = None
+            status = CANCELLED
+        except Exception as e:
+            message = str(e)
+            status = FAILED
+        with self._lock:
+            self._running -= 1
+            # 用户取消后任务已经标记为已取消，不再覆盖
+            if job.status == RUNNING:
+                job.status = status
+                job.message = message
+                job.finished = time.monotonic()
+        self._notify(job)
+        self._dispatch()
+
+    def _notify(self, job):
+        if self.on_change:
+            self.on_change(job)
@@ -0,0 +1,75 @@
+import threading
+from collections import deque
+
+# 界面中最多保留的日志行数，更早的行只写入日志文件
+DEFAULT_MAX_LINES = 5000
+
+
+class LogStream:
+    """
+    线程安全的日志缓冲
+
+    工作线程逐行写入，界面线程成批取出后一次性插入控件，避免每行都刷新界面。
+    未取出的行保存在环形缓冲中，界面来不及显示时只保留最新的 max_lines 行；
+    完整日志同时写入 log_path (如有)。
+
+    参数:
+        max_lines (int, optional): 环形缓冲容量，默认为 DEFAULT_MAX_LINES
+        log_path (str, optional): 完整日志文件路径
+        notify (callable, optional): 缓冲由空变为非空时在工作线程中调用，用于唤醒界面线程
+    """
+
+    def __init__(self, max_lines=DEFAULT_MAX_LINES, log_path=None, notify=None):
+        self.max_lines = max_lines
+        self.log_path = log_path
+        self.notify = notify
+        self.total_lines = 0
+        self._pending = deque(maxlen=max_lines)
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._log_file = open(log_path, 'w', encoding='utf-8', errors='replace') if log_path else None
+
+    def write(self, text):
+        """写入一段文本 (通常是一行)，可以在任意线程调用"""
+        with self._lock:
+            was_empty = not self._pending
+            if len(self._pending) == self.max_lines:
+                self._dropped += 1
+            self._pending.append(text)
+            self.total_lines += 1
+            if self._log_file:
+                self._log_file.write(text)
+        if was_empty and self.notify:
+            try:
+                self.notify()
+            except Exception:
+                # 唤醒失败时由界面线程的定时刷新兜底
+                self.notify = None
+
+    def drain(self):
+        """
+        取出所有待显示的文本
+
+        返回:
+            tuple: (合并后的文本, 因缓冲已满而丢弃的行数)
+        """
+        with self._lock:
+            text = ''.join(self._pending)
+            self._pending.clear()
+            dropped, self._dropped = self._dropped, 0
+            if self._log_file:
+                self._log_file.flush()
+        return text, dropped
+
+    def close(self):
+        with self._lock:
+            if self._log_file:
+                self._log_file.close()
+                self._log_file = None
+
+
+def trim_text_widget(widget, max_lines):
+    """删除 Text 控件开头多出的行，只保留最后 max_lines 行"""
+    line_count = int(widget.index('end-1c').split('.')[0])
+    if line_count > max_lines:
+        widget.delete('1.0', f"{line_count - max_lines + 1}.0")
@@ -0,0 +1,255 @@
+"""
+多程序共享依赖打包：把多个脚本一起分析，输出一个共享的运行时/依赖目录和每个程序各自的启动器
+
+文件夹模式下每个程序都带一份解释器和第三方库，几十个工具就是几十份重复。本模块为所有脚本生成
+一个 spec：每个脚本各自 Analysis/PYZ/EXE，再用同一个 COLLECT 收集到一个目录中，
+相同的共享库和数据文件只保存一份 (都在 _internal 中)，每个启动器只包含引导程序和自己的模块。
+打包后逐个启动各程序，确认仍能正常运行。
+
+用法:
+    python multipackage.py tool_a.py tool_b.py tool_c.py -n tools -o dist [--verify-args "--version"]
+"""
+import os
+import sys
+import json
+import shlex
+import shutil
+import argparse
+import tempfile
+from process_runner import run_process, echo_line, tail_text
+from packager_core import check_pyinstaller, publish_artifacts
+
+# 启动检查时，超过该秒数仍在运行且没有报错的程序视为启动成功 (如常驻服务)
+DEFAULT_VERIFY_TIMEOUT = 10
+
+# 启动器输出中表示启动失败的文本
+_STARTUP_ERRORS = ('ModuleNotFoundError', 'ImportError', 'Failed to execute script', '[PYI-')
+
+_SPEC_TEMPLATE = '''# 由 multipackage.py 生成
+import json
+
+scripts = {scripts!r}
+analyses = []
+for script in scripts:
+    analyses.append(Analysis(
+        [script],
+        pathex={pathex!r},
+        datas={datas!r},
+        hiddenimports={hidden_imports!r},
+        excludes={excludes!r},
+        noarchive=False,
+    ))
+
+items = []
+members = {{}}
+for script, a in zip(scripts, analyses):
+    name = {names!r}[script]
+    pyz = PYZ(a.pure)
+    exe = EXE(pyz, a.scripts, [], exclude_binaries=True, name=name, console={console!r}, icon={icon!r})
+    items.extend([exe, a.binaries, a.datas])
+    members[name] = sorted({{entry[0] for entry in a.binaries + a.datas}})
+
+COLLECT(*items, name={name!r})
+
+# 记录每个程序用到的共享文件，用于计算节省的空间
+with open({manifest!r}, 'w', encoding='utf-8') as f:
+    json.dump(members, f)
+'''
+
+
+def write_spec(input_files, spec_path, manifest_path, name, console=True, icon_path=None, additional_data=None,
+               hidden_imports=None, exclude_modules=None):
+    """生成多程序共享依赖的 spec 文件"""
+    scripts = [os.path.abspath(path) for path in input_files]
+    with open(spec_path, 'w', encoding='utf-8') as f:
+        f.write(_SPEC_TEMPLATE.format(
+            scripts=scripts,
+            names={script: os.path.splitext(os.path.basename(script))[0] for script in scripts},
+            pathex=sorted({os.path.dirname(script) for script in scripts}),
+            datas=[(os.path.abspath(src), dest) for src, dest in additional_data or []],
+            hidden_imports=list(hidden_imports or []),
+            excludes=list(exclude_modules or []),
+            console=console,
+            icon=os.path.abspath(icon_path) if icon_path else None,
+            name=name,
+            manifest=manifest_path,
+        ))
+
+
+def _size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for root, _, files in os.walk(path):
+        total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+
+def _launcher_path(dist_dir, name):
+    for candidate in (name, name + '.exe'):
+        path = os.path.join(dist_dir, candidate)
+        if os.path.isfile(path):
+            return path
+    raise FileNotFoundError(f"找不到启动器: {os.path.join(dist_dir, name)}")
+
+
+def verify_tools(dist_dir, names, args=None, timeout=DEFAULT_VERIFY_TIMEOUT):
+    """
+    逐个启动各程序，检查是否能正常运行
+
+    返回:
+        list: 每个程序的 {'name', 'status', 'returncode', 'output'}，status 为
+            ok (正常退出)、running (超时仍在运行且没有报错) 或 failed
+    """
+    results = []
+    for name in names:
+        result = run_process([_launcher_path(dist_dir, name)] + list(args or []), timeout=timeout)
+        output = tail_text(result, count=20)
+        if result['timed_out']:
+            status = 'failed' if any(marker in output for marker in _STARTUP_ERRORS) else 'running'
+        else:
+            status = 'ok' if result['returncode'] == 0 else 'failed'
+        results.append({'name': name, 'status': status, 'returncode': result['returncode'], 'output': output})
+    return results
+
+
+def build_multipackage(input_files, output_dir=None, name='shared', console=True, icon_path=None,
+                       additional_data=None, hidden_imports=None, exclude_modules=None, auto_hidden_imports=False,
+                       verify=True, verify_args=None, verify_timeout=DEFAULT_VERIFY_TIMEOUT, timeout=None,
+                       cancel_event=None):
+    """
+    把多个脚本打包到同一个目录，共享运行时和依赖
+
+    参数:
+        input_files (list): 要打包的 Python 文件路径，文件名 (不含扩展名) 不能重复
+        output_dir (str, optional): 输出目录，默认为第一个脚本所在目录下的 dist
+        name (str, optional): 输出目录中共享目录的名称，默认为 shared
+        console ... exclude_modules: 与 build_exe 相同，对所有脚本生效
+        auto_hidden_imports (bool, optional): 是否静态分析每个脚本，自动补充隐藏导入，默认为 False
+        verify (bool, optional): 打包后是否逐个启动各程序检查，默认为 True
+        verify_args (list, optional): 启动检查时传入的命令行参数
+        verify_timeout (float, optional): 启动检查的超时秒数
+        timeout (float, optional): PyInstaller 运行的超时秒数
+        cancel_event (threading.Event, optional): 被设置后结束 PyInstaller 并抛出 ProcessCancelled
+
+    返回:
+        dict: dist_dir、tools (各启动器的大小)、shared_bytes、separate_bytes (分别打包时依赖的总大小)、
+            verify (启动检查结果，未检查时为 None)
+    """
+    if not input_files:
+        raise ValueError("至少需要一个 Python 文件")
+    names = []
+    for path in input_files:
+        if not os.path.isfile(path):
+            raise FileNotFoundError(f"输入文件不存在: {path}")
+        if not path.lower().endswith('.py'):
+            raise ValueError(f"输入文件必须是 .py 文件: {path}")
+        names.append(os.path.splitext(os.path.basename(path))[0])
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise ValueError(f"程序名称重复: {', '.join(duplicates)}")
+    if name in names:
+        raise ValueError(f"共享目录名称不能与程序名称相同: {name}")
+    check_pyinstaller()
+
+    if auto_hidden_imports:
+        from import_analyzer import detect_hidden_imports
+        for path in input_files:
+            hidden_imports, detected = detect_hidden_imports(path, hidden_imports)
+            if detected:
+                print(f"{os.path.basename(path)}: 自动检测到隐藏导入 {', '.join(detected)}")
+
+    if output_dir is None:
+        output_dir = os.path.join(os.path.dirname(input_files[0]), 'dist')
+    os.makedirs(output_dir, exist_ok=True)
+
+    work_dir = tempfile.mkdtemp(prefix='py_to_exe_multi_')
+    stage_dir = tempfile.mkdtemp(prefix=f".{name}-partial-", dir=output_dir)
+    try:
+        spec_path = os.path.join(work_dir, f"{name}.spec")
+        manifest_path = os.path.join(work_dir, 'members.json')
+        write_spec(input_files, spec_path, manifest_path, name, console, icon_path, additional_data,
+                   hidden_imports, exclude_modules)
+        cmd = ['pyinstaller', '--noconfirm', '--distpath', stage_dir,
+               '--workpath', os.path.join(work_dir, 'build'), spec_path]
+        print(f"正在把 {len(input_files)} 个程序打包到共享目录 {name}...")
+        run_process(cmd, on_line=echo_line, timeout=timeout, cancel_event=cancel_event, check=True)
+        publish_artifacts(stage_dir, output_dir)
+        with open(manifest_path, encoding='utf-8') as f:
+            members = json.load(f)
+    finally:
+        shutil.rmtree(stage_dir, ignore_errors=True)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    dist_dir = os.path.join(output_dir, name)
+    internal_dir = os.path.join(dist_dir, '_internal')
+    tools = {tool: _size(_launcher_path(dist_dir, tool)) for tool in names}
+    shared_bytes = _size(internal_dir)
+    # 分别打包时每个程序都带一份自己用到的依赖
+    separate_bytes = sum(tools.values()) + sum(
+        _size(os.path.join(internal_dir, member)) for tool in names for member in set(members[tool])
+        if os.path.exists(os.path.join(internal_dir, member))
+    )
+    report = {
+        'dist_dir': dist_dir,
+        'tools': tools,
+        'shared_bytes': shared_bytes,
+        'separate_bytes': separate_bytes,
+        'verify': verify_tools(dist_dir, names, verify_args, verify_timeout) if verify else None,
+    }
+    print(format_multipackage(report))
+    failed = [item['name'] for item in report['verify'] or [] if item['status'] == 'failed']
+    if failed:
+        raise RuntimeError(f"以下程序无法正常启动: {', '.join(failed)}")
+    return report
+
+
+def format_multipackage(report):
+    """把共享依赖打包的结果格式化为多行文本"""
+    total = report['shared_bytes'] + sum(report['tools'].values())
+    lines = [f"共享目录: {report['dist_dir']}",
+             f"共享依赖 {report['shared_bytes'] / 1024 / 1024:.1f} MB，"
+             f"{len(report['tools'])} 个启动器共 {sum(report['tools'].values()) / 1024 / 1024:.1f} MB；"
+             f"分别打包约 {report['separate_bytes'] / 1024 / 1024:.1f} MB，"
+             f"节省 {(report['separate_bytes'] - total) / 1024 / 1024:.1f} MB"]
+    labels = {'ok': '正常', 'running': '运行中 (超时前没有报错)', 'failed': '启动失败'}
+    for item in report['verify'] or []:
+        lines.append(f"  {item['name']}: {labels[item['status']]}")
+        if item['status'] == 'failed':
+            lines.extend(f"      {line}" for line in item['output'].splitlines()[-5:])
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="把多个脚本打包到同一个目录，共享运行时和依赖")
+    parser.add_argument('input_files', nargs='+', help="要打包的 Python 文件")
+    parser.add_argument('-n', '--name', default='shared', help="共享目录名称，默认为 shared")
+    parser.add_argument('-o', '--output-dir', help="输出目录，默认为第一个脚本所在目录下的 dist")
+    parser.add_argument('--windowed', dest='console', action='store_false', help="不显示控制台窗口")
+    parser.add_argument('--icon', dest='icon_path', help="图标文件 (.ico)")
+    parser.add_argument('--add-data', dest='additional_data', action='append', metavar=f"SRC{os.pathsep}DEST",
+                        type=lambda value: tuple(value.rsplit(os.pathsep, 1)), help="附加数据文件，可重复")
+    parser.add_argument('--hidden-import', dest='hidden_imports', action='append', metavar='MODULE',
+                        help="隐藏导入模块，可重复")
+    parser.add_argument('--exclude-module', dest='exclude_modules', action='append', metavar='MODULE',
+                        help="排除的模块，可重复")
+    parser.add_argument('--auto-imports', dest='auto_hidden_imports', action='store_true',
+                        help="静态分析每个脚本，自动补充隐藏导入")
+    parser.add_argument('--no-verify', dest='verify', action='store_false', help="打包后不逐个启动检查")
+    parser.add_argument('--verify-args', default='', help="启动检查时传入的参数，如 \"--version\"")
+    parser.add_argument('--verify-timeout', type=float, default=DEFAULT_VERIFY_TIMEOUT,
+                        help=f"启动检查的超时秒数，默认为 {DEFAULT_VERIFY_TIMEOUT}")
+    args = parser.parse_args(argv)
+
+    try:
+        build_multipackage(args.input_files, args.output_dir, args.name, args.console, args.icon_path,
+                           args.additional_data, args.hidden_imports, args.exclude_modules,
+                           args.auto_hidden_imports, args.verify, shlex.split(args.verify_args), args.verify_timeout)
+    except Exception as e:
+        print(f"打包过程中出错: {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""
+无交互的命令行打包工具，适用于没有图形界面的构建服务器
+
+用法:
+    python packager_cli.py app.py --onedir --windowed --icon app.ico --add-data assets:assets
+    python packager_cli.py --config build.toml [--target NAME ...] [-j 4]
+    python packager_cli.py app.py --watch
+    python packager_cli.py app.py --reproducible --verify
+    python packager_cli.py app.py --requirements-lock requirements.lock --wheelhouse wheels
+    python packager_cli.py app.py --server http://buildbox:8765
+    python packager_cli.py path/to/project [--entry NAME | --entry pkg.cli:main]
+
+配置文件 (TOML 或 JSON) 可以包含多个目标:
+
+    [defaults]
+    output_dir = "dist"
+    use_cache = true
+
+    [[targets]]
+    name = "app"
+    input_file = "app.py"
+    onefile = true
+    console = false
+    icon_path = "app.ico"
+    additional_data = [["assets", "assets"]]
+    hidden_imports = ["pkg.plugin"]
+
+本模块只依赖打包核心，不会导入 tkinter、questionary、PySimpleGUI 或 PyInstaller；
+批量打包和监视模式只在使用时才导入，导入耗时预算见 import_budget.py。
+"""
+import os
+import sys
+import argparse
+import subprocess
+
+from packager_core import build_exe
+from process_runner import echo_line
+from compression import COMPRESSION_MODES, OBJECTIVES
+
+# 退出码
+EXIT_OK = 0
+EXIT_BUILD_FAILED = 1
+EXIT_USAGE = 2
+EXIT_MISSING_DEPENDENCY = 3
+EXIT_INPUT_ERROR = 4
+EXIT_NOT_REPRODUCIBLE = 5
+EXIT_INTERRUPTED = 130
+
+
+def parse_add_data(value):
+    """解析 --add-data 参数，格式为 源路径:目标路径 (Windows 上也可以用 ;)"""
+    for sep in (os.pathsep, ':'):
+        if sep in value:
+            src, dest = value.rsplit(sep, 1)
+            if src and dest:
+                return (src, dest)
+    raise argparse.ArgumentTypeError(f"格式应为 源路径{os.pathsep}目标路径: {value}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="将 Python 文件打包成 EXE (无交互)",
+        epilog="退出码: 0 成功，1 打包失败，2 参数或配置错误，3 缺少依赖，4 输入文件错误，5 产物不可复现，130 被中断"
+    )
+    parser.add_argument('input_file', nargs='?', help="要打包的 Python 文件，或项目目录、pyproject.toml、带 __main__.py 的包目录")
+    parser.add_argument('-c', '--config', help="TOML 或 JSON 格式的打包配置文件")
+    parser.add_argument('-t', '--target', action='append', dest='targets', metavar='NAME',
+                        help="只打包配置文件中的指定目标，可重复")
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="配置文件中有多个目标时的并行进程数，默认为 1")
+    parser.add_argument('-e', '--entry',
+                        help="项目的入口点：pyproject.toml 中的名称、模块:函数 或 名称=模块:函数；项目只有一个入口点时可以省略")
+    parser.add_argument('-o', '--output-dir', help="输出目录，默认为脚本所在目录 (项目为项目目录) 下的 dist")
+
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--onefile', dest='onefile', action='store_true', default=None, help="打包为单个文件 (默认)")
+    mode.add_argument('--onedir', dest='onefile', action='store_false', help="打包为文件夹形式")
+    window = parser.add_mutually_exclusive_group()
+    window.add_argument('--console', dest='console', action='store_true', default=None, help="显示控制台窗口 (默认)")
+    window.add_argument('--windowed', dest='console', action='store_false', help="不显示控制台窗口")
+
+    parser.add_argument('--icon', dest='icon_path', help="图标文件 (.ico)")
+    parser.add_argument('--add-data', dest='additional_data', action='append', type=parse_add_data,
+                        metavar=f"SRC{os.pathsep}DEST", help="附加数据文件，可重复")
+    parser.add_argument('--hidden-import', dest='hidden_imports', action='append', metavar='MODULE',
+                        help="隐藏导入模块，可重复")
+    parser.add_argument('--auto-imports', dest='auto_hidden_imports', action='store_true', default=None,
+                        help="静态分析脚本，自动补充隐藏导入")
+    parser.add_argument('--exclude-module', dest='exclude_modules', action='append', metavar='MODULE',
+                        help="排除的模块，可重复")
+    parser.add_argument('--size-report', action='store_true', default=None,
+                        help="打包后分析产物组成并给出可排除的包")
+    parser.add_argument('--auto-exclude', action='store_true', default=None,
+                        help="自动排除静态导入图无法到达的包并重新打包")
+    parser.add_argument('--cache', dest='use_cache', action='store_true', default=None, help="启用构建缓存")
+    parser.add_argument('--cache-dir', help="构建缓存目录")
+    parser.add_argument('--incremental', action='store_true', default=None, help="启用增量构建")
+    parser.add_argument('--work-root', help="增量构建工作目录根")
+    parser.add_argument('--timeout', type=float, metavar='SECONDS', help="单个目标的打包超时秒数")
+    parser.add_argument('--artifact-store', metavar='DIR|URL',
+                        help="产物仓库目录或 http(s):// 地址 (见 store_server.py)，可由多台构建机共享："
+                             "相同输入的产物直接取回，构建成功后发布")
+    parser.add_argument('--metrics', dest='metrics_file', metavar='PATH',
+                        help="各阶段耗时的输出文件 (.json，或 .csv 每次追加一行)")
+    parser.add_argument('--optimize', type=int, choices=(0, 1, 2), metavar='LEVEL',
+                        help="字节码优化级别: 1 去掉 assert，2 再去掉文档字符串 (同 python -O/-OO)")
+    parser.add_argument('--strip-tests', action='store_true', default=None,
+                        help="排除标准库、本地和第三方包中的测试包")
+    parser.add_argument('--optimize-report', action='store_true', default=None,
+                        help="另外打包一份未优化的产物，比较优化前后的大小和启动耗时")
+    parser.add_argument('--compression', choices=COMPRESSION_MODES,
+                        help="压缩策略: none 不压缩，upx-fast/upx/upx-best 为不同级别的 UPX，auto 分别打包比较后选出最佳")
+    parser.add_argument('--upx-dir', help="upx 所在目录，默认在 PATH 中查找")
+    parser.add_argument('--upx-exclude', action='append', metavar='FILE',
+                        help="不压缩的二进制文件名 (支持通配符)，可重复")
+    parser.add_argument('--compression-objective', choices=OBJECTIVES,
+                        help="--compression auto 的优化目标: size 最小、startup 冷启动最快、balanced 兼顾 (默认)")
+    parser.add_argument('--reproducible', action='store_true', default=None,
+                        help="可复现构建: 固定 PYTHONHASHSEED 和 SOURCE_DATE_EPOCH，相同输入得到逐字节相同的产物")
+    parser.add_argument('--verify', action='store_true',
+                        help="重新打包并与输出目录中的已有产物逐字节比较，列出不同的文件和归档成员")
+    parser.add_argument('--no-preflight', dest='preflight', action='store_false', default=None,
+                        help="不在运行 PyInstaller 之前检查导入的模块、隐藏导入和附加数据")
+    parser.add_argument('--delta-dir', metavar='DIR',
+                        help="差量更新目录: 保存每次构建的产物，并生成相对于上一次构建的差量文件")
+    parser.add_argument('--requirements-lock', metavar='FILE',
+                        help="依赖锁文件: 在按锁文件创建并缓存的虚拟环境中打包，只包含锁文件中的依赖")
+    parser.add_argument('--wheelhouse', metavar='DIR',
+                        help="创建打包环境用的本地 wheel 目录 (不联网)，默认为锁文件所在目录下的 wheelhouse")
+    parser.add_argument('--venv-dir', metavar='DIR', help="打包环境目录根，默认为 ~/.cache/py_to_exe/venvs")
+    parser.add_argument('--server', metavar='URL', default=os.environ.get('PY_TO_EXE_SERVER'),
+                        help="提交到打包服务器 (build_server.py) 打包并下载产物，默认取环境变量 PY_TO_EXE_SERVER；"
+                             "--server '' 在本机打包")
+    parser.add_argument('--watch', action='store_true',
+                        help="监视脚本、本地导入模块和附加数据，变化时自动增量重新打包")
+    parser.add_argument('--watch-polling', action='store_true',
+                        help="监视模式下使用轮询代替 inotify (网络盘等收不到通知的场景)")
+    parser.add_argument('--debounce', type=float, metavar='SECONDS',
+                        help="监视模式下最后一次修改后等待的秒数，默认为 0.3")
+    return parser
+
+
+def _options_from_args(args):
+    """命令行中显式给出的打包参数，会覆盖配置文件中的同名参数"""
+    keys = ('output_dir', 'onefile', 'console', 'icon_path', 'additional_data', 'hidden_imports',
+            'use_cache', 'cache_dir', 'incremental', 'work_root', 'auto_hidden_imports',
+            'exclude_modules', 'size_report', 'auto_exclude', 'timeout', 'metrics_file', 'artifact_store',
+            'optimize', 'strip_tests', 'optimize_report',
+            'compression', 'upx_dir', 'upx_exclude', 'compression_objective', 'reproducible',
+            'delta_dir', 'preflight', 'requirements_lock', 'wheelhouse', 'venv_dir')
+    return {key: getattr(args, key) for key in keys if getattr(args, key) is not None}
+
+
+def exit_code_for(error):
+    """根据异常类型返回退出码"""
+    if isinstance(error, ImportError):
+        return EXIT_MISSING_DEPENDENCY
+    if isinstance(error, (FileNotFoundError, ValueError)):
+        return EXIT_INPUT_ERROR
+    return EXIT_BUILD_FAILED
+
+
+def run_jobs(jobs, max_workers=1):
+    """依次 (或并行) 执行打包任务，返回退出码"""
+    if max_workers > 1 and len(jobs) > 1:
+        from batch_packager import run_batch, format_result, format_summary
+        summary = run_batch(jobs, max_workers=max_workers,
+                            on_result=lambda r: print(format_result(r), flush=True))
+        print(format_summary(summary))
+        return EXIT_BUILD_FAILED if summary['failed'] else EXIT_OK
+
+    exit_code = EXIT_OK
+    for job in jobs:
+        try:
+            build_exe(**job)
+        except subprocess.CalledProcessError as e:
+            print(f"打包过程中出错: PyInstaller 返回码 {e.returncode}", file=sys.stderr)
+            exit_code = exit_code or EXIT_BUILD_FAILED
+        except subprocess.TimeoutExpired as e:
+            print(f"打包过程中出错: 超过 {e.timeout:g} 秒仍未完成，已结束 PyInstaller", file=sys.stderr)
+            exit_code = exit_code or EXIT_BUILD_FAILED
+        except Exception as e:
+            print(f"打包过程中出错: {str(e)}", file=sys.stderr)
+            exit_code = exit_code or exit_code_for(e)
+    return exit_code
+
+
+def run_remote_jobs(jobs, server):
+    """依次提交到打包服务器，实时输出服务器上的日志，产物下载到各自的输出目录，返回退出码"""
+    from build_client import remote_build, RemoteBuildError
+    exit_code = EXIT_OK
+    for job in jobs:
+        try:
+            build = remote_build(server=server, on_line=echo_line, **job)
+            print(f"打包完成！{', '.join(build['artifacts'])} 已下载到: {build['output_dir']}")
+        except RemoteBuildError as e:
+            print(f"打包过程中出错: {str(e)}", file=sys.stderr)
+            exit_code = exit_code or e.exit_code
+        except Exception as e:
+            print(f"打包过程中出错: {str(e)}", file=sys.stderr)
+            exit_code = exit_code or exit_code_for(e)
+    return exit_code
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if bool(args.config) == bool(args.input_file):
+        parser.error("必须指定要打包的 Python 文件或 --config 配置文件 (二选一)")
+    if args.targets and not args.config:
+        parser.error("--target 只能与 --config 一起使用")
+    if args.entry and args.config:
+        parser.error("--entry 只能用于单个项目，配置文件中请在目标里写 entry")
+    if args.jobs < 1:
+        parser.error("--jobs 必须大于 0")
+    if args.watch and args.config:
+        parser.error("--watch 只能用于单个 Python 文件")
+    if args.verify and (args.config or args.watch):
+        parser.error("--verify 只能用于单个 Python 文件，且不能与 --watch 同时使用")
+    if args.server and (args.watch or args.verify):
+        parser.error("--watch 和 --verify 只能在本机打包，请用 --server '' 关闭服务器打包")
+
+    overrides = _options_from_args(args)
+    if args.config:
+        from batch_packager import load_manifest
+        try:
+            jobs = load_manifest(args.config, names=args.targets)
+        except ImportError as e:
+            print(f"读取配置出错: {str(e)}", file=sys.stderr)
+            return EXIT_MISSING_DEPENDENCY
+        except (OSError, ValueError) as e:
+            print(f"读取配置出错: {str(e)}", file=sys.stderr)
+            return EXIT_USAGE
+        jobs = [dict(job, **overrides) for job in jobs]
+        if not jobs:
+            print("配置文件中没有打包目标", file=sys.stderr)
+            return EXIT_USAGE
+    else:
+        from project import expand_project
+        try:
+            jobs = [expand_project(dict(overrides, input_file=args.input_file, entry=args.entry))]
+        except ImportError as e:
+            print(f"读取项目出错: {str(e)}", file=sys.stderr)
+            return EXIT_MISSING_DEPENDENCY
+        except (OSError, ValueError) as e:
+            print(f"读取项目出错: {str(e)}", file=sys.stderr)
+            return EXIT_INPUT_ERROR
+
+    if args.watch:
+        if not os.path.isfile(jobs[0]['input_file']):
+            print(f"输入文件不存在: {jobs[0]['input_file']}", file=sys.stderr)
+            return EXIT_INPUT_ERROR
+        from watch_mode import watch_and_build, DEFAULT_DEBOUNCE
+        debounce = DEFAULT_DEBOUNCE if args.debounce is None else args.debounce
+        try:
+            watch_and_build(debounce=debounce, polling=args.watch_polling, **jobs[0])
+        except KeyboardInterrupt:
+            print("已退出监视模式", file=sys.stderr)
+        return EXIT_OK
+
+    if args.verify:
+        from reproducible import verify_build
+        try:
+            result = verify_build(**jobs[0])
+        except Exception as e:
+            print(f"校验过程中出错: {str(e)}", file=sys.stderr)
+            return exit_code_for(e)
+        return EXIT_OK if result['identical'] else EXIT_NOT_REPRODUCIBLE
+
+    try:
+        if args.server:
+            return run_remote_jobs(jobs, args.server)
+        return run_jobs(jobs, args.jobs)
+    except KeyboardInterrupt:
+        print("打包已中断", file=sys.stderr)
+        return EXIT_INTERRUPTED
+
+
+if __name__ == "__main__":
+    sys.exit(main())
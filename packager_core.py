@@ -0,0 +1,496 @@
+import os
+import sys
+import shutil
+import tempfile
+from process_runner import run_process, echo_line, ProcessCancelled
+from build_metrics import PhaseTimer, write_metrics, format_metrics
+from project import program_name, is_project, expand_project
+
+# 构建缓存、增量构建、导入分析、产物分析和产物仓库只在启用对应选项时才导入，
+# 命令行每次启动只加载必需的模块 (导入耗时预算见 import_budget.py)
+
+# PyInstaller 已确认安装后不再重复查找
+_pyinstaller_found = False
+
+# 自动排除后试运行产物的秒数，到时仍在运行 (图形界面、服务等) 视为已正常启动
+SMOKE_TIMEOUT = 10
+
+def check_pyinstaller():
+    """
+    检查 PyInstaller 是否安装，未安装时抛出 ImportError
+
+    只通过 importlib.util.find_spec 查找而不导入 PyInstaller；找到后在进程内缓存结果，
+    未找到时不缓存，安装后无需重启即可继续打包
+    """
+    global _pyinstaller_found
+    if _pyinstaller_found:
+        return
+    import importlib.util
+    if importlib.util.find_spec('PyInstaller') is None:
+        raise ImportError("PyInstaller 未安装，请先运行: pip install pyinstaller")
+    _pyinstaller_found = True
+
+def _artifact_size(output_dir, name):
+    """返回输出目录中产物 (单文件或文件夹) 的总字节数"""
+    total = 0
+    for candidate in (name, name + '.exe', name + '.app'):
+        path = os.path.join(output_dir, candidate)
+        if os.path.isfile(path):
+            total += os.path.getsize(path)
+        elif os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                total += sum(os.path.getsize(os.path.join(root, f)) for f in files)
+    return total
+
+def _smoke_run(executable, timeout=SMOKE_TIMEOUT):
+    """
+    试运行产物，返回 (结果, 缺少模块时的错误行)
+
+    结果为返回码，到时仍在运行时为 'running'
+    """
+    result = run_process([executable], timeout=timeout)
+    errors = [text.strip() for _, _, text in result['lines']
+              if 'ModuleNotFoundError' in text or 'ImportError' in text]
+    return ('running' if result['timed_out'] else result['returncode']), (errors[-1] if errors else None)
+
+
+def _write_metrics(metrics, metrics_file):
+    """写出阶段耗时，metrics_file 为一个路径或路径列表"""
+    for path in [metrics_file] if isinstance(metrics_file, str) else metrics_file:
+        write_metrics(metrics, path)
+
+
+def publish_artifacts(stage_dir, output_dir):
+    """
+    把暂存目录中的产物移动到输出目录
+
+    PyInstaller 先输出到 output_dir 下的暂存目录，成功后再逐个 os.replace 到输出目录，
+    打包失败或被取消时输出目录中不会留下写了一半的文件。已存在的同名产物先改名再删除。
+    """
+    for entry in os.listdir(stage_dir):
+        target = os.path.join(output_dir, entry)
+        old = None
+        if os.path.isdir(target) and not os.path.islink(target):
+            old = tempfile.mkdtemp(prefix=f".{entry}-old-", dir=output_dir)
+            os.replace(target, os.path.join(old, entry))
+        os.replace(os.path.join(stage_dir, entry), target)
+        if old:
+            shutil.rmtree(old, ignore_errors=True)
+    shutil.rmtree(stage_dir, ignore_errors=True)
+
+def build_exe(input_file, output_dir=None, onefile=True, console=True, icon_path=None, additional_data=None, hidden_imports=None, use_cache=False, cache_dir=None, incremental=False, work_root=None, auto_hidden_imports=False, exclude_modules=None, size_report=False, auto_exclude=False, work_dir=None, timeout=None, cancel_event=None, metrics_file=None, on_phase=None, artifact_store=None, optimize=0, strip_tests=False, optimize_report=False, compression=None, upx_dir=None, upx_exclude=None, compression_objective='balanced', reproducible=False, delta_dir=None, preflight=True, requirements_lock=None, wheelhouse=None, venv_dir=None, entry=None, source_root=None, on_line=None):
+    """
+    将 Python 文件打包成 EXE 可执行文件，出错时抛出异常
+
+    参数:
+        input_file ... hidden_imports: 与 package_py_to_exe 相同
+        use_cache (bool, optional): 是否启用构建缓存，输入未变化时直接还原之前的产物，默认为 False
+        cache_dir (str, optional): 构建缓存目录，默认为 ~/.cache/py_to_exe/builds
+        incremental (bool, optional): 是否启用增量构建，保留源码树之外的工作目录供下次复用，默认为 False
+        work_root (str, optional): 增量构建工作目录根，默认为 ~/.cache/py_to_exe/work
+        auto_hidden_imports (bool, optional): 是否静态分析脚本及其本地模块，自动补充隐藏导入，默认为 False
+        exclude_modules (list, optional): 需要排除的模块列表 (--exclude-module)
+        size_report (bool, optional): 是否在打包后分析产物组成，并写出 <名称>-size-report.json，默认为 False
+        auto_exclude (bool, optional): 是否排除静态导入图无法到达的包后重新打包，试运行通过才替换原产物，默认为 False
+        work_dir (str, optional): 本次构建独占的工作目录 (--workpath/--specpath)，打包结束后删除，
+            默认为临时目录；启用增量构建时忽略
+        timeout (float, optional): PyInstaller 运行的超时秒数，超时后结束进程并抛出 subprocess.TimeoutExpired
+        cancel_event (threading.Event, optional): 被设置后结束 PyInstaller 进程树，清理工作目录和未完成的产物，
+            并抛出 ProcessCancelled
+        metrics_file (str or list, optional): 各阶段耗时的输出文件 (可以是多个)，.csv 追加一行，其他扩展名写为 JSON
+        on_phase (callable, optional): 进入新阶段时调用 on_phase(阶段名, 序号, 阶段总数)
+        artifact_store (str, optional): 产物仓库目录。构建前先查找相同输入的产物，找到时直接取回；
+            构建成功后发布产物、命令行、输入哈希、版本和耗时，供其他构建机复用
+        optimize (int, optional): 字节码优化级别 (--optimize)，1 去掉 assert，2 再去掉文档字符串，默认为 0
+        strip_tests (bool, optional): 是否排除标准库、本地和第三方包中的测试包，默认为 False
+        optimize_report (bool, optional): 是否另外打包一份未优化的产物，比较优化前后的大小和启动耗时，默认为 False
+        compression (str, optional): 压缩策略，none、upx-fast、upx、upx-best 或 auto (分别打包比较后选出最佳)，
+            默认为 None，即 PyInstaller 的默认行为
+        upx_dir (str, optional): upx 所在目录，默认在 PATH 中查找
+        upx_exclude (list, optional): 不压缩的二进制文件名，在 compression.DEFAULT_UPX_EXCLUDE 之外追加
+        compression_objective (str, optional): 自动选择压缩策略时的优化目标，size、startup 或 balanced
+        reproducible (bool, optional): 是否可复现构建，固定 PYTHONHASHSEED 和 SOURCE_DATE_EPOCH，
+            产物修改时间设为 SOURCE_DATE_EPOCH，不复用增量工作目录，默认为 False
+        delta_dir (str, optional): 差量更新目录。保存每次构建的产物，产物变化时生成相对于上一次构建的
+            差量文件 (<产物>-<旧摘要>-<新摘要>.delta)，客户端用 delta_apply.py 应用
+        preflight (bool, optional): 是否在运行 PyInstaller 之前检查语法、导入的模块、隐藏导入和附加数据，
+            有错误时抛出 preflight.PreflightError，默认为 True
+        requirements_lock (str, optional): 依赖锁文件。指定时在按锁文件创建 (并缓存) 的虚拟环境中运行
+            PyInstaller 和预检，只打包锁文件中的依赖，而不是当前环境中碰巧安装的包
+        wheelhouse (str, optional): 创建虚拟环境用的本地 wheel 目录 (不联网)，默认为锁文件所在目录下的 wheelhouse
+        venv_dir (str, optional): 虚拟环境目录根，默认为 ~/.cache/py_to_exe/venvs
+        entry (str, optional): input_file 为项目 (pyproject.toml、项目目录或包目录) 时的入口点，
+            项目只有一个入口点时可以省略，详见 project.py
+        source_root (str, optional): 项目的源码目录。指定时构建缓存和产物仓库按整个源码树的哈希
+            (而不只是脚本的导入闭包) 判断输入是否变化，项目模式下自动设置
+        on_line (callable, optional): 输出接收函数，调用方式与 run_process 的 on_line 相同；指定时 PyInstaller
+            的输出和打包过程中的消息都交给它 (消息的秒数为 0，流为 'stdout')，不再写到标准输出
+
+    返回:
+        str: EXE 文件所在的输出目录
+    """
+    # 项目模式：换成为入口点生成的启动脚本
+    if entry or is_project(input_file):
+        job = expand_project({'input_file': input_file, 'entry': entry, 'output_dir': output_dir, 'console': console,
+                              'hidden_imports': hidden_imports, 'source_root': source_root})
+        input_file, output_dir, console = job['input_file'], job['output_dir'], job['console']
+        hidden_imports, source_root = job['hidden_imports'], job['source_root']
+    
+    def say(message):
+        if on_line:
+            on_line(0, 'stdout', message + '\n')
+        else:
+            print(message)
+
+    name = program_name(input_file)
+    timer = PhaseTimer(name, on_phase)
+    timer.start('validate')
+    
+    # 检查输入文件是否存在
+    if not os.path.isfile(input_file):
+        raise FileNotFoundError(f"输入文件不存在: {input_file}")
+        
+    # 检查文件扩展名
+    if not input_file.lower().endswith('.py'):
+        raise ValueError("输入文件必须是 .py 文件")
+        
+    # 预检: 缺少依赖的构建不必运行 PyInstaller；使用隔离环境时在环境准备好后再检查
+    if preflight and not requirements_lock:
+        from preflight import check, format_preflight
+        checked = check(input_file, additional_data=additional_data, hidden_imports=hidden_imports,
+                        icon_path=icon_path, exclude_modules=exclude_modules, source_root=source_root)
+        if checked['warnings']:
+            say(format_preflight(checked))
+        
+    # 检查 PyInstaller 是否安装，使用隔离环境时创建或复用环境
+    timer.start('check_pyinstaller')
+    venv = None
+    if requirements_lock:
+        from venv_cache import ensure_env
+        venv = ensure_env(requirements_lock, wheelhouse, venv_dir, timeout=timeout, cancel_event=cancel_event)
+        if not venv['created']:
+            say(f"复用打包环境: {venv['path']}")
+        if preflight:
+            from preflight import check, format_preflight
+            checked = check(input_file, python=venv['python'], additional_data=additional_data,
+                            hidden_imports=hidden_imports, icon_path=icon_path, exclude_modules=exclude_modules,
+                            source_root=source_root)
+            if checked['warnings']:
+                say(format_preflight(checked))
+    else:
+        check_pyinstaller()
+        
+    # 准备输出目录
+    if output_dir is None:
+        output_dir = os.path.join(os.path.dirname(input_file), 'dist')
+    os.makedirs(output_dir, exist_ok=True)
+    
+    # 自动选择压缩策略：先分别打包比较选出最佳策略，再按该策略走下面的正常流程，
+    # 构建缓存、产物仓库、耗时记录、产物分析等选项照常生效。启用构建缓存时各策略的
+    # 试打包结果已写入缓存，最佳策略直接从缓存还原，不必再打包一次
+    if compression == 'auto':
+        from compression import auto_select
+        selection = auto_select(
+            input_file, None, compression_objective, upx_dir, upx_exclude,
+            onefile=onefile, console=console, icon_path=icon_path, additional_data=additional_data,
+            hidden_imports=hidden_imports, auto_hidden_imports=auto_hidden_imports, exclude_modules=exclude_modules,
+            optimize=optimize, strip_tests=strip_tests, timeout=timeout, cancel_event=cancel_event,
+            reproducible=reproducible, requirements_lock=requirements_lock, wheelhouse=wheelhouse, venv_dir=venv_dir,
+            source_root=source_root, use_cache=use_cache, cache_dir=cache_dir, on_line=on_line
+        )
+        compression = selection['best']
+    
+    # 构建 PyInstaller 命令
+    cmd = [venv['pyinstaller'] if venv else 'pyinstaller', '--noconfirm']
+    
+    if onefile:
+        cmd.append('--onefile')
+    else:
+        cmd.append('--onedir')
+        
+    if not console:
+        cmd.append('--windowed')
+        
+    if icon_path:
+        if not os.path.isfile(icon_path):
+            raise FileNotFoundError(f"图标文件不存在: {icon_path}")
+        cmd.extend(['--icon', os.path.abspath(icon_path)])
+        
+    if additional_data:
+        for src, dest in additional_data:
+            if not os.path.exists(src):
+                raise FileNotFoundError(f"附加数据文件不存在: {src}")
+            # 使用绝对路径，--specpath 会改变相对路径的基准目录
+            cmd.extend(['--add-data', f"{os.path.abspath(src)}{os.pathsep}{dest}"])
+            
+    if auto_hidden_imports:
+        from import_analyzer import detect_hidden_imports
+        hidden_imports, detected = detect_hidden_imports(input_file, hidden_imports, source_root)
+        if detected:
+            say(f"自动检测到隐藏导入: {', '.join(detected)}")
+            
+    if hidden_imports:
+        for imp in hidden_imports:
+            cmd.extend(['--hidden-import', imp])
+            
+    if exclude_modules:
+        for mod in exclude_modules:
+            cmd.extend(['--exclude-module', mod])
+            
+    if optimize:
+        if optimize not in (1, 2):
+            raise ValueError(f"字节码优化级别必须是 0、1 或 2: {optimize}")
+        cmd.extend(['--optimize', str(optimize)])
+        
+    if strip_tests:
+        from bytecode_optimizer import find_test_packages
+        for mod in find_test_packages(input_file, source_root):
+            if mod not in (exclude_modules or []):
+                cmd.extend(['--exclude-module', mod])
+            
+    upx_env = {}
+    if compression:
+        from compression import compression_args
+        upx_args, upx_env = compression_args(compression, upx_dir, upx_exclude)
+        cmd.extend(upx_args)
+            
+    build_env = dict(upx_env)
+    if reproducible:
+        from reproducible import reproducible_env
+        repro_env = reproducible_env()
+        build_env.update(repro_env)
+        if incremental:
+            # 复用的工作目录可能保留之前构建的归档
+            say("可复现构建不复用增量工作目录")
+            incremental = False
+            
+    if name != os.path.splitext(os.path.basename(input_file))[0]:
+        # 项目模式的启动脚本，产物以入口点命名
+        cmd.extend(['--name', name])
+
+    if source_root:
+        # 项目模式的启动脚本不在源码目录中，项目的包从源码目录导入
+        cmd.extend(['--paths', os.path.abspath(source_root)])
+
+    # 添加输入文件和输出目录
+    cmd.extend(['--distpath', output_dir])
+    cmd.append(input_file)
+    
+    key_cmd = cmd
+    if compression:
+        from compression import cache_key_cmd
+        key_cmd = cache_key_cmd(cmd, upx_env)
+    if reproducible:
+        # 环境变量不在命令行中，需要补到命令里，与普通构建的产物区分
+        key_cmd = key_cmd[:-1] + [f"{key}={value}" for key, value in sorted(repro_env.items())] + key_cmd[-1:]
+    if venv:
+        # 环境路径因机器而异，用环境键 (锁文件内容、Python 版本和平台的哈希) 区分依赖
+        key_cmd = ['pyinstaller', f"VENV={venv['key']}"] + key_cmd[1:]
+    
+    # 项目模式下按整个源码树判断输入是否变化：未变化的文件只比较大小和修改时间
+    source_tree = None
+    if source_root and (use_cache or artifact_store):
+        from source_tree import hash_tree, format_tree
+        tree = hash_tree(source_root, exclude=[output_dir])
+        say(format_tree(tree))
+        source_tree = tree['digest']
+    
+    # 查询构建缓存
+    cache = None
+    if use_cache:
+        from build_cache import BuildCache, format_stats
+        cache = BuildCache(cache_dir)
+        cache_key = cache.compute_key(input_file, key_cmd, additional_data, icon_path, source_tree, source_root)
+        if cache.lookup(cache_key, output_dir):
+            say(f"命中构建缓存，EXE 文件已还原到: {output_dir}")
+            say(format_stats(cache.stats()))
+            if metrics_file:
+                _write_metrics(timer.finish('命中缓存'), metrics_file)
+            return output_dir
+    
+    # 查询产物仓库
+    store = None
+    if artifact_store:
+        from artifact_store import open_store, build_record
+        store = open_store(artifact_store)
+        store_key, record = build_record(input_file, key_cmd, additional_data, icon_path, source_tree, source_root)
+        fetched = store.fetch(store_key, output_dir)
+        if fetched:
+            say(f"从产物仓库取回 {', '.join(fetched)}，已保存到: {output_dir}")
+            if cache:
+                cache.store(cache_key, output_dir, name, onefile)
+            if metrics_file:
+                _write_metrics(timer.finish('命中仓库'), metrics_file)
+            return output_dir
+    
+    # 准备工作目录
+    if incremental:
+        from incremental import prepare_work_dir, mark_built
+        work_dir, reason = prepare_work_dir(input_file, cmd, work_root)
+        if reason:
+            say(f"增量构建: 重新完整分析 ({reason})")
+        else:
+            say(f"增量构建: 复用工作目录 {work_dir}")
+    else:
+        # 不在脚本目录下留下 build/ 和 .spec 文件，并行打包时也互不干扰
+        work_dir = work_dir or tempfile.mkdtemp(prefix='py_to_exe_work_')
+        os.makedirs(work_dir, exist_ok=True)
+        cmd[-1:-1] = ['--workpath', os.path.join(work_dir, 'build'), '--specpath', work_dir]
+    work_path = os.path.join(work_dir, 'build', name)
+    
+    # 产物先输出到暂存目录，成功后再移动到输出目录
+    stage_dir = tempfile.mkdtemp(prefix=f".{name}-partial-", dir=output_dir)
+    run_cmd = list(cmd)
+    run_cmd[run_cmd.index('--distpath') + 1] = stage_dir
+    
+    def on_output(elapsed, stream, line):
+        (on_line or echo_line)(elapsed, stream, line)
+        timer.feed(line)
+    
+    status = '失败'
+    try:
+        # 运行 PyInstaller
+        say(f"正在打包 {input_file} 为 EXE 文件...")
+        timer.start('analysis')
+        run_process(run_cmd, on_line=on_output, timeout=timeout, cancel_event=cancel_event, check=True,
+                    env=dict(os.environ, **build_env) if build_env else None)
+        timer.start('cleanup')
+        if reproducible:
+            from reproducible import normalize_mtimes
+            normalize_mtimes(stage_dir, int(repro_env['SOURCE_DATE_EPOCH']))
+        publish_artifacts(stage_dir, output_dir)
+        
+        # 分析产物组成 (需要在清理工作目录之前)
+        report = None
+        if size_report or auto_exclude:
+            from bundle_report import analyze_bundle, format_report, write_report
+            report = analyze_bundle(work_path, name, input_file, output_dir, onefile, hidden_imports,
+                                    source_root=source_root)
+            say(format_report(report))
+            write_report(report, os.path.join(output_dir, f"{name}-size-report.json"))
+        
+        if incremental:
+            # 保留工作目录，记录本次构建供下次判断是否失效
+            mark_built(work_dir, cmd)
+        status = '成功'
+    except ProcessCancelled:
+        status = '已取消'
+        raise
+    finally:
+        # 失败或被取消时删除未完成的产物；增量构建的工作目录没有构建记录，下次会重新完整分析
+        shutil.rmtree(stage_dir, ignore_errors=True)
+        if not incremental:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if status != '成功' and metrics_file:
+            _write_metrics(timer.finish(status), metrics_file)
+        
+    # 保存到构建缓存
+    if cache:
+        cache.store(cache_key, output_dir, name, onefile)
+        say(format_stats(cache.stats()))
+    
+    metrics = timer.finish(status)
+    say(format_metrics(metrics))
+    if metrics_file:
+        _write_metrics(metrics, metrics_file)
+    
+    # 发布到产物仓库
+    if store:
+        artifacts = [c for c in (name, name + '.exe', name + '.app') if os.path.exists(os.path.join(output_dir, c))]
+        store.publish(store_key, output_dir, artifacts, dict(record, metrics=metrics))
+        say(f"已发布到产物仓库: {store_key[:12]}")
+        
+    # 生成相对于上一次构建的差量文件
+    if delta_dir:
+        from delta_update import update_deltas
+        update_deltas(output_dir, name, delta_dir, on_line=on_line)
+        
+    say(f"打包完成！EXE 文件已保存到: {output_dir}")
+    
+    # 排除无法到达的包后在临时目录中重新打包，试运行通过才替换原产物
+    if auto_exclude and report['exclude_candidates']:
+        from startup_benchmark import _find_executable
+        excluded = [item['name'] for item in report['exclude_candidates']]
+        before = _artifact_size(output_dir, name)
+        say(f"自动排除后重新打包: {', '.join(excluded)}")
+        trial_dir = tempfile.mkdtemp(prefix=f".{name}-trial-", dir=output_dir)
+        try:
+            build_exe(
+                input_file, trial_dir, onefile, console, icon_path, additional_data, hidden_imports,
+                use_cache=use_cache, cache_dir=cache_dir, incremental=incremental, work_root=work_root,
+                exclude_modules=list(exclude_modules or []) + excluded, size_report=True,
+                timeout=timeout, cancel_event=cancel_event, optimize=optimize, strip_tests=strip_tests,
+                compression=compression, upx_dir=upx_dir, upx_exclude=upx_exclude, reproducible=reproducible,
+                preflight=False, requirements_lock=requirements_lock, wheelhouse=wheelhouse, venv_dir=venv_dir,
+                source_root=source_root, on_line=on_line
+            )
+            baseline, _ = _smoke_run(_find_executable(output_dir, name, onefile))
+            outcome, error = _smoke_run(_find_executable(trial_dir, name, onefile))
+            if error or outcome != baseline:
+                say(f"排除后的产物试运行失败 ({error or f'结果 {outcome}，原产物为 {baseline}'})，保留未排除的产物")
+            else:
+                publish_artifacts(trial_dir, output_dir)
+                after = _artifact_size(output_dir, name)
+                say(f"产物大小: 排除前 {before / 1024 / 1024:.1f} MB，排除后 {after / 1024 / 1024:.1f} MB")
+        finally:
+            shutil.rmtree(trial_dir, ignore_errors=True)
+    
+    # 另外打包一份未优化的产物作为对照
+    if optimize_report and (optimize or strip_tests):
+        from bytecode_optimizer import compare_builds, format_comparison
+        from startup_benchmark import _find_executable
+        baseline_dir = tempfile.mkdtemp(prefix='py_to_exe_baseline_')
+        try:
+            say("正在打包未优化的对照产物...")
+            build_exe(
+                input_file, os.path.join(baseline_dir, 'dist'), onefile, console, icon_path, additional_data,
+                hidden_imports, exclude_modules=exclude_modules, work_dir=os.path.join(baseline_dir, 'work'),
+                timeout=timeout, cancel_event=cancel_event, compression=compression, upx_dir=upx_dir,
+                upx_exclude=upx_exclude, preflight=False, requirements_lock=requirements_lock, wheelhouse=wheelhouse,
+                venv_dir=venv_dir, source_root=source_root, on_line=on_line
+            )
+            comparison = compare_builds(_find_executable(os.path.join(baseline_dir, 'dist'), name, onefile),
+                                        _find_executable(output_dir, name, onefile), on_line=on_line)
+        finally:
+            shutil.rmtree(baseline_dir, ignore_errors=True)
+        say(format_comparison(comparison))
+    return output_dir
+
+def package_py_to_exe(input_file, output_dir=None, onefile=True, console=True, icon_path=None, additional_data=None, hidden_imports=None, **options):
+    """
+    将 Python 文件打包成 EXE 可执行文件
+    
+    参数:
+        input_file (str): 要打包的 Python 文件路径
+        output_dir (str, optional): 输出目录，默认为当前目录下的 'dist' 文件夹
+        onefile (bool, optional): 是否打包为单个文件，默认为 True
+        console (bool, optional): 是否显示控制台窗口，默认为 True
+        icon_path (str, optional): 可执行文件的图标文件路径 (.ico)
+        additional_data (list, optional): 额外需要包含的文件列表，格式为 [(源路径, 目标路径), ...]
+        hidden_imports (list, optional): 需要手动指定的隐藏导入模块列表
+        **options: 构建缓存、增量构建、自动检测隐藏导入等其他选项，原样传给 build_exe
+
+    设置了环境变量 PY_TO_EXE_SERVER 时提交到打包服务器，产物下载到 output_dir
+    """
+    try:
+        if os.environ.get('PY_TO_EXE_SERVER'):
+            from build_client import remote_build
+            from process_runner import echo_line
+            build = remote_build(
+                input_file, output_dir=output_dir, on_line=echo_line, onefile=onefile, console=console,
+                icon_path=icon_path, additional_data=additional_data, hidden_imports=hidden_imports, **options)
+            print(f"\n打包完成！{', '.join(build['artifacts'])} 已下载到: {build['output_dir']}")
+            return
+        build_exe(
+            input_file,
+            output_dir=output_dir,
+            onefile=onefile,
+            console=console,
+            icon_path=icon_path,
+            additional_data=additional_data,
+            hidden_imports=hidden_imports,
+            **options
+        )
+    except Exception as e:
+        print(f"打包过程中出错: {str(e)}")
+        sys.exit(1)
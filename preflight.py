@@ -0,0 +1,318 @@
+"""
+打包前预检：在运行 PyInstaller 之前确认依赖都能找到，几秒内报告缺少的模块和文件
+
+PyInstaller 分析阶段遇到缺少的模块只会记录警告，打包完成后程序启动时才报 ModuleNotFoundError；
+附加数据、图标不存在时则要等到 PyInstaller 运行一段时间后才失败。预检在线程池中并行检查:
+    - 脚本及其本地模块的语法
+    - 所有导入的模块在当前环境 (运行 PyInstaller 的解释器) 中能否找到：只用 importlib.util.find_spec
+      查找顶层包、在包目录中查找子模块，不执行任何被检查的模块
+    - 隐藏导入的模块
+    - 附加数据和图标文件
+
+模块顶层无条件执行的导入找不到时为错误；写在 try/if/函数中的导入 (通常是可选依赖或平台相关的模块)
+以及字符串形式的动态导入找不到时为警告。使用隔离的打包环境时，预检用该环境的解释器运行 (run_preflight_in)。
+
+用法:
+    python preflight.py app.py [--hidden-import MODULE ...] [--add-data SRC:DEST ...]
+"""
+import os
+import sys
+import ast
+import json
+import time
+import argparse
+import importlib.util
+import importlib.machinery
+from concurrent.futures import ThreadPoolExecutor
+from import_analyzer import ScanCache, analyze, _resolve_local_module
+
+# 模块名与 pip 安装名不同的常见第三方库
+PIP_NAMES = {
+    'cv2': 'opencv-python',
+    'PIL': 'Pillow',
+    'yaml': 'PyYAML',
+    'sklearn': 'scikit-learn',
+    'bs4': 'beautifulsoup4',
+    'dateutil': 'python-dateutil',
+    'win32api': 'pywin32',
+    'win32con': 'pywin32',
+    'serial': 'pyserial',
+    'usb': 'pyusb',
+    'Crypto': 'pycryptodome',
+    'dotenv': 'python-dotenv',
+    'jwt': 'PyJWT',
+    'OpenSSL': 'pyOpenSSL',
+    'magic': 'python-magic',
+    'docx': 'python-docx',
+    'pptx': 'python-pptx',
+    'fitz': 'PyMuPDF',
+    'skimage': 'scikit-image',
+    'attr': 'attrs',
+}
+
+# 模块的查找结果
+FOUND = 'found'
+MISSING = 'missing'
+UNKNOWN = 'unknown'
+
+
+class PreflightError(ValueError):
+    """预检发现错误，result 为 run_preflight 的结果"""
+
+    def __init__(self, result):
+        super().__init__(format_preflight(result))
+        self.result = result
+
+
+def find_module(name, search_dir):
+    """
+    在不导入的情况下查找模块
+
+    返回:
+        str: FOUND、MISSING，或 UNKNOWN (顶层模块存在，但子模块无法通过文件系统确认，如 six.moves)
+    """
+    if _resolve_local_module(name, search_dir):
+        return FOUND
+    parts = name.split('.')
+    if _resolve_local_module(parts[0], search_dir):
+        # 本地包中的名称可能是属性而不是子模块，交给 PyInstaller 判断
+        return FOUND
+    if parts[0] in sys.builtin_module_names:
+        return FOUND if len(parts) == 1 else UNKNOWN
+    try:
+        spec = importlib.util.find_spec(parts[0])
+    except (ImportError, ValueError):
+        return MISSING
+    if spec is None:
+        return MISSING
+    if len(parts) == 1:
+        return FOUND
+    if not spec.submodule_search_locations:
+        return UNKNOWN
+    suffixes = importlib.machinery.all_suffixes()
+    for location in spec.submodule_search_locations:
+        base = os.path.join(location, *parts[1:])
+        if os.path.isdir(base) or any(os.path.isfile(base + suffix) for suffix in suffixes):
+            return FOUND
+    return MISSING
+
+
+def _is_excluded(name, exclude_modules):
+    return any(name == excluded or name.startswith(excluded + '.') for excluded in exclude_modules)
+
+
+def _scan_file(cache, path):
+    """扫描一个本地文件，返回 (扫描结果, 语法错误说明)"""
+    try:
+        return cache.scan(path), None
+    except SyntaxError as e:
+        return None, f"第 {e.lineno} 行: {e.msg}"
+    except (ValueError, OSError) as e:
+        return None, str(e)
+
+
+def _import_lines(path, top):
+    """返回文件中导入顶层模块 top 的行号"""
+    try:
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (SyntaxError, ValueError, OSError):
+        return []
+    lines = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names = [node.module]
+        else:
+            continue
+        if any(name.split('.')[0] == top for name in names):
+            lines.add(node.lineno)
+    return sorted(lines)
+
+
+def _check_data(src):
+    """检查一个附加数据源，返回 (级别, 说明)，没有问题时返回 None"""
+    if not os.path.exists(src):
+        return 'error', "不存在"
+    if not os.access(src, os.R_OK):
+        return 'error', "没有读取权限"
+    if os.path.isdir(src):
+        if not any(files for _, _, files in os.walk(src)):
+            return 'warning', "目录中没有文件"
+    return None
+
+
+def run_preflight(input_file, additional_data=None, hidden_imports=None, icon_path=None, exclude_modules=None,
+                  workers=None, source_root=None):
+    """
+    打包前检查依赖和文件
+
+    参数:
+        input_file (str): 要打包的 Python 文件路径
+        additional_data (list, optional): 附加数据 [(源路径, 目标路径), ...]
+        hidden_imports (list, optional): 隐藏导入模块
+        icon_path (str, optional): 图标文件路径
+        exclude_modules (list, optional): 排除的模块，不检查它们能否找到
+        workers (int, optional): 线程数，默认为 min(32, CPU 核数 + 4)
+        source_root (str, optional): 本地模块所在的源码目录，默认为脚本所在目录
+
+    返回:
+        dict: ok、errors 和 warnings (每项为 kind、name、detail)、files (检查的本地文件数)、
+            modules (检查的模块数)、seconds
+    """
+    start = time.perf_counter()
+    if not os.path.isfile(input_file):
+        return {'ok': False, 'errors': [{'kind': 'input', 'name': input_file, 'detail': "不存在"}], 'warnings': [],
+                'files': 0, 'modules': 0, 'seconds': round(time.perf_counter() - start, 3)}
+    input_file = os.path.abspath(input_file)
+    search_dir = os.path.abspath(source_root) if source_root else os.path.dirname(input_file)
+    exclude_modules = list(exclude_modules or [])
+    errors, warnings = [], []
+
+    cache = ScanCache()
+    local_files = analyze(input_file, cache, source_root)['local_files']
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        scans = list(pool.map(lambda path: _scan_file(cache, path), local_files))
+
+        # 每个模块的导入位置：模块名 -> [(文件, 是否为顶层无条件导入)]
+        usages = {}
+        for path, (scanned, syntax_error) in zip(local_files, scans):
+            if syntax_error:
+                errors.append({'kind': 'syntax', 'name': os.path.relpath(path, search_dir), 'detail': syntax_error})
+                continue
+            toplevel = set(scanned['toplevel_imports'])
+            for name in scanned['imports']:
+                if not name.startswith('.'):
+                    # from X import Y 中的 Y 可能是属性，静态导入只检查顶层包
+                    usages.setdefault(name.split('.')[0], []).append((path, name in toplevel))
+            for name in scanned['dynamic']:
+                usages.setdefault(name, []).append((path, False))
+        hidden = [name for name in hidden_imports or [] if not _is_excluded(name, exclude_modules)]
+        names = sorted({name for name in usages if not _is_excluded(name, exclude_modules)} | set(hidden))
+        found = dict(zip(names, pool.map(lambda name: find_module(name, search_dir), names)))
+
+        data_sources = [src for src, _ in additional_data or []]
+        data_results = list(pool.map(_check_data, data_sources))
+
+    for name in hidden:
+        if found[name] == MISSING:
+            errors.append({'kind': 'hidden_import', 'name': name, 'detail': "隐藏导入的模块在当前环境中找不到"})
+        elif found[name] == UNKNOWN:
+            warnings.append({'kind': 'hidden_import', 'name': name, 'detail': "无法在不导入的情况下确认该子模块"})
+    for name, places in sorted(usages.items()):
+        if name in hidden or found.get(name) != MISSING:
+            continue
+        top = name.split('.')[0]
+        required = [path for path, is_toplevel in places if is_toplevel]
+        where = []
+        for path in sorted({path for path, _ in places}):
+            lines = _import_lines(path, top)
+            rel = os.path.relpath(path, search_dir)
+            where.append(f"{rel}:{','.join(map(str, lines))}" if lines else rel)
+        hint = f"，可以尝试 pip install {PIP_NAMES.get(top, top)}"
+        if required:
+            errors.append({'kind': 'import', 'name': name, 'detail': f"{'; '.join(where)} 中导入，当前环境中找不到{hint}"})
+        else:
+            warnings.append({'kind': 'import', 'name': name,
+                             'detail': f"{'; '.join(where)} 中的条件导入或动态导入，当前环境中找不到{hint}"})
+    for src, problem in zip(data_sources, data_results):
+        if problem:
+            level, detail = problem
+            (errors if level == 'error' else warnings).append({'kind': 'data', 'name': src, 'detail': detail})
+    if icon_path and not os.path.isfile(icon_path):
+        errors.append({'kind': 'icon', 'name': icon_path, 'detail': "不存在"})
+
+    cache.save()
+    return {
+        'ok': not errors,
+        'errors': errors,
+        'warnings': warnings,
+        'files': len(local_files),
+        'modules': len(names),
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def run_preflight_in(python, input_file, additional_data=None, hidden_imports=None, icon_path=None,
+                     exclude_modules=None, timeout=None, source_root=None):
+    """
+    用另一个解释器 (如隔离的打包环境) 运行预检，模块在该解释器的环境中查找
+
+    参数:
+        python (str): 解释器路径
+        其他参数与 run_preflight 相同，timeout 为子进程的超时秒数
+
+    返回:
+        dict: 与 run_preflight 相同
+    """
+    from process_runner import run_process, tail_text
+    cmd = [python, os.path.abspath(__file__), os.path.abspath(input_file), '--json']
+    for src, dest in additional_data or []:
+        cmd.extend(['--add-data', f"{os.path.abspath(src)}{os.pathsep}{dest}"])
+    for name in hidden_imports or []:
+        cmd.extend(['--hidden-import', name])
+    for name in exclude_modules or []:
+        cmd.extend(['--exclude-module', name])
+    if icon_path:
+        cmd.extend(['--icon', os.path.abspath(icon_path)])
+    if source_root:
+        cmd.extend(['--source-root', os.path.abspath(source_root)])
+    # 有错误时预检进程返回 1，结果仍在输出中
+    result = run_process(cmd, timeout=timeout)
+    try:
+        return json.loads(tail_text(result, 'stdout'))
+    except ValueError:
+        raise RuntimeError(f"预检进程没有输出结果:\n{tail_text(result, count=10)}") from None
+
+
+def check(input_file, python=None, **options):
+    """运行预检 (指定 python 时在该解释器的环境中运行)，有错误时抛出 PreflightError，否则返回结果"""
+    result = run_preflight_in(python, input_file, **options) if python else run_preflight(input_file, **options)
+    if not result['ok']:
+        raise PreflightError(result)
+    return result
+
+
+_KIND_LABELS = {
+    'input': '输入文件',
+    'syntax': '语法错误',
+    'import': '缺少模块',
+    'hidden_import': '隐藏导入',
+    'data': '附加数据',
+    'icon': '图标文件',
+}
+
+
+def format_preflight(result):
+    """把预检结果格式化为多行文本"""
+    status = '通过' if result['ok'] else f"发现 {len(result['errors'])} 个错误"
+    lines = [f"预检{status}: 检查 {result['files']} 个本地文件、{result['modules']} 个模块，用时 {result['seconds']:.2f}s"]
+    for label, items in (('错误', result['errors']), ('警告', result['warnings'])):
+        for item in items:
+            lines.append(f"  {label} [{_KIND_LABELS[item['kind']]}] {item['name']}: {item['detail']}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="打包前检查依赖和文件")
+    parser.add_argument('input_file', help="要打包的 Python 文件")
+    parser.add_argument('--hidden-import', dest='hidden_imports', action='append', metavar='MODULE',
+                        help="隐藏导入模块，可重复")
+    parser.add_argument('--exclude-module', dest='exclude_modules', action='append', metavar='MODULE',
+                        help="排除的模块，可重复")
+    parser.add_argument('--add-data', dest='additional_data', action='append', metavar=f"SRC{os.pathsep}DEST",
+                        type=lambda value: tuple(value.rsplit(os.pathsep, 1)), help="附加数据文件，可重复")
+    parser.add_argument('--icon', dest='icon_path', help="图标文件")
+    parser.add_argument('--source-root', help="本地模块所在的源码目录，默认为脚本所在目录")
+    parser.add_argument('--json', action='store_true', help="以 JSON 输出结果")
+    args = parser.parse_args(argv)
+
+    result = run_preflight(args.input_file, args.additional_data, args.hidden_imports, args.icon_path,
+                           args.exclude_modules, source_root=args.source_root)
+    print(json.dumps(result, ensure_ascii=False) if args.json else format_preflight(result))
+    return 0 if result['ok'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
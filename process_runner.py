@@ -0,0 +1,217 @@
+import os
+import sys
+import time
+import signal
+import queue
+import threading
+import subprocess
+from collections import deque
+
+# 结果中保留的最近输出行数，同时也是读取线程与调用线程之间队列的容量
+DEFAULT_MAX_LINES = 2000
+
+# 超时或取消后，等待子进程 (及其仍持有管道的子进程) 关闭输出的最长时间
+_DRAIN_GRACE = 3
+
+# 请求进程树退出后，强制结束前等待的秒数
+_TERMINATE_GRACE = 1
+
+_EOF = object()
+
+
+class ProcessCancelled(Exception):
+    """进程被取消"""
+
+
+def _put(lines, item, abandoned):
+    """把一行放入有界队列；调用线程已经不再读取 (abandoned 被设置) 时放弃并返回 False"""
+    while not abandoned.is_set():
+        try:
+            lines.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            pass
+    return False
+
+
+def _read_stream(stream, name, lines, abandoned):
+    """
+    在读取线程中逐行读取一个输出流，直到对方关闭管道
+
+    管道由读取线程自己关闭：另一个线程在 readline 中等待时关闭同一个流会一直阻塞到有数据或管道关闭
+    """
+    try:
+        for line in iter(stream.readline, ''):
+            if not _put(lines, (time.monotonic(), name, line), abandoned):
+                break
+    except (OSError, ValueError):
+        pass
+    finally:
+        _put(lines, (time.monotonic(), name, _EOF), abandoned)
+        try:
+            stream.close()
+        except (OSError, ValueError):
+            pass
+
+
+def _stop(process, grace=_TERMINATE_GRACE):
+    """
+    结束子进程及其创建的所有进程 (PyInstaller 会启动子进程做模块分析)
+
+    POSIX 上子进程运行在独立的进程组中，先向整个进程组发送 SIGTERM，超过 grace 秒后发送 SIGKILL；
+    Windows 上使用 taskkill /T 结束整个进程树
+    """
+    if os.name == 'nt':
+        if process.poll() is None:
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)],
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        process.wait()
+        return
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+    try:
+        process.wait(grace)
+    except subprocess.TimeoutExpired:
+        pass
+    # 主进程退出后，进程组中可能还有残留的子进程
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        pass
+    process.wait()
+
+
+def echo_line(elapsed, stream, line):
+    """把子进程的一行输出原样写到当前进程对应的 stdout/stderr，可作为 on_line 回调"""
+    target = sys.stderr if stream == 'stderr' else sys.stdout
+    target.write(line)
+    target.flush()
+
+
+def run_process(cmd, on_line=None, timeout=None, cancel_event=None, max_lines=DEFAULT_MAX_LINES,
+                check=False, cwd=None, env=None):
+    """
+    运行子进程，同时读取 stdout 和 stderr，避免其中一个管道写满导致双方互相等待
+
+    参数:
+        cmd (list): 要执行的命令
+        on_line (callable, optional): 每读到一行调用一次 on_line(距启动的秒数, 'stdout' 或 'stderr', 行文本)，
+            在调用 run_process 的线程中执行
+        timeout (float, optional): 超时秒数，超时后结束整个进程树
+        cancel_event (threading.Event, optional): 被设置后结束整个进程树
+        max_lines (int, optional): 结果中保留的最近输出行数，内存占用不随输出总量增长
+        check (bool, optional): 为 True 时，超时抛出 subprocess.TimeoutExpired，取消抛出 ProcessCancelled，
+            返回码非 0 抛出 subprocess.CalledProcessError
+        cwd (str, optional): 工作目录
+        env (dict, optional): 环境变量
+
+    返回:
+        dict: cmd、returncode、started_at (开始时间戳)、duration、timed_out、cancelled、
+            lines (最近的 (秒数, 流名称, 文本) 列表) 和 line_counts (各流的总行数)
+    """
+    started_at = time.time()
+    start = time.monotonic()
+    # 让子进程成为独立进程组的组长，超时或取消时可以结束整个进程树
+    if os.name == 'nt':
+        group_options = {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        group_options = {'start_new_session': True}
+    process = subprocess.Popen(
+        cmd,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding='utf-8',
+        errors='replace',
+        bufsize=1,
+        cwd=cwd,
+        env=env,
+        **group_options
+    )
+
+    # 有界队列：调用线程处理不过来时读取线程会等待，内存占用有上限
+    lines = queue.Queue(maxsize=max_lines)
+    abandoned = threading.Event()
+    readers = [threading.Thread(target=_read_stream, args=(stream, name, lines, abandoned), daemon=True)
+               for stream, name in ((process.stdout, 'stdout'), (process.stderr, 'stderr'))]
+    for reader in readers:
+        reader.start()
+
+    recent = deque(maxlen=max_lines)
+    line_counts = {'stdout': 0, 'stderr': 0}
+    open_streams = 2
+    timed_out = False
+    cancelled = False
+    drain_deadline = None
+    try:
+        while open_streams:
+            if drain_deadline is None:
+                if timeout is not None and time.monotonic() - start > timeout:
+                    timed_out = True
+                elif cancel_event is not None and cancel_event.is_set():
+                    cancelled = True
+                if timed_out or cancelled:
+                    _stop(process)
+                    drain_deadline = time.monotonic() + _DRAIN_GRACE
+            elif time.monotonic() > drain_deadline:
+                # 孙进程仍持有管道，不再等待剩余输出
+                break
+
+            try:
+                stamp, name, line = lines.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if line is _EOF:
+                open_streams -= 1
+                continue
+            elapsed = stamp - start
+            line_counts[name] += 1
+            recent.append((round(elapsed, 3), name, line.rstrip('\r\n')))
+            if on_line:
+                on_line(elapsed, name, line)
+        process.wait()
+    except BaseException:
+        # 回调出错或被中断时不留下孤儿进程
+        _stop(process)
+        raise
+    finally:
+        # 不再读取队列：等待放入的读取线程随即退出，已读到的行直接丢弃。
+        # 孙进程仍持有管道时读取线程停在 readline 中，由它在管道关闭后自行退出
+        abandoned.set()
+        while True:
+            try:
+                lines.get_nowait()
+            except queue.Empty:
+                break
+        for reader in readers:
+            reader.join(0.2)
+
+    result = {
+        'cmd': list(cmd),
+        'returncode': process.returncode,
+        'started_at': started_at,
+        'duration': time.monotonic() - start,
+        'timed_out': timed_out,
+        'cancelled': cancelled,
+        'lines': list(recent),
+        'line_counts': line_counts,
+    }
+    if check:
+        if cancelled:
+            raise ProcessCancelled("进程已被取消")
+        if timed_out:
+            raise subprocess.TimeoutExpired(cmd, timeout, output=tail_text(result, 'stdout'),
+                                            stderr=tail_text(result, 'stderr'))
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, output=tail_text(result, 'stdout'),
+                                                stderr=tail_text(result, 'stderr'))
+    return result
+
+
+def tail_text(result, stream=None, count=DEFAULT_MAX_LINES):
+    """返回结果中最近 count 行输出 (可只取某一个流) 组成的文本"""
+    selected = [text for _, name, text in result['lines'] if stream is None or name == stream]
+    return "\n".join(selected[-count:])
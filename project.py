@@ -0,0 +1,298 @@
+"""
+项目模式：打包由多个模块组成的包，而不只是单个脚本
+
+输入可以是 pyproject.toml、包含它的项目目录，或者带 __main__.py 的包目录。入口点来自
+[project.scripts] / [project.gui-scripts] (或 [tool.poetry.scripts])，也可以直接写成
+模块:函数 或 名称=模块:函数。所选入口点生成一个启动脚本 .py_to_exe-<名称>.py，放在源码目录之外的
+启动脚本目录中 (不会出现在用户的源码树和版本控制里)；导入分析、预检和 PyInstaller (--paths) 通过
+source_root 在源码目录 (src 布局时为 src) 中找到项目的包；产物以入口点命名。
+"""
+import os
+import sys
+import argparse
+
+# 生成的启动脚本的文件名前缀 (以 . 开头，不会与项目中的模块重名)
+LAUNCHER_PREFIX = '.py_to_exe-'
+
+# 默认启动脚本目录，可通过环境变量 PY_TO_EXE_LAUNCHER_DIR 覆盖；每个源码目录一个子目录
+DEFAULT_LAUNCHER_DIR = os.environ.get(
+    'PY_TO_EXE_LAUNCHER_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'py_to_exe', 'launchers')
+)
+
+_LAUNCHER_HEADER = "# 由 py_to_exe 根据入口点 {name} = \"{value}\" 生成，打包时会被覆盖，请勿修改\n"
+
+
+def program_name(input_file):
+    """产物名称：一般为脚本的文件名，项目模式生成的启动脚本为入口点名称"""
+    stem = os.path.splitext(os.path.basename(input_file))[0]
+    if stem.startswith(LAUNCHER_PREFIX):
+        return stem[len(LAUNCHER_PREFIX):]
+    return stem
+
+
+def is_project(path):
+    """输入是否为项目 (目录或 pyproject.toml)"""
+    return os.path.isdir(path) or os.path.basename(path) == 'pyproject.toml'
+
+
+def _read_pyproject(path):
+    try:
+        import tomllib
+    except ImportError:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise ImportError("读取 pyproject.toml 需要 Python 3.11+ 或 tomli，请先运行: pip install tomli")
+    with open(path, 'rb') as f:
+        return tomllib.load(f)
+
+
+def _has_packages(directory):
+    try:
+        return any(os.path.isfile(os.path.join(directory, name, '__init__.py')) for name in os.listdir(directory))
+    except OSError:
+        return False
+
+
+def _source_root(root, pyproject):
+    """按 setuptools/poetry 的配置或 src 布局推断源码目录"""
+    tool = pyproject.get('tool', {})
+    setuptools = tool.get('setuptools', {})
+    package_dir = setuptools.get('package-dir', {})
+    if isinstance(package_dir, dict) and package_dir.get(''):
+        return os.path.join(root, package_dir[''])
+    find = setuptools.get('packages', {})
+    if isinstance(find, dict) and find.get('find', {}).get('where'):
+        return os.path.join(root, find['find']['where'][0])
+    for package in tool.get('poetry', {}).get('packages', []):
+        if isinstance(package, dict) and package.get('from'):
+            return os.path.join(root, package['from'])
+    src = os.path.join(root, 'src')
+    if os.path.isdir(src) and _has_packages(src):
+        return src
+    return root
+
+
+def _main_packages(source_root):
+    """源码目录中带 __main__.py 的顶层包，作为 python -m 包名 形式的入口点"""
+    entries = []
+    try:
+        names = sorted(os.listdir(source_root))
+    except OSError:
+        return entries
+    for name in names:
+        if os.path.isfile(os.path.join(source_root, name, '__main__.py')):
+            entries.append({'name': name, 'value': name, 'gui': False})
+    return entries
+
+
+def load_project(path):
+    """
+    读取项目信息
+
+    参数:
+        path (str): pyproject.toml、项目目录或带 __main__.py 的包目录
+
+    返回:
+        dict: root (项目目录)、source_root (源码目录)、name (项目名称)、
+            entry_points (每项为 name、value (模块 或 模块:函数)、gui)
+    """
+    path = os.path.abspath(path)
+    if os.path.basename(path) == 'pyproject.toml' or os.path.isfile(os.path.join(path, 'pyproject.toml')):
+        pyproject_path = path if os.path.isfile(path) else os.path.join(path, 'pyproject.toml')
+        if not os.path.isfile(pyproject_path):
+            raise FileNotFoundError(f"项目文件不存在: {pyproject_path}")
+        root = os.path.dirname(pyproject_path)
+        pyproject = _read_pyproject(pyproject_path)
+        project = pyproject.get('project', {})
+        poetry = pyproject.get('tool', {}).get('poetry', {})
+        source_root = _source_root(root, pyproject)
+        entry_points = []
+        for group, gui in (('scripts', False), ('gui-scripts', True)):
+            for name, value in project.get(group, {}).items():
+                entry_points.append({'name': name, 'value': value, 'gui': gui})
+        for name, value in poetry.get('scripts', {}).items():
+            if isinstance(value, str):
+                entry_points.append({'name': name, 'value': value, 'gui': False})
+        if not entry_points:
+            entry_points = _main_packages(source_root)
+        name = project.get('name') or poetry.get('name') or os.path.basename(root)
+    elif os.path.isfile(os.path.join(path, '__init__.py')):
+        # 包目录：以上级目录为源码目录，通过 __main__.py 运行
+        root = source_root = os.path.dirname(path)
+        name = os.path.basename(path)
+        entry_points = [{'name': name, 'value': name, 'gui': False}] \
+            if os.path.isfile(os.path.join(path, '__main__.py')) else []
+    elif os.path.isdir(path):
+        root = source_root = path
+        name = os.path.basename(path)
+        entry_points = _main_packages(path)
+    else:
+        raise FileNotFoundError(f"项目目录不存在: {path}")
+    return {'root': root, 'source_root': os.path.abspath(source_root), 'name': name, 'entry_points': entry_points}
+
+
+def _parse_entry(value):
+    """把 模块:属性 [extra] 拆成 (模块, 属性)，没有属性时属性为 None"""
+    value = value.split('[')[0].strip()
+    module, _, attr = value.partition(':')
+    module, attr = module.strip(), attr.strip() or None
+    if not module or not all(part.isidentifier() for part in module.split('.')) or \
+            (attr and not all(part.isidentifier() for part in attr.split('.'))):
+        raise ValueError(f"入口点格式应为 模块 或 模块:函数: {value}")
+    return module, attr
+
+
+def select_entry(project, entry=None):
+    """
+    选择入口点
+
+    参数:
+        project (dict): load_project 的结果
+        entry (str, optional): 入口点名称、模块:函数 或 名称=模块:函数；项目只有一个入口点时可以省略
+
+    返回:
+        dict: name、value、gui
+    """
+    entries = {item['name']: item for item in project['entry_points']}
+    if entry is None:
+        if len(entries) == 1:
+            return next(iter(entries.values()))
+        if not entries:
+            raise ValueError(f"项目 {project['name']} 没有入口点，请指定 模块:函数 (例如 --entry pkg.cli:main)")
+        raise ValueError(f"项目有多个入口点，请指定其中一个: {', '.join(sorted(entries))}")
+    if entry in entries:
+        return entries[entry]
+    name, sep, value = entry.partition('=')
+    if sep:
+        name, value = name.strip(), value.strip()
+    else:
+        name, value = None, entry.strip()
+    module, _ = _parse_entry(value)
+    if not name:
+        # pkg.__main__ 以包名命名，pkg.cli:main 以模块名命名
+        parts = module.split('.')
+        name = parts[-2] if parts[-1] == '__main__' and len(parts) > 1 else parts[-1]
+    if any(char in name for char in '/\\:'):
+        raise ValueError(f"入口点名称不合法: {name}")
+    return {'name': name, 'value': value, 'gui': False}
+
+
+def _module_exists(module, source_root):
+    base = os.path.join(source_root, *module.split('.'))
+    return os.path.isfile(base + '.py') or os.path.isfile(os.path.join(base, '__init__.py'))
+
+
+def launcher_source(entry):
+    """生成启动脚本的源码，返回 (源码, 需要补充的隐藏导入)"""
+    module, attr = _parse_entry(entry['value'])
+    header = _LAUNCHER_HEADER.format(name=entry['name'], value=entry['value'])
+    if attr:
+        head = attr.split('.')[0]
+        return (f"{header}import sys\nfrom {module} import {head}\n\n"
+                f"if __name__ == '__main__':\n    sys.exit({attr}())\n"), []
+    # 只有模块时像 python -m 一样运行；runpy 的目标 PyInstaller 找不到，作为隐藏导入补充
+    return (f"{header}import runpy\n\n"
+            f"if __name__ == '__main__':\n    runpy.run_module('{module}', run_name='__main__', alter_sys=True)\n"), \
+        [module]
+
+
+def launcher_dir(source_root):
+    """源码目录对应的启动脚本目录 (在启动脚本目录根下按源码目录路径的哈希区分)"""
+    # packager_core 在导入时加载本模块，hashlib 只在项目模式下才需要
+    import hashlib
+    digest = hashlib.sha256(os.path.abspath(source_root).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(DEFAULT_LAUNCHER_DIR, digest)
+
+
+def prepare_project(path, entry=None):
+    """
+    读取项目、选择入口点并生成启动脚本
+
+    启动脚本写在 launcher_dir(source_root) 中，不修改项目目录；内容不变时不重写，
+    保持修改时间不变，增量构建可以直接复用
+
+    返回:
+        dict: input_file (启动脚本)、name (产物名称)、source_root、output_dir (项目目录下的 dist)、
+            gui (是否为 gui-scripts 入口点)、hidden_imports
+    """
+    project = load_project(path)
+    selected = select_entry(project, entry)
+    source_root = project['source_root']
+    module, attr = _parse_entry(selected['value'])
+    if not attr and _module_exists(module + '.__main__', source_root):
+        # 包入口运行其中的 __main__
+        module += '.__main__'
+        selected = dict(selected, value=module)
+    if not _module_exists(module, source_root):
+        available = ', '.join(item['name'] for item in project['entry_points']) or '无'
+        raise FileNotFoundError(f"入口模块 {module} 不在源码目录 {source_root} 中 (项目的入口点: {available})")
+
+    source, hidden_imports = launcher_source(selected)
+    directory = launcher_dir(source_root)
+    os.makedirs(directory, exist_ok=True)
+    launcher = os.path.join(directory, f"{LAUNCHER_PREFIX}{selected['name']}.py")
+    try:
+        with open(launcher, 'r', encoding='utf-8') as f:
+            unchanged = f.read() == source
+    except OSError:
+        unchanged = False
+    if not unchanged:
+        with open(launcher, 'w', encoding='utf-8') as f:
+            f.write(source)
+    return {
+        'input_file': launcher,
+        'name': selected['name'],
+        'source_root': source_root,
+        'output_dir': os.path.join(project['root'], 'dist'),
+        'gui': selected['gui'],
+        'hidden_imports': hidden_imports,
+    }
+
+
+def expand_project(job):
+    """
+    打包任务的 input_file 为项目时换成生成的启动脚本，并补充 source_root、hidden_imports、
+    output_dir (默认为项目目录下的 dist)；gui-scripts 入口点不显示控制台。入口点取任务中的 entry
+
+    返回新的任务字典 (不含 entry)，不是项目时原样返回
+    """
+    job = dict(job)
+    entry = job.pop('entry', None)
+    if not is_project(job['input_file']):
+        if entry:
+            raise ValueError("只有项目目录或 pyproject.toml 才能指定入口点")
+        return job
+    project = prepare_project(job['input_file'], entry)
+    job['input_file'] = project['input_file']
+    job['source_root'] = job.get('source_root') or project['source_root']
+    job['output_dir'] = job.get('output_dir') or project['output_dir']
+    if project['gui']:
+        job['console'] = False
+    hidden_imports = list(job.get('hidden_imports') or [])
+    job['hidden_imports'] = hidden_imports + [name for name in project['hidden_imports'] if name not in hidden_imports]
+    return job
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="列出项目的入口点")
+    parser.add_argument('path', help="pyproject.toml、项目目录或包目录")
+    args = parser.parse_args(argv)
+
+    try:
+        project = load_project(args.path)
+    except (OSError, ValueError, ImportError) as e:
+        print(f"出错: {str(e)}", file=sys.stderr)
+        return 1
+    print(f"项目: {project['name']}")
+    print(f"源码目录: {project['source_root']}")
+    for item in project['entry_points']:
+        print(f"  {item['name']} = {item['value']}{' (gui)' if item['gui'] else ''}")
+    if not project['entry_points']:
+        print("  没有入口点，打包时请用 --entry 模块:函数 指定")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,8 @@ from tkinter import filedialog, messagebox
 import subprocess
 import os
 import threading
+import importlib.util
+from process_runner import run_process, echo_line, tail_text
 
 class Py2ExeConverter:
     def __init__(self, root):
@@ -84,10 +86,8 @@ class Py2ExeConverter:
             messagebox.showerror("错误", "请选择输出目录")
             return
         
-        # 检查PyInstaller是否安装
-        try:
-            import PyInstaller
-        except ImportError:
+        # 检查PyInstaller是否安装 (只查找不导入)，提交到打包服务器时本机不需要
+        if not os.environ.get('PY_TO_EXE_SERVER') and importlib.util.find_spec('PyInstaller') is None:
             if messagebox.askyesno("PyInstaller未安装", "需要安装PyInstaller才能继续。是否现在安装？"):
                 self.install_pyinstaller()
             return
@@ -123,24 +123,28 @@ class Py2ExeConverter:
         self.status_var.set("正在打包...")
         
         try:
-            # 运行PyInstaller
-            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
-            
-            # 实时更新输出
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    print(output.strip())
-            
-            return_code = process.poll()
+            # 设置了打包服务器时提交到服务器，产物下载到输出目录
+            if os.environ.get('PY_TO_EXE_SERVER'):
+                from build_client import remote_build, RemoteBuildError
+                try:
+                    remote_build(py_file, output_dir=output_dir, on_line=echo_line,
+                                 onefile=self.onefile_var.get(), console=not self.noconsole_var.get())
+                except RemoteBuildError as e:
+                    messagebox.showerror("错误", f"打包失败:\n{str(e)}")
+                    self.status_var.set("打包失败")
+                    return
+                messagebox.showinfo("成功", "打包完成！")
+                self.status_var.set("打包完成")
+                return
+
+            # 运行PyInstaller，同时读取 stdout 和 stderr 并实时输出
+            result = run_process(cmd, on_line=echo_line)
             
-            if return_code == 0:
+            if result['returncode'] == 0:
                 messagebox.showinfo("成功", "打包完成！")
                 self.status_var.set("打包完成")
             else:
-                error = process.stderr.read()
+                error = tail_text(result, 'stderr', 30)
                 messagebox.showerror("错误", f"打包失败:\n{error}")
                 self.status_var.set("打包失败")
         
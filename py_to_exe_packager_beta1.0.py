@@ -1,10 +1,11 @@
 import os
 import sys
-import subprocess
 import shutil
+import importlib.util
 from pathlib import Path
 import questionary
 from questionary import Style
+from process_runner import run_process, echo_line
 
 # 自定义样式
 custom_style = Style([
@@ -40,11 +41,21 @@ def package_py_to_exe(input_file, output_dir=None, onefile=True, console=True, i
         # 检查文件扩展名
         if not input_file.lower().endswith('.py'):
             raise ValueError("输入文件必须是 .py 文件")
-            
-        # 检查 PyInstaller 是否安装
-        try:
-            import PyInstaller
-        except ImportError:
+
+        # 设置了打包服务器时提交到服务器，本机不需要安装 PyInstaller
+        if os.environ.get('PY_TO_EXE_SERVER'):
+            from build_client import remote_build
+            print(f"\n{' 正在打包 ':=^40}")
+            build = remote_build(input_file, output_dir=output_dir, on_line=echo_line, onefile=onefile,
+                                 console=console, icon_path=icon_path, additional_data=additional_data,
+                                 hidden_imports=hidden_imports)
+            print(f"\n{' 打包完成 ':=^40}")
+            print(f"EXE 文件已下载到: {build['output_dir']}")
+            print(f"{'='*40}\n")
+            return
+
+        # 检查 PyInstaller 是否安装 (只查找不导入)
+        if importlib.util.find_spec('PyInstaller') is None:
             raise ImportError("PyInstaller 未安装，请先运行: pip install pyinstaller")
             
         # 准备输出目录
@@ -85,7 +96,7 @@ def package_py_to_exe(input_file, output_dir=None, onefile=True, console=True, i
         # 运行 PyInstaller
         print(f"\n{' 正在打包 ':=^40}")
         print(f"正在打包 {input_file} 为 EXE 文件...")
-        subprocess.run(cmd, check=True)
+        run_process(cmd, on_line=echo_line, check=True)
         
         # 清理临时文件
         build_dir = os.path.join(os.path.dirname(input_file), 'build')
@@ -201,7 +212,8 @@ def main():
         # 检查必要库是否安装
         try:
             import questionary
-            import PyInstaller
+            if importlib.util.find_spec('PyInstaller') is None:
+                raise ImportError("No module named 'PyInstaller'")
         except ImportError as e:
             print(f"\n{' 错误 ':=^40}")
             print(f"缺少依赖库: {str(e)}")
@@ -1,9 +1,10 @@
 import os
 import sys
-import subprocess
 import shutil
+import importlib.util
 from pathlib import Path
 import PySimpleGUI as sg
+from process_runner import run_process, tail_text
 
 # 设置主题
 sg.theme('LightBlue2')
@@ -31,11 +32,24 @@ def package_py_to_exe(input_file, output_dir=None, onefile=True, console=True, i
         if not input_file.lower().endswith('.py'):
             sg.popup_error("输入文件必须是 .py 文件")
             return False
-            
-        # 检查 PyInstaller 是否安装
-        try:
-            import PyInstaller
-        except ImportError:
+
+        # 设置了打包服务器时提交到服务器，本机不需要安装 PyInstaller
+        if os.environ.get('PY_TO_EXE_SERVER'):
+            from build_client import remote_build, RemoteBuildError
+            lines = []
+            sg.popup_auto_close("正在提交到打包服务器...", auto_close_duration=1)
+            try:
+                build = remote_build(input_file, output_dir=output_dir, on_line=lambda t, s, line: lines.append(line),
+                                     onefile=onefile, console=console, icon_path=icon_path,
+                                     additional_data=additional_data, hidden_imports=hidden_imports)
+            except RemoteBuildError:
+                sg.popup_error("打包失败", f"错误信息:\n{''.join(lines[-30:])}")
+                return False
+            sg.popup("打包完成", f"EXE 文件已下载到:\n{build['output_dir']}")
+            return True
+
+        # 检查 PyInstaller 是否安装 (只查找不导入)
+        if importlib.util.find_spec('PyInstaller') is None:
             sg.popup_error("PyInstaller 未安装", "请先运行: pip install pyinstaller")
             return False
             
@@ -78,10 +92,10 @@ def package_py_to_exe(input_file, output_dir=None, onefile=True, console=True, i
         
         # 运行 PyInstaller
         sg.popup_auto_close("正在打包...", auto_close_duration=1)
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        result = run_process(cmd)
         
-        if result.returncode != 0:
-            sg.popup_error("打包失败", f"错误信息:\n{result.stderr}")
+        if result['returncode'] != 0:
+            sg.popup_error("打包失败", f"错误信息:\n{tail_text(result, 'stderr', 30)}")
             return False
         
         # 清理临时文件
@@ -175,9 +189,7 @@ def create_add_import_window():
 
 def main():
     # 检查 PyInstaller 是否安装
-    try:
-        import PyInstaller
-    except ImportError:
+    if importlib.util.find_spec('PyInstaller') is None:
         sg.popup_error("PyInstaller 未安装", "请先运行: pip install pyinstaller")
         return
 
@@ -1,11 +1,11 @@
 import os
 import sys
-import subprocess
 import shutil
 from pathlib import Path
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 import threading
+from process_runner import run_process, tail_text
 
 class PyToExePackager:
     def __init__(self, root):
@@ -176,7 +176,12 @@ class PyToExePackager:
         try:
             input_file = self.input_file.get()
             output_dir = self.output_dir.get() or os.path.join(os.path.dirname(input_file), 'dist')
-            
+
+            # 设置了打包服务器时提交到服务器
+            if os.environ.get('PY_TO_EXE_SERVER'):
+                self.package_remote(input_file, output_dir)
+                return
+
             # 构建 PyInstaller 命令
             cmd = ['pyinstaller', '--noconfirm']
             
@@ -205,9 +210,9 @@ class PyToExePackager:
             cmd.append(input_file)
             
             # 运行 PyInstaller
-            result = subprocess.run(cmd, capture_output=True, text=True)
+            result = run_process(cmd)
             
-            if result.returncode == 0:
+            if result['returncode'] == 0:
                 # 清理临时文件
                 build_dir = os.path.join(os.path.dirname(input_file), 'build')
                 spec_file = os.path.join(os.path.dirname(input_file), f"{Path(input_file).stem}.spec")
@@ -219,11 +224,26 @@ class PyToExePackager:
                 
                 self.root.after(0, self.on_success, output_dir)
             else:
-                self.root.after(0, self.on_error, result.stderr)
+                self.root.after(0, self.on_error, tail_text(result, 'stderr', 30))
                 
         except Exception as e:
             self.root.after(0, self.on_error, str(e))
-    
+
+    def package_remote(self, input_file, output_dir):
+        """在打包服务器上打包，失败时显示服务器日志的最后几行"""
+        from build_client import remote_build, RemoteBuildError
+        lines = []
+        icon_path = self.icon_path.get()
+        try:
+            remote_build(input_file, output_dir=output_dir, on_line=lambda t, s, line: lines.append(line),
+                         onefile=self.onefile.get(), console=self.console.get(),
+                         icon_path=icon_path if icon_path and os.path.isfile(icon_path) else None,
+                         additional_data=self.additional_data, hidden_imports=self.hidden_imports)
+        except RemoteBuildError:
+            self.root.after(0, self.on_error, ''.join(lines[-30:]))
+            return
+        self.root.after(0, self.on_success, output_dir)
+
     def on_success(self, output_dir):
         self.progress.stop()
         self.status_label.config(text="打包完成!")
@@ -1,12 +1,19 @@
 import os
 import sys
 import subprocess
-import shutil
 from pathlib import Path
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk, scrolledtext
 import threading
 import queue
+from log_stream import LogStream, DEFAULT_MAX_LINES, trim_text_widget
+from process_runner import ProcessCancelled
+from job_queue import JobScheduler, RUNNING, SUCCEEDED, FINISHED
+from build_metrics import PhaseTimer, PHASES, PHASE_LABELS, write_metrics, format_metrics
+from compression import COMPRESSION_MODES
+from project import program_name, is_project
+
+# 打包、导入分析、预检、监视、批量打包和测速在第一次使用时才导入，窗口启动时只加载界面必需的模块
 
 class PyToExePackager:
     def __init__(self, root):
@@ -28,18 +35,42 @@ class PyToExePackager:
         
         # 创建变量
         self.input_file = tk.StringVar()
+        # 项目模式下选择的入口点，为空时使用项目唯一的入口点
+        self.entry = tk.StringVar()
         self.output_dir = tk.StringVar()
         self.onefile = tk.BooleanVar(value=True)
         self.console = tk.BooleanVar(value=True)
+        self.use_cache = tk.BooleanVar(value=True)
+        self.incremental = tk.BooleanVar(value=False)
+        self.size_report = tk.BooleanVar(value=False)
+        self.optimize = tk.IntVar(value=0)
+        self.strip_tests = tk.BooleanVar(value=False)
+        self.compression = tk.StringVar(value='默认')
         self.icon_path = tk.StringVar()
         self.additional_data = []
         self.hidden_imports = []
         
-        # 创建输出队列用于线程通信
+        self.concurrency = tk.IntVar(value=1)
+        
+        # 创建输出队列用于线程通信 (成功/错误、任务状态变化等控制消息)
         self.output_queue = queue.Queue()
         
+        # 打包日志单独缓冲，成批显示
+        self.log_stream = LogStream()
+        
+        # 打包任务队列，每个任务有自己的输出选项卡
+        self.scheduler = JobScheduler(self.run_job, on_change=lambda job: self.output_queue.put(("JOB", job.id)))
+        self.job_tabs = {}
+        
+        # 监视模式：停止事件和最近一次由监视触发的任务
+        self.watch_stop = None
+        self.watch_job = None
+        
         self.create_widgets()
         
+        # 工作线程有新日志时通过虚拟事件唤醒界面线程
+        self.root.bind('<<LogReady>>', lambda event: self.flush_all_logs())
+        
         # 开始定期检查队列
         self.poll_output_queue()
         
@@ -67,6 +98,11 @@ class PyToExePackager:
         self.output_text.pack(fill=tk.BOTH, expand=True)
         self.output_text.config(state=tk.DISABLED)
         
+        # 创建队列选项卡
+        self.queue_frame = ttk.Frame(self.notebook, padding="10")
+        self.notebook.add(self.queue_frame, text="队列")
+        self.create_queue_widgets()
+        
         # 配置配置选项卡
         self.config_frame.columnconfigure(1, weight=1)
         
@@ -75,9 +111,12 @@ class PyToExePackager:
         header.grid(row=0, column=0, columnspan=3, pady=(0, 20))
         
         # 输入文件
-        ttk.Label(self.config_frame, text="Python 文件:").grid(row=1, column=0, sticky=tk.W, pady=5)
+        ttk.Label(self.config_frame, text="Python 文件/项目:").grid(row=1, column=0, sticky=tk.W, pady=5)
         ttk.Entry(self.config_frame, textvariable=self.input_file, width=50).grid(row=1, column=1, sticky=(tk.W, tk.E), padx=5, pady=5)
-        ttk.Button(self.config_frame, text="浏览...", command=self.browse_input_file).grid(row=1, column=2, padx=5, pady=5)
+        input_btn_frame = ttk.Frame(self.config_frame)
+        input_btn_frame.grid(row=1, column=2, padx=5, pady=5)
+        ttk.Button(input_btn_frame, text="浏览...", command=self.browse_input_file).pack(side=tk.LEFT)
+        ttk.Button(input_btn_frame, text="项目...", command=self.browse_project_dir).pack(side=tk.LEFT, padx=(2, 0))
         
         # 输出目录
         ttk.Label(self.config_frame, text="输出目录:").grid(row=2, column=0, sticky=tk.W, pady=5)
@@ -85,8 +124,23 @@ class PyToExePackager:
         ttk.Button(self.config_frame, text="浏览...", command=self.browse_output_dir).grid(row=2, column=2, padx=5, pady=5)
         
         # 打包选项
-        ttk.Checkbutton(self.config_frame, text="打包为单个文件", variable=self.onefile).grid(row=3, column=0, columnspan=2, sticky=tk.W, pady=5)
-        ttk.Checkbutton(self.config_frame, text="显示控制台窗口", variable=self.console).grid(row=4, column=0, columnspan=2, sticky=tk.W, pady=5)
+        options_frame = ttk.Frame(self.config_frame)
+        options_frame.grid(row=3, column=0, columnspan=3, rowspan=2, sticky=(tk.W, tk.E), pady=5)
+        ttk.Checkbutton(options_frame, text="打包为单个文件", variable=self.onefile).grid(row=0, column=0, sticky=tk.W, padx=(0, 20), pady=2)
+        ttk.Checkbutton(options_frame, text="显示控制台窗口", variable=self.console).grid(row=1, column=0, sticky=tk.W, padx=(0, 20), pady=2)
+        ttk.Checkbutton(options_frame, text="使用构建缓存", variable=self.use_cache).grid(row=0, column=1, sticky=tk.W, padx=(0, 20), pady=2)
+        ttk.Checkbutton(options_frame, text="增量构建", variable=self.incremental).grid(row=1, column=1, sticky=tk.W, padx=(0, 20), pady=2)
+        ttk.Checkbutton(options_frame, text="分析产物大小", variable=self.size_report).grid(row=0, column=2, sticky=tk.W, padx=(0, 20), pady=2)
+        ttk.Checkbutton(options_frame, text="排除测试包", variable=self.strip_tests).grid(row=1, column=2, sticky=tk.W, padx=(0, 20), pady=2)
+        optimize_frame = ttk.Frame(options_frame)
+        optimize_frame.grid(row=0, column=3, sticky=tk.W, pady=2)
+        ttk.Label(optimize_frame, text="字节码优化:").pack(side=tk.LEFT)
+        ttk.Combobox(optimize_frame, textvariable=self.optimize, values=(0, 1, 2), width=3, state='readonly').pack(side=tk.LEFT, padx=5)
+        compression_frame = ttk.Frame(options_frame)
+        compression_frame.grid(row=1, column=3, sticky=tk.W, pady=2)
+        ttk.Label(compression_frame, text="压缩:").pack(side=tk.LEFT)
+        ttk.Combobox(compression_frame, textvariable=self.compression, width=9, state='readonly',
+                     values=('默认',) + tuple(mode for mode in COMPRESSION_MODES if mode != 'auto')).pack(side=tk.LEFT, padx=5)
         
         # 图标文件
         ttk.Label(self.config_frame, text="图标文件:").grid(row=5, column=0, sticky=tk.W, pady=5)
@@ -114,12 +168,19 @@ class PyToExePackager:
         import_btn_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=(5, 0))
         ttk.Button(import_btn_frame, text="添加", command=self.add_import).pack(fill=tk.X, pady=2)
         ttk.Button(import_btn_frame, text="删除", command=self.remove_import).pack(fill=tk.X, pady=2)
+        ttk.Button(import_btn_frame, text="自动检测", command=self.detect_imports).pack(fill=tk.X, pady=2)
         
         # 打包按钮和状态
         btn_frame = ttk.Frame(self.config_frame)
         btn_frame.grid(row=8, column=0, columnspan=3, pady=20)
         self.pack_button = ttk.Button(btn_frame, text="开始打包", command=self.start_packaging)
         self.pack_button.pack(side=tk.LEFT, padx=5)
+        self.batch_button = ttk.Button(btn_frame, text="批量打包...", command=self.start_batch_packaging)
+        self.batch_button.pack(side=tk.LEFT, padx=5)
+        self.bench_button = ttk.Button(btn_frame, text="启动测速", command=self.start_benchmark)
+        self.bench_button.pack(side=tk.LEFT, padx=5)
+        self.watch_button = ttk.Button(btn_frame, text="监视模式", command=self.toggle_watch)
+        self.watch_button.pack(side=tk.LEFT, padx=5)
         ttk.Button(btn_frame, text="退出", command=self.root.quit).pack(side=tk.LEFT, padx=5)
         
         # 进度条和状态
@@ -128,17 +189,74 @@ class PyToExePackager:
         self.status_label = ttk.Label(self.config_frame, text="就绪")
         self.status_label.grid(row=10, column=0, columnspan=3, sticky=tk.W)
     
+    def create_queue_widgets(self):
+        # 任务列表
+        columns = ('name', 'priority', 'status', 'duration')
+        self.queue_tree = ttk.Treeview(self.queue_frame, columns=columns, show='headings', height=12)
+        for column, title, width in zip(columns, ("任务", "优先级", "状态", "耗时"), (300, 60, 80, 80)):
+            self.queue_tree.heading(column, text=title)
+            self.queue_tree.column(column, width=width, stretch=(column == 'name'))
+        self.queue_tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.queue_tree.bind('<Double-1>', lambda event: self.show_job_output())
+        
+        # 队列操作
+        queue_btn_frame = ttk.Frame(self.queue_frame)
+        queue_btn_frame.pack(side=tk.RIGHT, fill=tk.Y, padx=(5, 0))
+        ttk.Button(queue_btn_frame, text="上移", command=lambda: self.move_job(-1)).pack(fill=tk.X, pady=2)
+        ttk.Button(queue_btn_frame, text="下移", command=lambda: self.move_job(1)).pack(fill=tk.X, pady=2)
+        ttk.Button(queue_btn_frame, text="提高优先级", command=lambda: self.change_priority(1)).pack(fill=tk.X, pady=2)
+        ttk.Button(queue_btn_frame, text="降低优先级", command=lambda: self.change_priority(-1)).pack(fill=tk.X, pady=2)
+        ttk.Button(queue_btn_frame, text="取消任务", command=self.cancel_job).pack(fill=tk.X, pady=2)
+        ttk.Button(queue_btn_frame, text="查看输出", command=self.show_job_output).pack(fill=tk.X, pady=2)
+        ttk.Button(queue_btn_frame, text="清除已结束", command=self.remove_finished_jobs).pack(fill=tk.X, pady=2)
+        ttk.Label(queue_btn_frame, text="并发数:").pack(anchor=tk.W, pady=(10, 0))
+        ttk.Spinbox(queue_btn_frame, from_=1, to=os.cpu_count() or 1, width=5, textvariable=self.concurrency,
+                    command=self.apply_concurrency).pack(fill=tk.X, pady=2)
+    
     def browse_input_file(self):
         filename = filedialog.askopenfilename(
             title="选择Python文件",
-            filetypes=[("Python files", "*.py"), ("All files", "*.*")]
+            filetypes=[("Python files", "*.py"), ("Project files", "pyproject.toml"), ("All files", "*.*")]
         )
         if filename:
             self.input_file.set(filename)
-            if not self.output_dir.get():
+            self.entry.set('')
+            if is_project(filename):
+                self.choose_entry(filename)
+            elif not self.output_dir.get():
                 default_dir = os.path.join(os.path.dirname(filename), 'dist')
                 self.output_dir.set(default_dir)
     
+    def browse_project_dir(self):
+        directory = filedialog.askdirectory(title="选择项目目录或包目录")
+        if directory:
+            self.input_file.set(directory)
+            self.entry.set('')
+            self.choose_entry(directory)
+    
+    def choose_entry(self, path):
+        """读取项目的入口点，有多个时让用户选择一个；输出目录默认为项目目录下的 dist"""
+        from project import load_project
+        try:
+            project = load_project(path)
+        except Exception as e:
+            messagebox.showerror("错误", f"读取项目失败:\n{str(e)}")
+            return
+        if not self.output_dir.get():
+            root = os.path.dirname(path) if os.path.basename(path) == 'pyproject.toml' else path
+            self.output_dir.set(os.path.join(root, 'dist'))
+        names = [item['name'] for item in project['entry_points']]
+        if len(names) == 1:
+            self.entry.set(names[0])
+        else:
+            prompt = f"项目的入口点: {', '.join(names)}\n请输入要打包的入口点名称:" if names else \
+                "项目没有入口点，请输入 模块:函数 (例如 pkg.cli:main):"
+            entry = tk.simpledialog.askstring("选择入口点", prompt)
+            if entry:
+                self.entry.set(entry.strip())
+        if self.entry.get():
+            self.status_label.config(text=f"项目 {project['name']}，入口点: {self.entry.get()}")
+    
     def browse_output_dir(self):
         directory = filedialog.askdirectory(title="选择输出目录")
         if directory:
@@ -176,6 +294,28 @@ class PyToExePackager:
             self.import_listbox.insert(tk.END, import_name)
             self.hidden_imports.append(import_name)
     
+    def detect_imports(self):
+        input_file = self.input_file.get()
+        if not input_file or not os.path.exists(input_file):
+            messagebox.showerror("错误", "请先选择要打包的Python文件或项目")
+            return
+        
+        # 项目从所选入口点的启动脚本开始分析，源码目录中的包按本地模块处理
+        job = self.expand_input()
+        if job is None:
+            return
+        from import_analyzer import detect_hidden_imports
+        try:
+            self.hidden_imports, detected = detect_hidden_imports(job['input_file'], self.hidden_imports,
+                                                                  source_root=job.get('source_root'))
+        except SyntaxError as e:
+            messagebox.showerror("错误", f"脚本解析失败:\n{str(e)}")
+            return
+        
+        for name in detected:
+            self.import_listbox.insert(tk.END, name)
+        self.status_label.config(text=f"自动检测到 {len(detected)} 个隐藏导入")
+    
     def remove_import(self):
         selection = self.import_listbox.curselection()
         if selection:
@@ -183,110 +323,463 @@ class PyToExePackager:
             self.import_listbox.delete(index)
             self.hidden_imports.pop(index)
     
-    def start_packaging(self):
+    def expand_input(self, **job):
+        """
+        按界面上的输入生成打包任务：项目换成所选入口点的启动脚本，并补充 source_root、hidden_imports 等
+
+        读取项目失败时弹出错误对话框并返回 None
+        """
+        from project import expand_project
+        input_file = self.input_file.get()
+        job = dict(job, input_file=input_file, hidden_imports=list(self.hidden_imports),
+                   entry=(self.entry.get() or None) if is_project(input_file) else None)
+        try:
+            return expand_project(job)
+        except Exception as e:
+            messagebox.showerror("错误", f"读取项目失败:\n{str(e)}")
+            return None
+    
+    def start_packaging(self, watch=False):
         # 验证输入
         if not self.input_file.get():
             messagebox.showerror("错误", "请选择要打包的Python文件")
-            return
+            return None
         
-        if not os.path.isfile(self.input_file.get()):
+        if not os.path.exists(self.input_file.get()):
             messagebox.showerror("错误", "输入的Python文件不存在")
+            return None
+        
+        from preflight import run_preflight, format_preflight
+        
+        # 项目模式：生成所选入口点的启动脚本，源码目录中的所有文件都参与缓存键和监视
+        project = self.expand_input(output_dir=self.output_dir.get() or None)
+        if project is None:
+            return None
+        
+        # 在界面线程中保存当前配置，之后修改界面不影响已加入队列的任务
+        input_file = project['input_file']
+        icon_path = self.icon_path.get()
+        options = {
+            'input_file': input_file,
+            'source_root': project.get('source_root'),
+            'output_dir': project['output_dir'] or os.path.join(os.path.dirname(input_file), 'dist'),
+            'onefile': self.onefile.get(),
+            'console': project.get('console', self.console.get()),
+            'icon_path': icon_path if icon_path and os.path.isfile(icon_path) else None,
+            'additional_data': list(self.additional_data),
+            'hidden_imports': project['hidden_imports'],
+            'use_cache': self.use_cache.get(),
+            # 监视模式下总是增量构建
+            'incremental': self.incremental.get() or watch,
+            'size_report': self.size_report.get(),
+            'optimize': self.optimize.get(),
+            'strip_tests': self.strip_tests.get(),
+            'compression': None if self.compression.get() == '默认' else self.compression.get(),
+        }
+        
+        # 预检: 缺少依赖或文件的任务不加入队列。提交到打包服务器时由服务器预检
+        if os.environ.get('PY_TO_EXE_SERVER'):
+            checked = {'ok': True, 'warnings': []}
+        else:
+            checked = run_preflight(input_file, options['additional_data'], options['hidden_imports'], options['icon_path'],
+                                    source_root=options['source_root'])
+        if not checked['ok']:
+            if watch:
+                # 监视模式下编辑到一半的代码常常暂时有错，不弹出对话框
+                first = checked['errors'][0]
+                self.status_label.config(text=f"预检失败: {first['name']}: {first['detail']}")
+            else:
+                messagebox.showerror("预检失败", format_preflight(checked))
+            return None
+        
+        # 完整日志写入输出目录 (文件名带任务编号，同名脚本的任务互不覆盖)，界面中只保留最近的部分
+        os.makedirs(options['output_dir'], exist_ok=True)
+        name = program_name(input_file)
+        
+        def make_log(job_id):
+            log = LogStream(log_path=os.path.join(options['output_dir'], f"{name}-build-{job_id}.log"),
+                            notify=self.notify_log)
+            if checked['warnings']:
+                log.write(format_preflight(checked) + "\n")
+            return log
+        
+        job = self.scheduler.add(Path(input_file).name if name == Path(input_file).stem else name, options, log=make_log)
+        self.create_job_tab(job)
+        self.status_label.config(text=f"已加入队列: #{job.id} {job.name}")
+        return job
+    
+    def toggle_watch(self):
+        """开始或停止监视模式"""
+        if self.watch_stop is not None:
+            self.watch_stop.set()
+            self.watch_stop = None
+            self.watch_button.config(text="监视模式")
+            self.status_label.config(text="已停止监视")
+            return
+        
+        job = self.start_packaging(watch=True)
+        if job is None:
+            return
+        self.watch_job = job
+        self.watch_stop = threading.Event()
+        self.watch_button.config(text="停止监视")
+        options = job.options
+        threading.Thread(target=self.run_watch, args=(options['input_file'], options['additional_data'], self.watch_stop,
+                                                      options['source_root'], options['output_dir']),
+                         daemon=True).start()
+    
+    def run_watch(self, input_file, additional_data, stop_event, source_root=None, output_dir=None):
+        """在工作线程中监视文件 (项目模式下为整个源码目录)，变化时通知界面线程重新打包"""
+        from watch_mode import watch_changes, watched_paths
+        try:
+            watch_changes(lambda: watched_paths(input_file, additional_data, source_root, [output_dir]),
+                          lambda changed: self.output_queue.put(("WATCH", sorted(changed))), stop_event)
+        except Exception as e:
+            self.output_queue.put(("ERROR", f"监视文件时出错: {str(e)}"))
+    
+    def on_watch_change(self, changed):
+        """文件变化后取消仍在进行的监视任务，并加入新的增量构建任务"""
+        if self.watch_stop is None or not os.path.exists(self.input_file.get()):
+            # 编辑器保存时脚本可能短暂不存在，等下一次变化
+            return
+        if self.watch_job is not None and self.watch_job.status not in FINISHED:
+            self.scheduler.cancel(self.watch_job.id)
+        job = self.start_packaging(watch=True)
+        if job is None:
+            return
+        self.watch_job = job
+        names = ', '.join(os.path.basename(path) for path in changed)
+        self.status_label.config(text=f"检测到修改: {names}，已加入队列: #{job.id} {job.name}")
+    
+    def create_job_tab(self, job):
+        """为任务创建输出选项卡"""
+        frame = ttk.Frame(self.notebook, padding="10")
+        header = ttk.Frame(frame)
+        header.pack(fill=tk.X, pady=(0, 5))
+        status = ttk.Label(header, text=job.status)
+        status.pack(side=tk.LEFT)
+        progress = ttk.Progressbar(header, mode='determinate', maximum=len(PHASES), length=200)
+        progress.pack(side=tk.RIGHT)
+        text = scrolledtext.ScrolledText(frame, wrap=tk.WORD, width=80, height=20, font=('Consolas', 9))
+        text.pack(fill=tk.BOTH, expand=True)
+        text.insert(tk.END, f"完整日志: {job.log.log_path}\n" + "=" * 50 + "\n")
+        text.config(state=tk.DISABLED)
+        self.notebook.add(frame, text=f"#{job.id} {job.name}")
+        self.job_tabs[job.id] = {'frame': frame, 'status': status, 'progress': progress, 'text': text, 'done': False}
+        self.update_job(job.id)
+    
+    def selected_job_id(self):
+        selection = self.queue_tree.selection()
+        return int(selection[0]) if selection else None
+    
+    def move_job(self, offset):
+        job_id = self.selected_job_id()
+        if job_id is not None:
+            self.scheduler.move(job_id, offset)
+    
+    def change_priority(self, delta):
+        job_id = self.selected_job_id()
+        job = self.scheduler.get(job_id) if job_id is not None else None
+        if job:
+            self.scheduler.set_priority(job_id, job.priority + delta)
+    
+    def cancel_job(self):
+        """
+        取消选中的任务
+
+        后台线程会结束整个 PyInstaller 进程树并删除工作目录和未完成的产物，
+        任务立即标记为已取消，不等待清理结束
+        """
+        job_id = self.selected_job_id()
+        if job_id is not None:
+            self.scheduler.cancel(job_id)
+    
+    def show_job_output(self):
+        job_id = self.selected_job_id()
+        if job_id in self.job_tabs:
+            self.notebook.select(self.job_tabs[job_id]['frame'])
+    
+    def remove_finished_jobs(self):
+        for job in self.scheduler.remove_finished():
+            tab = self.job_tabs.pop(job.id, None)
+            if tab:
+                self.notebook.forget(tab['frame'])
+                tab['frame'].destroy()
+        self.refresh_queue_view()
+    
+    def apply_concurrency(self):
+        try:
+            self.scheduler.set_max_workers(self.concurrency.get())
+        except tk.TclError:
+            pass
+    
+    def refresh_queue_view(self):
+        """按队列顺序重建任务列表，并在状态栏显示各状态的任务数"""
+        selected = self.queue_tree.selection()
+        self.queue_tree.delete(*self.queue_tree.get_children())
+        for job in self.scheduler.jobs():
+            duration = f"{job.duration:.1f}s" if job.status in FINISHED and job.duration is not None else ""
+            self.queue_tree.insert('', tk.END, iid=str(job.id),
+                                   values=(f"#{job.id} {job.name}", job.priority, job.status, duration))
+        self.queue_tree.selection_set([iid for iid in selected if self.queue_tree.exists(iid)])
+        counts = self.scheduler.counts()
+        self.status_label.config(text="队列: " + "，".join(f"{status} {count}" for status, count in counts.items() if count))
+    
+    def update_job(self, job_id):
+        """任务状态变化后更新队列列表和任务选项卡"""
+        self.refresh_queue_view()
+        job = self.scheduler.get(job_id)
+        tab = self.job_tabs.get(job_id)
+        if job is None or tab is None:
+            return
+        if job.status == RUNNING:
+            return
+        tab['status'].config(text=job.status if not job.message else f"{job.status}: {job.message}")
+        if job.status in FINISHED and not tab['done']:
+            tab['done'] = True
+            if job.status == SUCCEEDED:
+                tab['progress'].config(value=len(PHASES))
+            self._flush_stream(job.log, tab['text'])
+            job.log.close()
+            tab['text'].config(state=tk.NORMAL)
+            tab['text'].insert(tk.END, "\n" + "=" * 50 + "\n")
+            tab['text'].insert(tk.END, f"{job.status}" + (f": {job.message}" if job.message else "") + "\n")
+            tab['text'].see(tk.END)
+            tab['text'].config(state=tk.DISABLED)
+    
+    def update_job_phase(self, job_id, phase, index, total):
+        """任务进入新阶段时更新选项卡中的进度条"""
+        tab = self.job_tabs.get(job_id)
+        if tab is None or tab['done']:
+            return
+        tab['progress'].config(maximum=total, value=index)
+        tab['status'].config(text=f"{RUNNING}: {PHASE_LABELS[phase]} ({index + 1}/{total})")
+    
+    def run_job(self, job):
+        """在调度线程中运行队列中的任务"""
+        on_phase = lambda phase, index, total: self.output_queue.put(("PHASE", (job.id, phase, index, total)))
+        return self.package_py_to_exe(job.options, job.log, job.cancel_event, on_phase)
+    
+    def start_batch_packaging(self):
+        manifest_path = filedialog.askopenfilename(
+            title="选择批量打包清单",
+            filetypes=[("Manifest files", "*.json *.toml"), ("All files", "*.*")]
+        )
+        if not manifest_path:
+            return
+        
+        from batch_packager import load_manifest
+        try:
+            jobs = load_manifest(manifest_path)
+        except (OSError, ValueError, ImportError) as e:
+            messagebox.showerror("错误", f"读取清单出错:\n{str(e)}")
             return
         
         # 清空输出窗口
-        self.output_text.config(state=tk.NORMAL)
-        self.output_text.delete(1.0, tk.END)
-        self.output_text.insert(tk.END, "开始打包过程...\n")
-        self.output_text.insert(tk.END, "=" * 50 + "\n")
-        self.output_text.config(state=tk.DISABLED)
+        self.reset_output(f"开始批量打包，共 {len(jobs)} 个任务...\n")
         
-        # 切换到输出选项卡
         self.notebook.select(1)
-        
-        # 禁用打包按钮
         self.pack_button.config(state=tk.DISABLED)
-        
-        # 在后台线程中运行打包过程
+        self.batch_button.config(state=tk.DISABLED)
         self.progress.start()
-        self.status_label.config(text="正在打包...")
+        self.status_label.config(text="正在批量打包...")
         
-        thread = threading.Thread(target=self.package_py_to_exe)
+        thread = threading.Thread(target=self.run_batch_packaging, args=(jobs,))
         thread.daemon = True
         thread.start()
     
-    def package_py_to_exe(self):
+    def run_batch_packaging(self, jobs):
+        from batch_packager import run_batch, format_result, format_summary
         try:
-            input_file = self.input_file.get()
-            output_dir = self.output_dir.get() or os.path.join(os.path.dirname(input_file), 'dist')
-            
-            # 构建 PyInstaller 命令
-            cmd = ['pyinstaller', '--noconfirm']
-            
-            if self.onefile.get():
-                cmd.append('--onefile')
-            else:
-                cmd.append('--onedir')
-                
-            if not self.console.get():
-                cmd.append('--windowed')
-                
-            icon_path = self.icon_path.get()
-            if icon_path and os.path.isfile(icon_path):
-                cmd.extend(['--icon', icon_path])
-                
-            if self.additional_data:
-                for src, dest in self.additional_data:
-                    cmd.extend(['--add-data', f"{src}{os.pathsep}{dest}"])
-                    
-            if self.hidden_imports:
-                for imp in self.hidden_imports:
-                    cmd.extend(['--hidden-import', imp])
-                    
-            # 添加输入文件和输出目录
-            cmd.extend(['--distpath', output_dir])
-            cmd.append(input_file)
-            
-            # 将命令添加到输出
-            self.output_queue.put(f"执行命令: {' '.join(cmd)}\n")
-            
-            # 运行 PyInstaller 并实时捕获输出
-            process = subprocess.Popen(
-                cmd, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.STDOUT,
-                text=True,
-                bufsize=1,
-                universal_newlines=True
-            )
-            
-            # 实时读取输出
-            for line in process.stdout:
-                self.output_queue.put(line)
-                
-            # 等待进程完成
-            process.wait()
-            
-            if process.returncode == 0:
-                # 清理临时文件
-                build_dir = os.path.join(os.path.dirname(input_file), 'build')
-                spec_file = os.path.join(os.path.dirname(input_file), f"{Path(input_file).stem}.spec")
-                
-                if os.path.exists(build_dir):
-                    shutil.rmtree(build_dir)
-                    self.output_queue.put("已清理 build 目录\n")
-                if os.path.exists(spec_file):
-                    os.remove(spec_file)
-                    self.output_queue.put("已清理 spec 文件\n")
-                
-                self.output_queue.put(("SUCCESS", f"打包完成！EXE 文件已保存到: {output_dir}"))
+            summary = run_batch(jobs, on_result=lambda r: self.log_stream.write(format_result(r) + "\n"))
+            self.log_stream.write(f"日志目录: {summary['log_dir']}\n")
+            if summary['failed']:
+                self.output_queue.put(("ERROR", format_summary(summary)))
             else:
-                self.output_queue.put(("ERROR", f"打包过程失败，返回码: {process.returncode}"))
-                
+                self.output_queue.put(("SUCCESS", format_summary(summary)))
         except Exception as e:
-            self.output_queue.put(("ERROR", f"打包过程中出错: {str(e)}"))
+            self.output_queue.put(("ERROR", f"批量打包过程中出错: {str(e)}"))
+    
+    def start_benchmark(self):
+        # 验证输入
+        if not self.input_file.get() or not os.path.exists(self.input_file.get()):
+            messagebox.showerror("错误", "请选择要打包的Python文件或项目")
+            return
+        
+        # 在界面线程中生成任务 (项目换成启动脚本)，两种形式都按同一个任务打包
+        job = self.expand_input(output_dir=self.output_dir.get() or None)
+        if job is None:
+            return
+        icon_path = self.icon_path.get()
+        job.update(console=job.get('console', self.console.get()),
+                   icon_path=icon_path if icon_path and os.path.isfile(icon_path) else None,
+                   additional_data=list(self.additional_data))
+        
+        # 清空输出窗口
+        self.reset_output("分别以单文件和文件夹形式打包并测量启动耗时...\n")
+        
+        self.notebook.select(1)
+        self.pack_button.config(state=tk.DISABLED)
+        self.batch_button.config(state=tk.DISABLED)
+        self.bench_button.config(state=tk.DISABLED)
+        self.progress.start()
+        self.status_label.config(text="正在测速...")
+        
+        thread = threading.Thread(target=self.run_benchmark, args=(job,))
+        thread.daemon = True
+        thread.start()
+    
+    def run_benchmark(self, job):
+        """在工作线程中测速，job 为 start_benchmark 生成的任务"""
+        from startup_benchmark import run_benchmark, format_benchmark
+        try:
+            job = dict(job)
+            input_file = job.pop('input_file')
+            output_dir = job.pop('output_dir') or os.path.join(os.path.dirname(input_file), 'dist')
+            os.makedirs(output_dir, exist_ok=True)
+            report_path = os.path.join(output_dir, f"{program_name(input_file)}-startup.json")
+            report = run_benchmark(input_file, runs=5, output_json=report_path, **job)
+            self.log_stream.write(format_benchmark(report) + "\n")
+            self.output_queue.put(("SUCCESS", f"测速完成！结果已保存到: {report_path}"))
+        except Exception as e:
+            self.output_queue.put(("ERROR", f"测速过程中出错: {str(e)}"))
+    
+    def package_py_to_exe(self, options, log, cancel_event, on_phase=None):
+        """
+        在后台线程中打包，不访问界面变量
+
+        参数:
+            options (dict): 加入队列时保存的打包配置
+            log (LogStream): 本任务的日志缓冲
+            cancel_event (threading.Event): 被设置后结束 PyInstaller 进程树并清理未完成的产物
+            on_phase (callable, optional): 进入新阶段时调用 on_phase(阶段名, 序号, 阶段总数)
+
+        本机打包直接调用 packager_core.build_exe，PyInstaller 的输出和打包消息写入本任务的日志；
+        各阶段耗时写入输出目录下的 <名称>-build-metrics.json，并追加到 build-metrics.csv
+
+        返回结果消息；失败时抛出异常，取消时抛出 ProcessCancelled
+        """
+        input_file = options['input_file']
+        output_dir = options['output_dir']
+        name = program_name(input_file)
+        metrics_files = [os.path.join(output_dir, f"{name}-build-metrics.json"), os.path.join(output_dir, "build-metrics.csv")]
+
+        # 设置了打包服务器时提交到服务器，日志实时写入本任务的日志
+        if os.environ.get('PY_TO_EXE_SERVER'):
+            return self._remote_package(options, log, cancel_event, PhaseTimer(name, on_phase), metrics_files)
+
+        from packager_core import build_exe
+        try:
+            build_exe(
+                input_file,
+                output_dir=output_dir,
+                onefile=options['onefile'],
+                console=options['console'],
+                icon_path=options['icon_path'],
+                additional_data=options['additional_data'],
+                hidden_imports=options['hidden_imports'],
+                use_cache=options['use_cache'],
+                incremental=options['incremental'],
+                size_report=options['size_report'],
+                optimize=options['optimize'],
+                strip_tests=options['strip_tests'],
+                compression=options['compression'],
+                source_root=options['source_root'],
+                cancel_event=cancel_event,
+                on_phase=on_phase,
+                on_line=lambda elapsed, stream, line: log.write(line),
+                metrics_file=metrics_files,
+                # 加入队列时已经预检过
+                preflight=False,
+            )
+        except ProcessCancelled:
+            log.write("打包已取消，已结束 PyInstaller 进程并清理未完成的产物\n")
+            raise
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f"打包过程失败，返回码: {e.returncode}") from None
+        return f"打包完成！EXE 文件已保存到: {output_dir}"
+
+    def _remote_package(self, options, log, cancel_event, timer, metrics_files):
+        """提交到打包服务器，服务器的日志写入本任务的日志，产物下载到输出目录"""
+        from build_client import remote_build
+
+        def on_remote_line(elapsed, stream, line):
+            log.write(line)
+            timer.feed(line)
+
+        output_dir = options['output_dir']
+        status = '失败'
+        try:
+            timer.start('analysis')
+            build = remote_build(options['input_file'], output_dir=output_dir, on_line=on_remote_line,
+                                 cancel_event=cancel_event,
+                                 **{key: options[key] for key in ('onefile', 'console', 'icon_path', 'additional_data',
+                                                                  'hidden_imports', 'size_report', 'optimize',
+                                                                  'strip_tests', 'compression', 'source_root')})
+            status = '成功'
+            return f"打包完成！{', '.join(build['artifacts'])} 已下载到: {output_dir}"
+        except ProcessCancelled:
+            status = '已取消'
+            raise
+        finally:
+            metrics = timer.finish(status)
+            log.write(format_metrics(metrics) + "\n")
+            try:
+                for path in metrics_files:
+                    write_metrics(metrics, path)
+            except OSError as e:
+                log.write(f"写入阶段耗时失败: {str(e)}\n")
+    
+    def reset_output(self, header, log_path=None):
+        """清空输出窗口并开始新的日志缓冲"""
+        self.log_stream.close()
+        self.log_stream = LogStream(log_path=log_path, notify=self.notify_log)
+        self.output_text.config(state=tk.NORMAL)
+        self.output_text.delete(1.0, tk.END)
+        self.output_text.insert(tk.END, header)
+        if log_path:
+            self.output_text.insert(tk.END, f"完整日志: {log_path}\n")
+        self.output_text.insert(tk.END, "=" * 50 + "\n")
+        self.output_text.config(state=tk.DISABLED)
+    
+    def notify_log(self):
+        """在工作线程中调用，请求界面线程刷新日志 (Tcl 不支持多线程时抛出异常，改由定时检查刷新)"""
+        self.root.event_generate('<<LogReady>>', when='tail')
+    
+    def _flush_stream(self, stream, text_widget):
+        """把缓冲中的日志一次性插入文本控件，并删除超出上限的旧行"""
+        text, dropped = stream.drain()
+        if not text:
+            return
+        text_widget.config(state=tk.NORMAL)
+        if dropped:
+            text_widget.insert(tk.END, f"... 省略 {dropped} 行，完整内容见日志文件 ...\n")
+        text_widget.insert(tk.END, text)
+        trim_text_widget(text_widget, DEFAULT_MAX_LINES)
+        text_widget.see(tk.END)
+        text_widget.config(state=tk.DISABLED)
+    
+    def flush_log(self):
+        self._flush_stream(self.log_stream, self.output_text)
+    
+    def flush_all_logs(self, fallback=False):
+        """
+        刷新输出选项卡和所有运行中任务的日志
+
+        fallback 为 True 时只刷新无法通过事件唤醒界面的日志缓冲 (定时检查时使用)
+        """
+        pairs = [(self.log_stream, self.output_text)]
+        for job_id, tab in self.job_tabs.items():
+            job = self.scheduler.get(job_id)
+            if job and not tab['done']:
+                pairs.append((job.log, tab['text']))
+        for stream, text_widget in pairs:
+            if not fallback or stream.notify is None:
+                self._flush_stream(stream, text_widget)
     
     def poll_output_queue(self):
-        """定期检查输出队列并更新UI"""
+        """定期检查控制消息队列；无法通过事件唤醒时也在这里刷新日志"""
+        self.flush_all_logs(fallback=True)
         try:
             while True:
                 # 非阻塞获取队列内容
@@ -294,18 +787,17 @@ class PyToExePackager:
                     output = self.output_queue.get_nowait()
                     
                     # 处理特殊消息（成功/错误）
-                    if isinstance(output, tuple) and len(output) == 2:
-                        msg_type, message = output
-                        if msg_type == "SUCCESS":
-                            self.root.after(0, self.on_success, message)
-                        elif msg_type == "ERROR":
-                            self.root.after(0, self.on_error, message)
-                    else:
-                        # 普通输出消息
-                        self.output_text.config(state=tk.NORMAL)
-                        self.output_text.insert(tk.END, output)
-                        self.output_text.see(tk.END)
-                        self.output_text.config(state=tk.DISABLED)
+                    msg_type, message = output
+                    if msg_type == "JOB":
+                        self.update_job(message)
+                    elif msg_type == "PHASE":
+                        self.update_job_phase(*message)
+                    elif msg_type == "WATCH":
+                        self.on_watch_change(message)
+                    elif msg_type == "SUCCESS":
+                        self.root.after(0, self.on_success, message)
+                    elif msg_type == "ERROR":
+                        self.root.after(0, self.on_error, message)
                     
                     self.output_queue.task_done()
                 except queue.Empty:
@@ -318,8 +810,12 @@ class PyToExePackager:
         self.progress.stop()
         self.status_label.config(text="打包完成!")
         self.pack_button.config(state=tk.NORMAL)
+        self.batch_button.config(state=tk.NORMAL)
+        self.bench_button.config(state=tk.NORMAL)
         
         # 在输出窗口添加成功消息
+        self.flush_log()
+        self.log_stream.close()
         self.output_text.config(state=tk.NORMAL)
         self.output_text.insert(tk.END, "\n" + "=" * 50 + "\n")
         self.output_text.insert(tk.END, f"✓ {message}\n")
@@ -332,8 +828,12 @@ class PyToExePackager:
         self.progress.stop()
         self.status_label.config(text="打包失败")
         self.pack_button.config(state=tk.NORMAL)
+        self.batch_button.config(state=tk.NORMAL)
+        self.bench_button.config(state=tk.NORMAL)
         
         # 在输出窗口添加错误消息
+        self.flush_log()
+        self.log_stream.close()
         self.output_text.config(state=tk.NORMAL)
         self.output_text.insert(tk.END, "\n" + "=" * 50 + "\n")
         self.output_text.insert(tk.END, f"✗ 错误: {error_msg}\n")
@@ -0,0 +1,299 @@
+"""
+可复现构建：相同输入两次打包得到逐字节相同的产物，并提供重新打包比较的 verify 命令
+
+同一脚本两次打包产物不同，主要来自:
+    - 哈希随机化: PyInstaller 分析时用集合收集模块，base_library.zip 的成员顺序和 PYZ 中常量的
+      序列化结果随 PYTHONHASHSEED 变化，固定为 0 后两者都稳定
+    - 构建时间: Windows 上 EXE 的 PE 时间戳取自 SOURCE_DATE_EPOCH (没有设置时为当前时间)
+    - 产物文件的修改时间: 打包后统一设置为 SOURCE_DATE_EPOCH，产物目录再压缩或同步时也保持一致
+    - 工作目录: 复用的增量工作目录可能保留之前 (非可复现) 构建的归档，可复现构建总是使用新的工作目录。
+      PyInstaller 会把模块的源文件路径改写为相对路径，临时工作目录和脚本所在目录的绝对路径不会进入产物
+
+用法:
+    python reproducible.py verify app.py [--onedir] [-o dist]
+    python reproducible.py diff dist/app other/app
+"""
+import os
+import io
+import sys
+import shutil
+import hashlib
+import zipfile
+import argparse
+import tempfile
+from project import program_name
+
+# 没有设置 SOURCE_DATE_EPOCH 时使用的时间 (1980-01-01 UTC，ZIP 格式能表示的最早时间)
+DEFAULT_SOURCE_DATE_EPOCH = 315532800
+
+# 固定的哈希种子
+HASH_SEED = '0'
+
+# 归档中表示成员顺序的伪成员名
+ORDER_MEMBER = '<成员顺序>'
+
+
+def source_date_epoch():
+    """返回构建时间戳：环境变量 SOURCE_DATE_EPOCH，没有设置时为 DEFAULT_SOURCE_DATE_EPOCH"""
+    value = os.environ.get('SOURCE_DATE_EPOCH')
+    if not value:
+        return DEFAULT_SOURCE_DATE_EPOCH
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"SOURCE_DATE_EPOCH 必须是整数秒: {value}")
+
+
+def reproducible_env():
+    """返回可复现构建时传给 PyInstaller 的环境变量"""
+    return {'PYTHONHASHSEED': HASH_SEED, 'SOURCE_DATE_EPOCH': str(source_date_epoch())}
+
+
+def normalize_mtimes(path, epoch=None):
+    """把文件或目录中所有文件和子目录的修改时间设置为 epoch"""
+    epoch = source_date_epoch() if epoch is None else epoch
+    paths = [path]
+    if os.path.isdir(path):
+        for root, dirs, files in os.walk(path):
+            paths.extend(os.path.join(root, name) for name in dirs + files)
+    # 先改文件再改目录，目录的修改时间不会被之后的操作改变
+    for item in reversed(paths):
+        if not os.path.islink(item):
+            os.utime(item, (epoch, epoch))
+
+
+def _sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _zip_members(data, prefix):
+    """返回 ZIP 归档中每个成员 (内容和时间戳) 的摘要，以及成员顺序的摘要"""
+    members = {}
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            infos = zf.infolist()
+            for info in infos:
+                members[f"{prefix}/{info.filename}"] = _sha256(repr(info.date_time).encode() + zf.read(info))
+    except zipfile.BadZipFile:
+        return members
+    members[f"{prefix}/{ORDER_MEMBER}"] = _sha256('\n'.join(info.filename for info in infos).encode())
+    return members
+
+
+def member_digests(path):
+    """
+    返回文件中每个归档成员的摘要
+
+    PyInstaller 的 EXE (内嵌 CArchive) 逐个条目计算，其中的 PYZ 和 ZIP 再展开到模块；
+    ZIP 文件 (如文件夹模式的 base_library.zip) 逐个成员计算。其他文件返回空字典。
+
+    返回:
+        dict: {成员名: sha256}，嵌套的成员名形如 PYZ.pyz/json.decoder
+    """
+    with open(path, 'rb') as f:
+        head = f.read(4)
+    if head == b'PK\x03\x04':
+        with open(path, 'rb') as f:
+            return _zip_members(f.read(), os.path.basename(path))
+
+    try:
+        from PyInstaller.archive.readers import CArchiveReader
+        reader = CArchiveReader(path)
+    except Exception:
+        return {}
+    members = {ORDER_MEMBER: _sha256('\n'.join(reader.toc).encode())}
+    for name, entry in reader.toc.items():
+        data = reader.extract(name)
+        members[name] = _sha256(data)
+        if entry[-1] in ('z', 'Z'):
+            pyz = reader.open_embedded_archive(name)
+            members[f"{name}/{ORDER_MEMBER}"] = _sha256('\n'.join(pyz.toc).encode())
+            for module in pyz.toc:
+                members[f"{name}/{module}"] = _sha256(pyz.extract(module, raw=True))
+        elif data[:4] == b'PK\x03\x04':
+            members.update(_zip_members(data, name))
+    return members
+
+
+def artifact_paths(output_dir, name):
+    """返回输出目录中属于该程序的产物 (单文件 EXE、文件夹或 .app)"""
+    return [os.path.join(output_dir, candidate) for candidate in (name, name + '.exe', name + '.app')
+            if os.path.exists(os.path.join(output_dir, candidate))]
+
+
+def tree_digests(paths):
+    """
+    返回产物中每个文件的 sha256
+
+    参数:
+        paths (list): 产物路径 (文件或目录)
+
+    返回:
+        dict: {相对于输出目录的路径 (以 / 分隔): sha256}
+    """
+    digests = {}
+    for path in paths:
+        base = os.path.dirname(os.path.abspath(path))
+        if os.path.isfile(path):
+            digests[os.path.basename(path)] = file_sha256(path)
+            continue
+        for root, _, files in os.walk(path):
+            for name in files:
+                full = os.path.join(root, name)
+                digests[os.path.relpath(full, base).replace(os.sep, '/')] = file_sha256(full)
+    return digests
+
+
+def combined_digest(digests):
+    """把多个文件的摘要合并为一个，用于比较整个产物"""
+    return _sha256(''.join(f"{path}\0{digest}\n" for path, digest in sorted(digests.items())).encode())
+
+
+def _diff_keys(reference, rebuilt):
+    """比较两个摘要字典，返回 [(键, missing/extra/changed)]"""
+    diff = []
+    for key in sorted(set(reference) | set(rebuilt)):
+        if key not in rebuilt:
+            diff.append((key, 'missing'))
+        elif key not in reference:
+            diff.append((key, 'extra'))
+        elif reference[key] != rebuilt[key]:
+            diff.append((key, 'changed'))
+    return diff
+
+
+def diff_artifacts(reference_paths, rebuilt_paths):
+    """
+    逐文件、逐归档成员比较两份产物
+
+    参数:
+        reference_paths (list): 参照产物路径
+        rebuilt_paths (list): 重新打包的产物路径，按文件名与参照产物对应
+
+    返回:
+        dict: identical、reference_digest、rebuilt_digest 和 differences (每项为 path、status、members，
+            members 为 [(成员名, 状态)]；文件不同而所有成员都相同时为空列表，差异在归档之外，如 EXE 头部)
+    """
+    reference = tree_digests(reference_paths)
+    rebuilt = tree_digests(rebuilt_paths)
+    roots = {os.path.basename(path): os.path.dirname(os.path.abspath(path)) for path in reference_paths}
+    rebuilt_roots = {os.path.basename(path): os.path.dirname(os.path.abspath(path)) for path in rebuilt_paths}
+
+    differences = []
+    for rel, status in _diff_keys(reference, rebuilt):
+        members = []
+        if status == 'changed':
+            top = rel.split('/')[0]
+            members = _diff_keys(member_digests(os.path.join(roots[top], *rel.split('/'))),
+                                 member_digests(os.path.join(rebuilt_roots[top], *rel.split('/'))))
+            # 只列出最内层的差异，外层归档 (如 PYZ.pyz) 的不同由其中的成员说明
+            nested = {name.rsplit('/', 1)[0] for name, _ in members if '/' in name}
+            members = [(name, member_status) for name, member_status in members if name not in nested]
+        differences.append({'path': rel, 'status': status, 'members': members})
+    return {
+        'identical': not differences,
+        'reference_digest': combined_digest(reference),
+        'rebuilt_digest': combined_digest(rebuilt),
+        'differences': differences,
+    }
+
+
+def verify_build(input_file, output_dir=None, **build_options):
+    """
+    重新打包并与已有产物逐字节比较
+
+    输出目录中没有该程序的产物时先以可复现模式打包一次。重新打包总是以可复现模式进行，
+    不使用构建缓存、产物仓库和增量工作目录。
+
+    参数:
+        input_file (str): 要打包的 Python 文件路径
+        output_dir (str, optional): 已有产物所在的输出目录，默认为脚本所在目录下的 dist
+        **build_options: 其他打包参数，原样传给 build_exe，需要与打包已有产物时相同
+
+    返回:
+        dict: diff_artifacts 的结果，另有 reference (参照产物路径)
+    """
+    from packager_core import build_exe
+    name = program_name(input_file)
+    if output_dir is None:
+        output_dir = os.path.join(os.path.dirname(input_file), 'dist')
+    for key in ('use_cache', 'artifact_store', 'incremental', 'optimize_report', 'reproducible'):
+        build_options.pop(key, None)
+
+    reference_paths = artifact_paths(output_dir, name)
+    if reference_paths:
+        print(f"与已有产物比较: {', '.join(reference_paths)}")
+    else:
+        print("输出目录中没有已有产物，先打包一次作为参照")
+        build_exe(input_file, output_dir, reproducible=True, **build_options)
+        reference_paths = artifact_paths(output_dir, name)
+
+    rebuild_dir = tempfile.mkdtemp(prefix='py_to_exe_verify_')
+    try:
+        print("正在重新打包...")
+        build_exe(input_file, rebuild_dir, reproducible=True, **build_options)
+        result = diff_artifacts(reference_paths, artifact_paths(rebuild_dir, name))
+    finally:
+        shutil.rmtree(rebuild_dir, ignore_errors=True)
+    result['reference'] = reference_paths
+    print(format_verify(result))
+    return result
+
+
+_STATUS_LABELS = {'missing': '重新打包后缺少', 'extra': '重新打包后多出', 'changed': '内容不同'}
+
+
+def format_verify(result, limit=20):
+    """把比较结果格式化为多行文本，每个文件最多列出 limit 个不同的成员"""
+    if result['identical']:
+        return f"产物可复现: 两次打包逐字节相同 (sha256 {result['rebuilt_digest']})"
+    lines = [f"产物不可复现: 参照 {result['reference_digest'][:16]}，重新打包 {result['rebuilt_digest'][:16]}"]
+    for item in result['differences']:
+        lines.append(f"  {item['path']}: {_STATUS_LABELS[item['status']]}")
+        if item['status'] == 'changed' and not item['members']:
+            lines.append("      (所有归档成员都相同，差异在归档之外)")
+        for member, status in item['members'][:limit]:
+            lines.append(f"      {member}: {_STATUS_LABELS[status]}")
+        if len(item['members']) > limit:
+            lines.append(f"      ... 另有 {len(item['members']) - limit} 个成员不同")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="可复现构建的校验工具")
+    commands = parser.add_subparsers(dest='command', required=True)
+    verify = commands.add_parser('verify', help="重新打包，与已有产物逐字节比较")
+    verify.add_argument('input_file', help="要打包的 Python 文件")
+    verify.add_argument('-o', '--output-dir', help="已有产物所在的输出目录，默认为脚本所在目录下的 dist")
+    verify.add_argument('--onedir', dest='onefile', action='store_false', help="文件夹形式的产物")
+    verify.add_argument('--windowed', dest='console', action='store_false', help="不显示控制台窗口")
+    diff = commands.add_parser('diff', help="比较两份已有产物")
+    diff.add_argument('reference', help="参照产物 (EXE 文件或文件夹)")
+    diff.add_argument('rebuilt', help="另一份产物")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'verify':
+            result = verify_build(args.input_file, args.output_dir, onefile=args.onefile, console=args.console)
+        else:
+            for path in (args.reference, args.rebuilt):
+                if not os.path.exists(path):
+                    raise FileNotFoundError(f"产物不存在: {path}")
+            result = diff_artifacts([args.reference], [args.rebuilt])
+            print(format_verify(result))
+    except Exception as e:
+        print(f"校验过程中出错: {str(e)}", file=sys.stderr)
+        return 2
+    return 0 if result['identical'] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
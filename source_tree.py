@@ -0,0 +1,277 @@
+"""
+源码树哈希：项目模式下按整个源码树 (而不只是脚本的导入闭包) 判断是否需要重新构建
+
+目录的摘要由其中文件和子目录的摘要组成 (Merkle 树)，只与相对路径和文件内容有关，
+源码树放在不同位置、修改时间变化都不影响摘要。上一次的结果保存在状态文件中：
+大小和修改时间都没变的文件直接复用记录的摘要而不读取，其余文件在线程池中并行哈希；
+比较新旧摘要时跳过摘要相同的子树，只在变化的子树中找出变化的文件。
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# 状态文件格式版本，修改摘要的计算方式时需要递增
+TREE_FORMAT_VERSION = 2
+
+# 默认状态目录，可通过环境变量 PY_TO_EXE_TREE_DIR 覆盖
+DEFAULT_STATE_DIR = os.environ.get(
+    'PY_TO_EXE_TREE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'py_to_exe', 'trees')
+)
+
+# 源码树根目录下不属于源码的目录；只在根目录中跳过，且含有 __init__.py 的包从不跳过
+# (另外在任何层级都跳过 __pycache__、以 . 开头的目录、*.egg-info 和虚拟环境)
+IGNORED_DIRS = frozenset({'build', 'dist', 'node_modules', 'venv', 'env', 'htmlcov'})
+IGNORED_SUFFIXES = ('.pyc', '.pyo', '.swp', '~')
+
+# 修改时间距扫描时刻太近的文件下次仍要重新哈希：同一时间粒度内再次修改时
+# 大小和修改时间可能都不变 (与 git 的 "racy clean" 相同的问题)
+RACY_WINDOW_NS = 2 * 10 ** 9
+
+# 需要哈希的文件少于这个数时不使用线程池
+PARALLEL_THRESHOLD = 8
+
+_CHUNK_SIZE = 1024 * 1024
+
+
+def _ignored_dir(entry, top_level):
+    name = entry.name
+    if name.startswith('.') or name == '__pycache__' or name.endswith('.egg-info'):
+        return True
+    if os.path.isfile(os.path.join(entry.path, '__init__.py')):
+        return False
+    if top_level and name in IGNORED_DIRS:
+        return True
+    return os.path.isfile(os.path.join(entry.path, 'pyvenv.cfg'))
+
+
+def _ignored_file(name):
+    return name.startswith('.') or name.endswith(IGNORED_SUFFIXES)
+
+
+def list_files(root, exclude=()):
+    """
+    列出源码树中的文件
+
+    参数:
+        root (str): 源码树根目录
+        exclude (list, optional): 额外跳过的目录 (例如位于源码树中的输出目录)
+
+    返回:
+        dict: {以 / 分隔的相对路径: os.stat_result}
+    """
+    root = os.path.abspath(root)
+    exclude = {os.path.abspath(path) for path in exclude}
+    files = {}
+    pending = ['']
+    while pending:
+        rel_dir = pending.pop()
+        try:
+            entries = list(os.scandir(os.path.join(root, rel_dir)))
+        except OSError:
+            continue
+        for entry in entries:
+            rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not _ignored_dir(entry, not rel_dir) and entry.path not in exclude:
+                        pending.append(rel)
+                elif entry.is_file() and not _ignored_file(entry.name):
+                    files[rel] = entry.stat()
+            except OSError:
+                # 扫描过程中被删除的文件
+                continue
+    return files
+
+
+def _hash_file(path):
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _dir_digests(file_digests):
+    """按 Merkle 树计算每个目录的摘要，返回 {相对目录 ('' 为根目录): 摘要}"""
+    children = {'': []}
+    for rel in file_digests:
+        parent, _, name = rel.rpartition('/')
+        # 补全各级目录
+        missing = []
+        while parent not in children:
+            children[parent] = []
+            missing.append(parent)
+            parent = parent.rpartition('/')[0]
+        for rel_dir in missing:
+            grand, _, dir_name = rel_dir.rpartition('/')
+            children[grand].append(('d', dir_name, rel_dir))
+        children[rel.rpartition('/')[0]].append(('f', name, rel))
+
+    digests = {}
+    # 先计算深的目录，父目录用到子目录的摘要时已经算好
+    for rel_dir in sorted(children, key=lambda d: d.count('/') + bool(d), reverse=True):
+        hasher = hashlib.sha256()
+        for kind, name, rel in sorted(children[rel_dir], key=lambda item: item[1]):
+            digest = file_digests[rel] if kind == 'f' else digests[rel]
+            hasher.update(f"{kind}\t{name}\t{digest}\n".encode('utf-8'))
+        digests[rel_dir] = hasher.hexdigest()
+    return digests
+
+
+def _changed_files(old_files, old_dirs, new_files, new_dirs):
+    """比较两次结果，跳过摘要相同的子树，返回新增、修改和删除的文件 (已排序)"""
+    children = {}
+    for rel in new_files:
+        parent = rel.rpartition('/')[0]
+        children.setdefault(parent, set()).add(rel)
+    for rel_dir in new_dirs:
+        if rel_dir:
+            children.setdefault(rel_dir.rpartition('/')[0], set()).add(rel_dir)
+
+    changed = set()
+    pending = ['']
+    while pending:
+        rel_dir = pending.pop()
+        if old_dirs.get(rel_dir) == new_dirs.get(rel_dir):
+            continue
+        for rel in children.get(rel_dir, ()):
+            if rel in new_dirs:
+                pending.append(rel)
+            elif old_files.get(rel) != new_files[rel]:
+                changed.add(rel)
+    changed.update(rel for rel in old_files if rel not in new_files)
+    return sorted(changed)
+
+
+def _state_path(root, state_dir):
+    digest = hashlib.sha256(os.path.abspath(root).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(state_dir or DEFAULT_STATE_DIR, f"{digest}.json")
+
+
+def _load_state(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') == TREE_FORMAT_VERSION:
+            return state
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def _save_state(path, state):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + f".{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        # 状态写入失败只影响下次的速度
+        pass
+
+
+def hash_tree(root, exclude=(), state_dir=None, workers=None):
+    """
+    计算源码树的摘要
+
+    参数:
+        root (str): 源码树根目录
+        exclude (list, optional): 额外跳过的目录
+        state_dir (str, optional): 状态目录，默认为 ~/.cache/py_to_exe/trees
+        workers (int, optional): 哈希线程数，默认为 min(32, CPU 核数 + 4)
+
+    返回:
+        dict: digest (整个源码树的摘要)、files (文件数)、hashed (本次读取的文件数)、
+            changed (与上一次相比新增、修改或删除的文件，首次计算时为 None)、seconds
+    """
+    start = time.perf_counter()
+    root = os.path.abspath(root)
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f"源码目录不存在: {root}")
+    state_path = _state_path(root, state_dir)
+    state = _load_state(state_path)
+    old_files = state['files'] if state else {}
+
+    scan_ns = time.time_ns()
+    stats = list_files(root, exclude)
+    digests = {}
+    pending = []
+    for rel, st in stats.items():
+        old = old_files.get(rel)
+        if old and old[0] == st.st_size and old[1] == st.st_mtime_ns:
+            digests[rel] = old[2]
+        else:
+            pending.append(rel)
+
+    def hash_one(rel):
+        return _hash_file(os.path.join(root, *rel.split('/')))
+
+    # 文件读取和 sha256 计算都会释放 GIL，线程池可以并行
+    if len(pending) < PARALLEL_THRESHOLD:
+        hashed = [hash_one(rel) for rel in pending]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            hashed = list(pool.map(hash_one, pending))
+    digests.update(zip(pending, hashed))
+
+    dirs = _dir_digests(digests)
+    changed = None
+    if state:
+        changed = _changed_files({rel: entry[2] for rel, entry in old_files.items()}, state['dirs'], digests, dirs)
+
+    if pending or not state or len(old_files) != len(digests):
+        files = {}
+        for rel, st in stats.items():
+            mtime_ns = st.st_mtime_ns if scan_ns - st.st_mtime_ns > RACY_WINDOW_NS else -1
+            files[rel] = [st.st_size, mtime_ns, digests[rel]]
+        _save_state(state_path, {'version': TREE_FORMAT_VERSION, 'root': root, 'files': files, 'dirs': dirs})
+
+    return {
+        'digest': dirs[''],
+        'files': len(digests),
+        'hashed': len(pending),
+        'changed': changed,
+        'seconds': round(time.perf_counter() - start, 3),
+    }
+
+
+def format_tree(result, limit=5):
+    """把 hash_tree 的结果格式化为一行文本"""
+    line = f"源码树: {result['files']} 个文件，读取 {result['hashed']} 个，用时 {result['seconds']:.2f}s"
+    changed = result['changed']
+    if changed is None:
+        return line + "，首次计算"
+    if not changed:
+        return line + "，没有变化"
+    shown = ', '.join(changed[:limit]) + (f" 等 {len(changed)} 个" if len(changed) > limit else '')
+    return line + f"，变化: {shown}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="计算源码树的摘要，列出与上一次相比变化的文件")
+    parser.add_argument('root', help="源码树根目录")
+    parser.add_argument('--exclude', action='append', default=[], help="跳过的目录，可重复")
+    parser.add_argument('-j', '--jobs', type=int, default=None, help="哈希线程数")
+    args = parser.parse_args(argv)
+
+    try:
+        result = hash_tree(args.root, args.exclude, workers=args.jobs)
+    except OSError as e:
+        print(f"出错: {str(e)}", file=sys.stderr)
+        return 1
+    print(result['digest'])
+    print(format_tree(result, limit=20))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,340 @@
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import shlex
+import argparse
+import platform
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+
+from packager_core import build_exe
+from project import program_name
+
+# 超过基准多少比例视为性能回退
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+# 单文件模式下，运行时会被解压到临时目录的归档条目类型 (模块和脚本直接从归档中读取)
+_EXTRACTED_TYPECODES = ('b', 'x', 'd', 'l', 'n', 'Z')
+
+
+def percentile(values, pct):
+    """最近秩法计算百分位数：排序后第 ceil(pct / 100 * n) 个值 (至少为第 1 个)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    # 先乘后除，整数百分位不会因浮点误差 (7 / 100 * 100 = 7.000000000000001) 多进一位
+    rank = max(1, math.ceil(pct * len(ordered) / 100))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples):
+    """把一组耗时 (秒) 汇总为毫秒统计"""
+    if not samples:
+        return None
+    ms = [s * 1000 for s in samples]
+    return {
+        'runs': len(ms),
+        'min_ms': round(min(ms), 2),
+        'p50_ms': round(percentile(ms, 50), 2),
+        'p95_ms': round(percentile(ms, 95), 2),
+        'max_ms': round(max(ms), 2),
+        'mean_ms': round(sum(ms) / len(ms), 2),
+    }
+
+
+def _drop_page_cache():
+    """尝试清空系统页缓存以模拟冷启动 (需要 root 权限，仅 Linux)，返回是否成功"""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        os.sync()
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3\n')
+        return True
+    except OSError:
+        return False
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def unpacked_bytes(exe_path):
+    """
+    根据单文件 EXE 内嵌归档的目录计算每次启动要解压到临时目录的字节数
+
+    无法读取归档 (未安装 PyInstaller 或不是单文件 EXE) 时返回 None
+    """
+    try:
+        from PyInstaller.archive.readers import CArchiveReader
+        reader = CArchiveReader(exe_path)
+    except Exception:
+        return None
+    return sum(entry[2] for entry in reader.toc.values() if entry[4] in _EXTRACTED_TYPECODES)
+
+
+class _TempDirWatcher(threading.Thread):
+    """运行期间轮询临时目录，记录其最大字节数 (读取不到归档时的后备方案)"""
+
+    def __init__(self, path, interval=0.005):
+        super().__init__(daemon=True)
+        self.path = path
+        self.interval = interval
+        self.peak = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            self.peak = max(self.peak, _dir_size(self.path))
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+def launch_once(exe_path, args=None, timeout=60, watch_tmp=False):
+    """
+    启动一次可执行文件并等待其退出
+
+    每次启动使用新的空临时目录，单文件模式的解压不会受之前运行的影响。
+    返回 {'seconds', 'returncode', 'peak_rss_bytes', 'tmp_peak_bytes'}
+    """
+    tmp_dir = tempfile.mkdtemp(prefix='py_to_exe_bench_')
+    env = dict(os.environ, TMPDIR=tmp_dir, TEMP=tmp_dir, TMP=tmp_dir)
+    watcher = _TempDirWatcher(tmp_dir) if watch_tmp else None
+    peak_rss = None
+    try:
+        start = time.perf_counter()
+        process = subprocess.Popen([exe_path] + list(args or []), env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if watcher:
+            watcher.start()
+        if hasattr(os, 'wait4'):
+            # wait4 同时返回子进程 (及其已退出的子进程) 的资源占用
+            deadline = start + timeout
+            while True:
+                pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+                if pid:
+                    break
+                if time.perf_counter() > deadline:
+                    process.kill()
+                    pid, status, usage = os.wait4(process.pid, 0)
+                    raise subprocess.TimeoutExpired(exe_path, timeout)
+                time.sleep(0.0005)
+            elapsed = time.perf_counter() - start
+            returncode = os.waitstatus_to_exitcode(status)
+            process.returncode = returncode
+            # Linux 上 ru_maxrss 以 KB 为单位，macOS 上以字节为单位
+            peak_rss = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+        else:
+            returncode = process.wait(timeout=timeout)
+            elapsed = time.perf_counter() - start
+    finally:
+        if watcher:
+            watcher.stop()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    return {
+        'seconds': elapsed,
+        'returncode': returncode,
+        'peak_rss_bytes': peak_rss,
+        'tmp_peak_bytes': watcher.peak if watcher else None,
+    }
+
+
+def benchmark_executable(exe_path, runs=10, args=None, warmup=1, timeout=60):
+    """
+    测量可执行文件的启动耗时
+
+    冷启动: 能够清空页缓存 (Linux root) 时，每次启动前都清空；否则只有构建后的第一次启动计为冷启动。
+    热启动: 预热 warmup 次后连续启动 runs 次。
+    """
+    exe_path = os.path.abspath(exe_path)
+    cold = []
+    cold_method = 'drop-caches' if _drop_page_cache() else 'first-run'
+    if cold_method == 'drop-caches':
+        for i in range(runs):
+            if i:
+                _drop_page_cache()
+            cold.append(launch_once(exe_path, args, timeout))
+    else:
+        cold.append(launch_once(exe_path, args, timeout))
+
+    for _ in range(warmup):
+        launch_once(exe_path, args, timeout)
+    unpacked = unpacked_bytes(exe_path) if os.path.isfile(exe_path) else 0
+    warm = [launch_once(exe_path, args, timeout, watch_tmp=unpacked is None) for _ in range(runs)]
+
+    samples = cold + warm
+    failures = [s['returncode'] for s in samples if s['returncode'] != 0]
+    rss = [s['peak_rss_bytes'] for s in samples if s['peak_rss_bytes'] is not None]
+    if unpacked is None:
+        unpacked = max((s['tmp_peak_bytes'] or 0) for s in warm)
+
+    return {
+        'exe': exe_path,
+        'size_bytes': os.path.getsize(exe_path) if os.path.isfile(exe_path) else _dir_size(os.path.dirname(exe_path)),
+        'cold_method': cold_method,
+        'cold': summarize([s['seconds'] for s in cold]),
+        'warm': summarize([s['seconds'] for s in warm]),
+        'peak_rss_bytes': max(rss) if rss else None,
+        'unpacked_bytes': unpacked,
+        'failed_runs': len(failures),
+    }
+
+
+def _find_executable(output_dir, name, onefile):
+    base = output_dir if onefile else os.path.join(output_dir, name)
+    for candidate in (name, name + '.exe'):
+        path = os.path.join(base, candidate)
+        if os.path.isfile(path):
+            return path
+    raise FileNotFoundError(f"找不到打包产物: {os.path.join(base, name)}")
+
+
+def run_benchmark(input_file, runs=10, args=None, warmup=1, timeout=60, output_json=None, **build_options):
+    """
+    分别以单文件和文件夹形式打包同一个脚本，并测量两者的启动性能
+
+    参数:
+        input_file (str): 要打包的 Python 文件路径
+        runs (int, optional): 冷启动/热启动各测量的次数，默认为 10
+        args (list, optional): 启动产物时传入的命令行参数
+        warmup (int, optional): 热启动测量前的预热次数，默认为 1
+        timeout (int, optional): 单次启动的超时时间 (秒)
+        output_json (str, optional): 结果 JSON 文件路径
+        **build_options: 其他打包参数，原样传给 build_exe
+
+    返回结果字典
+    """
+    name = program_name(input_file)
+    bench_dir = tempfile.mkdtemp(prefix='py_to_exe_bench_build_')
+    results = {}
+    try:
+        for mode, onefile in (('onefile', True), ('onedir', False)):
+            output_dir = os.path.join(bench_dir, mode)
+            build_exe(input_file, output_dir=output_dir, onefile=onefile,
+                      work_dir=os.path.join(bench_dir, f"work-{mode}"), **build_options)
+            exe_path = _find_executable(output_dir, name, onefile)
+            print(f"正在测量 {mode} 启动耗时...")
+            results[mode] = benchmark_executable(exe_path, runs, args, warmup, timeout)
+            results[mode]['exe'] = os.path.relpath(exe_path, bench_dir)
+            if not onefile:
+                results[mode]['size_bytes'] = _dir_size(os.path.join(output_dir, name))
+    finally:
+        shutil.rmtree(bench_dir, ignore_errors=True)
+
+    report = {
+        'input_file': os.path.abspath(input_file),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'pyinstaller': _pyinstaller_version(),
+        'runs': runs,
+        'results': results,
+    }
+    if output_json:
+        with open(output_json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+def _pyinstaller_version():
+    try:
+        from importlib.metadata import version
+        return version('pyinstaller')
+    except Exception:
+        return 'unknown'
+
+
+def compare_reports(baseline, current, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """
+    与基准结果比较，返回回退项列表 (p50/p95 启动耗时、峰值内存、大小超过基准 threshold 比例)
+    """
+    regressions = []
+    for mode, result in current['results'].items():
+        base = baseline.get('results', {}).get(mode)
+        if not base:
+            continue
+        checks = [
+            ('warm.p50_ms', (base.get('warm') or {}).get('p50_ms'), (result.get('warm') or {}).get('p50_ms')),
+            ('warm.p95_ms', (base.get('warm') or {}).get('p95_ms'), (result.get('warm') or {}).get('p95_ms')),
+            ('cold.p50_ms', (base.get('cold') or {}).get('p50_ms'), (result.get('cold') or {}).get('p50_ms')),
+            ('peak_rss_bytes', base.get('peak_rss_bytes'), result.get('peak_rss_bytes')),
+            ('size_bytes', base.get('size_bytes'), result.get('size_bytes')),
+        ]
+        for metric, old, new in checks:
+            if old and new and new > old * (1 + threshold):
+                regressions.append(f"{mode} {metric}: {old} -> {new} (+{(new / old - 1):.0%})")
+    return regressions
+
+
+def format_benchmark(report):
+    """把测量结果格式化为多行文本"""
+    lines = [f"启动性能 ({report['input_file']}, 每项 {report['runs']} 次):"]
+    for mode, result in report['results'].items():
+        warm = result['warm'] or {}
+        cold = result['cold'] or {}
+        line = (f"  {mode:8} 热启动 p50 {warm.get('p50_ms')} ms / p95 {warm.get('p95_ms')} ms，"
+                f"冷启动 p50 {cold.get('p50_ms')} ms ({result['cold_method']})")
+        if result['peak_rss_bytes']:
+            line += f"，峰值内存 {result['peak_rss_bytes'] / 1024 / 1024:.1f} MB"
+        line += (f"，解压 {(result['unpacked_bytes'] or 0) / 1024 / 1024:.1f} MB"
+                 f"，大小 {result['size_bytes'] / 1024 / 1024:.1f} MB")
+        if result['failed_runs']:
+            line += f"，{result['failed_runs']} 次运行返回非零退出码"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比较单文件与文件夹模式产物的启动性能")
+    parser.add_argument('input_file', help="要打包的 Python 文件")
+    parser.add_argument('-n', '--runs', type=int, default=10, help="冷启动/热启动各测量的次数，默认为 10")
+    parser.add_argument('--warmup', type=int, default=1, help="热启动测量前的预热次数，默认为 1")
+    parser.add_argument('--timeout', type=int, default=60, help="单次启动的超时时间 (秒)")
+    parser.add_argument('-o', '--output', help="结果 JSON 文件")
+    parser.add_argument('--baseline', help="基准结果 JSON 文件，超过阈值时以退出码 1 退出")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="回退阈值 (比例)，默认为 0.10")
+    parser.add_argument('--windowed', dest='console', action='store_false', help="不显示控制台窗口")
+    parser.add_argument('--hidden-import', dest='hidden_imports', action='append', metavar='MODULE')
+    parser.add_argument('--script-args', default='', help="启动产物时传入的参数，例如 \"--version\"")
+    args = parser.parse_args()
+    script_args = shlex.split(args.script_args)
+
+    try:
+        report = run_benchmark(args.input_file, runs=args.runs, args=script_args, warmup=args.warmup,
+                               timeout=args.timeout, output_json=args.output,
+                               console=args.console, hidden_imports=args.hidden_imports)
+    except Exception as e:
+        print(f"测量过程中出错: {str(e)}")
+        sys.exit(2)
+
+    print(format_benchmark(report))
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare_reports(json.load(f), report, args.threshold)
+        if regressions:
+            print("性能回退:")
+            for item in regressions:
+                print(f"  {item}")
+            sys.exit(1)
+        print("与基准相比没有回退")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+"""
+产物仓库的 HTTP 对象服务器：把一个目录按 S3 风格的对象接口共享给多台构建机
+
+对象按 LocalArtifactStore 的目录结构保存在仓库目录中，同一个目录也可以直接用作本地仓库。
+客户端为 artifact_store.HttpArtifactStore (--artifact-store http://主机:端口)。
+
+接口 (对象名称只能由字母、数字、.、_、- 和 / 组成，如 records/<键>.json):
+    HEAD /<name>           对象是否存在 (200 或 404)
+    GET  /<name>           读取对象
+    PUT  /<name>           写入对象 (需要 Content-Length)，先写临时文件再改名，读取方不会看到写了一半的对象
+    GET  /?prefix=<前缀>   以前缀开头的对象名称 (JSON 列表)
+
+用法:
+    python store_server.py [目录] [--host 127.0.0.1] [--port 8766] [--token TOKEN]
+"""
+import os
+import re
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from artifact_store import LocalArtifactStore, STORE_TOKEN_ENV
+
+DEFAULT_PORT = 8766
+
+# 单个对象的大小上限
+MAX_OBJECT = 2 * 1024 * 1024 * 1024
+
+_NAME_PATTERN = re.compile(r'[A-Za-z0-9._-]+(?:/[A-Za-z0-9._-]+)*')
+
+
+def _valid_name(name):
+    """对象名称是否合法 (不含 . 或 .. 路径段，不能逃出仓库目录)"""
+    return bool(_NAME_PATTERN.fullmatch(name)) and not any(part in ('.', '..') for part in name.split('/'))
+
+
+def serve_store(root=None, host='127.0.0.1', port=DEFAULT_PORT, token=None):
+    """
+    创建对象服务器 (尚未开始处理请求)，调用其 serve_forever() 开始服务
+
+    参数:
+        root (str, optional): 仓库目录，默认为 artifact_store.DEFAULT_STORE_DIR
+        host, port: 监听地址和端口，port 为 0 时由系统分配
+        token (str, optional): 设置后请求需要带 Authorization: Bearer <token>
+    """
+    httpd = ThreadingHTTPServer((host, port), StoreRequestHandler)
+    httpd.daemon_threads = True
+    httpd.store = LocalArtifactStore(root)
+    httpd.token = token
+    return httpd
+
+
+class StoreRequestHandler(BaseHTTPRequestHandler):
+    """对象服务器的请求处理"""
+
+    server_version = 'py_to_exe_store/1'
+
+    def log_message(self, format, *args):
+        sys.stderr.write(f"[{self.log_date_time_string()}] {self.address_string()} {format % args}\n")
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _send_error(self, status, message):
+        self._send_json({'error': message}, status)
+
+    def _object(self):
+        """检查令牌并解析对象名称 (列出对象时为空字符串)；出错时已发送响应并返回 None"""
+        if self.server.token and self.headers.get('Authorization') != f"Bearer {self.server.token}":
+            self._send_error(401, "需要有效的令牌")
+            return None
+        name = unquote(urlsplit(self.path).path).strip('/')
+        if name and not _valid_name(name):
+            self._send_error(400, f"不合法的对象名称: {name}")
+            return None
+        return name
+
+    def _send_object(self, name):
+        path = self.server.store._path(name)
+        if not os.path.isfile(path):
+            self._send_error(404, f"没有这个对象: {name}")
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(os.path.getsize(path)))
+        self.end_headers()
+        if self.command == 'GET':
+            with open(path, 'rb') as f:
+                shutil.copyfileobj(f, self.wfile)
+
+    def do_HEAD(self):
+        name = self._object()
+        if name:
+            self._send_object(name)
+        elif name == '':
+            self._send_error(405, "HEAD 需要对象名称")
+
+    def do_GET(self):
+        name = self._object()
+        if name is None:
+            return
+        if name:
+            self._send_object(name)
+            return
+        prefix = parse_qs(urlsplit(self.path).query).get('prefix', [''])[0]
+        directory, _, _ = prefix.rpartition('/')
+        if directory and not _valid_name(directory):
+            self._send_error(400, f"不合法的前缀: {prefix}")
+            return
+        names = self.server.store._list(directory + '/') if directory else sorted(
+            entry for entry in os.listdir(self.server.store.root) if not entry.endswith('.tmp'))
+        self._send_json([n for n in names if n.startswith(prefix)])
+
+    def do_PUT(self):
+        name = self._object()
+        if name is None:
+            return
+        if not name:
+            self._send_error(405, "PUT 需要对象名称")
+            return
+        try:
+            length = int(self.headers['Content-Length'])
+        except (TypeError, ValueError):
+            self._send_error(411, "需要 Content-Length")
+            return
+        if length > MAX_OBJECT:
+            self._send_error(413, f"对象超过 {MAX_OBJECT // 1024 // 1024} MB")
+            return
+        target = self.server.store._path(name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # 同时写入同一对象的请求各自使用临时文件，改名是原子的
+        fd, tmp = tempfile.mkstemp(prefix=os.path.basename(target) + '.', suffix='.tmp', dir=os.path.dirname(target))
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                remaining = length
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                    if not chunk:
+                        raise ConnectionError("上传中断")
+                    f.write(chunk)
+                    remaining -= len(chunk)
+            os.replace(tmp, target)
+        except (OSError, ConnectionError) as e:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            self.close_connection = True
+            self._send_error(500, f"写入对象失败: {str(e)}")
+            return
+        self._send_json({'name': name, 'bytes': length}, 201)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="产物仓库的 HTTP 对象服务器")
+    parser.add_argument('root', nargs='?', help="仓库目录，默认为 ~/.cache/py_to_exe/artifacts")
+    parser.add_argument('--host', default='127.0.0.1', help="监听地址，默认只接受本机连接")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"监听端口，默认为 {DEFAULT_PORT}")
+    parser.add_argument('--token', default=os.environ.get(STORE_TOKEN_ENV),
+                        help=f"要求客户端提供的令牌，默认取环境变量 {STORE_TOKEN_ENV}")
+    args = parser.parse_args(argv)
+
+    httpd = serve_store(args.root, args.host, args.port, args.token)
+    if args.host not in ('127.0.0.1', 'localhost', '::1') and not args.token:
+        print("警告: 服务器接受其他机器的连接且没有设置令牌，任何人都可以读写仓库", file=sys.stderr)
+    print(f"产物仓库已启动: http://{args.host}:{httpd.server_address[1]} ({httpd.store.root})")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        print("正在停止产物仓库...")
+    finally:
+        httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
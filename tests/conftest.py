@@ -0,0 +1,44 @@
+"""
+测试公共设置
+
+各模块在导入时读取缓存目录的环境变量，这里在导入任何被测模块之前把它们指向临时目录，
+测试不会读写 ~/.cache/py_to_exe。
+"""
+import os
+import sys
+import shutil
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+_STATE_DIR = tempfile.mkdtemp(prefix='py_to_exe_tests_')
+os.environ['PY_TO_EXE_CACHE_DIR'] = os.path.join(_STATE_DIR, 'builds')
+os.environ['PY_TO_EXE_SCAN_CACHE'] = os.path.join(_STATE_DIR, 'imports.json')
+os.environ['PY_TO_EXE_TREE_DIR'] = os.path.join(_STATE_DIR, 'trees')
+os.environ['PY_TO_EXE_LAUNCHER_DIR'] = os.path.join(_STATE_DIR, 'launchers')
+os.environ['PY_TO_EXE_WORK_DIR'] = os.path.join(_STATE_DIR, 'work')
+os.environ.pop('PY_TO_EXE_SERVER', None)
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_STATE_DIR, ignore_errors=True)
+
+
+@pytest.fixture
+def write_files(tmp_path):
+    """按 {相对路径: 内容} 在临时目录中创建文件，返回临时目录"""
+    def write(files):
+        for rel, content in files.items():
+            path = tmp_path / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content, encoding='utf-8')
+        return tmp_path
+    return write
+
+
+def has_pyinstaller():
+    return shutil.which('pyinstaller') is not None
@@ -0,0 +1,96 @@
+"""产物仓库：索引锁和 HTTP 后端"""
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import subprocess
+
+import pytest
+
+from artifact_store import LocalArtifactStore, HttpArtifactStore, open_store, STALE_LOCK_SECONDS
+from store_server import serve_store
+
+
+def _write_lock(store, **owner):
+    lock = dict({'host': socket.gethostname(), 'pid': os.getpid(), 'created': time.time(), 'token': 'other'}, **owner)
+    with open(os.path.join(store.root, store.LOCK_NAME), 'w', encoding='utf-8') as f:
+        json.dump(lock, f)
+    return lock
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_live_lock_is_not_stolen(tmp_path):
+    store = LocalArtifactStore(str(tmp_path))
+    _write_lock(store)
+    with pytest.raises(TimeoutError):
+        with store._locked(timeout=0.3):
+            pass
+    # 等待超时后锁仍归原持有者
+    assert os.path.isfile(os.path.join(store.root, store.LOCK_NAME))
+
+
+@pytest.mark.parametrize('reason', ['dead-pid', 'expired'])
+def test_stale_lock_is_broken(tmp_path, reason):
+    store = LocalArtifactStore(str(tmp_path))
+    if reason == 'dead-pid':
+        _write_lock(store, pid=_dead_pid())
+    else:
+        _write_lock(store, host='other-host', created=time.time() - STALE_LOCK_SECONDS - 1)
+    with store._locked(timeout=5):
+        with open(os.path.join(store.root, store.LOCK_NAME), encoding='utf-8') as f:
+            assert json.load(f)['pid'] == os.getpid()
+    assert not os.path.exists(os.path.join(store.root, store.LOCK_NAME))
+
+
+def test_release_keeps_lock_taken_over_by_another_process(tmp_path):
+    store = LocalArtifactStore(str(tmp_path))
+    with store._locked():
+        # 本进程的锁被当作失效锁删除，另一个进程取得了锁
+        os.remove(os.path.join(store.root, store.LOCK_NAME))
+        lock = _write_lock(store, token='new-holder')
+    with open(os.path.join(store.root, store.LOCK_NAME), encoding='utf-8') as f:
+        assert json.load(f) == lock
+
+
+@pytest.fixture
+def store_url(tmp_path):
+    httpd = serve_store(str(tmp_path / 'remote'), '127.0.0.1', 0, token='secret')
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_http_store_publish_and_fetch(store_url, tmp_path):
+    dist = tmp_path / 'dist'
+    (dist / 'app').mkdir(parents=True)
+    (dist / 'app' / 'app.bin').write_bytes(os.urandom(3 * 1024 * 1024))
+    (dist / 'tool').write_text('tool')
+    store = HttpArtifactStore(store_url, token='secret')
+    key = 'ab' * 32
+    assert not store.has(key) and store.fetch(key, str(tmp_path / 'out')) is None
+
+    store.publish(key, str(dist), ['app', 'tool'], {'pyinstaller': '6.0'})
+    assert store.has(key)
+    assert [r['key'] for r in store.records()] == [key]
+    assert store.fetch(key, str(tmp_path / 'out')) == ['app', 'tool']
+    assert (tmp_path / 'out' / 'app' / 'app.bin').read_bytes() == (dist / 'app' / 'app.bin').read_bytes()
+    # 服务器上的目录与本地仓库的结构相同
+    assert LocalArtifactStore(str(tmp_path / 'remote')).has(key)
+
+
+def test_http_store_rejects_bad_requests(store_url, monkeypatch):
+    monkeypatch.delenv('PY_TO_EXE_STORE_TOKEN', raising=False)
+    with pytest.raises(OSError, match='401'):
+        HttpArtifactStore(store_url).has('cd' * 32)
+    with pytest.raises(OSError, match='400'):
+        HttpArtifactStore(store_url, token='secret')._write('../evil.json', b'{}')
+    assert isinstance(open_store(store_url), HttpArtifactStore)
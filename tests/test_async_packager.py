@@ -0,0 +1,170 @@
+"""异步打包接口：结果、输出、取消和超时"""
+import asyncio
+import os
+import subprocess
+import sys
+import threading
+
+import pytest
+
+import async_packager
+from conftest import has_pyinstaller
+from async_packager import AsyncPackager, start_build, build_async, TIMED_OUT
+from job_queue import SUCCEEDED, FAILED, CANCELLED
+from process_runner import ProcessCancelled
+
+
+class FakeBuild:
+    """
+    代替 build_exe：输出几行后等待 release 或 cancel_event，被取消时像 build_exe 一样清理后抛出 ProcessCancelled
+
+    error 不为 None 时输出后抛出该异常
+    """
+
+    def __init__(self, block=False, error=None):
+        self.block = block
+        self.error = error
+        self.calls = []
+        self.cleaned = []
+        self.release = threading.Event()
+
+    def __call__(self, input_file, cancel_event=None, on_phase=None, **options):
+        self.calls.append(input_file)
+        on_phase('analysis', 2, 7)
+        print(f"building {input_file}")
+        sys.stderr.write("warning line\npartial")
+        if self.block:
+            while not self.release.wait(0.01):
+                if cancel_event.is_set():
+                    self.cleaned.append(input_file)
+                    raise ProcessCancelled("已取消")
+        if self.error is not None:
+            raise self.error
+        return options.get('output_dir') or 'dist'
+
+
+@pytest.fixture
+def fake(monkeypatch):
+    build = FakeBuild()
+    monkeypatch.setattr(async_packager, 'build_exe', build)
+    return build
+
+
+def test_result_and_lines(fake, tmp_path):
+    log_path = str(tmp_path / 'build.log')
+    stdout = sys.stdout
+
+    async def run():
+        build = start_build('app.py', log_path=log_path, output_dir='out')
+        lines = [line async for line in build.lines()]
+        return build, lines, await build
+
+    build, lines, result = asyncio.run(run())
+    assert lines == ['building app.py', 'warning line', 'partial']
+    assert result['status'] == SUCCEEDED and result['exit_code'] == 0 and result['error'] is None
+    assert result['output_dir'] == 'out' and result['tail'] == lines and result['log'] == log_path
+    assert build.phase == 'analysis' and build.total_lines == 3
+    with open(log_path, encoding='utf-8') as f:
+        assert f.read() == "building app.py\nwarning line\npartial"
+    # 打包结束后恢复 stdout
+    assert sys.stdout is stdout
+
+
+@pytest.mark.parametrize('error, message, error_type, exit_code', [
+    (subprocess.CalledProcessError(2, ['pyinstaller']), "PyInstaller 返回码 2", 'CalledProcessError', 1),
+    (FileNotFoundError("输入文件不存在: app.py"), "输入文件不存在: app.py", 'FileNotFoundError', 4),
+    (ImportError("未安装 PyInstaller"), "未安装 PyInstaller", 'ImportError', 3),
+    (SystemExit(1), "打包过程中调用了 sys.exit(1)", 'SystemExit', 1),
+], ids=['pyinstaller', 'input', 'dependency', 'sys-exit'])
+def test_errors_are_returned(fake, error, message, error_type, exit_code):
+    fake.error = error
+    result = asyncio.run(build_async('app.py'))
+    assert (result['status'], result['error'], result['error_type'], result['exit_code']) == (
+        FAILED, message, error_type, exit_code)
+    assert result['output_dir'] is None
+    assert result['tail'][-1].endswith(f"打包过程中出错: {message}")
+
+
+def test_cancel_running_build(fake):
+    fake.block = True
+
+    async def run():
+        build = start_build('app.py')
+        async for line in build.lines():
+            if line == 'building app.py':
+                build.cancel()
+        return await build
+
+    result = asyncio.run(run())
+    assert result['status'] == CANCELLED and result['error'] == "已取消" and result['error_type'] is None
+    assert result['exit_code'] == 1 and fake.cleaned == ['app.py']
+
+
+def test_cancelling_waiting_task_waits_for_cleanup(fake):
+    fake.block = True
+
+    async def run():
+        build = start_build('app.py')
+        task = asyncio.ensure_future(build.result())
+        while not fake.calls:
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # 取消传出时 build_exe 已经清理完毕
+        return list(fake.cleaned)
+
+    assert asyncio.run(run()) == ['app.py']
+
+
+def test_timeout_stops_build(fake):
+    fake.block = True
+    result = asyncio.run(build_async('app.py', timeout=0.2))
+    assert result['status'] == TIMED_OUT and result['exit_code'] == 1
+    assert result['error'] == "超过 0.2 秒仍未完成，已结束打包"
+    assert fake.cleaned == ['app.py'] and result['duration'] < 5
+
+
+def test_packager_limits_concurrency(fake):
+    fake.block = True
+
+    async def run():
+        with AsyncPackager(max_concurrent=1) as packager:
+            first = packager.start('first.py')
+            queued = packager.start('queued.py')
+            cancelled = packager.start('cancelled.py')
+            while not fake.calls:
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.1)
+            # 名额被占满时其他打包排队，取消的打包不再运行
+            assert fake.calls == ['first.py']
+            cancelled.cancel()
+            fake.release.set()
+            return await asyncio.gather(first, queued, cancelled)
+
+    results = asyncio.run(run())
+    assert [result['status'] for result in results] == [SUCCEEDED, SUCCEEDED, CANCELLED]
+    assert fake.calls == ['first.py', 'queued.py']
+    assert results[1]['queued'] > 0
+
+
+def test_concurrent_outputs_are_separate(fake):
+    async def run():
+        with AsyncPackager(max_concurrent=4) as packager:
+            return await packager.build_many([{'input_file': f"app{i}.py"} for i in range(8)])
+
+    results = asyncio.run(run())
+    for i, result in enumerate(results):
+        assert result['input_file'] == f"app{i}.py" and result['status'] == SUCCEEDED
+        assert result['tail'] == [f"building app{i}.py", 'warning line', 'partial']
+
+
+@pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+def test_timeout_kills_real_build(write_files, tmp_path):
+    root = write_files({'hello.py': 'print("hello")\n'})
+    output_dir = tmp_path / 'out'
+    result = asyncio.run(build_async(str(root / 'hello.py'), timeout=1, output_dir=str(output_dir),
+                                     preflight=False))
+    assert result['status'] == TIMED_OUT and result['output_dir'] is None
+    # 未完成的产物已删除
+    assert os.listdir(output_dir) == []
@@ -0,0 +1,94 @@
+"""批量打包：读取清单、预检和并行打包，项目目标按源码目录预检和打包"""
+import os
+import json
+import subprocess
+
+import pytest
+
+from conftest import has_pyinstaller
+from batch_packager import load_manifest, preflight_jobs, run_batch, format_summary
+
+PROJECT = {
+    'demo/pyproject.toml': '[project]\nname = "demo"\n\n[project.scripts]\ndemo = "demo.cli:main"\n',
+    'demo/src/demo/__init__.py': '',
+    'demo/src/demo/cli.py': 'from demo import util\n\ndef main():\n    print(util.message())\n    return 0\n',
+    'demo/src/demo/util.py': 'def message():\n    return "batch-project-ok"\n',
+    'tool.py': 'print("batch-script-ok")\n',
+}
+
+
+def _manifest(root, jobs):
+    path = root / 'build.json'
+    path.write_text(json.dumps({'defaults': {'output_dir': 'dist'}, 'jobs': jobs}), encoding='utf-8')
+    return str(path)
+
+
+def test_manifest_merges_defaults_and_filters_targets(write_files):
+    root = write_files({'a.py': '', 'tools/b.py': ''})
+    path = root / 'build.toml'
+    path.write_text('[defaults]\nonefile = false\noutput_dir = "dist"\n\n'
+                    '[[jobs]]\ninput_file = "a.py"\n\n'
+                    '[[jobs]]\nname = "bee"\ninput_file = "tools/b.py"\nonefile = true\n', encoding='utf-8')
+    jobs = load_manifest(str(path))
+    assert [job['onefile'] for job in jobs] == [False, True]
+    # 相对路径以清单所在目录为基准
+    assert jobs[1]['input_file'] == os.path.join(str(root), 'tools/b.py')
+    assert jobs[0]['output_dir'] == os.path.join(str(root), 'dist')
+    assert [job['input_file'] for job in load_manifest(str(path), names=['bee'])] == [jobs[1]['input_file']]
+    with pytest.raises(ValueError, match="没有这些目标"):
+        load_manifest(str(path), names=['missing'])
+
+
+def test_manifest_rejects_unknown_options(write_files):
+    root = write_files({'a.py': ''})
+    with pytest.raises(ValueError, match="未知参数: onefiel"):
+        load_manifest(_manifest(root, [{'input_file': 'a.py', 'onefiel': True}]))
+
+
+def test_preflight_passes_project_targets(write_files):
+    root = write_files(PROJECT)
+    jobs = load_manifest(_manifest(root, [{'input_file': 'demo'}, {'input_file': 'tool.py'}]))
+    passed, rejected = preflight_jobs(jobs)
+    assert rejected == []
+    assert len(passed) == 2
+
+
+def test_preflight_rejects_missing_module(write_files):
+    root = write_files(dict(PROJECT, **{'demo/src/demo/util.py': 'import missing_dependency_xyz\n'}))
+    passed, rejected = preflight_jobs(load_manifest(_manifest(root, [{'input_file': 'demo'}])))
+    assert passed == []
+    assert 'missing_dependency_xyz' in rejected[0]['error']
+
+
+@pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+def test_cli_config_builds_project_in_parallel(write_files):
+    from packager_cli import main
+    root = write_files(PROJECT)
+    config = _manifest(root, [{'input_file': 'demo'}, {'input_file': 'tool.py'}])
+    assert main(['--config', config, '-j', '2']) == 0
+    for name, expected in (('demo', 'batch-project-ok'), ('tool', 'batch-script-ok')):
+        result = subprocess.run([str(root / 'dist' / name)], capture_output=True, text=True, timeout=60)
+        assert result.stdout.strip() == expected
+
+
+@pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+def test_run_batch_isolates_failures(write_files, tmp_path):
+    root = write_files({'good.py': 'print("good")\n', 'missing_dep.py': 'import missing_dependency_xyz\n',
+                        'broken.py': 'def broken(:\n'})
+    jobs = load_manifest(_manifest(root, [{'input_file': 'good.py'}, {'input_file': 'missing_dep.py'},
+                                          # 跳过预检，在工作进程中失败
+                                          {'input_file': 'broken.py', 'preflight': False}]))
+    seen = []
+    summary = run_batch(jobs, max_workers=2, log_dir=str(tmp_path / 'logs'), on_result=seen.append)
+    assert len(seen) == 3
+    results = {os.path.basename(r['input_file']): r for r in summary['results']}
+    assert results['good.py']['status'] == '成功'
+    assert 'missing_dependency_xyz' in results['missing_dep.py']['error']
+    # 预检未通过的任务不占用工作进程，没有日志
+    assert results['missing_dep.py']['log'] is None
+    assert results['broken.py']['status'] == '失败'
+    # 每个工作进程中的任务有独立的日志
+    assert os.path.dirname(results['broken.py']['log']) == str(tmp_path / 'logs')
+    assert results['good.py']['log'] != results['broken.py']['log']
+    assert (summary['succeeded'], summary['failed']) == (1, 2)
+    assert "成功 1 个，失败 2 个" in format_summary(summary)
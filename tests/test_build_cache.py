@@ -0,0 +1,117 @@
+import os
+import sys
+import json
+import time
+import socket
+import threading
+import subprocess
+
+import pytest
+
+from build_cache import BuildCache
+
+CMD = ['pyinstaller', '--noconfirm', '--onefile', '--distpath', 'dist', 'main.py']
+
+
+def test_key_changes_when_imported_module_changes(write_files):
+    root = write_files({'main.py': "import helper\n", 'helper.py': "N = 1\n"})
+    cache = BuildCache(str(root / 'cache'))
+    main = str(root / 'main.py')
+    key = cache.compute_key(main, CMD)
+    assert cache.compute_key(main, CMD) == key
+    (root / 'helper.py').write_text("N = 2\n")
+    assert cache.compute_key(main, CMD) != key
+
+
+def test_key_ignores_output_paths(write_files):
+    root = write_files({'main.py': "print('hi')\n"})
+    cache = BuildCache(str(root / 'cache'))
+    main = str(root / 'main.py')
+    other = ['pyinstaller', '--noconfirm', '--onefile', '--distpath', 'elsewhere', '--workpath', 'w', 'main.py']
+    assert cache.compute_key(main, CMD) == cache.compute_key(main, other)
+
+
+def test_store_lookup_and_stats(tmp_path):
+    cache = BuildCache(str(tmp_path / 'cache'))
+    dist = tmp_path / 'dist'
+    dist.mkdir()
+    (dist / 'app').write_bytes(b'binary')
+    assert cache.lookup('k1', str(tmp_path / 'out')) is None
+    assert cache.store('k1', str(dist), 'app')
+    restored = cache.lookup('k1', str(tmp_path / 'out'))
+    assert restored == [str(tmp_path / 'out' / 'app')]
+    assert (tmp_path / 'out' / 'app').read_bytes() == b'binary'
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['entries']) == (1, 1, 1)
+
+
+def test_lru_eviction(tmp_path):
+    cache = BuildCache(str(tmp_path / 'cache'), max_size=15)
+    dist = tmp_path / 'dist'
+    dist.mkdir()
+    (dist / 'app').write_bytes(b'x' * 10)
+    cache.store('old', str(dist), 'app')
+    cache.store('new', str(dist), 'app')
+    assert cache.lookup('old', str(tmp_path / 'out')) is None
+    assert cache.lookup('new', str(tmp_path / 'out'))
+    assert cache.stats()['evictions'] == 1
+    assert not os.path.exists(os.path.join(cache.cache_dir, 'old'))
+
+
+def _write_lock(cache, age=0, **owner):
+    lock = dict({'host': socket.gethostname(), 'pid': os.getpid(), 'created': time.time() - age, 'token': 'other'},
+                **owner)
+    path = os.path.join(cache.cache_dir, cache.LOCK_NAME)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(lock, f)
+    os.utime(path, (time.time() - age, time.time() - age))
+    return lock
+
+
+def test_live_lock_is_not_stolen_after_waiting(tmp_path):
+    cache = BuildCache(str(tmp_path / 'cache'))
+    # 持有者仍在运行，等待时间超过 timeout 也不能删除它的锁
+    lock = _write_lock(cache, age=5)
+    with pytest.raises(TimeoutError):
+        with cache._locked(timeout=0.3):
+            pass
+    with open(os.path.join(cache.cache_dir, cache.LOCK_NAME), encoding='utf-8') as f:
+        assert json.load(f) == lock
+
+
+def test_lock_of_exited_process_is_broken(tmp_path):
+    cache = BuildCache(str(tmp_path / 'cache'))
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    _write_lock(cache, pid=process.pid)
+    with cache._locked(timeout=5):
+        pass
+    assert not os.path.exists(os.path.join(cache.cache_dir, cache.LOCK_NAME))
+
+
+def test_release_keeps_lock_of_new_holder(tmp_path):
+    cache = BuildCache(str(tmp_path / 'cache'))
+    with cache._locked():
+        os.remove(os.path.join(cache.cache_dir, cache.LOCK_NAME))
+        lock = _write_lock(cache, token='new-holder')
+    with open(os.path.join(cache.cache_dir, cache.LOCK_NAME), encoding='utf-8') as f:
+        assert json.load(f) == lock
+
+
+def test_lock_is_exclusive(tmp_path):
+    cache = BuildCache(str(tmp_path / 'cache'))
+    counter = tmp_path / 'counter'
+    counter.write_text('0')
+
+    def work():
+        for _ in range(20):
+            with cache._locked():
+                value = int(counter.read_text())
+                counter.write_text(str(value + 1))
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert counter.read_text() == '160'
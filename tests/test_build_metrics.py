@@ -0,0 +1,91 @@
+"""打包阶段耗时的记录和写出"""
+import csv
+import json
+import os
+
+import pytest
+
+from conftest import has_pyinstaller
+from build_metrics import PhaseTimer, PHASES, write_metrics, format_metrics
+
+PYINSTALLER_LOG = [
+    "123 INFO: PyInstaller: 6.0.0\n",
+    "456 INFO: checking Analysis\n",
+    "789 INFO: Analyzing hidden import 'x'\n",
+    "800 INFO: checking PYZ\n",
+    # 重复或倒退的标记不会切换阶段
+    "801 INFO: checking Analysis\n",
+    "900 INFO: checking PKG\n",
+    "950 INFO: checking PKG\n",
+]
+
+
+def test_feed_detects_pyinstaller_phases():
+    events = []
+    timer = PhaseTimer('app', on_phase=lambda *args: events.append(args))
+    timer.start('validate')
+    for line in PYINSTALLER_LOG:
+        timer.feed(line)
+    timer.start('cleanup')
+    metrics = timer.finish('成功')
+    assert [item['phase'] for item in metrics['phases']] == ['validate', 'analysis', 'pyz', 'assemble', 'cleanup']
+    assert events == [('validate', 0, len(PHASES)), ('analysis', 2, len(PHASES)), ('pyz', 3, len(PHASES)),
+                      ('assemble', 4, len(PHASES)), ('cleanup', 6, len(PHASES))]
+    assert metrics['name'] == 'app' and metrics['status'] == '成功'
+    # 各阶段首尾相接，总耗时覆盖所有阶段
+    for before, after in zip(metrics['phases'], metrics['phases'][1:]):
+        assert after['start'] == pytest.approx(before['start'] + before['duration'], abs=0.002)
+    last = metrics['phases'][-1]
+    assert metrics['total'] >= last['start'] + last['duration'] - 0.002
+    assert format_metrics(metrics).startswith("阶段耗时 (共 ")
+    assert "模块分析" in format_metrics(metrics) and "收尾清理" in format_metrics(metrics)
+
+
+def test_finish_without_phases():
+    metrics = PhaseTimer().finish('失败')
+    assert metrics['phases'] == [] and metrics['status'] == '失败'
+    assert format_metrics(metrics).endswith("): ")
+
+
+def _metrics(name, status, phases):
+    return {'name': name, 'status': status, 'started_at': 0, 'total': sum(d for _, d in phases),
+            'phases': [{'phase': p, 'label': p, 'start': 0, 'duration': d} for p, d in phases]}
+
+
+def test_write_metrics_json(tmp_path):
+    path = str(tmp_path / 'sub' / 'metrics.json')
+    metrics = _metrics('app', '成功', [('analysis', 1.5)])
+    write_metrics(metrics, path)
+    write_metrics(metrics, path)
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f) == metrics
+
+
+def test_write_metrics_csv_appends_rows(tmp_path):
+    path = str(tmp_path / 'metrics.csv')
+    write_metrics(_metrics('app', '成功', [('analysis', 1.25), ('pyz', 0.5), ('analysis', 0.25)]), path)
+    write_metrics(_metrics('app', '已取消', [('validate', 0.1)]), path)
+    with open(path, encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == 2
+    assert rows[0]['status'] == '成功' and rows[1]['status'] == '已取消'
+    # 同一阶段多次出现时合并耗时，没有经过的阶段留空
+    assert (rows[0]['analysis'], rows[0]['pyz'], rows[0]['collect']) == ('1.5', '0.5', '')
+    assert rows[1]['validate'] == '0.1' and rows[1]['analysis'] == ''
+
+
+@pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+def test_build_records_phases(write_files, tmp_path):
+    from packager_core import build_exe
+    root = write_files({'hello.py': 'print("hello")\n'})
+    metrics_file = str(tmp_path / 'metrics.json')
+    phases = []
+    build_exe(str(root / 'hello.py'), output_dir=str(tmp_path / 'out'), preflight=False, metrics_file=metrics_file,
+              on_phase=lambda phase, index, total: phases.append(phase), on_line=lambda *args: None)
+    with open(metrics_file, encoding='utf-8') as f:
+        metrics = json.load(f)
+    assert metrics['status'] == '成功' and metrics['name'] == 'hello'
+    assert [item['phase'] for item in metrics['phases']] == phases
+    assert phases[0] == 'validate' and phases[-1] == 'cleanup'
+    assert {'analysis', 'pyz', 'assemble'} <= set(phases)
+    assert os.path.isfile(os.path.join(str(tmp_path / 'out'), 'hello'))
@@ -0,0 +1,142 @@
+import io
+import os
+import sys
+import time
+import zipfile
+import stat
+import threading
+import subprocess
+
+import pytest
+
+from conftest import has_pyinstaller
+from build_client import pack_sources, extract_zip, submit_build, get_build, cancel_build, follow_log, remote_build
+from build_server import BuildServer
+from job_queue import RUNNING, CANCELLED, FINISHED
+
+# main.py 通过 from .. import util 用到 pkg/util.py，顶层的 util.py 是同名的干扰项
+PROJECT = {
+    'main.py': "import pkg.sub.a\nprint(pkg.sub.a.value())\n",
+    'util.py': "VALUE = 'wrong'\n",
+    'pkg/__init__.py': "",
+    'pkg/util.py': "VALUE = 'remote-ok'\n",
+    'pkg/sub/__init__.py': "",
+    'pkg/sub/a.py': "from .. import util\n\ndef value():\n    return util.VALUE\n",
+    'data/config.txt': "x\n",
+    'dist/old.bin': "stale\n",
+}
+
+
+def _names(archive):
+    with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+        return set(zf.namelist())
+
+
+def test_pack_sources_uploads_source_tree(write_files):
+    root = write_files(PROJECT)
+    (root / '__pycache__').mkdir()
+    (root / '__pycache__' / 'main.cpython-311.pyc').write_bytes(b'')
+    archive, entry, paths = pack_sources(str(root / 'main.py'))
+    names = _names(archive)
+    assert entry == 'main.py'
+    assert {'main.py', 'pkg/util.py', 'pkg/sub/a.py', 'data/config.txt'} <= names
+    assert not any(name.startswith(('dist/', '__pycache__/')) for name in names)
+
+
+
+def _zip(members):
+    """按 [(名称, 内容或 ('link', 链接文本))] 生成 zip 数据"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for name, content in members:
+            if isinstance(content, tuple):
+                info = zipfile.ZipInfo(name)
+                info.external_attr = (stat.S_IFLNK | 0o777) << 16
+                archive.writestr(info, content[1])
+            else:
+                archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def test_extract_zip_keeps_links_inside_target(tmp_path):
+    target = tmp_path / 'target'
+    extract_zip(_zip([('pkg/data.txt', 'x'), ('pkg/alias.txt', ('link', 'data.txt'))]), str(target))
+    assert (target / 'pkg' / 'alias.txt').read_text() == 'x'
+
+
+@pytest.mark.parametrize('members', [
+    # 每个链接单独看都在目标目录中，串起来逃出目标目录
+    [('a/b/up', ('link', '..')), ('a/b/up/up2', ('link', '..')), ('a/b/up/up2/up3', ('link', '..')),
+     ('a/b/up/up2/up3/escaped.txt', 'x')],
+    # 链接本身指向目标目录中，但不能经过它写入其他成员
+    [('a/link', ('link', '..')), ('a/link/escaped.txt', 'x')],
+    [('a/out', ('link', '../../escaped.txt'))],
+    [('a/out', ('link', '/tmp/escaped.txt'))],
+    [('../escaped.txt', 'x')],
+    [('a/../../escaped.txt', 'x')],
+    [('/tmp/escaped.txt', 'x')],
+], ids=['link-chain', 'write-through-link', 'link-outside', 'absolute-link', 'dotdot', 'nested-dotdot', 'absolute'])
+def test_extract_zip_rejects_escapes(tmp_path, members):
+    target = tmp_path / 'zs' / 't'
+    with pytest.raises(ValueError):
+        extract_zip(_zip(members), str(target))
+    assert not (tmp_path / 'zs' / 'escaped.txt').exists()
+    assert not (tmp_path / 'escaped.txt').exists()
+
+
+@pytest.fixture
+def server(tmp_path):
+    """在本机的临时端口上运行打包服务器，返回服务器地址"""
+    builds = BuildServer(data_dir=str(tmp_path / 'server'), cache_dir=str(tmp_path / 'server-cache'))
+    httpd = builds.serve('127.0.0.1', 0)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    for job in builds.scheduler.jobs():
+        builds.cancel(job)
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def _wait_for(server, build_id, statuses, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        build = get_build(build_id, server)
+        if build['status'] in statuses:
+            return build
+        time.sleep(0.1)
+    raise AssertionError(f"任务 {build_id} 超时仍为 {build['status']}")
+
+
+@pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+def test_remote_build_streams_log_and_downloads(server, write_files, tmp_path):
+    root = write_files(PROJECT)
+    lines = []
+    build = remote_build(str(root / 'main.py'), output_dir=str(tmp_path / 'out'), server=server,
+                         on_line=lambda elapsed, stream, line: lines.append(line))
+    assert build['status'] == '成功'
+    assert any('开始打包' in line for line in lines)
+    exe = tmp_path / 'out' / ('main.exe' if sys.platform == 'win32' else 'main')
+    assert build['artifacts'] == [exe.name]
+    output = subprocess.run([str(exe)], capture_output=True, text=True, timeout=60)
+    assert output.returncode == 0, output.stderr
+    assert output.stdout.strip() == 'remote-ok'
+
+
+@pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+def test_cancel_running_build(server, write_files):
+    root = write_files({'slow.py': "print('slow')\n"})
+    build = submit_build(str(root / 'slow.py'), server)
+    _wait_for(server, build['id'], (RUNNING,) + FINISHED)
+    cancel_build(build['id'], server)
+    lines = []
+    follow_log(build['id'], lambda elapsed, stream, line: lines.append(line), server)
+    assert _wait_for(server, build['id'], FINISHED)['status'] == CANCELLED
+    assert any('已取消' in line for line in lines)
+
+
+def test_submit_rejects_paths_outside_archive(server):
+    from build_client import RemoteBuildError, _request_json
+    with pytest.raises(RemoteBuildError) as excinfo:
+        _request_json(f"{server}/builds", 'POST', {'entry': '../evil.py', 'options': {}, 'archive': ''})
+    assert excinfo.value.exit_code == 4
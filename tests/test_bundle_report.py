@@ -0,0 +1,44 @@
+import os
+import sys
+import stat
+
+import pytest
+
+from bundle_report import _reachable_modules
+from import_analyzer import ScanCache
+from packager_core import _smoke_run
+
+
+def test_reachability_follows_function_level_imports(write_files, tmp_path):
+    root = write_files({
+        'archiver.py': "def pack():\n    import tarball\n    return tarball\n",
+        'tarball.py': "import gzipper\n",
+        'gzipper.py': "",
+        'unused.py': "",
+    })
+    modules = {name: str(root / f"{name}.py") for name in ('archiver', 'tarball', 'gzipper', 'unused')}
+    reached = _reachable_modules(modules, ['archiver'], ScanCache(str(tmp_path / 'scan.json')))
+    assert reached == {'archiver', 'tarball', 'gzipper'}
+
+
+def test_reachability_resolves_relative_imports(write_files, tmp_path):
+    root = write_files({'pkg/__init__.py': "", 'pkg/a.py': "def f():\n    from . import b\n", 'pkg/b.py': ""})
+    modules = {'pkg': str(root / 'pkg/__init__.py'), 'pkg.a': str(root / 'pkg/a.py'), 'pkg.b': str(root / 'pkg/b.py')}
+    reached = _reachable_modules(modules, ['pkg.a'], ScanCache(str(tmp_path / 'scan.json')))
+    assert reached == {'pkg', 'pkg.a', 'pkg.b'}
+
+
+def _script(path, body):
+    path.write_text("#!/bin/sh\n" + body)
+    path.chmod(path.stat().st_mode | stat.S_IEXEC)
+    return str(path)
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="使用 sh 脚本模拟产物")
+def test_smoke_run_reports_missing_modules(tmp_path):
+    ok = _script(tmp_path / 'ok', "echo fine\n")
+    broken = _script(tmp_path / 'broken', "echo \"ModuleNotFoundError: No module named 'tarfile'\" >&2\nexit 1\n")
+    slow = _script(tmp_path / 'slow', "sleep 30\n")
+    assert _smoke_run(ok) == (0, None)
+    assert _smoke_run(broken) == (1, "ModuleNotFoundError: No module named 'tarfile'")
+    assert _smoke_run(slow, timeout=0.5) == ('running', None)
@@ -0,0 +1,48 @@
+"""排除测试包时只排除导入图到达不了的测试包；优化前后的比较"""
+import os
+import importlib
+
+import pytest
+
+from bytecode_optimizer import find_test_packages, compare_builds
+
+
+def test_reachable_test_packages_are_kept(write_files, monkeypatch):
+    root = write_files({
+        'site/fakepkg/__init__.py': 'from fakepkg import testing\n',
+        'site/fakepkg/testing/__init__.py': '',
+        'site/fakepkg/tests/__init__.py': '',
+        'site/fakepkg/sub/__init__.py': 'def run():\n    from .tests import check\n',
+        'site/fakepkg/sub/tests/__init__.py': 'def check():\n    pass\n',
+        'site/fakepkg/other/__init__.py': '',
+        'site/fakepkg/other/test/__init__.py': '',
+        'app/main.py': 'import fakepkg.sub\n',
+    })
+    monkeypatch.syspath_prepend(str(root / 'site'))
+    importlib.invalidate_caches()
+    packages = find_test_packages(str(root / 'app' / 'main.py'))
+    assert 'fakepkg.tests' in packages
+    assert 'fakepkg.other.test' in packages
+    # pandas.testing 这样被包的 __init__ 导入的测试包，以及函数中导入的测试包都不能排除
+    assert 'fakepkg.testing' not in packages
+    assert 'fakepkg.sub.tests' not in packages
+
+
+def test_local_module_named_test_is_kept(write_files):
+    root = write_files({'main.py': 'import test\n', 'test.py': 'VALUE = 1\n'})
+    assert 'test' not in find_test_packages(str(root / 'main.py'))
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="用 shell 脚本代替产物")
+def test_compare_builds_reports_through_on_line(tmp_path, capsys):
+    exes = []
+    for name in ('baseline', 'optimized'):
+        path = tmp_path / name
+        path.write_text('#!/bin/sh\nexit 0\n')
+        path.chmod(0o755)
+        exes.append(str(path))
+    lines = []
+    result = compare_builds(*exes, runs=1, on_line=lambda elapsed, stream, line: lines.append((stream, line)))
+    assert set(result) == {'baseline', 'optimized'}
+    assert [line for _, line in lines] == ["正在测量优化前的启动耗时...\n", "正在测量优化后的启动耗时...\n"]
+    assert capsys.readouterr().out == ''
@@ -0,0 +1,27 @@
+"""自动选择压缩策略后仍走正常的打包流程"""
+import os
+import json
+
+import pytest
+
+from conftest import has_pyinstaller
+from artifact_store import _portable_cmd
+
+
+def test_portable_cmd_drops_upx_dir():
+    cmd = ['pyinstaller', '--upx-dir', '/opt/local/upx-4.2', '--upx-exclude', 'python3*.dll', '/home/me/app.py']
+    assert _portable_cmd(cmd) == ['pyinstaller', '--upx-dir', '<upx>', '--upx-exclude', 'python3*.dll', 'app.py']
+
+
+@pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+def test_auto_compression_keeps_post_build_options(write_files, tmp_path):
+    from packager_core import build_exe
+    root = write_files({'hello.py': 'print("auto-ok")\n'})
+    output_dir = str(tmp_path / 'out')
+    metrics_file = str(tmp_path / 'metrics.json')
+    build_exe(str(root / 'hello.py'), output_dir=output_dir, compression='auto', compression_objective='size',
+              size_report=True, metrics_file=metrics_file, preflight=False, on_line=lambda *args: None)
+    assert os.path.isfile(os.path.join(output_dir, 'hello'))
+    assert os.path.isfile(os.path.join(output_dir, 'hello-size-report.json'))
+    with open(metrics_file, encoding='utf-8') as f:
+        assert json.load(f)['status'] == '成功'
@@ -0,0 +1,168 @@
+"""差量更新：生成、应用和校验"""
+import os
+import json
+import lzma
+import random
+import shutil
+
+import pytest
+
+from delta_update import create_delta, update_deltas, PREVIOUS_DIR
+from delta_apply import apply_delta, check_base, verify_result, read_delta, MAGIC
+
+
+def _data(size, seed):
+    return random.Random(seed).randbytes(size)
+
+
+def _write(path, data, mode=0o644):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    os.chmod(path, mode)
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def _app_dir(root, main, extra=None):
+    """模拟文件夹产物: 可执行文件、库、数据、文件和目录的符号链接"""
+    _write(os.path.join(root, 'app'), main, 0o755)
+    _write(os.path.join(root, '_internal', 'lib.so'), _data(200 * 1024, 2), 0o755)
+    _write(os.path.join(root, '_internal', 'base_library.zip'), _data(100 * 1024, 3))
+    os.symlink('lib.so', os.path.join(root, '_internal', 'lib.so.1'))
+    os.symlink('_internal', os.path.join(root, 'lib'))
+    for rel, data in (extra or {}).items():
+        _write(os.path.join(root, rel), data)
+    return root
+
+
+def test_file_delta_survives_insert_and_delete(tmp_path):
+    old = _data(1024 * 1024, 1)
+    # 中间插入一段，后面删除一段，之后的内容整体移位
+    new = old[:300000] + _data(5000, 9) + old[300000:700000] + old[710000:]
+    _write(str(tmp_path / 'old' / 'app'), old, 0o755)
+    _write(str(tmp_path / 'new' / 'app'), new, 0o755)
+    delta = str(tmp_path / 'app.delta')
+    result = create_delta(str(tmp_path / 'old' / 'app'), str(tmp_path / 'new' / 'app'), delta)
+    assert result['copied_bytes'] > 0.9 * len(new)
+    assert result['delta_bytes'] < 0.1 * len(new)
+
+    target = str(tmp_path / 'out' / 'app')
+    assert apply_delta(str(tmp_path / 'old' / 'app'), delta, target) == target
+    assert _read(target) == new
+    assert os.stat(target).st_mode & 0o777 == 0o755
+    assert verify_result(target, delta) == []
+    # 旧版本没有被修改
+    assert _read(str(tmp_path / 'old' / 'app')) == old
+
+
+def test_dir_delta_keeps_links_and_modes(tmp_path):
+    main = _data(300 * 1024, 4)
+    old = _app_dir(str(tmp_path / 'old'), main, {'_internal/removed.dat': b'gone'})
+    new = _app_dir(str(tmp_path / 'new'), main[:1000] + b'patched' + main[1000:], {'_internal/added.dat': b'new'})
+    delta = str(tmp_path / 'app.delta')
+    create_delta(old, new, delta)
+
+    # 原地更新
+    in_place = str(tmp_path / 'installed')
+    shutil.copytree(old, in_place, symlinks=True)
+    apply_delta(in_place, delta)
+    assert verify_result(in_place, delta) == []
+    assert _read(os.path.join(in_place, 'app')) == _read(os.path.join(new, 'app'))
+    assert os.stat(os.path.join(in_place, 'app')).st_mode & 0o777 == 0o755
+    assert os.readlink(os.path.join(in_place, '_internal', 'lib.so.1')) == 'lib.so'
+    assert os.readlink(os.path.join(in_place, 'lib')) == '_internal'
+    assert not os.path.exists(os.path.join(in_place, '_internal', 'removed.dat'))
+    assert not any(name.startswith('.') for name in os.listdir(tmp_path))
+
+    # 多余的文件不算一致
+    _write(os.path.join(in_place, 'stray.txt'), b'x')
+    assert verify_result(in_place, delta) == ['stray.txt: 多余的文件']
+
+
+def test_wrong_base_is_rejected(tmp_path):
+    old = _data(200 * 1024, 5)
+    _write(str(tmp_path / 'old'), old)
+    _write(str(tmp_path / 'new'), old[:1000] + old[2000:])
+    delta = str(tmp_path / 'app.delta')
+    create_delta(str(tmp_path / 'old'), str(tmp_path / 'new'), delta)
+
+    _write(str(tmp_path / 'other'), old[:-1] + b'\0')
+    assert check_base(str(tmp_path / 'other'), delta)
+    with pytest.raises(ValueError, match="不匹配"):
+        apply_delta(str(tmp_path / 'other'), delta, str(tmp_path / 'out'))
+    assert not os.path.exists(tmp_path / 'out')
+    # 类型不同 (文件夹) 也不能应用
+    os.makedirs(tmp_path / 'dir')
+    assert check_base(str(tmp_path / 'dir'), delta)
+
+
+def _tamper(delta, change):
+    """修改差量文件的头部或新增数据后重新写回"""
+    header, payload = read_delta(delta)
+    header, payload = change(header, bytearray(payload))
+    header_data = json.dumps(header).encode('utf-8')
+    with open(delta, 'wb') as f:
+        f.write(MAGIC + len(header_data).to_bytes(8, 'big') + header_data + lzma.compress(bytes(payload)))
+
+
+def _flip_payload(header, payload):
+    payload[len(payload) // 2] ^= 0xFF
+    return header, payload
+
+
+def _truncate(delta):
+    with open(delta, 'rb') as f:
+        data = f.read()
+    with open(delta, 'wb') as f:
+        f.write(data[:-100])
+
+
+def _bad_magic(delta):
+    with open(delta, 'r+b') as f:
+        f.write(b'NOTDELTA')
+
+
+@pytest.mark.parametrize('corrupt', [
+    lambda delta: _tamper(delta, _flip_payload),
+    _truncate,
+    _bad_magic,
+], ids=['payload-changed', 'truncated', 'bad-magic'])
+def test_corrupted_delta_leaves_old_version(tmp_path, corrupt):
+    old = _data(300 * 1024, 6)
+    _write(str(tmp_path / 'app'), old)
+    _write(str(tmp_path / 'new'), old[:5000] + _data(20000, 7) + old[5000:])
+    delta = str(tmp_path / 'app.delta')
+    create_delta(str(tmp_path / 'app'), str(tmp_path / 'new'), delta)
+    corrupt(delta)
+    with pytest.raises(ValueError):
+        apply_delta(str(tmp_path / 'app'), delta)
+    assert _read(str(tmp_path / 'app')) == old
+    assert sorted(os.listdir(tmp_path)) == ['app', 'app.delta', 'new']
+
+
+def test_update_deltas_keeps_previous_build(tmp_path, capsys):
+    output_dir = tmp_path / 'dist'
+    delta_dir = str(tmp_path / 'deltas')
+    first = _data(150 * 1024, 8)
+    _write(str(output_dir / 'app'), first, 0o755)
+    assert update_deltas(str(output_dir), 'app', delta_dir) == []
+    # 没有变化时不生成差量
+    assert update_deltas(str(output_dir), 'app', delta_dir) == []
+
+    _write(str(output_dir / 'app'), first + b'tail', 0o755)
+    lines = []
+    results = update_deltas(str(output_dir), 'app', delta_dir, on_line=lambda elapsed, stream, line: lines.append(line))
+    assert len(results) == 1
+    # 报告走 on_line (图形界面、服务器和异步接口的日志)，不直接打印
+    assert len(lines) == 1 and lines[0].startswith(f"差量文件: {results[0]['delta_path']}")
+    assert capsys.readouterr().out == ''
+    # 客户端手中是第一次构建的产物
+    client = str(tmp_path / 'client' / 'app')
+    _write(client, first, 0o755)
+    apply_delta(client, results[0]['delta_path'])
+    assert _read(client) == first + b'tail'
+    assert _read(os.path.join(delta_dir, PREVIOUS_DIR, 'app')) == first + b'tail'
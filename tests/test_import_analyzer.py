@@ -0,0 +1,46 @@
+import os
+
+from import_analyzer import import_closure, analyze
+
+
+def _rel(root, paths):
+    return sorted(os.path.relpath(path, root).replace(os.sep, '/') for path in paths)
+
+
+def test_relative_import_uses_level(write_files):
+    root = write_files({
+        'main.py': "import pkg.sub.a\n",
+        'util.py': "X = 0\n",
+        'pkg/__init__.py': "",
+        'pkg/util.py': "Y = 1\n",
+        'pkg/sub/__init__.py': "",
+        'pkg/sub/a.py': "from .. import util\nfrom . import b\nfrom .b import f\n",
+        'pkg/sub/b.py': "def f():\n    pass\n",
+    })
+    local_files, _ = import_closure(str(root / 'main.py'))
+    assert _rel(root, local_files) == [
+        'main.py', 'pkg/__init__.py', 'pkg/sub/__init__.py', 'pkg/sub/a.py', 'pkg/sub/b.py', 'pkg/util.py']
+
+
+def test_relative_import_never_falls_back_to_top_level(write_files):
+    root = write_files({
+        'main.py': "import pkg.a\n",
+        'helper.py': "",
+        'pkg/__init__.py': "",
+        'pkg/a.py': "from . import helper\n",
+    })
+    local_files, _ = import_closure(str(root / 'main.py'))
+    assert 'helper.py' not in _rel(root, local_files)
+
+
+def test_relative_import_beyond_source_root(write_files):
+    root = write_files({'main.py': "import pkg.a\n", 'pkg/__init__.py': "", 'pkg/a.py': "from ... import x\n"})
+    local_files, _ = import_closure(str(root / 'main.py'))
+    assert _rel(root, local_files) == ['main.py', 'pkg/__init__.py', 'pkg/a.py']
+
+
+def test_dynamic_and_external_imports(write_files):
+    root = write_files({'main.py': "import json\nimport importlib\nimportlib.import_module('plugins.csv')\n"})
+    result = analyze(str(root / 'main.py'))
+    assert 'json' in result['external']
+    assert 'plugins.csv' in result['hidden_imports']
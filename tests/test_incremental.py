@@ -0,0 +1,77 @@
+"""增量构建：工作目录的复用和失效判断"""
+import os
+import subprocess
+
+import pytest
+
+from conftest import has_pyinstaller
+from incremental import prepare_work_dir, mark_built, work_dir_for, stale_reason
+
+CMD = ['pyinstaller', '--noconfirm', '--onefile', '--distpath', 'dist', 'main.py']
+
+
+def test_work_dir_is_reused_after_successful_build(tmp_path):
+    script = str(tmp_path / 'src' / 'main.py')
+    work_root = str(tmp_path / 'work')
+    cmd = list(CMD)
+    work_dir, reason = prepare_work_dir(script, cmd, work_root)
+    assert reason == "首次构建"
+    assert work_dir == work_dir_for(script, work_root) and work_dir.startswith(work_root)
+    # 工作目录参数插在输入文件之前，首次构建完整分析
+    assert cmd[-1] == 'main.py' and '--clean' in cmd
+    assert cmd[cmd.index('--workpath') + 1] == os.path.join(work_dir, 'build')
+    with open(os.path.join(work_dir, 'analysis.toc'), 'w') as f:
+        f.write('cached')
+    mark_built(work_dir, cmd)
+
+    # 只有输出目录不同，仍然复用
+    cmd = ['pyinstaller', '--noconfirm', '--onefile', '--distpath', 'elsewhere', 'main.py']
+    work_dir, reason = prepare_work_dir(script, cmd, work_root)
+    assert reason is None and '--clean' not in cmd
+    assert os.path.isfile(os.path.join(work_dir, 'analysis.toc'))
+
+
+def test_changed_options_reset_work_dir(tmp_path):
+    script = str(tmp_path / 'main.py')
+    work_dir, _ = prepare_work_dir(script, list(CMD), str(tmp_path / 'work'))
+    mark_built(work_dir, CMD)
+    open(os.path.join(work_dir, 'analysis.toc'), 'w').close()
+    cmd = ['pyinstaller', '--noconfirm', '--onedir', '--distpath', 'dist', 'main.py']
+    work_dir, reason = prepare_work_dir(script, cmd, str(tmp_path / 'work'))
+    assert reason == "打包参数已变化"
+    assert '--clean' in cmd
+    assert not os.path.exists(os.path.join(work_dir, 'analysis.toc'))
+
+
+def test_interrupted_build_is_not_reused(tmp_path):
+    script = str(tmp_path / 'main.py')
+    work_dir, _ = prepare_work_dir(script, list(CMD), str(tmp_path / 'work'))
+    mark_built(work_dir, CMD)
+    # 构建开始时删除标记，中途失败时下次完整分析
+    prepare_work_dir(script, list(CMD), str(tmp_path / 'work'))
+    assert stale_reason(work_dir, CMD) == "上次构建未成功完成"
+
+
+def test_same_name_scripts_use_separate_work_dirs(tmp_path):
+    assert work_dir_for(str(tmp_path / 'a' / 'main.py')) != work_dir_for(str(tmp_path / 'b' / 'main.py'))
+
+
+@pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+def test_incremental_rebuild_picks_up_source_change(write_files, tmp_path):
+    from packager_core import build_exe
+    root = write_files({'app.py': "import helper\nprint(helper.VALUE)\n", 'helper.py': "VALUE = 'one'\n"})
+    work_root = str(tmp_path / 'work')
+    output_dir = str(tmp_path / 'dist')
+    messages = []
+    on_line = lambda elapsed, stream, line: messages.append(line)
+    build_exe(str(root / 'app.py'), output_dir=output_dir, incremental=True, work_root=work_root, on_line=on_line)
+    assert any("重新完整分析 (首次构建)" in line for line in messages)
+
+    (root / 'helper.py').write_text("VALUE = 'two'\n")
+    messages.clear()
+    build_exe(str(root / 'app.py'), output_dir=output_dir, incremental=True, work_root=work_root, on_line=on_line)
+    assert any("复用工作目录" in line for line in messages)
+    result = subprocess.run([os.path.join(output_dir, 'app')], capture_output=True, text=True, timeout=60)
+    assert result.stdout.strip() == 'two'
+    # 源码目录中没有 build/ 和 .spec
+    assert not (root / 'build').exists() and not (root / 'app.spec').exists()
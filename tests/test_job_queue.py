@@ -0,0 +1,137 @@
+"""打包任务队列：优先级调度和取消"""
+import threading
+import time
+
+from job_queue import JobScheduler, PENDING, RUNNING, SUCCEEDED, FAILED, CANCELLED
+from process_runner import ProcessCancelled
+
+
+class BlockingRunner:
+    """在 release 之前一直运行的 runner，取消时像 build_exe 一样抛出 ProcessCancelled"""
+
+    def __init__(self):
+        self.started = []
+        self.release = threading.Event()
+
+    def __call__(self, job):
+        self.started.append(job.name)
+        while not self.release.wait(0.01):
+            if job.cancel_event.is_set():
+                raise ProcessCancelled("已取消")
+        return f"{job.name} 完成"
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        time.sleep(0.01)
+
+
+def _wait_idle(scheduler):
+    """等待所有任务结束且并发名额全部释放"""
+    _wait_for(lambda: scheduler._running == 0 and not scheduler.counts()[PENDING])
+
+
+def test_cancel_pending_job_never_runs():
+    runner = BlockingRunner()
+    scheduler = JobScheduler(runner)
+    first = scheduler.add('first', {})
+    second = scheduler.add('second', {})
+    assert (first.status, second.status) == (RUNNING, PENDING)
+    scheduler.cancel(second.id)
+    assert second.status == CANCELLED and second.duration == 0
+    runner.release.set()
+    _wait_idle(scheduler)
+    assert first.status == SUCCEEDED and first.message == 'first 完成'
+    assert runner.started == ['first']
+
+
+def test_cancel_running_job_frees_slot_after_cleanup():
+    runner = BlockingRunner()
+    changes = []
+    scheduler = JobScheduler(runner, on_change=lambda job: changes.append((job.name, job.status)))
+    first = scheduler.add('first', {})
+    second = scheduler.add('second', {})
+    scheduler.cancel(first.id)
+    # 立即标记为已取消，runner 结束后才调度下一个任务
+    assert first.status == CANCELLED and first.cancel_event.is_set()
+    _wait_for(lambda: second.status == RUNNING)
+    runner.release.set()
+    _wait_idle(scheduler)
+    assert first.status == CANCELLED and first.message is None
+    assert second.status == SUCCEEDED
+    # runner 抛出 ProcessCancelled 后不会覆盖已取消的状态
+    assert [status for name, status in changes if name == 'first'] == [PENDING, RUNNING, CANCELLED, CANCELLED]
+
+
+def test_cancel_finished_or_unknown_job_is_ignored():
+    scheduler = JobScheduler(lambda job: 'ok')
+    job = scheduler.add('done', {})
+    _wait_idle(scheduler)
+    scheduler.cancel(job.id)
+    scheduler.cancel(999)
+    assert job.status == SUCCEEDED and not job.cancel_event.is_set()
+
+
+def _queue(runner, names, max_workers=1):
+    """第一个任务占住唯一的名额，其余任务留在队列中等待调度"""
+    scheduler = JobScheduler(runner, max_workers=max_workers)
+    jobs = {name: scheduler.add(name, {}, priority=priority) for name, priority in names}
+    return scheduler, jobs
+
+
+def _run_all(runner, scheduler):
+    runner.release.set()
+    _wait_idle(scheduler)
+    return runner.started
+
+
+def test_higher_priority_runs_first_then_queue_order():
+    runner = BlockingRunner()
+    scheduler, jobs = _queue(runner, [('busy', 0), ('low', -1), ('a', 0), ('urgent', 5), ('b', 0)])
+    assert _run_all(runner, scheduler) == ['busy', 'urgent', 'a', 'b', 'low']
+    assert all(job.status == SUCCEEDED for job in jobs.values())
+
+
+def test_move_and_set_priority_reorder_pending_jobs():
+    runner = BlockingRunner()
+    scheduler, jobs = _queue(runner, [('busy', 0), ('a', 0), ('b', 0), ('c', 0)])
+    scheduler.move(jobs['c'].id, -5)
+    assert [job.name for job in scheduler.jobs()] == ['c', 'busy', 'a', 'b']
+    scheduler.move(jobs['c'].id, 1)
+    scheduler.set_priority(jobs['b'].id, 1)
+    # 忽略不存在的任务
+    scheduler.move(999, 1)
+    scheduler.set_priority(999, 1)
+    assert _run_all(runner, scheduler) == ['busy', 'b', 'c', 'a']
+
+
+def test_set_max_workers_starts_waiting_jobs():
+    runner = BlockingRunner()
+    scheduler, jobs = _queue(runner, [('a', 0), ('b', 0), ('c', 0)])
+    assert scheduler.counts()[RUNNING] == 1
+    scheduler.set_max_workers(3)
+    _wait_for(lambda: len(runner.started) == 3)
+    assert scheduler.counts()[RUNNING] == 3
+    # 调小并发数不影响已在运行的任务
+    scheduler.set_max_workers(0)
+    assert scheduler.max_workers == 1 and scheduler.counts()[RUNNING] == 3
+    _run_all(runner, scheduler)
+    assert scheduler.counts()[SUCCEEDED] == 3
+
+
+def test_failed_job_does_not_block_queue():
+    def runner(job):
+        if job.name == 'bad':
+            raise RuntimeError("打包失败")
+        return 'ok'
+
+    scheduler = JobScheduler(runner)
+    bad = scheduler.add('bad', {})
+    good = scheduler.add('good', {})
+    _wait_idle(scheduler)
+    assert (bad.status, bad.message) == (FAILED, "打包失败")
+    assert good.status == SUCCEEDED
+    assert [job.name for job in scheduler.remove_finished()] == ['bad', 'good']
+    assert scheduler.jobs() == []
@@ -0,0 +1,76 @@
+"""日志缓冲：成批取出、容量上限和完整日志文件"""
+import threading
+
+from log_stream import LogStream, trim_text_widget
+
+
+def test_notify_once_per_batch():
+    calls = []
+    stream = LogStream(notify=lambda: calls.append(1))
+    for i in range(100):
+        stream.write(f"line {i}\n")
+    # 缓冲由空变为非空时才唤醒界面线程
+    assert len(calls) == 1
+    text, dropped = stream.drain()
+    assert text.splitlines() == [f"line {i}" for i in range(100)] and dropped == 0
+    assert stream.drain() == ('', 0)
+    stream.write("again\n")
+    assert len(calls) == 2
+
+
+def test_overflow_keeps_newest_lines_and_full_log(tmp_path):
+    log_path = tmp_path / 'build.log'
+    stream = LogStream(max_lines=10, log_path=str(log_path))
+    for i in range(25):
+        stream.write(f"line {i}\n")
+    text, dropped = stream.drain()
+    assert dropped == 15
+    assert text.splitlines() == [f"line {i}" for i in range(15, 25)]
+    assert stream.total_lines == 25
+    stream.close()
+    assert log_path.read_text(encoding='utf-8').splitlines() == [f"line {i}" for i in range(25)]
+
+
+def test_concurrent_writers():
+    stream = LogStream(max_lines=100000)
+    threads = [threading.Thread(target=lambda n=n: [stream.write(f"{n}-{i}\n") for i in range(1000)])
+               for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    text, dropped = stream.drain()
+    assert len(text.splitlines()) == 8000 and dropped == 0
+
+
+def test_failing_notify_falls_back_to_polling():
+    def notify():
+        raise RuntimeError("main thread is not in main loop")
+    stream = LogStream(notify=notify)
+    stream.write("x\n")
+    # 之后由界面线程的定时检查刷新
+    assert stream.notify is None
+    assert stream.drain() == ("x\n", 0)
+
+
+class _TextWidget:
+    """只实现 trim_text_widget 用到的 Text 控件接口"""
+
+    def __init__(self, lines):
+        self.lines = list(lines)
+
+    def index(self, where):
+        assert where == 'end-1c'
+        return f"{len(self.lines)}.0"
+
+    def delete(self, start, end):
+        assert start == '1.0'
+        del self.lines[:int(end.split('.')[0]) - 1]
+
+
+def test_trim_text_widget_keeps_last_lines():
+    widget = _TextWidget(f"line {i}" for i in range(1, 21))
+    trim_text_widget(widget, 5)
+    assert widget.lines == [f"line {i}" for i in range(16, 21)]
+    trim_text_widget(widget, 5)
+    assert len(widget.lines) == 5
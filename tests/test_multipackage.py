@@ -0,0 +1,83 @@
+"""多程序共享依赖打包"""
+import os
+import stat
+import subprocess
+
+import pytest
+
+from conftest import has_pyinstaller
+from multipackage import build_multipackage, verify_tools, format_multipackage, main
+
+
+@pytest.mark.parametrize('files, inputs, name, message', [
+    ({}, [], 'shared', "至少需要一个"),
+    ({}, ['missing.py'], 'shared', "输入文件不存在"),
+    ({'tool.txt': ''}, ['tool.txt'], 'shared', "必须是 .py"),
+    ({'a/tool.py': '', 'b/tool.py': ''}, ['a/tool.py', 'b/tool.py'], 'shared', "程序名称重复: tool"),
+    ({'tools.py': ''}, ['tools.py'], 'tools', "不能与程序名称相同"),
+], ids=['empty', 'missing', 'not-python', 'duplicate', 'name-clash'])
+def test_invalid_inputs(write_files, tmp_path, files, inputs, name, message):
+    root = write_files(files)
+    with pytest.raises((ValueError, FileNotFoundError), match=message):
+        build_multipackage([str(root / path) for path in inputs], str(tmp_path / 'out'), name)
+    assert not (tmp_path / 'out').exists()
+
+
+def _launchers(directory, scripts):
+    for name, body in scripts.items():
+        path = directory / name
+        path.write_text('#!/bin/sh\n' + body + '\n')
+        path.chmod(path.stat().st_mode | stat.S_IXUSR)
+
+
+def test_verify_tools_statuses(tmp_path):
+    _launchers(tmp_path, {
+        'ok': 'echo "$1"',
+        'failed': 'echo boom >&2; exit 3',
+        'server': 'echo ready; sleep 30',
+        'broken': 'echo "ModuleNotFoundError: No module named x" >&2; sleep 30',
+    })
+    results = verify_tools(str(tmp_path), ['ok', 'failed', 'server', 'broken'], args=['--version'], timeout=1)
+    assert [(item['name'], item['status']) for item in results] == [
+        ('ok', 'ok'), ('failed', 'failed'), ('server', 'running'), ('broken', 'failed')]
+    assert results[0]['output'].strip() == '--version'
+    assert results[1]['returncode'] == 3 and 'boom' in results[1]['output']
+    with pytest.raises(FileNotFoundError, match="找不到启动器"):
+        verify_tools(str(tmp_path), ['missing'])
+
+
+def test_format_reports_savings_and_failures():
+    mb = 1024 * 1024
+    report = {'dist_dir': 'dist/tools', 'tools': {'a': mb, 'b': mb}, 'shared_bytes': 10 * mb,
+              'separate_bytes': 20 * mb,
+              'verify': [{'name': 'a', 'status': 'ok', 'returncode': 0, 'output': ''},
+                         {'name': 'b', 'status': 'failed', 'returncode': 1, 'output': 'line1\nImportError: y'}]}
+    text = format_multipackage(report)
+    assert "共享依赖 10.0 MB，2 个启动器共 2.0 MB；分别打包约 20.0 MB，节省 8.0 MB" in text
+    assert "  a: 正常" in text and "  b: 启动失败" in text and "      ImportError: y" in text
+
+
+@pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+def test_tools_share_one_runtime(write_files, tmp_path):
+    root = write_files({
+        'alpha.py': 'import json\nimport common\nprint("alpha", json.dumps(common.VALUE))\n',
+        'beta.py': 'import common\nprint("beta", common.VALUE)\n',
+        'common.py': 'VALUE = 42\n',
+    })
+    output_dir = tmp_path / 'out'
+    assert main([str(root / 'alpha.py'), str(root / 'beta.py'), '-n', 'tools', '-o', str(output_dir)]) == 0
+    dist_dir = output_dir / 'tools'
+    assert sorted(os.listdir(output_dir)) == ['tools']
+    # 两个启动器共用一个 _internal 目录
+    assert {'alpha', 'beta', '_internal'} <= set(os.listdir(dist_dir))
+    for name, expected in (('alpha', 'alpha 42'), ('beta', 'beta 42')):
+        result = subprocess.run([str(dist_dir / name)], capture_output=True, text=True, timeout=60)
+        assert result.stdout.strip() == expected
+
+    report = build_multipackage([str(root / 'alpha.py'), str(root / 'beta.py')], str(output_dir), 'tools',
+                                verify_args=[])
+    assert report['dist_dir'] == str(dist_dir)
+    assert set(report['tools']) == {'alpha', 'beta'}
+    assert [item['status'] for item in report['verify']] == ['ok', 'ok']
+    # 分别打包时共享库要存两份
+    assert report['separate_bytes'] > report['shared_bytes'] + sum(report['tools'].values())
@@ -0,0 +1,73 @@
+"""命令行：各种失败对应的退出码"""
+import os
+import json
+import subprocess
+
+import pytest
+
+import packager_cli
+from conftest import has_pyinstaller
+from packager_cli import (main, exit_code_for, EXIT_OK, EXIT_BUILD_FAILED, EXIT_USAGE, EXIT_MISSING_DEPENDENCY,
+                          EXIT_INPUT_ERROR, EXIT_INTERRUPTED)
+
+
+@pytest.mark.parametrize('argv', [
+    [],
+    ['a.py', '--config', 'build.toml'],
+    ['a.py', '--target', 'x'],
+    ['a.py', '--jobs', '0'],
+    ['a.py', '--add-data', 'nodest'],
+    ['a.py', '--optimize', '3'],
+], ids=['no-input', 'input-and-config', 'target-without-config', 'jobs-zero', 'bad-add-data', 'bad-optimize'])
+def test_usage_errors(argv):
+    with pytest.raises(SystemExit) as info:
+        main(argv)
+    assert info.value.code == EXIT_USAGE
+
+
+def test_config_errors(write_files):
+    root = write_files({'ok.py': 'print(1)\n'})
+    (root / 'bad.json').write_text(json.dumps({'jobs': [{'input_file': 'ok.py', 'bogus': 1}]}), encoding='utf-8')
+    (root / 'empty.json').write_text(json.dumps({'jobs': []}), encoding='utf-8')
+    assert main(['--config', str(root / 'bad.json')]) == EXIT_USAGE
+    assert main(['--config', str(root / 'missing.toml')]) == EXIT_USAGE
+    assert main(['--config', str(root / 'empty.json')]) == EXIT_USAGE
+    assert main(['--config', str(root / 'bad.json'), '--target', 'other']) == EXIT_USAGE
+
+
+def test_input_errors(write_files):
+    root = write_files({'ok.py': 'print(1)\n', 'dep.py': 'import missing_dependency_xyz\n', 'data.txt': ''})
+    assert main([str(root / 'nope.py')]) == EXIT_INPUT_ERROR
+    assert main([str(root / 'data.txt')]) == EXIT_INPUT_ERROR
+    # 预检未通过时不运行 PyInstaller
+    assert main([str(root / 'dep.py')]) == EXIT_INPUT_ERROR
+    assert main([str(root / 'ok.py'), '--entry', 'x']) == EXIT_INPUT_ERROR
+    assert not (root / 'dist').exists()
+
+
+def test_exit_code_for_exception_types():
+    assert exit_code_for(ImportError("PyInstaller 未安装")) == EXIT_MISSING_DEPENDENCY
+    assert exit_code_for(FileNotFoundError("x")) == EXIT_INPUT_ERROR
+    assert exit_code_for(ValueError("x")) == EXIT_INPUT_ERROR
+    assert exit_code_for(RuntimeError("x")) == EXIT_BUILD_FAILED
+
+
+def test_interrupt(write_files, monkeypatch):
+    root = write_files({'ok.py': 'print(1)\n'})
+
+    def interrupted(jobs, max_workers=1):
+        raise KeyboardInterrupt
+    monkeypatch.setattr(packager_cli, 'run_jobs', interrupted)
+    assert main([str(root / 'ok.py')]) == EXIT_INTERRUPTED
+
+
+@pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+def test_build_results(write_files):
+    root = write_files({'ok.py': 'print("cli-ok")\n', 'bad.py': 'def broken(:\n'})
+    assert main([str(root / 'ok.py'), '--onedir']) == EXIT_OK
+    result = subprocess.run([str(root / 'dist' / 'ok' / 'ok')], capture_output=True, text=True, timeout=60)
+    assert result.stdout.strip() == 'cli-ok'
+    # 跳过预检后由 PyInstaller 报错
+    assert main([str(root / 'bad.py'), '--no-preflight']) == EXIT_BUILD_FAILED
+    assert main([str(root / 'ok.py'), '-o', str(root / 'slow'), '--timeout', '0.5']) == EXIT_BUILD_FAILED
+    assert not os.path.exists(root / 'slow' / 'ok')
@@ -0,0 +1,56 @@
+"""build_exe 的输出接收函数"""
+import os
+import subprocess
+
+import pytest
+
+from conftest import has_pyinstaller
+
+
+@pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+def test_on_line_receives_all_output(write_files, tmp_path, capsys):
+    from packager_core import build_exe
+    root = write_files({'hello.py': 'print("sink-ok")\n'})
+    lines = []
+    output_dir = build_exe(str(root / 'hello.py'), output_dir=str(tmp_path / 'out'), preflight=False,
+                           on_line=lambda elapsed, stream, line: lines.append((stream, line)))
+    captured = capsys.readouterr()
+    assert captured.out == '' and captured.err == ''
+    text = ''.join(line for _, line in lines)
+    assert '正在打包' in text and '打包完成' in text
+    assert any(stream == 'stderr' for stream, _ in lines)
+    result = subprocess.run([os.path.join(output_dir, 'hello')], capture_output=True, text=True, timeout=60)
+    assert result.stdout.strip() == 'sink-ok'
+
+
+def test_scheduler_creates_log_with_job_id():
+    from job_queue import JobScheduler
+    scheduler = JobScheduler(lambda job: job.log)
+    first = scheduler.add('a', {}, log=lambda job_id: f"a-build-{job_id}.log")
+    second = scheduler.add('a', {}, log=lambda job_id: f"a-build-{job_id}.log")
+    assert (first.log, second.log) == ('a-build-1.log', 'a-build-2.log')
+
+
+@pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+def test_cancel_removes_partial_artifacts(write_files, tmp_path):
+    import json
+    import threading
+    from packager_core import build_exe
+    from process_runner import ProcessCancelled
+    root = write_files({'hello.py': 'print("hello")\n'})
+    output_dir = tmp_path / 'out'
+    work_dir = tmp_path / 'work'
+    metrics_file = tmp_path / 'metrics.json'
+    cancel_event = threading.Event()
+
+    def on_line(elapsed, stream, line):
+        # PyInstaller 开始输出后再取消，确保进程已经在运行
+        if stream == 'stderr':
+            cancel_event.set()
+
+    with pytest.raises(ProcessCancelled):
+        build_exe(str(root / 'hello.py'), output_dir=str(output_dir), work_dir=str(work_dir), preflight=False,
+                  cancel_event=cancel_event, metrics_file=str(metrics_file), on_line=on_line)
+    assert os.listdir(output_dir) == []
+    assert not work_dir.exists()
+    assert json.loads(metrics_file.read_text(encoding='utf-8'))['status'] == '已取消'
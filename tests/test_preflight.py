@@ -0,0 +1,136 @@
+"""打包前预检"""
+import sys
+
+import pytest
+
+import preflight
+from preflight import run_preflight, run_preflight_in, check, find_module, format_preflight, PreflightError, main
+
+
+def _items(items, kind=None):
+    return {item['name']: item['detail'] for item in items if kind is None or item['kind'] == kind}
+
+
+def test_clean_script_passes(write_files):
+    root = write_files({
+        'app.py': 'import json\nimport helper\nfrom pkg import sub\n',
+        'helper.py': 'import os.path\n',
+        'pkg/__init__.py': '',
+        'pkg/sub.py': 'from . import other\n',
+        'pkg/other.py': '',
+    })
+    result = run_preflight(str(root / 'app.py'))
+    assert result['ok'] and result['errors'] == [] and result['warnings'] == []
+    assert result['files'] == 5
+    assert "预检通过: 检查 5 个本地文件" in format_preflight(result)
+
+
+def test_missing_modules(write_files, monkeypatch):
+    monkeypatch.setitem(preflight.PIP_NAMES, 'no_such_pkg', 'no-such-dist')
+    root = write_files({
+        'app.py': 'import json\nimport helper\n\nimport no_such_pkg.sub\n',
+        'helper.py': ('try:\n    import no_such_optional\nexcept ImportError:\n    pass\n'
+                      'import importlib\nplugin = importlib.import_module("no_such_plugin")\n'
+                      'from no_such_pkg import thing\n'),
+    })
+    result = run_preflight(str(root / 'app.py'))
+    assert not result['ok']
+    # 顶层导入为错误，列出所有导入位置和 pip 安装名
+    assert _items(result['errors']) == {
+        'no_such_pkg': "app.py:4; helper.py:7 中导入，当前环境中找不到，可以尝试 pip install no-such-dist"}
+    # 条件导入和动态导入为警告
+    warnings = _items(result['warnings'], 'import')
+    assert set(warnings) == {'no_such_optional', 'no_such_plugin'}
+    assert warnings['no_such_optional'].startswith("helper.py:2 中的条件导入或动态导入")
+
+
+def test_excluded_modules_are_not_checked(write_files):
+    root = write_files({'app.py': 'import no_such_pkg\n'})
+    result = run_preflight(str(root / 'app.py'), hidden_imports=['no_such_pkg.sub'], exclude_modules=['no_such_pkg'])
+    assert result['ok'] and result['modules'] == 0
+
+
+@pytest.mark.parametrize('name, expected', [
+    ('json', preflight.FOUND),
+    ('json.decoder', preflight.FOUND),
+    ('json.no_such', preflight.MISSING),
+    ('no_such_pkg', preflight.MISSING),
+    ('sys', preflight.FOUND),
+    # os 不是包，无法确认 os.path 这样的子模块
+    ('os.path', preflight.UNKNOWN),
+    ('helper', preflight.FOUND),
+    ('helper.attr', preflight.FOUND),
+])
+def test_find_module(write_files, name, expected):
+    root = write_files({'helper.py': ''})
+    assert find_module(name, str(root)) == expected
+
+
+def test_hidden_imports(write_files):
+    root = write_files({'app.py': ''})
+    result = run_preflight(str(root / 'app.py'), hidden_imports=['json.decoder', 'no_such_hidden', 'os.path'])
+    assert _items(result['errors']) == {'no_such_hidden': "隐藏导入的模块在当前环境中找不到"}
+    assert list(_items(result['warnings'], 'hidden_import')) == ['os.path']
+
+
+def test_data_icon_and_syntax_errors(write_files):
+    root = write_files({
+        'app.py': 'import broken\n',
+        'broken.py': 'def f(:\n',
+        'config.ini': '',
+        'assets/logo.png': '',
+    })
+    (root / 'empty').mkdir()
+    data = [(str(root / name), '.') for name in ('config.ini', 'assets', 'missing.ini', 'empty')]
+    result = run_preflight(str(root / 'app.py'), additional_data=data, icon_path=str(root / 'app.ico'))
+    assert _items(result['errors'], 'syntax') == {'broken.py': "第 1 行: invalid syntax"}
+    assert _items(result['errors'], 'data') == {str(root / 'missing.ini'): "不存在"}
+    assert _items(result['warnings'], 'data') == {str(root / 'empty'): "目录中没有文件"}
+    assert _items(result['errors'], 'icon') == {str(root / 'app.ico'): "不存在"}
+
+
+def test_missing_input():
+    result = run_preflight('no_such_dir/app.py')
+    assert result['errors'] == [{'kind': 'input', 'name': 'no_such_dir/app.py', 'detail': "不存在"}]
+    assert not result['ok'] and result['files'] == 0
+
+
+SRC_LAYOUT = {
+    'src/demo/__init__.py': '',
+    'src/demo/__main__.py': 'from demo import util\nimport demo.cli\n',
+    'src/demo/util.py': 'import json\n',
+    'src/demo/cli.py': '',
+}
+
+
+def test_source_root_resolves_project_packages(write_files):
+    root = write_files(SRC_LAYOUT)
+    entry = str(root / 'src/demo/__main__.py')
+    # 只看脚本所在目录时找不到项目自己的包
+    assert 'demo' in _items(run_preflight(entry)['errors'], 'import')
+    result = run_preflight(entry, source_root=str(root / 'src'))
+    assert result['ok'] and result['files'] == 4
+
+
+def test_check_raises_preflight_error(write_files):
+    root = write_files({'app.py': 'import no_such_pkg\n'})
+    with pytest.raises(PreflightError) as info:
+        check(str(root / 'app.py'))
+    assert isinstance(info.value, ValueError)
+    assert str(info.value).startswith("预检发现 1 个错误")
+    assert "  错误 [缺少模块] no_such_pkg: app.py:1 中导入" in str(info.value)
+    assert info.value.result['errors'][0]['name'] == 'no_such_pkg'
+
+
+def test_run_in_other_interpreter(write_files):
+    root = write_files(dict(SRC_LAYOUT, **{'src/demo/cli.py': 'import no_such_pkg\n'}))
+    result = run_preflight_in(sys.executable, str(root / 'src/demo/__main__.py'), hidden_imports=['json'],
+                              additional_data=[(str(root / 'missing'), '.')], source_root=str(root / 'src'))
+    assert set(_items(result['errors'])) == {'no_such_pkg', str(root / 'missing')}
+
+
+def test_main_exit_code(write_files, capsys):
+    root = write_files({'good.py': 'import json\n', 'bad.py': 'import no_such_pkg\n'})
+    assert main([str(root / 'good.py')]) == 0
+    assert main([str(root / 'bad.py'), '--json']) == 1
+    assert '"ok": false' in capsys.readouterr().out
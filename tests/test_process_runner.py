@@ -0,0 +1,98 @@
+"""子进程运行：同时读取两个管道、超时、取消和输出行数上限"""
+import os
+import sys
+import time
+import threading
+import subprocess
+
+import pytest
+
+from process_runner import run_process, tail_text, ProcessCancelled
+
+
+def _python(code):
+    return [sys.executable, '-c', code]
+
+
+def _wait_gone(pid, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_large_stderr_does_not_block_stdout():
+    # 先写满 stderr 再写 stdout：只读一个管道时双方会互相等待
+    code = ("import sys\n"
+            "for i in range(20000): sys.stderr.write('e' * 200 + '\\n')\n"
+            "for i in range(20000): sys.stdout.write('o' * 200 + '\\n')\n")
+    seen = {'stdout': 0, 'stderr': 0}
+    result = run_process(_python(code), timeout=60, max_lines=50,
+                         on_line=lambda elapsed, stream, line: seen.__setitem__(stream, seen[stream] + 1))
+    assert result['returncode'] == 0 and not result['timed_out']
+    assert result['line_counts'] == {'stdout': 20000, 'stderr': 20000} == seen
+
+
+def test_recent_lines_are_bounded():
+    result = run_process(_python("for i in range(10000): print(f'line{i}')"), max_lines=100)
+    assert len(result['lines']) == 100
+    assert result['lines'][-1][1:] == ('stdout', 'line9999')
+    assert result['line_counts']['stdout'] == 10000
+    assert tail_text(result, 'stdout', 2) == 'line9998\nline9999'
+
+
+def test_check_raises_called_process_error():
+    with pytest.raises(subprocess.CalledProcessError) as info:
+        run_process(_python("import sys; print('boom', file=sys.stderr); sys.exit(3)"), check=True)
+    assert info.value.returncode == 3
+    assert info.value.stderr == 'boom'
+    assert run_process(_python("import sys; sys.exit(3)"))['returncode'] == 3
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="检查进程组需要 POSIX")
+def test_timeout_kills_process_group(tmp_path):
+    pid_file = tmp_path / 'child.pid'
+    code = ("import subprocess, sys, time\n"
+            "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+            f"open({str(pid_file)!r}, 'w').write(str(child.pid))\n"
+            "print('started', flush=True)\n"
+            "time.sleep(60)\n")
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired) as info:
+        run_process(_python(code), timeout=1, check=True)
+    assert time.monotonic() - start < 10
+    assert info.value.output == 'started'
+    assert _wait_gone(int(pid_file.read_text()))
+
+
+def test_cancel_event_stops_process():
+    cancel = threading.Event()
+    threading.Timer(0.5, cancel.set).start()
+    start = time.monotonic()
+    result = run_process(_python("import time; time.sleep(60)"), cancel_event=cancel)
+    assert result['cancelled'] and not result['timed_out']
+    assert time.monotonic() - start < 10
+    cancel.set()
+    with pytest.raises(ProcessCancelled):
+        run_process(_python("import time; time.sleep(60)"), cancel_event=cancel, check=True)
+
+
+@pytest.mark.skipif(os.name == 'nt', reason="需要 POSIX 的 start_new_session")
+def test_detached_grandchild_holding_pipe_does_not_block_return():
+    # 孙进程离开进程组后仍持有输出管道；输出量超过队列容量，读取线程不能一直卡在放入队列上
+    code = ("import subprocess, sys, time\n"
+            "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(20)'], start_new_session=True)\n"
+            "for i in range(5000): print(i)\n"
+            "sys.stdout.flush()\n"
+            "time.sleep(60)\n")
+    before = threading.active_count()
+    start = time.monotonic()
+    result = run_process(_python(code), timeout=1, max_lines=10)
+    assert result['timed_out']
+    assert time.monotonic() - start < 10
+    # 读取线程只会停在 readline 中 (孙进程退出后结束)，不会额外残留
+    assert threading.active_count() <= before + 2
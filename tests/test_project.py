@@ -0,0 +1,61 @@
+"""项目模式：启动脚本生成在源码目录之外"""
+import os
+import subprocess
+
+import pytest
+
+from conftest import has_pyinstaller
+from project import prepare_project, launcher_dir
+from import_analyzer import import_closure
+from build_cache import BuildCache
+
+PYPROJECT = '[project]\nname = "demo"\n\n[project.scripts]\ndemo = "demo.cli:main"\n'
+SOURCES = {
+    'pyproject.toml': PYPROJECT,
+    'src/demo/__init__.py': '',
+    'src/demo/cli.py': 'from . import util\n\ndef main():\n    print(util.message())\n    return 0\n',
+    'src/demo/util.py': 'def message():\n    return "project-ok"\n',
+}
+
+
+def _snapshot(root):
+    return sorted(os.path.relpath(os.path.join(d, f), root) for d, _, files in os.walk(root) for f in files)
+
+
+def test_launcher_is_not_written_into_source_tree(write_files):
+    root = write_files(SOURCES)
+    before = _snapshot(root)
+    project = prepare_project(str(root))
+    assert _snapshot(root) == before
+    assert os.path.dirname(project['input_file']) == launcher_dir(project['source_root'])
+    assert project['source_root'] == os.path.join(str(root), 'src')
+
+
+def test_import_closure_uses_source_root(write_files):
+    root = write_files(SOURCES)
+    project = prepare_project(str(root))
+    local_files, _ = import_closure(project['input_file'], source_root=project['source_root'])
+    names = {os.path.relpath(path, project['source_root']) for path in local_files}
+    assert {os.path.join('demo', 'cli.py'), os.path.join('demo', 'util.py')} <= names
+
+
+def test_cache_key_follows_project_sources(write_files):
+    root = write_files(SOURCES)
+    project = prepare_project(str(root))
+    cmd = ['pyinstaller', '--paths', project['source_root'], project['input_file']]
+    cache = BuildCache()
+    key = cache.compute_key(project['input_file'], cmd, source_root=project['source_root'])
+    (root / 'src' / 'demo' / 'util.py').write_text('def message():\n    return "changed"\n')
+    assert cache.compute_key(project['input_file'], cmd, source_root=project['source_root']) != key
+
+
+@pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+def test_build_project(write_files, tmp_path):
+    from packager_core import build_exe
+    root = write_files(SOURCES)
+    before = _snapshot(root / 'src')
+    output_dir = build_exe(str(root), output_dir=str(tmp_path / 'out'))
+    assert _snapshot(root / 'src') == before
+    executable = os.path.join(output_dir, 'demo')
+    result = subprocess.run([executable], capture_output=True, text=True, timeout=60)
+    assert result.stdout.strip() == 'project-ok'
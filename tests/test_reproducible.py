@@ -0,0 +1,152 @@
+"""可复现构建：产物比较和修改时间归一化"""
+import os
+import zipfile
+
+import pytest
+
+from conftest import has_pyinstaller
+from reproducible import (diff_artifacts, format_verify, normalize_mtimes, source_date_epoch, reproducible_env,
+                          ORDER_MEMBER, main)
+
+
+def _carchive(path, modules, data=b'data', header=b'BOOT'):
+    """
+    写一个与 PyInstaller 单文件 EXE 结构相同的文件：header 之后是 CArchive，
+    其中包含 PYZ.pyz (modules 为 {模块名: 源码})、一个 ZIP 和一个数据文件
+    """
+    from PyInstaller.archive.writers import CArchiveWriter, ZlibArchiveWriter
+    work = path.parent / (path.name + '.parts')
+    work.mkdir()
+    for name in modules:
+        (work / f"{name}.py").write_text(modules[name])
+    code = {name: compile(source, f"{name}.py", 'exec') for name, source in modules.items()}
+    ZlibArchiveWriter(str(work / 'PYZ.pyz'), [(name, str(work / f"{name}.py"), 'PYMODULE') for name in modules], code)
+    with zipfile.ZipFile(work / 'lib.zip', 'w') as zf:
+        zf.writestr(zipfile.ZipInfo('x.pyc', (1980, 1, 1, 0, 0, 0)), b'x')
+    (work / 'data.txt').write_bytes(data)
+    CArchiveWriter(str(work / 'pkg'), [('PYZ.pyz', str(work / 'PYZ.pyz'), False, 'z'),
+                                       ('lib.zip', str(work / 'lib.zip'), False, 'x'),
+                                       ('data.txt', str(work / 'data.txt'), True, 'x')], 'libpython3.so')
+    path.write_bytes(header + (work / 'pkg').read_bytes())
+    return str(path)
+
+
+def _zip(path, members):
+    """members 为 [(成员名, 内容, 时间)]，按顺序写入"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(path, 'w') as zf:
+        for name, content, date_time in members:
+            zf.writestr(zipfile.ZipInfo(name, date_time), content)
+
+
+def _onedir(root, members, extra=None):
+    """文件夹模式的产物：启动器、_internal/base_library.zip 和其他文件"""
+    app = root / 'app'
+    (app / '_internal').mkdir(parents=True)
+    (app / 'app').write_bytes(b'launcher')
+    _zip(app / '_internal' / 'base_library.zip', members)
+    for rel, content in (extra or {}).items():
+        (app / rel).write_bytes(content)
+    return str(app)
+
+
+T0 = (1980, 1, 1, 0, 0, 0)
+T1 = (2024, 5, 1, 12, 0, 0)
+MODULES = {'mod_a': 'A = 1\n', 'mod_b': 'B = 2\n'}
+
+
+needs_pyinstaller = pytest.mark.skipif(not has_pyinstaller(), reason="需要 PyInstaller")
+
+
+@needs_pyinstaller
+def test_identical_onefile(tmp_path):
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'b').mkdir()
+    result = diff_artifacts([_carchive(tmp_path / 'a' / 'app', MODULES)], [_carchive(tmp_path / 'b' / 'app', MODULES)])
+    assert result['identical'] and result['differences'] == []
+    assert result['reference_digest'] == result['rebuilt_digest']
+    assert format_verify(result).startswith("产物可复现")
+
+
+@needs_pyinstaller
+@pytest.mark.parametrize('rebuilt, members', [
+    ({'modules': {'mod_a': 'A = 1\n', 'mod_b': 'B = 3\n'}}, [('PYZ.pyz/mod_b', 'changed')]),
+    ({'modules': {'mod_a': 'A = 1\n'}}, [('PYZ.pyz/<成员顺序>', 'changed'), ('PYZ.pyz/mod_b', 'missing')]),
+    ({'modules': {'mod_b': 'B = 2\n', 'mod_a': 'A = 1\n'}}, [('PYZ.pyz/<成员顺序>', 'changed')]),
+    ({'modules': MODULES, 'data': b'other'}, [('data.txt', 'changed')]),
+    # 所有归档成员相同，差异在引导程序部分
+    ({'modules': MODULES, 'header': b'BOOT-2'}, []),
+], ids=['module-changed', 'module-missing', 'pyz-order', 'data-changed', 'header-only'])
+def test_onefile_differences_name_innermost_members(tmp_path, rebuilt, members):
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'b').mkdir()
+    reference = _carchive(tmp_path / 'a' / 'app', MODULES)
+    result = diff_artifacts([reference], [_carchive(tmp_path / 'b' / 'app', **rebuilt)])
+    assert not result['identical']
+    assert result['differences'] == [{'path': 'app', 'status': 'changed', 'members': members}]
+    assert result['reference_digest'] != result['rebuilt_digest']
+
+
+@pytest.mark.parametrize('rebuilt, extra, expected', [
+    ([('a.pyc', b'a', T0), ('b.pyc', b'b', T0)], {}, []),
+    ([('b.pyc', b'b', T0), ('a.pyc', b'a', T0)], {},
+     [{'path': 'app/_internal/base_library.zip', 'status': 'changed',
+       'members': [(f'base_library.zip/{ORDER_MEMBER}', 'changed')]}]),
+    ([('a.pyc', b'a', T1), ('b.pyc', b'b', T0)], {},
+     [{'path': 'app/_internal/base_library.zip', 'status': 'changed',
+       'members': [('base_library.zip/a.pyc', 'changed')]}]),
+    ([('a.pyc', b'a', T0), ('b.pyc', b'b', T0)], {'_internal/new.so': b''},
+     [{'path': 'app/_internal/new.so', 'status': 'extra', 'members': []}]),
+], ids=['identical', 'member-order', 'member-timestamp', 'extra-file'])
+def test_onedir_zip_members(tmp_path, rebuilt, extra, expected):
+    reference = _onedir(tmp_path / 'a', [('a.pyc', b'a', T0), ('b.pyc', b'b', T0)])
+    result = diff_artifacts([reference], [_onedir(tmp_path / 'b', rebuilt, extra)])
+    assert result['differences'] == expected
+    assert result['identical'] == (not expected)
+
+
+def test_missing_file_and_format(tmp_path):
+    reference = _onedir(tmp_path / 'a', [('a.pyc', b'a', T0)], {'_internal/gone.dat': b'x'})
+    rebuilt = _onedir(tmp_path / 'b', [('a.pyc', b'a', T1)])
+    result = diff_artifacts([reference], [rebuilt])
+    assert [(item['path'], item['status']) for item in result['differences']] == [
+        ('app/_internal/base_library.zip', 'changed'), ('app/_internal/gone.dat', 'missing')]
+    text = format_verify(result)
+    assert text.startswith("产物不可复现")
+    assert "  app/_internal/gone.dat: 重新打包后缺少" in text
+    assert "      base_library.zip/a.pyc: 内容不同" in text
+
+
+def test_diff_command_exit_codes(tmp_path, capsys):
+    same = _onedir(tmp_path / 'a', [('a.pyc', b'a', T0)])
+    copy = _onedir(tmp_path / 'b', [('a.pyc', b'a', T0)])
+    other = _onedir(tmp_path / 'c', [('a.pyc', b'b', T0)])
+    assert main(['diff', same, copy]) == 0
+    assert main(['diff', same, other]) == 1
+    assert main(['diff', same, str(tmp_path / 'missing')]) == 2
+    assert "产物不存在" in capsys.readouterr().err
+
+
+def test_normalize_mtimes_and_env(tmp_path, monkeypatch):
+    root = tmp_path / 'app'
+    (root / 'sub').mkdir(parents=True)
+    (root / 'sub' / 'file').write_text('x')
+    os.symlink('sub/file', root / 'link')
+    normalize_mtimes(str(root), 1000000000)
+    for path in (root, root / 'sub', root / 'sub' / 'file'):
+        assert os.stat(path).st_mtime == 1000000000
+
+    monkeypatch.delenv('SOURCE_DATE_EPOCH', raising=False)
+    assert reproducible_env() == {'PYTHONHASHSEED': '0', 'SOURCE_DATE_EPOCH': '315532800'}
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', '1700000000')
+    assert source_date_epoch() == 1700000000
+    monkeypatch.setenv('SOURCE_DATE_EPOCH', 'yesterday')
+    with pytest.raises(ValueError, match="必须是整数秒"):
+        source_date_epoch()
+
+
+@needs_pyinstaller
+def test_verify_rebuild_is_identical(write_files, capsys):
+    root = write_files({'app.py': 'import json\nprint(json.dumps({"a": 1}))\n'})
+    assert main(['verify', str(root / 'app.py')]) == 0
+    assert "产物可复现" in capsys.readouterr().out
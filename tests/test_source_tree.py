@@ -0,0 +1,79 @@
+import os
+import time
+
+from source_tree import list_files, hash_tree
+from build_cache import BuildCache
+
+CMD = ['pyinstaller', '--noconfirm', '--onefile', 'main.py']
+
+PROJECT = {
+    'main.py': "from tool.build import steps\nprint('steps', steps.N)\n",
+    'tool/__init__.py': "",
+    'tool/build/__init__.py': "",
+    'tool/build/steps.py': "N = 2\n",
+    'tool/dist/readme.txt': "not a package\n",
+    'build/lib/copy.py': "N = 0\n",
+    'dist/main': "binary\n",
+    'tool/__pycache__/x.pyc': "",
+    '.git/config': "",
+}
+
+
+def _project(base, files=PROJECT):
+    for rel, content in files.items():
+        path = base / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    return base
+
+
+def _age(root):
+    """把文件的修改时间调到几秒前，避开刚修改的文件总要重新读取的时间窗口"""
+    past = time.time() - 10
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            os.utime(os.path.join(dirpath, name), (past, past))
+
+
+def test_ignored_names_only_apply_at_top_level(tmp_path):
+    root = _project(tmp_path / 'proj')
+    assert sorted(list_files(str(root))) == [
+        'main.py', 'tool/__init__.py', 'tool/build/__init__.py', 'tool/build/steps.py', 'tool/dist/readme.txt']
+
+
+def test_top_level_package_named_build_is_kept(tmp_path):
+    root = _project(tmp_path / 'proj', {'main.py': "import build\n", 'build/__init__.py': "X = 1\n"})
+    assert sorted(list_files(str(root))) == ['build/__init__.py', 'main.py']
+
+
+def test_change_in_nested_build_package_invalidates_cache(tmp_path):
+    root = _project(tmp_path / 'proj')
+    _age(root)
+    state_dir = str(tmp_path / 'trees')
+    cache = BuildCache(str(tmp_path / 'cache'))
+    main = str(root / 'main.py')
+
+    first = hash_tree(str(root), state_dir=state_dir)
+    key = cache.compute_key(main, CMD, source_tree=first['digest'])
+
+    (root / 'tool/build/steps.py').write_text("N = 3\n")
+    second = hash_tree(str(root), state_dir=state_dir)
+    assert second['changed'] == ['tool/build/steps.py']
+    assert cache.compute_key(main, CMD, source_tree=second['digest']) != key
+
+
+def test_unchanged_files_are_not_read_again(tmp_path):
+    root = _project(tmp_path / 'proj')
+    _age(root)
+    state_dir = str(tmp_path / 'trees')
+    first = hash_tree(str(root), state_dir=state_dir)
+    second = hash_tree(str(root), state_dir=state_dir)
+    assert (first['hashed'], second['hashed']) == (5, 0)
+    assert second['changed'] == [] and second['digest'] == first['digest']
+
+
+def test_digest_is_location_independent(tmp_path):
+    root = _project(tmp_path / 'proj')
+    other = _project(tmp_path / 'copy')
+    assert hash_tree(str(root), state_dir=str(tmp_path / 't1'))['digest'] == \
+        hash_tree(str(other), state_dir=str(tmp_path / 't2'))['digest']
@@ -0,0 +1,27 @@
+"""启动测速的统计"""
+import pytest
+
+from startup_benchmark import percentile, summarize
+
+
+@pytest.mark.parametrize('values, pct, expected', [
+    (list(range(1, 11)), 50, 5),
+    (list(range(1, 101)), 95, 95),
+    (list(range(1, 101)), 50, 50),
+    (list(range(1, 101)), 7, 7),
+    (list(range(1, 11)), 95, 10),
+    (list(range(1, 11)), 0, 1),
+    (list(range(1, 11)), 100, 10),
+    ([3.0], 50, 3.0),
+])
+def test_percentile_nearest_rank(values, pct, expected):
+    assert percentile(list(reversed(values)), pct) == expected
+
+
+def test_percentile_empty():
+    assert percentile([], 50) is None
+
+
+def test_summarize_uses_nearest_rank():
+    summary = summarize([i / 1000 for i in range(1, 11)])
+    assert summary['p50_ms'] == 5 and summary['p95_ms'] == 10 and summary['runs'] == 10
@@ -0,0 +1,164 @@
+"""隔离的打包环境：锁文件规范化、环境复用和清理"""
+import os
+import subprocess
+import time
+
+import pytest
+
+import venv_cache
+from venv_cache import (read_requirements, pyinstaller_requirement, env_key, ensure_env, list_envs, prune_envs,
+                        format_envs, env_executables, MARKER_NAME, main)
+
+
+def _lock(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def test_read_requirements_normalizes(tmp_path):
+    lock = _lock(tmp_path / 'req.lock', (
+        "# 锁文件\n"
+        "requests==2.31.0   # HTTP\n"
+        "\n"
+        "Flask==3.0.0 \\\n"
+        "    --hash=sha256:abc\n"
+        "attrs  ==  23.1.0\n"
+    ))
+    assert read_requirements(lock) == ['attrs == 23.1.0', 'Flask==3.0.0 --hash=sha256:abc', 'requests==2.31.0']
+
+
+def test_env_key_ignores_formatting(tmp_path):
+    key = env_key(_lock(tmp_path / 'a.lock', "requests==2.31.0\nattrs==23.1.0\n"))
+    assert env_key(_lock(tmp_path / 'b.lock', "# 注释\nattrs==23.1.0\n\nrequests==2.31.0  # x\n")) == key
+    assert env_key(_lock(tmp_path / 'c.lock', "requests==2.32.0\nattrs==23.1.0\n")) != key
+    assert len(key) == 16
+
+
+@pytest.mark.parametrize('requirements, expected_none', [
+    (['requests==2.31.0'], False),
+    (['PyInstaller==6.0.0'], True),
+    (['pyinstaller[hook_testing]>=6'], True),
+], ids=['missing', 'pinned', 'extras'])
+def test_pyinstaller_requirement(requirements, expected_none):
+    extra = pyinstaller_requirement(requirements)
+    assert (extra is None) == expected_none
+    if extra:
+        assert extra.startswith('pyinstaller')
+
+
+class FakeInstaller:
+    """代替 venv_cache 中的 run_process：创建环境目录，pip install 时写入 pyinstaller 脚本"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.commands = []
+
+    def __call__(self, cmd, **kwargs):
+        self.commands.append(cmd)
+        if cmd[1:3] == ['-m', 'venv']:
+            python, _ = env_executables(cmd[3])
+            os.makedirs(os.path.dirname(python))
+            open(python, 'w').close()
+        else:
+            assert cmd[1:4] == ['-m', 'pip', 'install'] and '--no-index' in cmd
+            if self.fail:
+                raise subprocess.CalledProcessError(1, cmd)
+            _, pyinstaller = env_executables(os.path.dirname(os.path.dirname(cmd[0])))
+            open(pyinstaller, 'w').close()
+        return {'returncode': 0}
+
+
+@pytest.fixture
+def installer(monkeypatch):
+    fake = FakeInstaller()
+    monkeypatch.setattr(venv_cache, 'run_process', fake)
+    return fake
+
+
+def _project(tmp_path, name, text="requests==2.31.0\n"):
+    lock = _lock(tmp_path / name / 'requirements.lock', text)
+    (tmp_path / name / 'wheelhouse').mkdir()
+    return lock
+
+
+def test_env_is_created_once_and_reused(tmp_path, installer):
+    lock = _project(tmp_path, 'app')
+    root = str(tmp_path / 'venvs')
+    env = ensure_env(lock, root=root)
+    assert env['created'] and env['key'] == env_key(lock)
+    assert env['path'] == os.path.join(root, env['key'])
+    assert os.path.isfile(env['pyinstaller'])
+    pip = installer.commands[1]
+    assert pip[pip.index('--find-links') + 1] == str(tmp_path / 'app' / 'wheelhouse')
+    assert pip[-1].startswith('pyinstaller')
+
+    marker = os.path.join(env['path'], MARKER_NAME)
+    os.utime(marker, (0, 0))
+    again = ensure_env(lock, root=root)
+    assert not again['created'] and again['path'] == env['path']
+    assert len(installer.commands) == 2
+    # 复用时更新最近使用时间
+    assert os.path.getmtime(marker) > 0
+    assert not os.path.exists(os.path.join(root, f"{env['key']}.lock"))
+
+
+def test_failed_install_leaves_no_env(tmp_path, installer):
+    installer.fail = True
+    lock = _project(tmp_path, 'app')
+    root = tmp_path / 'venvs'
+    with pytest.raises(RuntimeError, match="安装依赖失败"):
+        ensure_env(lock, root=str(root))
+    assert os.listdir(root) == []
+
+    # 上次未完成的环境目录在下次创建时被替换
+    installer.fail = False
+    (root / env_key(lock) / 'leftover').mkdir(parents=True)
+    env = ensure_env(lock, root=str(root))
+    assert env['created'] and not os.path.exists(os.path.join(env['path'], 'leftover'))
+
+
+def test_missing_inputs(tmp_path, installer):
+    with pytest.raises(FileNotFoundError, match="依赖锁文件不存在"):
+        ensure_env(str(tmp_path / 'missing.lock'), root=str(tmp_path / 'venvs'))
+    lock = _lock(tmp_path / 'app' / 'requirements.lock', "requests==2.31.0\n")
+    with pytest.raises(FileNotFoundError, match="wheel 目录不存在"):
+        ensure_env(lock, root=str(tmp_path / 'venvs'))
+    assert installer.commands == []
+
+
+def test_least_recently_used_envs_are_evicted(tmp_path, installer):
+    root = str(tmp_path / 'venvs')
+    envs = [ensure_env(_project(tmp_path, f"app{i}", f"pkg{i}==1.0\n"), root=root, max_envs=10) for i in range(3)]
+    for age, env in enumerate(envs):
+        os.utime(os.path.join(env['path'], MARKER_NAME), (time.time() - 100 * age,) * 2)
+    # 没有标记的目录是未完成的环境，正在创建的环境持有锁
+    os.makedirs(os.path.join(root, 'incomplete'))
+    os.makedirs(os.path.join(root, 'creating'))
+    open(os.path.join(root, 'creating.lock'), 'w').close()
+
+    assert [env['key'] for env in list_envs(root)] == [env['key'] for env in envs]
+    removed = prune_envs(root, max_envs=1, keep=(envs[2]['key'],))
+    assert sorted(removed) == sorted([envs[0]['key'], envs[1]['key'], 'incomplete'])
+    assert sorted(os.listdir(root)) == sorted([envs[2]['key'], 'creating', 'creating.lock'])
+
+    # 新建环境后自动清理，只保留 max_envs 个
+    latest = ensure_env(_project(tmp_path, 'app9', "pkg9==1.0\n"), root=root, max_envs=1)
+    assert [env['key'] for env in list_envs(root)] == [latest['key']]
+
+
+def test_list_and_prune_commands(tmp_path, installer, capsys):
+    root = str(tmp_path / 'venvs')
+    assert main(['--venv-dir', root, 'list']) == 0
+    assert "没有已创建的打包环境" in capsys.readouterr().out
+    lock = _project(tmp_path, 'app')
+    assert main(['--venv-dir', root, 'create', lock]) == 0
+    assert main(['--venv-dir', root, 'create', lock]) == 0
+    out = capsys.readouterr().out
+    assert "已创建打包环境" in out and "复用打包环境" in out
+    envs = list_envs(root)
+    assert envs[0]['lock_file'] == lock and envs[0]['requirements'][0] == 'requests==2.31.0'
+    assert envs[0]['key'] in format_envs(envs) and lock in format_envs(envs)
+    assert main(['--venv-dir', root, 'prune', '--max', '0']) == 0
+    assert list_envs(root) == []
+    assert main(['--venv-dir', root, 'create', str(tmp_path / 'missing.lock')]) == 1
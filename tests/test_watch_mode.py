@@ -0,0 +1,147 @@
+"""监视模式：监视范围、轮询后端和防抖"""
+import os
+import threading
+import time
+
+from watch_mode import watched_paths, PollingWatcher, watch_changes, watch_and_build
+from process_runner import ProcessCancelled
+
+INTERVAL = 0.05
+
+
+def _write(path, text):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        time.sleep(0.01)
+
+
+class Watching:
+    """在后台线程中运行 watch_changes (强制轮询)，记录每次 on_change 收到的路径"""
+
+    def __init__(self, get_paths, debounce=0.3):
+        self.calls = []
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=watch_changes, daemon=True,
+                                       args=(get_paths, self.calls.append, self.stop_event, debounce, True, INTERVAL))
+
+    def __enter__(self):
+        self.thread.start()
+        # 等待第一次扫描完成，之后的修改才会被识别为变化
+        time.sleep(INTERVAL * 2)
+        return self
+
+    def __exit__(self, *exc):
+        self.stop_event.set()
+        self.thread.join(5)
+        assert not self.thread.is_alive()
+
+
+def test_watched_paths_follow_imports_and_data(write_files):
+    root = write_files({
+        'main.py': 'import helper\nimport json\n',
+        'helper.py': 'X = 1\n',
+        'unused.py': '',
+        'config.ini': '',
+        'assets/logo.png': '',
+    })
+    files, trees = watched_paths(str(root / 'main.py'),
+                                 [(str(root / 'config.ini'), '.'), (str(root / 'assets'), 'assets')])
+    assert files == {str(root / 'main.py'), str(root / 'helper.py'), str(root / 'config.ini')}
+    assert trees == {str(root / 'assets')}
+
+
+def test_watched_paths_with_syntax_error_keeps_script(write_files):
+    root = write_files({'main.py': 'import helper\ndef broken(:\n', 'helper.py': ''})
+    assert watched_paths(str(root / 'main.py')) == ({str(root / 'main.py')}, frozenset())
+
+
+def test_watched_paths_project_source_tree(write_files):
+    root = write_files({
+        'src/demo/__main__.py': 'print("hi")\n',
+        'src/demo/data.txt': '',
+        'src/dist/old.py': '',
+    })
+    source_root = str(root / 'src')
+    files, _ = watched_paths(str(root / 'src/demo/__main__.py'), source_root=source_root,
+                             exclude=[str(root / 'src/dist')])
+    assert str(root / 'src/demo/data.txt') in files
+    assert str(root / 'src/dist/old.py') not in files
+
+
+def test_polling_watcher_reports_changes(write_files):
+    root = write_files({'main.py': 'a = 1\n', 'assets/a.txt': 'a'})
+    watcher = PollingWatcher({str(root / 'main.py')}, {str(root / 'assets')}, INTERVAL)
+    assert watcher.wait(0.1) == set()
+    _write(root / 'main.py', 'a = 22\n')
+    _write(root / 'assets/b.txt', 'b')
+    os.remove(root / 'assets/a.txt')
+    assert watcher.wait(1) == {str(root / 'main.py'), str(root / 'assets/b.txt'), str(root / 'assets/a.txt')}
+    assert watcher.wait(0.1) == set()
+
+
+def test_rapid_saves_trigger_one_change(write_files):
+    root = write_files({'main.py': ''})
+    script = str(root / 'main.py')
+    with Watching(lambda: watched_paths(script)) as watching:
+        # 连续保存的间隔小于防抖时间，只触发一次
+        for i in range(5):
+            _write(script, 'x = 1\n' * (i + 1))
+            time.sleep(0.1)
+        _wait_for(lambda: watching.calls)
+        time.sleep(0.5)
+        assert watching.calls == [{script}]
+
+        # 安静下来之后的修改再触发一次
+        _write(script, 'x = 2\n')
+        _wait_for(lambda: len(watching.calls) == 2)
+        assert watching.calls[1] == {script}
+
+
+def test_new_import_is_watched_after_change(write_files):
+    root = write_files({'main.py': '', 'helper.py': ''})
+    script = str(root / 'main.py')
+    with Watching(lambda: watched_paths(script), debounce=0.1) as watching:
+        _write(script, 'import helper\n')
+        _wait_for(lambda: len(watching.calls) == 1)
+        time.sleep(INTERVAL * 2)
+        _write(root / 'helper.py', 'X = 1\n')
+        _wait_for(lambda: len(watching.calls) == 2)
+        assert watching.calls[1] == {str(root / 'helper.py')}
+
+
+def test_new_change_cancels_running_build(write_files, monkeypatch):
+    import packager_core
+    root = write_files({'main.py': ''})
+    script = str(root / 'main.py')
+    builds = []
+
+    def fake_build(input_file, cancel_event=None, **options):
+        # 第一次构建一直运行到被取消，之后的构建立即完成
+        builds.append({'options': options, 'cancelled': False})
+        if len(builds) == 1:
+            cancel_event.wait(10)
+            builds[0]['cancelled'] = cancel_event.is_set()
+            raise ProcessCancelled("已取消")
+
+    monkeypatch.setattr(packager_core, 'build_exe', fake_build)
+    stop_event = threading.Event()
+    thread = threading.Thread(target=watch_and_build, args=(script,), daemon=True,
+                              kwargs={'debounce': 0.1, 'polling': True, 'stop_event': stop_event})
+    thread.start()
+    try:
+        _wait_for(lambda: builds)
+        time.sleep(0.2)
+        _write(script, 'x = 1\n')
+        _wait_for(lambda: len(builds) == 2)
+    finally:
+        stop_event.set()
+        thread.join(5)
+    assert builds[0]['cancelled']
+    # 监视模式默认使用增量构建
+    assert builds[1]['options'] == {'incremental': True}
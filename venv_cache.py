@@ -0,0 +1,330 @@
+"""
+隔离的打包环境：按依赖锁文件创建专用的虚拟环境，在其中运行 PyInstaller
+
+直接使用当前环境打包时，PyInstaller 会收集当前环境中碰巧安装的包，产物变大且随机器不同。
+本模块用锁文件 (requirements 格式，应固定版本) 和本地 wheel 目录 (--no-index，不联网) 创建虚拟环境，
+以锁文件内容、Python 版本和平台的哈希为键缓存在 ~/.cache/py_to_exe/venvs 中，相同的锁文件直接复用；
+环境数量超过上限时删除最久没有使用的环境。锁文件中没有 PyInstaller 时安装与当前环境相同的版本
+(wheel 目录中需要有 PyInstaller 及其依赖)。
+
+用法:
+    python venv_cache.py create requirements.lock --wheelhouse wheels
+    python venv_cache.py list
+    python venv_cache.py prune --max 3
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
+import subprocess
+from contextlib import contextmanager
+from process_runner import run_process, echo_line
+
+# 环境格式版本，修改环境的创建方式时需要递增
+ENV_FORMAT_VERSION = 1
+
+# 默认环境目录，可通过环境变量 PY_TO_EXE_VENV_DIR 覆盖
+DEFAULT_VENV_ROOT = os.environ.get(
+    'PY_TO_EXE_VENV_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'py_to_exe', 'venvs')
+)
+
+# 默认保留的环境数量
+DEFAULT_MAX_ENVS = 5
+
+# 环境创建完成后写入的标记文件，修改时间即最近一次使用的时间
+MARKER_NAME = 'py_to_exe-env.json'
+
+# 等待其他进程创建同一个环境的最长秒数
+LOCK_TIMEOUT = 30 * 60
+
+
+def read_requirements(lock_file):
+    """读取锁文件中的需求行 (去掉注释、空行并合并续行)，按名称排序"""
+    lines = []
+    pending = ''
+    with open(lock_file, 'r', encoding='utf-8') as f:
+        for raw in f:
+            line = raw.split(' #', 1)[0].strip()
+            if line.startswith('#'):
+                line = ''
+            if line.endswith('\\'):
+                pending += line[:-1].strip() + ' '
+                continue
+            line = (pending + line).strip()
+            pending = ''
+            if line:
+                lines.append(' '.join(line.split()))
+    if pending.strip():
+        lines.append(' '.join(pending.split()))
+    return sorted(lines, key=str.lower)
+
+
+def _requirement_name(line):
+    name = line
+    for sep in ('[', '=', '<', '>', '!', '~', ';', '@', ' '):
+        name = name.split(sep, 1)[0]
+    return name.strip().lower().replace('_', '-')
+
+
+def pyinstaller_requirement(requirements):
+    """锁文件中没有 PyInstaller 时需要额外安装的需求，有时返回 None"""
+    if any(_requirement_name(line) == 'pyinstaller' for line in requirements):
+        return None
+    try:
+        from importlib.metadata import version
+        return f"pyinstaller=={version('pyinstaller')}"
+    except Exception:
+        return 'pyinstaller'
+
+
+def env_key(lock_file):
+    """计算环境的缓存键: 锁文件内容 (规范化后)、Python 版本和平台"""
+    requirements = read_requirements(lock_file)
+    hasher = hashlib.sha256()
+    hasher.update(f"format:{ENV_FORMAT_VERSION}\n".encode('utf-8'))
+    hasher.update(f"python:{sys.version}\n".encode('utf-8'))
+    hasher.update(f"platform:{sys.platform}\n".encode('utf-8'))
+    for line in requirements + [pyinstaller_requirement(requirements) or '']:
+        hasher.update(f"{line}\n".encode('utf-8'))
+    return hasher.hexdigest()[:16]
+
+
+def env_executables(env_dir):
+    """返回环境中的 (python, pyinstaller) 路径"""
+    if sys.platform == 'win32':
+        return os.path.join(env_dir, 'Scripts', 'python.exe'), os.path.join(env_dir, 'Scripts', 'pyinstaller.exe')
+    return os.path.join(env_dir, 'bin', 'python'), os.path.join(env_dir, 'bin', 'pyinstaller')
+
+
+@contextmanager
+def _locked(lock_path, timeout=LOCK_TIMEOUT):
+    """跨进程锁，同一个环境只由一个进程创建；timeout 为 0 时不等待"""
+    deadline = time.time() + timeout
+    while True:
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            # 持有者异常退出时遗留的锁文件视为过期
+            try:
+                if time.time() - os.path.getmtime(lock_path) > LOCK_TIMEOUT:
+                    os.remove(lock_path)
+                    continue
+            except OSError:
+                continue
+            if time.time() > deadline:
+                raise TimeoutError(f"等待环境锁超时: {lock_path}")
+            time.sleep(0.5)
+    try:
+        yield
+    finally:
+        os.close(fd)
+        try:
+            os.remove(lock_path)
+        except OSError:
+            pass
+
+
+def _env_info(env_dir, key, created):
+    python, pyinstaller = env_executables(env_dir)
+    return {'key': key, 'path': env_dir, 'python': python, 'pyinstaller': pyinstaller, 'created': created}
+
+
+def ensure_env(lock_file, wheelhouse=None, root=None, max_envs=DEFAULT_MAX_ENVS, timeout=None, cancel_event=None):
+    """
+    返回锁文件对应的虚拟环境，没有时创建
+
+    参数:
+        lock_file (str): 依赖锁文件 (requirements 格式)
+        wheelhouse (str, optional): 本地 wheel 目录，默认为锁文件所在目录下的 wheelhouse
+        root (str, optional): 环境目录根，默认为 ~/.cache/py_to_exe/venvs
+        max_envs (int, optional): 保留的环境数量，创建新环境后删除最久没有使用的环境
+        timeout (float, optional): 安装依赖的超时秒数
+        cancel_event (threading.Event, optional): 被设置后结束安装并抛出 ProcessCancelled
+
+    返回:
+        dict: key、path、python、pyinstaller、created (本次是否新建)
+    """
+    if not os.path.isfile(lock_file):
+        raise FileNotFoundError(f"依赖锁文件不存在: {lock_file}")
+    lock_file = os.path.abspath(lock_file)
+    wheelhouse = os.path.abspath(wheelhouse or os.path.join(os.path.dirname(lock_file), 'wheelhouse'))
+    if not os.path.isdir(wheelhouse):
+        raise FileNotFoundError(f"wheel 目录不存在: {wheelhouse}")
+    root = os.path.abspath(root or DEFAULT_VENV_ROOT)
+    os.makedirs(root, exist_ok=True)
+
+    key = env_key(lock_file)
+    env_dir = os.path.join(root, key)
+    marker = os.path.join(env_dir, MARKER_NAME)
+    with _locked(os.path.join(root, f"{key}.lock")):
+        if os.path.isfile(marker):
+            # 修改时间记录最近一次使用，供 LRU 清理
+            os.utime(marker)
+            return _env_info(env_dir, key, False)
+
+        # 虚拟环境中的脚本记录了绝对路径，不能先建在临时目录再改名；没有标记的目录是上次未完成的环境
+        if os.path.exists(env_dir):
+            shutil.rmtree(env_dir)
+        print(f"正在创建打包环境 {key} (锁文件: {lock_file})...")
+        start = time.perf_counter()
+        try:
+            run_process([sys.executable, '-m', 'venv', env_dir], on_line=echo_line, timeout=timeout,
+                        cancel_event=cancel_event, check=True)
+            python, pyinstaller = env_executables(env_dir)
+            requirements = read_requirements(lock_file)
+            cmd = [python, '-m', 'pip', 'install', '--no-index', '--find-links', wheelhouse,
+                   '--disable-pip-version-check', '--no-input', '-r', lock_file]
+            extra = pyinstaller_requirement(requirements)
+            if extra:
+                cmd.append(extra)
+            # 锁文件中的相对路径以锁文件所在目录为基准
+            try:
+                run_process(cmd, on_line=echo_line, timeout=timeout, cancel_event=cancel_event, check=True,
+                            cwd=os.path.dirname(lock_file))
+            except subprocess.CalledProcessError:
+                raise RuntimeError(f"安装依赖失败，请确认 wheel 目录中有锁文件需要的所有包: {wheelhouse}") from None
+            if not os.path.isfile(pyinstaller):
+                raise RuntimeError(f"环境中没有安装 PyInstaller，请把它加入锁文件或 wheel 目录: {wheelhouse}")
+        except BaseException:
+            shutil.rmtree(env_dir, ignore_errors=True)
+            raise
+        with open(marker, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': ENV_FORMAT_VERSION,
+                'key': key,
+                'lock_file': lock_file,
+                'requirements': requirements + ([extra] if extra else []),
+                'python': sys.version,
+                'created_at': time.time(),
+            }, f, ensure_ascii=False, indent=2)
+        print(f"打包环境已创建，用时 {time.perf_counter() - start:.1f}s")
+
+    prune_envs(root, max_envs, keep=(key,))
+    return _env_info(env_dir, key, True)
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def list_envs(root=None):
+    """
+    列出已创建的环境，最近使用的在前
+
+    返回:
+        list: 每个环境的 key、path、last_used、size_bytes、lock_file、requirements
+    """
+    root = os.path.abspath(root or DEFAULT_VENV_ROOT)
+    envs = []
+    if not os.path.isdir(root):
+        return envs
+    for entry in os.scandir(root):
+        marker = os.path.join(entry.path, MARKER_NAME)
+        if not entry.is_dir() or not os.path.isfile(marker):
+            continue
+        try:
+            with open(marker, 'r', encoding='utf-8') as f:
+                info = json.load(f)
+            last_used = os.path.getmtime(marker)
+        except (OSError, ValueError):
+            continue
+        envs.append({
+            'key': entry.name,
+            'path': entry.path,
+            'last_used': last_used,
+            'size_bytes': _dir_size(entry.path),
+            'lock_file': info.get('lock_file'),
+            'requirements': info.get('requirements', []),
+        })
+    envs.sort(key=lambda env: env['last_used'], reverse=True)
+    return envs
+
+
+def prune_envs(root=None, max_envs=DEFAULT_MAX_ENVS, keep=()):
+    """
+    删除最久没有使用的环境，只保留 max_envs 个；同时删除未完成且没有进程在创建的环境
+
+    返回:
+        list: 被删除的环境键
+    """
+    root = os.path.abspath(root or DEFAULT_VENV_ROOT)
+    if not os.path.isdir(root):
+        return []
+    envs = list_envs(root)
+    complete = {env['key'] for env in envs}
+    kept = [env['key'] for env in envs if env['key'] in keep]
+    candidates = []
+    for env in envs:
+        if env['key'] in kept:
+            continue
+        if len(kept) < max_envs:
+            kept.append(env['key'])
+            continue
+        candidates.append(env['key'])
+    candidates.extend(entry.name for entry in os.scandir(root)
+                      if entry.is_dir() and entry.name not in complete)
+    removed = []
+    for key in candidates:
+        try:
+            # 正在创建该环境的进程持有锁时跳过
+            with _locked(os.path.join(root, f"{key}.lock"), timeout=0):
+                shutil.rmtree(os.path.join(root, key), ignore_errors=True)
+            removed.append(key)
+        except TimeoutError:
+            pass
+    if removed:
+        print(f"已删除 {len(removed)} 个最久没有使用的打包环境")
+    return removed
+
+
+def format_envs(envs):
+    """把环境列表格式化为多行文本"""
+    if not envs:
+        return "没有已创建的打包环境"
+    lines = []
+    for env in envs:
+        used = time.strftime('%Y-%m-%d %H:%M', time.localtime(env['last_used']))
+        lines.append(f"{env['key']}  最近使用 {used}  {env['size_bytes'] / 1024 / 1024:7.1f} MB  {env['lock_file']}")
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="管理按依赖锁文件创建的打包环境")
+    parser.add_argument('--venv-dir', help="环境目录根，默认为 ~/.cache/py_to_exe/venvs")
+    commands = parser.add_subparsers(dest='command', required=True)
+    create = commands.add_parser('create', help="创建 (或复用) 锁文件对应的环境")
+    create.add_argument('lock_file', help="依赖锁文件 (requirements 格式)")
+    create.add_argument('--wheelhouse', help="本地 wheel 目录，默认为锁文件所在目录下的 wheelhouse")
+    commands.add_parser('list', help="列出已创建的环境")
+    prune = commands.add_parser('prune', help="删除最久没有使用的环境")
+    prune.add_argument('--max', type=int, default=DEFAULT_MAX_ENVS, help=f"保留的环境数量，默认为 {DEFAULT_MAX_ENVS}")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'create':
+            env = ensure_env(args.lock_file, args.wheelhouse, args.venv_dir)
+            print(f"{'已创建' if env['created'] else '复用'}打包环境: {env['path']}")
+        elif args.command == 'list':
+            print(format_envs(list_envs(args.venv_dir)))
+        else:
+            prune_envs(args.venv_dir, args.max)
+    except Exception as e:
+        print(f"出错: {str(e)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,300 @@
+"""
+监视模式：脚本、本地导入模块 (项目模式下为整个源码树) 或附加数据变化时自动重新打包
+
+Linux 上通过 inotify (ctypes 调用 libc，无需额外依赖) 接收文件变化通知，其他平台或 inotify
+不可用时退回到定时比较修改时间和大小。连续保存会合并为一次构建 (防抖)，新的修改会取消仍在进行的构建。
+"""
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import threading
+from import_analyzer import import_closure
+from process_runner import ProcessCancelled
+
+# 最后一次变化后等待多久没有新的变化才开始构建 (秒)
+DEFAULT_DEBOUNCE = 0.3
+
+# 轮询模式下检查文件的间隔 (秒)
+DEFAULT_POLL_INTERVAL = 0.5
+
+# inotify 事件
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+def watched_paths(input_file, additional_data=None, source_root=None, exclude=()):
+    """
+    返回需要监视的文件和目录
+
+    参数:
+        input_file (str): 要打包的 Python 文件路径
+        additional_data (list, optional): [(源路径, 目标路径), ...]
+        source_root (str, optional): 项目模式下的源码目录，其中的所有源码文件都会被监视
+        exclude (list, optional): 源码目录中不监视的目录 (例如输出目录)
+
+    返回:
+        tuple: (文件集合, 目录集合)，目录中的任意文件变化都算作变化
+    """
+    files = {os.path.abspath(input_file)}
+    try:
+        local_files, _ = import_closure(input_file, source_root=source_root)
+        files.update(os.path.abspath(path) for path in local_files)
+    except (SyntaxError, ValueError, OSError):
+        # 保存到一半的脚本可能暂时无法解析，先只监视脚本本身
+        pass
+    if source_root:
+        from source_tree import list_files
+        files.update(os.path.join(os.path.abspath(source_root), *rel.split('/')) for rel in list_files(source_root, exclude))
+    trees = set()
+    for src, _ in additional_data or []:
+        if os.path.isdir(src):
+            trees.add(os.path.abspath(src))
+        else:
+            files.add(os.path.abspath(src))
+    return frozenset(files), frozenset(trees)
+
+
+def _in_trees(path, trees):
+    return any(path == tree or path.startswith(tree + os.sep) for tree in trees)
+
+
+class PollingWatcher:
+    """
+    定时比较文件的修改时间和大小
+
+    参数:
+        files (set): 监视的文件
+        trees (set): 监视的目录 (递归)
+        interval (float, optional): 检查间隔
+    """
+
+    def __init__(self, files, trees, interval=DEFAULT_POLL_INTERVAL):
+        self.files = files
+        self.trees = trees
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def _scan(self):
+        snapshot = {}
+        paths = list(self.files)
+        for tree in self.trees:
+            for root, _, names in os.walk(tree):
+                paths.extend(os.path.join(root, name) for name in names)
+        for path in paths:
+            try:
+                st = os.stat(path)
+                snapshot[path] = (st.st_mtime_ns, st.st_size)
+            except OSError:
+                snapshot[path] = None
+        return snapshot
+
+    def wait(self, timeout=None):
+        """等待变化，返回变化的路径集合；超时返回空集合"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            snapshot = self._scan()
+            changed = {path for path in set(snapshot) | set(self._snapshot)
+                       if snapshot.get(path) != self._snapshot.get(path)}
+            self._snapshot = snapshot
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            delay = self.interval if deadline is None else min(self.interval, max(0, deadline - time.monotonic()))
+            time.sleep(delay)
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    通过 inotify 监视文件所在的目录 (编辑器常用"写临时文件再改名"的方式保存，直接监视文件会丢失事件)
+
+    参数与 PollingWatcher 相同 (没有 interval)；inotify 不可用时构造函数抛出 OSError
+    """
+
+    MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, files, trees):
+        import ctypes
+        import ctypes.util
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, "inotify 只在 Linux 上可用")
+        self.files = files
+        self.trees = trees
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._dirs = {}
+        directories = {os.path.dirname(path) for path in files}
+        for tree in trees:
+            for root, _, _ in os.walk(tree):
+                directories.add(root)
+        for directory in directories:
+            self._add(directory)
+
+    def _add(self, directory):
+        import ctypes
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK)
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err in (errno.ENOENT, errno.ENOTDIR):
+                return
+            self.close()
+            raise OSError(err, f"无法监视目录: {directory}")
+        self._dirs[wd] = directory
+
+    def _read_events(self):
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, os.fsdecode(name))
+            if path in self.files or _in_trees(path, self.trees):
+                changed.add(path)
+                # 数据目录中新建的子目录也需要监视
+                if mask & (IN_CREATE | IN_MOVED_TO) and os.path.isdir(path) and _in_trees(path, self.trees):
+                    self._add(path)
+        return changed
+
+    def wait(self, timeout=None):
+        """等待变化，返回变化的路径集合；超时返回空集合"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(0, deadline - time.monotonic())
+            ready, _, _ = select.select([self.fd], [], [], remaining)
+            if ready:
+                changed = self._read_events()
+                if changed:
+                    return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def create_watcher(files, trees, polling=False, interval=DEFAULT_POLL_INTERVAL):
+    """优先使用 inotify，不可用时退回轮询"""
+    if not polling:
+        try:
+            return InotifyWatcher(files, trees)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(files, trees, interval)
+
+
+def watch_changes(get_paths, on_change, stop_event=None, debounce=DEFAULT_DEBOUNCE, polling=False,
+                  interval=DEFAULT_POLL_INTERVAL):
+    """
+    监视文件变化，防抖后调用 on_change，直到 stop_event 被设置
+
+    参数:
+        get_paths (callable): 返回 (文件集合, 目录集合)，每次变化后重新调用，以便跟踪新增的导入
+        on_change (callable): on_change(变化的路径集合)
+        stop_event (threading.Event, optional): 被设置后返回
+        debounce (float, optional): 最后一次变化后等待的秒数
+        polling (bool, optional): 是否强制使用轮询
+        interval (float, optional): 轮询间隔
+    """
+    stop_event = stop_event or threading.Event()
+    paths = get_paths()
+    watcher = create_watcher(*paths, polling=polling, interval=interval)
+    try:
+        while not stop_event.is_set():
+            changed = watcher.wait(0.5)
+            if not changed:
+                continue
+            # 连续保存时等到安静下来再构建
+            while not stop_event.is_set():
+                more = watcher.wait(debounce)
+                if not more:
+                    break
+                changed |= more
+            if stop_event.is_set():
+                break
+            on_change(changed)
+            new_paths = get_paths()
+            if new_paths != paths:
+                watcher.close()
+                paths = new_paths
+                watcher = create_watcher(*paths, polling=polling, interval=interval)
+    finally:
+        watcher.close()
+
+
+def watch_and_build(input_file, debounce=DEFAULT_DEBOUNCE, polling=False, stop_event=None, **build_options):
+    """
+    先打包一次，之后每次变化都重新打包 (默认启用增量构建)；新的变化会取消仍在进行的构建
+
+    参数:
+        input_file (str): 要打包的 Python 文件路径
+        debounce (float, optional): 防抖秒数
+        polling (bool, optional): 是否强制使用轮询
+        stop_event (threading.Event, optional): 被设置后停止监视
+        **build_options: 其他打包参数，原样传给 build_exe
+    """
+    from packager_core import build_exe
+    build_options.setdefault('incremental', True)
+    current = {'thread': None, 'cancel': None}
+
+    def run(cancel_event):
+        try:
+            build_exe(input_file, cancel_event=cancel_event, **build_options)
+        except ProcessCancelled:
+            print("检测到新的修改，已取消本次构建")
+        except Exception as e:
+            print(f"打包过程中出错: {str(e)}")
+        print("等待文件变化... (按 Ctrl+C 退出)")
+
+    def stop_build():
+        if current['thread'] and current['thread'].is_alive():
+            current['cancel'].set()
+            current['thread'].join()
+
+    def start_build():
+        stop_build()
+        cancel_event = threading.Event()
+        thread = threading.Thread(target=run, args=(cancel_event,), daemon=True)
+        current.update(thread=thread, cancel=cancel_event)
+        thread.start()
+
+    def on_change(changed):
+        names = ', '.join(sorted(os.path.basename(path) for path in changed))
+        print(f"检测到修改: {names}，重新打包")
+        start_build()
+
+    start_build()
+    try:
+        watch_changes(lambda: watched_paths(input_file, build_options.get('additional_data'),
+                                            build_options.get('source_root'),
+                                            [build_options['output_dir']] if build_options.get('output_dir') else ()),
+                      on_change, stop_event, debounce, polling)
+    finally:
+        # 退出时不留下仍在运行的 PyInstaller
+        stop_build()